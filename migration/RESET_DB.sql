@@ -36,6 +36,7 @@ BEGIN
     DROP POLICY IF EXISTS "Allow authenticated users to read and update" ON archon_settings;
     
     -- Crawled pages policies
+    DROP POLICY IF EXISTS "Allow public read access to archon_pages" ON archon_pages;
     DROP POLICY IF EXISTS "Allow public read access to archon_crawled_pages" ON archon_crawled_pages;
     
     -- Sources policies  
@@ -131,7 +132,13 @@ BEGIN
     
     -- Search functions (new with archon_ prefix)
     DROP FUNCTION IF EXISTS match_archon_crawled_pages(vector, int, jsonb, text) CASCADE;
+    DROP FUNCTION IF EXISTS match_archon_crawled_pages(vector, int, jsonb, text, boolean) CASCADE;
+    DROP FUNCTION IF EXISTS match_archon_crawled_pages(vector, int, jsonb, text, boolean, boolean) CASCADE;
     DROP FUNCTION IF EXISTS match_archon_code_examples(vector, int, jsonb, text) CASCADE;
+    DROP FUNCTION IF EXISTS match_archon_code_examples(vector, int, jsonb, text, boolean) CASCADE;
+    DROP FUNCTION IF EXISTS trim_archon_crawled_pages(text[], integer[]) CASCADE;
+    DROP FUNCTION IF EXISTS reencode_archon_embeddings(text, boolean, integer) CASCADE;
+    DROP FUNCTION IF EXISTS reindex_archon_embeddings(text, boolean) CASCADE;
     
     -- Search functions (old without prefix)
     DROP FUNCTION IF EXISTS match_crawled_pages(vector, int, jsonb, text) CASCADE;
@@ -164,8 +171,10 @@ BEGIN
     DROP TABLE IF EXISTS archon_prompts CASCADE;
     
     -- Knowledge Base System - new archon_ prefixed tables
+    DROP TABLE IF EXISTS archon_failed_chunks CASCADE;
     DROP TABLE IF EXISTS archon_code_examples CASCADE;
     DROP TABLE IF EXISTS archon_crawled_pages CASCADE;
+    DROP TABLE IF EXISTS archon_pages CASCADE;
     DROP TABLE IF EXISTS archon_sources CASCADE;
     
     -- Configuration System - new archon_ prefixed table
@@ -94,7 +94,11 @@ INSERT INTO archon_settings (key, encrypted_value, is_encrypted, category, descr
 INSERT INTO archon_settings (key, value, is_encrypted, category, description) VALUES
 ('LLM_PROVIDER', 'openai', false, 'rag_strategy', 'LLM provider to use: openai, ollama, or google'),
 ('LLM_BASE_URL', NULL, false, 'rag_strategy', 'Custom base URL for LLM provider (mainly for Ollama, e.g., http://localhost:11434/v1)'),
-('EMBEDDING_MODEL', 'text-embedding-3-small', false, 'rag_strategy', 'Embedding model for vector search and similarity matching (required for all embedding operations)')
+('EMBEDDING_MODEL', 'text-embedding-3-small', false, 'rag_strategy', 'Embedding model for vector search and similarity matching (required for all embedding operations)'),
+('EMBEDDING_PROVIDER', '', false, 'rag_strategy', 'Set to local to run embeddings on CPU with sentence-transformers instead of the LLM provider'),
+('LOCAL_EMBEDDING_MODEL', 'sentence-transformers/all-MiniLM-L6-v2', false, 'rag_strategy', 'sentence-transformers model used when EMBEDDING_PROVIDER is local'),
+('LOCAL_EMBEDDING_WORKERS', '0', false, 'rag_strategy', 'Worker processes for local embeddings (0 = one per CPU core)'),
+('LOCAL_EMBEDDING_BACKEND', 'torch', false, 'rag_strategy', 'Inference backend for local embeddings: torch or onnx')
 ON CONFLICT (key) DO NOTHING;
 
 -- Add provider API key placeholders
@@ -122,10 +126,12 @@ INSERT INTO archon_settings (key, value, is_encrypted, category, description) VA
 ('MAX_PROSE_RATIO', '0.15', false, 'code_extraction', 'Maximum allowed ratio of prose indicators (0-1) in code blocks'),
 ('MIN_CODE_INDICATORS', '3', false, 'code_extraction', 'Minimum number of code patterns required (brackets, operators, keywords)'),
 ('ENABLE_DIAGRAM_FILTERING', 'true', false, 'code_extraction', 'Exclude diagram languages like Mermaid, PlantUML from code extraction'),
+('ENABLE_STREAMING_HTML_PARSER', 'true', false, 'code_extraction', 'Find HTML code blocks in one parsing pass instead of a regex per highlighter layout'),
 
 -- Processing Settings
 ('CODE_EXTRACTION_MAX_WORKERS', '3', false, 'code_extraction', 'Number of parallel workers for generating code summaries'),
-('ENABLE_CODE_SUMMARIES', 'true', false, 'code_extraction', 'Generate AI-powered summaries and names for extracted code examples')
+('ENABLE_CODE_SUMMARIES', 'true', false, 'code_extraction', 'Generate AI-powered summaries and names for extracted code examples'),
+('ENABLE_CODE_DEDUPLICATION', 'true', false, 'code_extraction', 'Skip summarizing, embedding and storing snippets already stored for the same source; duplicates are recorded on the existing example')
 
 -- Only insert if they don't already exist
 ON CONFLICT (key) DO NOTHING;
@@ -142,9 +148,20 @@ ON CONFLICT (key) DO NOTHING;
 -- Document Storage Performance Settings (from add_performance_settings.sql and optimize_batch_sizes.sql)
 INSERT INTO archon_settings (key, value, is_encrypted, category, description) VALUES
 ('DOCUMENT_STORAGE_BATCH_SIZE', '100', false, 'rag_strategy', 'Number of document chunks to process per batch (50-200) - increased for better performance'),
+('DOCUMENT_STORAGE_PIPELINE_DEPTH', '2', false, 'rag_strategy', 'Embedded batches allowed to wait for the database writer while the next batch is embedded (1-5)'),
+('CHUNKING_STRATEGY', 'characters', false, 'rag_strategy', 'How documents are split into chunks: characters (5000 character chunks) or tokens (sized with the local tokenizer to CHUNK_MAX_TOKENS)'),
+('CHUNK_MAX_TOKENS', '1000', false, 'rag_strategy', 'Maximum tokens per chunk when CHUNKING_STRATEGY is tokens'),
+('CHUNK_OVERLAP_TOKENS', '0', false, 'rag_strategy', 'Tokens of trailing context repeated at the start of the next chunk when CHUNKING_STRATEGY is tokens (whole sentences, at most 30% of CHUNK_MAX_TOKENS)'),
+('DOCUMENT_STORAGE_BACKEND', 'supabase', false, 'rag_strategy', 'How chunks and code examples are written: supabase (REST inserts) or postgres (COPY over DATABASE_URL, much faster for bulk loads)'),
+('VECTOR_STORAGE_MODE', 'full', false, 'rag_strategy', 'Embedding storage precision: full (vector, 4 bytes per dimension) or half (halfvec, 2 bytes per dimension; needs pgvector 0.7+). Run the re-encode job after changing it'),
 ('EMBEDDING_BATCH_SIZE', '200', false, 'rag_strategy', 'Number of embeddings to create per API call (100-500) - increased for better throughput'),
+('EMBEDDING_MAX_CONCURRENT_BATCHES', '3', false, 'rag_strategy', 'Maximum number of embedding API calls in flight at once (1-10)'),
+('EMBEDDING_MAX_TOKENS_PER_REQUEST', '50000', false, 'rag_strategy', 'Token budget per embedding API call; batches are packed up to this many tokens (at most EMBEDDING_BATCH_SIZE texts)'),
 ('DELETE_BATCH_SIZE', '100', false, 'rag_strategy', 'Number of URLs to delete in one database operation (50-200) - increased for better performance'),
-('ENABLE_PARALLEL_BATCHES', 'true', false, 'rag_strategy', 'Enable parallel processing of document batches')
+('ENABLE_PARALLEL_BATCHES', 'true', false, 'rag_strategy', 'Enable parallel processing of document batches'),
+('EMBEDDING_CACHE_ENABLED', 'true', false, 'rag_strategy', 'Reuse embeddings for unchanged text from a persistent local cache on re-crawls'),
+('EMBEDDING_CACHE_MAX_MB', '512', false, 'rag_strategy', 'Maximum size of the local embedding cache in megabytes before least recently used entries are evicted'),
+('INCREMENTAL_CRAWL_ENABLED', 'true', false, 'rag_strategy', 'On re-crawl, compare chunk hashes per URL and only embed and insert changed chunks instead of replacing every row')
 ON CONFLICT (key) DO UPDATE SET
     value = EXCLUDED.value,
     description = EXCLUDED.description;
@@ -155,7 +172,15 @@ INSERT INTO archon_settings (key, value, is_encrypted, category, description) VA
 ('DISPATCHER_CHECK_INTERVAL', '0.5', false, 'rag_strategy', 'How often to check memory usage in seconds (0.1-2.0)'),
 ('CODE_EXTRACTION_BATCH_SIZE', '40', false, 'rag_strategy', 'Number of code blocks to extract per batch (20-100) - increased for better performance'),
 ('CODE_SUMMARY_MAX_WORKERS', '3', false, 'rag_strategy', 'Maximum parallel workers for code summarization (1-10)'),
-('CONTEXTUAL_EMBEDDING_BATCH_SIZE', '50', false, 'rag_strategy', 'Number of chunks to process in contextual embedding batch API calls (20-100)')
+('CODE_SUMMARY_BATCH_SIZE', '8', false, 'rag_strategy', 'Number of code examples summarized per LLM request (1-20)'),
+('CODE_SUMMARY_CACHE_ENABLED', 'true', false, 'rag_strategy', 'Reuse generated code summaries for unchanged snippets and context from a persistent local cache'),
+('CODE_SUMMARY_CACHE_TTL_HOURS', '720', false, 'rag_strategy', 'Hours before a cached code summary expires and is regenerated'),
+('CODE_SUMMARY_CACHE_MAX_MB', '64', false, 'rag_strategy', 'Maximum size of the local code summary cache in megabytes before least recently used entries are evicted'),
+('CONTEXTUAL_EMBEDDING_BATCH_SIZE', '50', false, 'rag_strategy', 'Number of chunks to process in contextual embedding batch API calls (20-100)'),
+('CONTEXTUAL_EMBEDDING_MAX_TOKENS', '16000', false, 'rag_strategy', 'Prompt token budget per contextual embedding API call'),
+('CONTEXTUAL_CACHE_ENABLED', 'true', false, 'rag_strategy', 'Reuse generated chunk contexts for unchanged documents and chunks from a persistent local cache'),
+('CONTEXTUAL_CACHE_TTL_HOURS', '720', false, 'rag_strategy', 'Hours before a cached chunk context expires and is regenerated'),
+('CONTEXTUAL_CACHE_MAX_MB', '128', false, 'rag_strategy', 'Maximum size of the local contextual cache in megabytes before least recently used entries are evicted')
 ON CONFLICT (key) DO UPDATE SET
     value = EXCLUDED.value,
     description = EXCLUDED.description;
@@ -187,6 +212,27 @@ CREATE INDEX IF NOT EXISTS idx_archon_sources_knowledge_type ON archon_sources((
 COMMENT ON COLUMN archon_sources.title IS 'Descriptive title for the source (e.g., "Pydantic AI API Reference")';
 COMMENT ON COLUMN archon_sources.metadata IS 'JSONB field storing knowledge_type, tags, and other metadata';
 
+-- Create the pages table: one row per crawled URL holding the metadata shared by all of
+-- its chunks, the full markdown and what is needed to tell whether the page changed
+CREATE TABLE IF NOT EXISTS archon_pages (
+    id BIGSERIAL PRIMARY KEY,
+    url VARCHAR NOT NULL UNIQUE,
+    source_id TEXT NOT NULL,
+    metadata JSONB NOT NULL DEFAULT '{}'::jsonb,  -- title, description, knowledge_type, tags, ...
+    content TEXT,  -- Full page markdown
+    content_hash TEXT,  -- SHA-256 of the full markdown
+    etag TEXT,  -- ETag response header from the last crawl
+    chunk_count INTEGER NOT NULL DEFAULT 0,
+    last_crawled_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL,
+
+    -- Pages go with their source
+    FOREIGN KEY (source_id) REFERENCES archon_sources(source_id) ON DELETE CASCADE
+);
+
+CREATE INDEX IF NOT EXISTS idx_archon_pages_source_id ON archon_pages (source_id);
+CREATE INDEX IF NOT EXISTS idx_archon_pages_metadata ON archon_pages USING GIN (metadata);
+
 -- Create the documentation chunks table
 CREATE TABLE IF NOT EXISTS archon_crawled_pages (
     id BIGSERIAL PRIMARY KEY,
@@ -196,6 +242,7 @@ CREATE TABLE IF NOT EXISTS archon_crawled_pages (
     metadata JSONB NOT NULL DEFAULT '{}'::jsonb,
     source_id TEXT NOT NULL,
     embedding VECTOR(1536),  -- OpenAI embeddings are 1536 dimensions
+    content_hash TEXT,  -- SHA-256 of the chunk text, used to skip unchanged chunks on re-crawl
     created_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL,
 
     -- Add a unique constraint to prevent duplicate chunks for the same URL
@@ -205,10 +252,20 @@ CREATE TABLE IF NOT EXISTS archon_crawled_pages (
     FOREIGN KEY (source_id) REFERENCES archon_sources(source_id)
 );
 
+-- Existing installations predate the content_hash column
+ALTER TABLE archon_crawled_pages ADD COLUMN IF NOT EXISTS content_hash TEXT;
+
+-- Chunks reference their page, which holds the page-level metadata; chunk metadata keeps
+-- only chunk-level keys. Rows written before archon_pages existed have no page_id and
+-- still carry the full metadata.
+ALTER TABLE archon_crawled_pages
+    ADD COLUMN IF NOT EXISTS page_id BIGINT REFERENCES archon_pages(id) ON DELETE CASCADE;
+
 -- Create indexes for better performance
 CREATE INDEX ON archon_crawled_pages USING ivfflat (embedding vector_cosine_ops);
 CREATE INDEX idx_archon_crawled_pages_metadata ON archon_crawled_pages USING GIN (metadata);
 CREATE INDEX idx_archon_crawled_pages_source_id ON archon_crawled_pages (source_id);
+CREATE INDEX IF NOT EXISTS idx_archon_crawled_pages_page_id ON archon_crawled_pages (page_id);
 
 -- Create the code_examples table
 CREATE TABLE IF NOT EXISTS archon_code_examples (
@@ -220,6 +277,7 @@ CREATE TABLE IF NOT EXISTS archon_code_examples (
     metadata JSONB NOT NULL DEFAULT '{}'::jsonb,
     source_id TEXT NOT NULL,
     embedding VECTOR(1536),  -- OpenAI embeddings are 1536 dimensions
+    code_fingerprint TEXT,  -- SHA-256 of the normalized code, used to skip repeated snippets
     created_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL,
 
     -- Add a unique constraint to prevent duplicate chunks for the same URL
@@ -229,21 +287,67 @@ CREATE TABLE IF NOT EXISTS archon_code_examples (
     FOREIGN KEY (source_id) REFERENCES archon_sources(source_id)
 );
 
+-- Existing installations predate the code_fingerprint column
+ALTER TABLE archon_code_examples ADD COLUMN IF NOT EXISTS code_fingerprint TEXT;
+
 -- Create indexes for better performance
 CREATE INDEX ON archon_code_examples USING ivfflat (embedding vector_cosine_ops);
 CREATE INDEX idx_archon_code_examples_metadata ON archon_code_examples USING GIN (metadata);
 CREATE INDEX idx_archon_code_examples_source_id ON archon_code_examples (source_id);
+CREATE INDEX IF NOT EXISTS idx_archon_code_examples_fingerprint ON archon_code_examples (source_id, code_fingerprint);
+
+-- Half-precision embedding columns for VECTOR_STORAGE_MODE=half. halfvec stores 2 bytes
+-- per dimension instead of 4, halving the heap and index pages a search has to read.
+-- Rows keep their embedding in exactly one of the two columns; the re-encode job moves
+-- them. halfvec needs pgvector 0.7 or newer, older installs keep full precision only.
+DO $$
+BEGIN
+  IF (SELECT string_to_array(extversion, '.')::int[] >= ARRAY[0, 7]
+      FROM pg_extension WHERE extname = 'vector') THEN
+    ALTER TABLE archon_crawled_pages ADD COLUMN IF NOT EXISTS embedding_half HALFVEC(1536);
+    ALTER TABLE archon_code_examples ADD COLUMN IF NOT EXISTS embedding_half HALFVEC(1536);
+    CREATE INDEX IF NOT EXISTS idx_archon_crawled_pages_embedding_half
+      ON archon_crawled_pages USING ivfflat (embedding_half halfvec_cosine_ops);
+    CREATE INDEX IF NOT EXISTS idx_archon_code_examples_embedding_half
+      ON archon_code_examples USING ivfflat (embedding_half halfvec_cosine_ops);
+  ELSE
+    RAISE NOTICE 'pgvector is older than 0.7, skipping half-precision embedding columns';
+  END IF;
+END $$;
+
+-- Dead-letter table for rows that could not be written even on their own
+CREATE TABLE IF NOT EXISTS archon_failed_chunks (
+    id BIGSERIAL PRIMARY KEY,
+    target_table TEXT NOT NULL,  -- Table the row was meant for
+    url VARCHAR,
+    chunk_number INTEGER,
+    source_id TEXT,
+    payload JSONB NOT NULL,  -- The row without its embedding
+    error TEXT NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT timezone('utc'::text, now()) NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_archon_failed_chunks_source_id ON archon_failed_chunks (source_id);
 
 -- =====================================================
 -- SECTION 5: SEARCH FUNCTIONS
 -- =====================================================
 
--- Create a function to search for documentation chunks
+-- Create a function to search for documentation chunks.
+-- Page metadata is merged into each chunk's metadata only when include_metadata is set,
+-- and the join touches just the returned rows unless a metadata filter has to see it.
+-- use_halfvec ranks on the half-precision column (VECTOR_STORAGE_MODE=half).
+-- Earlier versions are dropped so calls don't become ambiguous.
+DROP FUNCTION IF EXISTS match_archon_crawled_pages(vector, int, jsonb, text);
+DROP FUNCTION IF EXISTS match_archon_crawled_pages(vector, int, jsonb, text, boolean);
+
 CREATE OR REPLACE FUNCTION match_archon_crawled_pages (
   query_embedding VECTOR(1536),
   match_count INT DEFAULT 10,
   filter JSONB DEFAULT '{}'::jsonb,
-  source_filter TEXT DEFAULT NULL
+  source_filter TEXT DEFAULT NULL,
+  include_metadata BOOLEAN DEFAULT TRUE,
+  use_halfvec BOOLEAN DEFAULT FALSE
 ) RETURNS TABLE (
   id BIGINT,
   url VARCHAR,
@@ -255,31 +359,101 @@ CREATE OR REPLACE FUNCTION match_archon_crawled_pages (
 )
 LANGUAGE plpgsql
 AS $$
-#variable_conflict use_column
+DECLARE
+  -- The ORDER BY has to name the indexed column directly for the ivfflat index to be used
+  distance TEXT := CASE
+    WHEN use_halfvec THEN 'chunks.embedding_half <=> $1::halfvec(1536)'
+    ELSE 'chunks.embedding <=> $1'
+  END;
+  -- Keys stored once on the page row (PAGE_METADATA_KEYS in page_storage_service.py)
+  page_keys TEXT[] := ARRAY[
+    'url', 'title', 'description', 'source', 'source_id',
+    'knowledge_type', 'crawl_type', 'tags', 'filename'
+  ];
+  page_filter JSONB;
+  chunk_filter JSONB;
 BEGIN
-  RETURN QUERY
-  SELECT
-    id,
-    url,
-    chunk_number,
-    content,
-    metadata,
-    source_id,
-    1 - (archon_crawled_pages.embedding <=> query_embedding) AS similarity
-  FROM archon_crawled_pages
-  WHERE metadata @> filter
-    AND (source_filter IS NULL OR source_id = source_filter)
-  ORDER BY archon_crawled_pages.embedding <=> query_embedding
-  LIMIT match_count;
+  IF filter = '{}'::jsonb THEN
+    RETURN QUERY EXECUTE format($query$
+      SELECT
+        matches.id,
+        matches.url,
+        matches.chunk_number,
+        matches.content,
+        COALESCE(pages.metadata, '{}'::jsonb) || matches.metadata,
+        matches.source_id,
+        matches.similarity
+      FROM (
+        SELECT
+          chunks.id,
+          chunks.url,
+          chunks.chunk_number,
+          chunks.content,
+          chunks.metadata,
+          chunks.source_id,
+          chunks.page_id,
+          1 - (%1$s) AS similarity
+        FROM archon_crawled_pages AS chunks
+        WHERE $4 IS NULL OR chunks.source_id = $4
+        ORDER BY %1$s
+        LIMIT $2
+      ) AS matches
+      LEFT JOIN archon_pages AS pages
+        ON $5 AND pages.id = matches.page_id
+      ORDER BY matches.similarity DESC
+    $query$, distance)
+    USING query_embedding, match_count, filter, source_filter, include_metadata;
+  ELSE
+    -- Test page-level keys against the page row and the rest against the chunk, each
+    -- with its own containment check so the GIN index on either table can serve it.
+    -- Chunks without a page still carry their full metadata.
+    SELECT
+      COALESCE(jsonb_object_agg(entry.key, entry.value) FILTER (WHERE entry.key = ANY(page_keys)), '{}'::jsonb),
+      COALESCE(jsonb_object_agg(entry.key, entry.value) FILTER (WHERE NOT entry.key = ANY(page_keys)), '{}'::jsonb)
+    INTO page_filter, chunk_filter
+    FROM jsonb_each(filter) AS entry;
+
+    RETURN QUERY EXECUTE format($query$
+      SELECT
+        chunks.id,
+        chunks.url,
+        chunks.chunk_number,
+        chunks.content,
+        CASE
+          WHEN $5 THEN COALESCE(pages.metadata, '{}'::jsonb) || chunks.metadata
+          ELSE chunks.metadata
+        END,
+        chunks.source_id,
+        1 - (%1$s)
+      FROM archon_crawled_pages AS chunks
+      LEFT JOIN archon_pages AS pages ON pages.id = chunks.page_id
+      WHERE chunks.metadata @> $6
+        AND (
+          $7 = '{}'::jsonb
+          OR chunks.page_id IN (
+            SELECT filtered.id FROM archon_pages AS filtered WHERE filtered.metadata @> $7
+          )
+          OR (chunks.page_id IS NULL AND chunks.metadata @> $7)
+        )
+        AND ($4 IS NULL OR chunks.source_id = $4)
+      ORDER BY %1$s
+      LIMIT $2
+    $query$, distance)
+    USING query_embedding, match_count, filter, source_filter, include_metadata,
+      chunk_filter, page_filter;
+  END IF;
 END;
 $$;
 
 -- Create a function to search for code examples
+DROP FUNCTION IF EXISTS match_archon_code_examples(vector, int, jsonb, text);
+
 CREATE OR REPLACE FUNCTION match_archon_code_examples (
   query_embedding VECTOR(1536),
   match_count INT DEFAULT 10,
   filter JSONB DEFAULT '{}'::jsonb,
-  source_filter TEXT DEFAULT NULL
+  source_filter TEXT DEFAULT NULL,
+  use_halfvec BOOLEAN DEFAULT FALSE
 ) RETURNS TABLE (
   id BIGINT,
   url VARCHAR,
@@ -292,23 +466,116 @@ CREATE OR REPLACE FUNCTION match_archon_code_examples (
 )
 LANGUAGE plpgsql
 AS $$
-#variable_conflict use_column
+DECLARE
+  distance TEXT := CASE
+    WHEN use_halfvec THEN 'examples.embedding_half <=> $1::halfvec(1536)'
+    ELSE 'examples.embedding <=> $1'
+  END;
 BEGIN
-  RETURN QUERY
-  SELECT
-    id,
-    url,
-    chunk_number,
-    content,
-    summary,
-    metadata,
-    source_id,
-    1 - (archon_code_examples.embedding <=> query_embedding) AS similarity
-  FROM archon_code_examples
-  WHERE metadata @> filter
-    AND (source_filter IS NULL OR source_id = source_filter)
-  ORDER BY archon_code_examples.embedding <=> query_embedding
-  LIMIT match_count;
+  RETURN QUERY EXECUTE format($query$
+    SELECT
+      examples.id,
+      examples.url,
+      examples.chunk_number,
+      examples.content,
+      examples.summary,
+      examples.metadata,
+      examples.source_id,
+      1 - (%1$s)
+    FROM archon_code_examples AS examples
+    WHERE examples.metadata @> $3
+      AND ($4 IS NULL OR examples.source_id = $4)
+    ORDER BY %1$s
+    LIMIT $2
+  $query$, distance)
+  USING query_embedding, match_count, filter, source_filter;
+END;
+$$;
+
+-- Create a function to move embeddings between the full and half precision columns.
+-- Works through one batch per call so each call is a short transaction; the re-encode job
+-- calls it until it returns 0. A row already holding a full-precision embedding keeps it
+-- when moving back to full precision.
+CREATE OR REPLACE FUNCTION reencode_archon_embeddings (
+  target_table TEXT,
+  to_half BOOLEAN,
+  batch_size INTEGER DEFAULT 1000
+) RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  updated_count INTEGER;
+BEGIN
+  IF target_table NOT IN ('archon_crawled_pages', 'archon_code_examples') THEN
+    RAISE EXCEPTION 'Embeddings of table % cannot be re-encoded', target_table;
+  END IF;
+
+  IF to_half THEN
+    EXECUTE format(
+      'UPDATE %1$I SET embedding_half = embedding::halfvec(1536), embedding = NULL
+       WHERE id IN (SELECT id FROM %1$I WHERE embedding IS NOT NULL LIMIT $1)',
+      target_table
+    ) USING batch_size;
+  ELSE
+    EXECUTE format(
+      'UPDATE %1$I SET embedding = COALESCE(embedding, embedding_half::vector(1536)), embedding_half = NULL
+       WHERE id IN (SELECT id FROM %1$I WHERE embedding_half IS NOT NULL LIMIT $1)',
+      target_table
+    ) USING batch_size;
+  END IF;
+
+  GET DIAGNOSTICS updated_count = ROW_COUNT;
+  RETURN updated_count;
+END;
+$$;
+
+-- Create a function to rebuild a table's ivfflat index once its embeddings have moved.
+-- ivfflat picks its list centroids when the index is built, so an index built while its
+-- column was still empty has to be rebuilt to search well.
+CREATE OR REPLACE FUNCTION reindex_archon_embeddings (
+  target_table TEXT,
+  to_half BOOLEAN
+) RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  index_name TEXT;
+BEGIN
+  IF target_table NOT IN ('archon_crawled_pages', 'archon_code_examples') THEN
+    RAISE EXCEPTION 'Embeddings of table % cannot be re-encoded', target_table;
+  END IF;
+
+  FOR index_name IN
+    SELECT indexes.indexname
+    FROM pg_indexes AS indexes
+    WHERE indexes.tablename = target_table
+      AND indexes.indexdef ILIKE '%USING ivfflat%'
+      AND indexes.indexdef ILIKE CASE WHEN to_half THEN '%(embedding_half %' ELSE '%(embedding %' END
+  LOOP
+    EXECUTE format('REINDEX INDEX %I', index_name);
+  END LOOP;
+END;
+$$;
+
+-- Create a function to drop chunks past the end of re-crawled pages.
+-- Chunks are upserted on (url, chunk_number), so after a re-crawl only rows at or beyond
+-- each page's new chunk count are stale. One statement trims every page in the batch.
+CREATE OR REPLACE FUNCTION trim_archon_crawled_pages (
+  urls TEXT[],
+  chunk_counts INTEGER[]
+) RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  deleted_count INTEGER;
+BEGIN
+  DELETE FROM archon_crawled_pages AS pages
+  USING unnest(urls, chunk_counts) AS trimmed(url, chunk_count)
+  WHERE pages.url = trimmed.url
+    AND pages.chunk_number >= trimmed.chunk_count;
+
+  GET DIAGNOSTICS deleted_count = ROW_COUNT;
+  RETURN deleted_count;
 END;
 $$;
 
@@ -317,11 +584,19 @@ $$;
 -- =====================================================
 
 -- Enable RLS on the knowledge base tables
+ALTER TABLE archon_pages ENABLE ROW LEVEL SECURITY;
 ALTER TABLE archon_crawled_pages ENABLE ROW LEVEL SECURITY;
 ALTER TABLE archon_sources ENABLE ROW LEVEL SECURITY;
 ALTER TABLE archon_code_examples ENABLE ROW LEVEL SECURITY;
+ALTER TABLE archon_failed_chunks ENABLE ROW LEVEL SECURITY;
 
 -- Create policies that allow anyone to read
+CREATE POLICY "Allow public read access to archon_pages"
+  ON archon_pages
+  FOR SELECT
+  TO public
+  USING (true);
+
 CREATE POLICY "Allow public read access to archon_crawled_pages"
   ON archon_crawled_pages
   FOR SELECT
@@ -340,6 +615,9 @@ CREATE POLICY "Allow public read access to archon_code_examples"
   TO public
   USING (true);
 
+CREATE POLICY "Allow service role full access to archon_failed_chunks" ON archon_failed_chunks
+    FOR ALL USING (auth.role() = 'service_role');
+
 -- =====================================================
 -- SECTION 7: PROJECTS AND TASKS MODULE
 -- =====================================================
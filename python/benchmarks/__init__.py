@@ -0,0 +1 @@
+"""Performance benchmarks. Run explicitly; not collected by the default test run."""
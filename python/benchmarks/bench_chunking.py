@@ -0,0 +1,108 @@
+"""
+Chunking benchmark: character chunker vs token chunker.
+
+Runs both chunkers over synthetic markdown documents from 100KB to 20MB and records
+throughput (via pytest-benchmark) plus the token-size distribution of the chunks each
+produces, which shows up in the ``extra_info`` column of the saved results.
+
+Usage (from the python/ directory, needs the dev dependency group):
+
+    uv run pytest benchmarks/bench_chunking.py --benchmark-columns=mean,ops
+    uv run pytest benchmarks/bench_chunking.py -k "not 20MB" --benchmark-json=chunking.json
+
+Token counts use the cl100k_base tokenizer when its encoding is cached locally and the
+character estimate otherwise.
+"""
+
+import random
+import statistics
+from functools import lru_cache
+from unittest.mock import MagicMock
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from src.server.services.embeddings.token_batching import count_tokens_batch  # noqa: E402
+from src.server.services.storage.storage_services import DocumentStorageService  # noqa: E402
+from src.server.services.storage.token_chunker import chunk_text_by_tokens  # noqa: E402
+
+SIZES = {"100KB": 100_000, "1MB": 1_000_000, "5MB": 5_000_000, "20MB": 20_000_000}
+
+# Roughly the same budget: 5000 characters of English prose is about 1000-1200 tokens
+CHUNK_SIZE_CHARS = 5000
+CHUNK_MAX_TOKENS = 1000
+
+_WORDS = (
+    "archon crawl embedding vector search chunk document source knowledge example "
+    "the a of to and in is for with on that this by from as are be can will"
+).split()
+
+
+@lru_cache(maxsize=len(SIZES))
+def make_markdown(size: int, seed: int = 7) -> str:
+    """Generate a deterministic markdown document mixing headings, prose, lists and code."""
+    rng = random.Random(seed)
+    blocks: list[str] = []
+    length = 0
+    while length < size:
+        kind = rng.random()
+        if kind < 0.1:
+            block = "## " + " ".join(rng.choices(_WORDS, k=rng.randint(2, 6))).title()
+        elif kind < 0.25:
+            lines = [f"    result_{i} = client.search(query='{rng.choice(_WORDS)}', limit={i})"
+                     for i in range(rng.randint(3, 60))]
+            block = "```python\n" + "\n".join(lines) + "\n```"
+        elif kind < 0.35:
+            block = "\n".join(
+                "- " + " ".join(rng.choices(_WORDS, k=rng.randint(3, 12)))
+                for _ in range(rng.randint(2, 8))
+            )
+        else:
+            block = " ".join(
+                " ".join(rng.choices(_WORDS, k=rng.randint(6, 30))).capitalize() + "."
+                for _ in range(rng.randint(1, 10))
+            )
+        blocks.append(block)
+        length += len(block) + 2
+    return "\n\n".join(blocks)
+
+
+def record_distribution(benchmark, chunks: list[str]) -> None:
+    tokens = sorted(count_tokens_batch(chunks))
+    benchmark.extra_info.update({
+        "chunks": len(chunks),
+        "tokens_min": tokens[0],
+        "tokens_p50": tokens[len(tokens) // 2],
+        "tokens_p95": tokens[int(len(tokens) * 0.95)],
+        "tokens_max": tokens[-1],
+        "tokens_stdev": round(statistics.pstdev(tokens), 1),
+        "over_budget": sum(t > CHUNK_MAX_TOKENS for t in tokens),
+    })
+
+
+@pytest.fixture(scope="module")
+def storage_service():
+    return DocumentStorageService(supabase_client=MagicMock())
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("size", SIZES.keys())
+def test_character_chunker(benchmark, storage_service, size):
+    text = make_markdown(SIZES[size])
+    chunks = benchmark.pedantic(
+        storage_service.smart_chunk_text, args=(text, CHUNK_SIZE_CHARS), rounds=3, iterations=1
+    )
+    benchmark.extra_info["mb_per_second"] = round(len(text) / 1e6 / benchmark.stats["mean"], 2)
+    record_distribution(benchmark, chunks)
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("size", SIZES.keys())
+def test_token_chunker(benchmark, size):
+    text = make_markdown(SIZES[size])
+    chunks = benchmark.pedantic(
+        chunk_text_by_tokens, args=(text, CHUNK_MAX_TOKENS), rounds=3, iterations=1
+    )
+    benchmark.extra_info["mb_per_second"] = round(len(text) / 1e6 / benchmark.stats["mean"], 2)
+    record_distribution(benchmark, chunks)
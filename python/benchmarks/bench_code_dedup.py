@@ -0,0 +1,89 @@
+"""
+Code deduplication benchmark: all-pairs SequenceMatcher vs MinHash/LSH candidates.
+
+Builds synthetic pages with many code snippets, a share of which are near-duplicate
+variants (one line changed), and times grouping them both ways. The LSH run also
+records whether it produced exactly the same groups as the all-pairs baseline.
+
+Usage (from the python/ directory, needs the dev dependency group):
+
+    uv run pytest benchmarks/bench_code_dedup.py --benchmark-columns=mean,ops
+    uv run pytest benchmarks/bench_code_dedup.py -k "not 1000" --benchmark-json=dedup.json
+"""
+
+import random
+from functools import lru_cache
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from src.server.services.storage.code_dedup import group_similar_texts, similarity  # noqa: E402
+from src.server.services.storage.code_storage_service import (  # noqa: E402
+    _normalize_code_for_comparison,
+)
+
+BLOCK_COUNTS = [100, 300, 1000]
+# Fraction of blocks that are variants of another block on the page
+VARIANT_RATIO = 0.3
+THRESHOLD = 0.85
+
+_NAMES = ["client", "session", "request", "response", "result", "config", "handler", "items"]
+
+
+@lru_cache(maxsize=len(BLOCK_COUNTS))
+def make_page(blocks: int, seed: int = 11) -> tuple[str, ...]:
+    """Generate normalized code blocks for a synthetic API reference page."""
+    rng = random.Random(seed)
+    originals = []
+    codes = []
+    for _ in range(blocks):
+        if originals and rng.random() < VARIANT_RATIO:
+            lines = rng.choice(originals).split("\n")
+            lines[rng.randrange(len(lines))] = f"# variant {rng.randint(0, 9999)}"
+            codes.append("\n".join(lines))
+        else:
+            code = "\n".join(
+                f"{rng.choice(_NAMES)}_{rng.randint(0, 999)} = "
+                f"{rng.choice(_NAMES)}.{rng.choice(_NAMES)}({rng.randint(0, 99)})"
+                for _ in range(rng.randint(8, 40))
+            )
+            originals.append(code)
+            codes.append(code)
+    return tuple(_normalize_code_for_comparison(code) for code in codes)
+
+
+def pairwise_groups(texts: tuple[str, ...]) -> list[list[int]]:
+    """The previous all-pairs greedy grouping."""
+    groups, grouped = [], set()
+    for i, text in enumerate(texts):
+        if i in grouped:
+            continue
+        grouped.add(i)
+        group = [i]
+        for j in range(i + 1, len(texts)):
+            if j not in grouped and similarity(text, texts[j]) >= THRESHOLD:
+                group.append(j)
+                grouped.add(j)
+        groups.append(group)
+    return groups
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("blocks", BLOCK_COUNTS)
+def test_pairwise(benchmark, blocks):
+    texts = make_page(blocks)
+    groups = benchmark.pedantic(pairwise_groups, args=(texts,), rounds=1, iterations=1)
+    benchmark.extra_info["groups"] = len(groups)
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("blocks", BLOCK_COUNTS)
+def test_minhash_lsh(benchmark, blocks):
+    texts = make_page(blocks)
+    groups = benchmark.pedantic(
+        group_similar_texts, args=(list(texts), THRESHOLD), rounds=3, iterations=1
+    )
+    benchmark.extra_info["groups"] = len(groups)
+    if blocks <= 300:
+        benchmark.extra_info["matches_pairwise"] = groups == pairwise_groups(texts)
@@ -0,0 +1,104 @@
+"""
+Code extraction benchmark over a corpus of saved HTML pages.
+
+Runs CodeExtractionService's HTML extraction (parsing, cleaning, language detection
+and quality validation) over every page in the corpus with both the streaming parser
+and the per-layout regex patterns, and records pages and megabytes per second, plus
+the number of blocks found so a throughput change that also changes the results is
+easy to spot.
+
+The bundled corpus in ``benchmarks/html_corpus`` covers the common highlighter
+layouts (Docusaurus, VitePress/Shiki, GitHub, highlight.js, CodeMirror, plain
+pre/code) and a prose-only page. Point ``CODE_EXTRACTION_CORPUS`` at a directory of
+your own saved ``.html`` pages to benchmark against real sites.
+
+Usage (from the python/ directory, needs the dev dependency group):
+
+    uv run pytest benchmarks/bench_code_extraction.py --benchmark-columns=mean,ops
+    CODE_EXTRACTION_CORPUS=~/saved-pages uv run pytest benchmarks/bench_code_extraction.py
+"""
+
+import asyncio
+import os
+from pathlib import Path
+from unittest.mock import MagicMock
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from src.server.services.crawling.code_extraction_service import (  # noqa: E402
+    CodeExtractionService,
+    CodeExtractionSettings,
+)
+
+CORPUS_DIR = Path(
+    os.getenv("CODE_EXTRACTION_CORPUS", Path(__file__).parent / "html_corpus")
+).expanduser()
+
+
+def load_corpus() -> dict[str, str]:
+    pages = {path.name: path.read_text(errors="replace") for path in sorted(CORPUS_DIR.glob("*.html"))}
+    if not pages:
+        pytest.skip(f"No .html pages in {CORPUS_DIR}")
+    return pages
+
+
+@pytest.fixture(scope="module", params=["streaming", "regex"])
+def service(request):
+    service = CodeExtractionService(supabase_client=MagicMock())
+    service._settings = CodeExtractionSettings(streaming_html_parser=request.param == "streaming")
+    return service
+
+
+def extract_all(service: CodeExtractionService, pages: dict[str, str]) -> int:
+    async def run() -> int:
+        blocks = 0
+        for html in pages.values():
+            blocks += len(await service._extract_html_code_blocks(html))
+        return blocks
+
+    return asyncio.run(run())
+
+
+@pytest.mark.slow
+def test_html_extraction_corpus(benchmark, service):
+    pages = load_corpus()
+    blocks = benchmark.pedantic(extract_all, args=(service, pages), rounds=5, iterations=1)
+    size = sum(len(html) for html in pages.values())
+    benchmark.extra_info.update({
+        "pages": len(pages),
+        "blocks": blocks,
+        "pages_per_second": round(len(pages) / benchmark.stats["mean"], 1),
+        "mb_per_second": round(size / 1e6 / benchmark.stats["mean"], 2),
+    })
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize("page", sorted(path.name for path in CORPUS_DIR.glob("*.html")))
+def test_html_extraction_page(benchmark, service, page):
+    pages = {page: (CORPUS_DIR / page).read_text(errors="replace")}
+    blocks = benchmark.pedantic(extract_all, args=(service, pages), rounds=5, iterations=1)
+    benchmark.extra_info["blocks"] = blocks
+
+
+@pytest.mark.slow
+def test_validate_code_quality(benchmark, service):
+    pages = load_corpus()
+    blocks = asyncio.run(_collect_blocks(service, pages))
+    if not blocks:
+        pytest.skip("Corpus has no code blocks")
+
+    def validate_all() -> int:
+        return sum(service._validate_code_quality(code, language) for code, language in blocks)
+
+    accepted = benchmark(validate_all)
+    benchmark.extra_info.update({"blocks": len(blocks), "accepted": accepted})
+
+
+async def _collect_blocks(service, pages) -> list[tuple[str, str]]:
+    blocks = []
+    for html in pages.values():
+        for block in await service._extract_html_code_blocks(html):
+            blocks.append((block["code"], block["language"]))
+    return blocks
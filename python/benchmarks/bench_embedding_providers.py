@@ -0,0 +1,120 @@
+"""
+Embedding provider throughput benchmark.
+
+Compares texts/sec of the local CPU provider (sentence-transformers in a process pool)
+against the remote OpenAI-compatible path, using the same batch size and in-flight
+window that create_embeddings_batch uses.
+
+Usage (from the python/ directory):
+
+    uv run python -m benchmarks.bench_embedding_providers --texts 2000
+    uv run python -m benchmarks.bench_embedding_providers --texts 2000 --remote
+
+The remote run needs OPENAI_API_KEY (and optionally OPENAI_BASE_URL) in the environment.
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+from src.server.services.embeddings.local_embedding_provider import (
+    DEFAULT_LOCAL_EMBEDDING_MODEL,
+    LocalEmbeddingProvider,
+)
+
+_WORDS = (
+    "archon crawl embedding vector search chunk document source knowledge code example "
+    "python async await function class module import return config settings provider "
+    "database query index table row column insert update delete select"
+).split()
+
+
+def make_texts(count: int, words_per_text: int, seed: int = 42) -> list[str]:
+    """Generate deterministic synthetic chunks of roughly documentation-like text."""
+    rng = random.Random(seed)
+    return [
+        " ".join(rng.choice(_WORDS) for _ in range(words_per_text)) + f" #{i}"
+        for i in range(count)
+    ]
+
+
+async def run_batches(client, model: str, texts: list[str], batch_size: int, concurrency: int, dimensions):
+    """Embed texts in batches with a bounded in-flight window, like create_embeddings_batch."""
+    window = asyncio.Semaphore(concurrency)
+
+    async def one(batch: list[str]):
+        async with window:
+            kwargs = {"dimensions": dimensions} if dimensions else {}
+            response = await client.embeddings.create(model=model, input=batch, **kwargs)
+            return len(response.data)
+
+    batches = [texts[i : i + batch_size] for i in range(0, len(texts), batch_size)]
+    counts = await asyncio.gather(*(one(batch) for batch in batches))
+    return sum(counts)
+
+
+async def bench_local(args, texts: list[str]) -> float:
+    provider = LocalEmbeddingProvider(args.local_model, workers=args.workers, backend=args.backend)
+    try:
+        # Warm up: start the pool and load the model in every worker
+        await run_batches(provider, args.local_model, texts[: provider.workers * 4], 4, provider.workers, None)
+
+        start = time.perf_counter()
+        done = await run_batches(
+            provider, args.local_model, texts, args.batch_size, provider.workers, None
+        )
+        elapsed = time.perf_counter() - start
+    finally:
+        provider.shutdown()
+
+    rate = done / elapsed
+    print(
+        f"local   model={args.local_model} workers={provider.workers} backend={args.backend}: "
+        f"{done} texts in {elapsed:.2f}s -> {rate:.1f} texts/sec"
+    )
+    return rate
+
+
+async def bench_remote(args, texts: list[str]) -> float:
+    import openai
+
+    client = openai.AsyncOpenAI()
+    start = time.perf_counter()
+    done = await run_batches(
+        client, args.remote_model, texts, args.batch_size, args.concurrency, args.dimensions
+    )
+    elapsed = time.perf_counter() - start
+
+    rate = done / elapsed
+    print(
+        f"remote  model={args.remote_model} concurrency={args.concurrency}: "
+        f"{done} texts in {elapsed:.2f}s -> {rate:.1f} texts/sec"
+    )
+    return rate
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--texts", type=int, default=1000, help="Number of texts to embed")
+    parser.add_argument("--words", type=int, default=200, help="Words per synthetic text")
+    parser.add_argument("--batch-size", type=int, default=100, help="Texts per request")
+    parser.add_argument("--local-model", default=DEFAULT_LOCAL_EMBEDDING_MODEL)
+    parser.add_argument("--workers", type=int, default=None, help="Local worker processes (default: cores)")
+    parser.add_argument("--backend", default="torch", choices=["torch", "onnx"])
+    parser.add_argument("--remote", action="store_true", help="Also benchmark the remote provider")
+    parser.add_argument("--remote-model", default="text-embedding-3-small")
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--concurrency", type=int, default=3, help="Remote requests in flight")
+    args = parser.parse_args()
+
+    texts = make_texts(args.texts, args.words)
+
+    local_rate = await bench_local(args, texts)
+    if args.remote:
+        remote_rate = await bench_remote(args, texts)
+        print(f"local/remote throughput ratio: {local_rate / remote_rate:.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -16,6 +16,20 @@ from pydantic_ai import Agent
 
 logger = logging.getLogger(__name__)
 
+try:
+    # In the server process agents share the server's adaptive concurrency controller.
+    # The standalone agents container ships without the server package.
+    from ..server.services.threading_service import get_threading_service
+except ImportError:
+    get_threading_service = None
+
+
+def _shared_concurrency_controller():
+    """The server's adaptive concurrency controller, or None when running standalone."""
+    if get_threading_service is None:
+        return None
+    return get_threading_service().concurrency_controller
+
 
 @dataclass
 class ArchonDependencies:
@@ -41,7 +55,13 @@ class BaseAgentOutput(BaseModel):
 
 
 class RateLimitHandler:
-    """Handles OpenAI rate limiting with exponential backoff."""
+    """
+    Handles OpenAI rate limiting with exponential backoff.
+
+    When the server's adaptive concurrency controller is available, agent calls take a
+    slot from it and report their latency and 429s, so agents, embeddings and summaries
+    all back off together.
+    """
 
     def __init__(self, max_retries: int = 5, base_delay: float = 1.0):
         self.max_retries = max_retries
@@ -52,8 +72,11 @@ class RateLimitHandler:
     async def execute_with_rate_limit(self, func, *args, progress_callback=None, **kwargs):
         """Execute a function with rate limiting protection."""
         retries = 0
+        controller = _shared_concurrency_controller()
 
         while retries <= self.max_retries:
+            if controller is not None:
+                await controller.acquire()
             try:
                 # Ensure minimum interval between requests
                 current_time = time.time()
@@ -62,7 +85,12 @@ class RateLimitHandler:
                     await asyncio.sleep(self.min_request_interval - time_since_last)
 
                 self.last_request_time = time.time()
-                return await func(*args, **kwargs)
+                result = await func(*args, **kwargs)
+                if controller is not None:
+                    # A whole agent run takes far longer than a single provider call, so
+                    # it is judged against its own latency baseline
+                    controller.record_success(time.time() - self.last_request_time, "agent_run")
+                return result
 
             except Exception as e:
                 error_str = str(e).lower()
@@ -74,7 +102,8 @@ class RateLimitHandler:
 
                 # Check for different types of rate limits
                 is_rate_limit = (
-                    "rate limit" in error_str
+                    getattr(e, "status_code", None) == 429
+                    or "rate limit" in error_str
                     or "429" in error_str
                     or "request_limit" in error_str  # New: catch PydanticAI limits
                     or "exceed" in error_str
@@ -95,6 +124,19 @@ class RateLimitHandler:
 
                     # Extract wait time from error message if available
                     wait_time = self._extract_wait_time(full_error)
+                    if controller is not None:
+                        # The shared controller cuts concurrency and holds back every
+                        # caller; the next acquire() waits out the backoff
+                        controller.record_throttle(wait_time)
+                        logger.info(
+                            f"Rate limit hit. Type: {type(e).__name__}, retry {retries}/{self.max_retries} after shared backoff"
+                        )
+                        if progress_callback:
+                            await progress_callback({
+                                "step": "ai_generation",
+                                "log": f"⏱️ Rate limit hit. Backing off before retry {retries}/{self.max_retries}",
+                            })
+                        continue
                     if wait_time is None:
                         # Use exponential backoff
                         wait_time = self.base_delay * (2 ** (retries - 1))
@@ -121,6 +163,9 @@ class RateLimitHandler:
                             "log": f"❌ Error: {str(e)}",
                         })
                     raise
+            finally:
+                if controller is not None:
+                    controller.release()
 
         raise Exception(f"Failed after {self.max_retries} retries")
 
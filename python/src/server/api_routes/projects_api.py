@@ -18,6 +18,7 @@ from pydantic import BaseModel
 # Removed direct logging import - using unified config
 # Set up standard logger for background tasks
 from ..config.logfire_config import get_logger, logfire
+from ..services.database_executor import run_db
 from ..utils import get_supabase_client
 
 logger = get_logger(__name__)
@@ -81,7 +82,7 @@ async def list_projects():
 
         # Use ProjectService to get projects
         project_service = ProjectService()
-        success, result = project_service.list_projects()
+        success, result = await run_db(project_service.list_projects)
 
         if not success:
             raise HTTPException(status_code=500, detail=result)
@@ -201,7 +202,7 @@ async def projects_health():
         try:
             project_service = ProjectService(supabase_client)
             # Try to list projects with limit 1 to test table access
-            success, _ = project_service.list_projects()
+            success, _ = await run_db(project_service.list_projects)
             projects_table_exists = success
             if success:
                 logfire.info("Projects table detected successfully")
@@ -215,7 +216,7 @@ async def projects_health():
         try:
             task_service = TaskService(supabase_client)
             # Try to list tasks with limit 1 to test table access
-            success, _ = task_service.list_tasks(include_closed=True)
+            success, _ = await run_db(task_service.list_tasks, include_closed=True)
             tasks_table_exists = success
             if success:
                 logfire.info("Tasks table detected successfully")
@@ -261,7 +262,7 @@ async def get_project(project_id: str):
 
         # Use ProjectService to get the project
         project_service = ProjectService()
-        success, result = project_service.get_project(project_id)
+        success, result = await run_db(project_service.get_project, project_id)
 
         if not success:
             if "not found" in result.get("error", "").lower():
@@ -325,7 +326,7 @@ async def update_project(project_id: str, request: UpdateProjectRequest):
 
                 # Get current project for comparison
                 project_service = ProjectService(supabase_client)
-                success, current_result = project_service.get_project(project_id)
+                success, current_result = await run_db(project_service.get_project, project_id)
 
                 if success and current_result.get("project"):
                     current_project = current_result["project"]
@@ -359,7 +360,7 @@ async def update_project(project_id: str, request: UpdateProjectRequest):
 
         # Use ProjectService to update the project
         project_service = ProjectService(supabase_client)
-        success, result = project_service.update_project(project_id, update_fields)
+        success, result = await run_db(project_service.update_project, project_id, update_fields)
 
         if not success:
             if "not found" in result.get("error", "").lower():
@@ -415,7 +416,7 @@ async def delete_project(project_id: str):
 
         # Use ProjectService to delete the project
         project_service = ProjectService()
-        success, result = project_service.delete_project(project_id)
+        success, result = await run_db(project_service.delete_project, project_id)
 
         if not success:
             if "not found" in result.get("error", "").lower():
@@ -450,7 +451,7 @@ async def get_project_features(project_id: str):
 
         # Use ProjectService to get features
         project_service = ProjectService()
-        success, result = project_service.get_project_features(project_id)
+        success, result = await run_db(project_service.get_project_features, project_id)
 
         if not success:
             if "not found" in result.get("error", "").lower():
@@ -482,7 +483,8 @@ async def list_project_tasks(project_id: str, include_archived: bool = False):
 
         # Use TaskService to list tasks
         task_service = TaskService()
-        success, result = task_service.list_tasks(
+        success, result = await run_db(
+            task_service.list_tasks,
             project_id=project_id,
             include_closed=True,  # Get all tasks, we'll filter archived separately
         )
@@ -567,7 +569,8 @@ async def list_tasks(
 
         # Use TaskService to list tasks
         task_service = TaskService()
-        success, result = task_service.list_tasks(
+        success, result = await run_db(
+            task_service.list_tasks,
             project_id=project_id,
             status=status,
             include_closed=include_closed,
@@ -615,7 +618,7 @@ async def get_task(task_id: str):
     try:
         # Use TaskService to get the task
         task_service = TaskService()
-        success, result = task_service.get_task(task_id)
+        success, result = await run_db(task_service.get_task, task_id)
 
         if not success:
             if "not found" in result.get("error", "").lower():
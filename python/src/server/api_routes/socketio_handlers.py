@@ -11,6 +11,7 @@ import time
 
 from ..config.logfire_config import get_logger
 from ..services.background_task_manager import get_task_manager
+from ..services.database_executor import run_db
 from ..services.projects.project_service import ProjectService
 from ..services.projects.source_linking_service import SourceLinkingService
 from ..socketio_app import get_socketio_instance
@@ -89,7 +90,7 @@ async def broadcast_project_update():
     """Broadcast project list to subscribers."""
     try:
         project_service = ProjectService()
-        success, result = project_service.list_projects()
+        success, result = await run_db(project_service.list_projects)
 
         if not success:
             logger.error(f"Failed to get projects for broadcast: {result}")
@@ -299,7 +300,7 @@ async def subscribe_projects(sid, data=None):
     # Send current project list using ProjectService
     try:
         project_service = ProjectService()
-        success, result = project_service.list_projects()
+        success, result = await run_db(project_service.list_projects)
 
         if not success:
             await sio.emit(
@@ -40,7 +40,11 @@ from .services.background_task_manager import cleanup_task_manager
 from .services.crawler_manager import cleanup_crawler, initialize_crawler
 
 # Import utilities and core classes
+from .services.cpu_process_pool import shutdown_cpu_process_pool
 from .services.credential_service import initialize_credentials
+from .services.database_executor import shutdown_database_executor
+from .services.embeddings.local_embedding_provider import shutdown_local_embedding_provider
+from .services.storage.postgres_bulk_loader import close_postgres_bulk_loader
 
 # Import Socket.IO integration
 from .socketio_app import create_socketio_app
@@ -163,6 +167,30 @@ async def lifespan(app: FastAPI):
         except Exception as e:
             api_logger.warning("Could not cleanup background task manager", error=str(e))
 
+        # Stop local embedding worker processes
+        try:
+            shutdown_local_embedding_provider()
+        except Exception as e:
+            api_logger.warning("Could not stop local embedding provider", error=str(e))
+
+        # Close the direct Postgres pool used for bulk loads
+        try:
+            await close_postgres_bulk_loader()
+        except Exception as e:
+            api_logger.warning("Could not close bulk loader pool", error=str(e))
+
+        # Stop ingestion worker processes
+        try:
+            shutdown_cpu_process_pool()
+        except Exception as e:
+            api_logger.warning("Could not stop ingestion process pool", error=str(e))
+
+        # Stop database worker threads
+        try:
+            shutdown_database_executor()
+        except Exception as e:
+            api_logger.warning("Could not stop database executor", error=str(e))
+
         api_logger.info("✅ Cleanup completed")
 
     except Exception as e:
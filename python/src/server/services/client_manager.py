@@ -11,11 +11,17 @@ from supabase import Client, create_client
 
 from ..config.logfire_config import search_logger
 
+# One client per (url, key) so its HTTP connection pool is reused across calls and threads
+_clients: dict[tuple[str, str], Client] = {}
+
 
 def get_supabase_client() -> Client:
     """
     Get a Supabase client instance.
 
+    The client is created once per URL and key and then shared, so repeated calls
+    reuse the same pooled HTTP connections.
+
     Returns:
         Supabase client instance
     """
@@ -27,9 +33,14 @@ def get_supabase_client() -> Client:
             "SUPABASE_URL and SUPABASE_SERVICE_KEY must be set in environment variables"
         )
 
+    client = _clients.get((url, key))
+    if client is not None:
+        return client
+
     try:
         # Let Supabase handle connection pooling internally
         client = create_client(url, key)
+        _clients[(url, key)] = client
 
         # Extract project ID from URL for logging purposes only
         match = re.match(r"https://([^.]+)\.supabase\.co", url)
@@ -0,0 +1,148 @@
+"""
+CPU Process Pool
+
+Runs CPU-bound ingestion steps (chunking, chunk metadata, markdown code block
+extraction) in worker processes.
+
+``ThreadingService.run_cpu_intensive`` uses a thread pool, so pure-Python work there
+still holds the GIL and competes with the event loop: a large crawl slows down every
+API request and Socket.IO update, and only one core does the parsing. Work submitted
+here runs in separate processes instead.
+
+Documents are handed to workers through shared memory as UTF-8 bytes, so only the
+segment name, the arguments and the result are pickled. Small inputs run inline
+because starting the round trip costs more than the work itself.
+
+Configured with environment variables:
+    INGESTION_PROCESS_WORKERS: worker processes, 0 to run everything in the caller's
+        thread pool instead (default: cores - 1)
+    INGESTION_PROCESS_MIN_BYTES: inputs smaller than this run inline (default: 50000)
+
+Usage:
+    chunks = await run_cpu_bound(chunk_text_by_characters, text, 5000)
+"""
+
+import asyncio
+import multiprocessing
+import os
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import TypeVar
+
+from ..config.logfire_config import search_logger
+
+T = TypeVar("T")
+
+DEFAULT_MIN_BYTES = 50_000
+
+
+def _default_workers() -> int:
+    # Leave a core for the event loop
+    return max(1, (os.cpu_count() or 2) - 1)
+
+
+def _run_on_shared_text(
+    func: Callable[..., T], segment_name: str, size: int, args: tuple, kwargs: dict
+) -> T:
+    """Worker entry point: read the text from shared memory and call func on it."""
+    segment = shared_memory.SharedMemory(name=segment_name)
+    try:
+        text = bytes(segment.buf[:size]).decode("utf-8")
+    finally:
+        segment.close()
+    return func(text, *args, **kwargs)
+
+
+class CpuProcessPool:
+    """Process pool for CPU-bound functions whose first argument is a large text."""
+
+    def __init__(self, max_workers: int | None = None, min_bytes: int = DEFAULT_MIN_BYTES):
+        self.max_workers = _default_workers() if max_workers is None else max_workers
+        self.min_bytes = min_bytes
+        self._executor: ProcessPoolExecutor | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_workers > 0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn avoids forking a process that is running an event loop and thread pools
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            search_logger.info(f"Started ingestion process pool with {self.max_workers} workers")
+        return self._executor
+
+    async def run(self, func: Callable[..., T], text: str, *args, **kwargs) -> T:
+        """
+        Call ``func(text, *args, **kwargs)`` in a worker process.
+
+        func must be a module-level function and its other arguments and result must
+        be picklable. Inputs below ``min_bytes`` are processed in the default thread
+        pool, and so is everything when the pool is disabled.
+
+        Returns:
+            The function's result
+        """
+        loop = asyncio.get_running_loop()
+        data = text.encode("utf-8")
+
+        if not self.enabled or len(data) < self.min_bytes:
+            return await loop.run_in_executor(None, lambda: func(text, *args, **kwargs))
+
+        segment = shared_memory.SharedMemory(create=True, size=len(data))
+        try:
+            segment.buf[: len(data)] = data
+            return await loop.run_in_executor(
+                self._get_executor(),
+                _run_on_shared_text,
+                func,
+                segment.name,
+                len(data),
+                args,
+                kwargs,
+            )
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed); start a fresh pool next time and finish
+            # this call in a thread so the document is not lost
+            search_logger.warning("Ingestion process pool broke, restarting it")
+            self.shutdown()
+            return await loop.run_in_executor(None, lambda: func(text, *args, **kwargs))
+        finally:
+            segment.close()
+            segment.unlink()
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# Global pool instance
+_cpu_process_pool: CpuProcessPool | None = None
+
+
+def get_cpu_process_pool() -> CpuProcessPool:
+    """Get the global ingestion process pool, configured from the environment."""
+    global _cpu_process_pool
+    if _cpu_process_pool is None:
+        workers = os.getenv("INGESTION_PROCESS_WORKERS")
+        _cpu_process_pool = CpuProcessPool(
+            max_workers=int(workers) if workers else None,
+            min_bytes=int(os.getenv("INGESTION_PROCESS_MIN_BYTES", str(DEFAULT_MIN_BYTES))),
+        )
+    return _cpu_process_pool
+
+
+async def run_cpu_bound(func: Callable[..., T], text: str, *args, **kwargs) -> T:
+    """Run a CPU-bound function over a text on the shared ingestion process pool."""
+    return await get_cpu_process_pool().run(func, text, *args, **kwargs)
+
+
+def shutdown_cpu_process_pool() -> None:
+    """Stop the ingestion worker processes on application shutdown."""
+    if _cpu_process_pool is not None:
+        _cpu_process_pool.shutdown()
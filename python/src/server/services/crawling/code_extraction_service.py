@@ -4,17 +4,87 @@ Code Extraction Service
 Handles extraction, processing, and storage of code examples from documents.
 """
 
-import re
-from collections.abc import Callable
+from collections import Counter
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass, field, fields
 from typing import Any
 from urllib.parse import urlparse
 
 from ...config.logfire_config import safe_logfire_error, safe_logfire_info
 from ...services.credential_service import credential_service
+from ..cpu_process_pool import run_cpu_bound
 from ..storage.code_storage_service import (
     add_code_examples_to_supabase,
+    add_duplicate_references,
+    compute_code_fingerprint,
+    find_existing_code_examples,
     generate_code_summaries_batch,
 )
+from . import code_patterns as patterns
+from .html_code_parser import parse_html_code_blocks
+
+
+@dataclass(frozen=True, slots=True)
+class CodeExtractionSettings:
+    """
+    Snapshot of the code_extraction settings, captured once per crawl.
+
+    Each field's metadata names the setting it is read from.
+    """
+
+    min_code_length: int = field(default=250, metadata={"key": "MIN_CODE_BLOCK_LENGTH"})
+    max_code_length: int = field(default=5000, metadata={"key": "MAX_CODE_BLOCK_LENGTH"})
+    complete_block_detection: bool = field(
+        default=True, metadata={"key": "ENABLE_COMPLETE_BLOCK_DETECTION"}
+    )
+    language_patterns: bool = field(
+        default=True, metadata={"key": "ENABLE_LANGUAGE_SPECIFIC_PATTERNS"}
+    )
+    prose_filtering: bool = field(default=True, metadata={"key": "ENABLE_PROSE_FILTERING"})
+    max_prose_ratio: float = field(default=0.15, metadata={"key": "MAX_PROSE_RATIO"})
+    min_code_indicators: int = field(default=3, metadata={"key": "MIN_CODE_INDICATORS"})
+    diagram_filtering: bool = field(default=True, metadata={"key": "ENABLE_DIAGRAM_FILTERING"})
+    contextual_length: bool = field(default=True, metadata={"key": "ENABLE_CONTEXTUAL_LENGTH"})
+    context_window_size: int = field(default=1000, metadata={"key": "CONTEXT_WINDOW_SIZE"})
+    code_summaries: bool = field(default=True, metadata={"key": "ENABLE_CODE_SUMMARIES"})
+    code_deduplication: bool = field(
+        default=True, metadata={"key": "ENABLE_CODE_DEDUPLICATION"}
+    )
+    streaming_html_parser: bool = field(
+        default=True, metadata={"key": "ENABLE_STREAMING_HTML_PARSER"}
+    )
+
+    @classmethod
+    def from_credentials(cls, values: Mapping[str, Any]) -> "CodeExtractionSettings":
+        """Parse settings keyed by setting name, using the default for missing or bad values."""
+        parsed = {}
+        for setting in fields(cls):
+            key = setting.metadata["key"]
+            value = values.get(key)
+            if value is None:
+                continue
+            try:
+                if isinstance(setting.default, bool):
+                    parsed[setting.name] = str(value).lower() == "true"
+                else:
+                    parsed[setting.name] = type(setting.default)(value)
+            except (TypeError, ValueError) as e:
+                safe_logfire_error(
+                    f"Error getting setting {key}: {e}, using default: {setting.default}"
+                )
+        return cls(**parsed)
+
+    def as_credentials(self) -> dict[str, str]:
+        """The settings as string values keyed by setting name, as extract_code_blocks reads."""
+        return {
+            setting.metadata["key"]: str(getattr(self, setting.name)).lower()
+            if isinstance(setting.default, bool)
+            else str(getattr(self, setting.name))
+            for setting in fields(self)
+        }
+
+
+_DEFAULT_SETTINGS = CodeExtractionSettings()
 
 
 class CodeExtractionService:
@@ -23,114 +93,35 @@ class CodeExtractionService:
     """
 
     # Language-specific patterns for better extraction
-    LANGUAGE_PATTERNS = {
-        "typescript": {
-            "block_start": r"^\s*(export\s+)?(class|interface|function|const|type|enum)\s+\w+",
-            "block_end": r"^\}(\s*;)?$",
-            "min_indicators": [":", "{", "}", "=>", "function", "class", "interface", "type"],
-        },
-        "javascript": {
-            "block_start": r"^\s*(export\s+)?(class|function|const|let|var)\s+\w+",
-            "block_end": r"^\}(\s*;)?$",
-            "min_indicators": ["function", "{", "}", "=>", "const", "let", "var"],
-        },
-        "python": {
-            "block_start": r"^\s*(class|def|async\s+def)\s+\w+",
-            "block_end": r"^\S",  # Unindented line
-            "min_indicators": ["def", ":", "return", "self", "import", "class"],
-        },
-        "java": {
-            "block_start": r"^\s*(public|private|protected)?\s*(class|interface|enum)\s+\w+",
-            "block_end": r"^\}$",
-            "min_indicators": ["class", "public", "private", "{", "}", ";"],
-        },
-        "rust": {
-            "block_start": r"^\s*(pub\s+)?(fn|struct|impl|trait|enum)\s+\w+",
-            "block_end": r"^\}$",
-            "min_indicators": ["fn", "let", "mut", "impl", "struct", "->"],
-        },
-        "go": {
-            "block_start": r"^\s*(func|type|struct)\s+\w+",
-            "block_end": r"^\}$",
-            "min_indicators": ["func", "type", "struct", "{", "}", ":="],
-        },
-    }
+    LANGUAGE_PATTERNS = patterns.LANGUAGE_PATTERNS
 
     def __init__(self, supabase_client):
         """
         Initialize the code extraction service.
 
+        The service is created per crawl, so its settings snapshot is too.
+
         Args:
             supabase_client: The Supabase client for database operations
         """
         self.supabase_client = supabase_client
-        self._settings_cache = {}
-
-    async def _get_setting(self, key: str, default: Any) -> Any:
-        """Get a setting from credential service with caching."""
-        if key in self._settings_cache:
-            return self._settings_cache[key]
-
-        try:
-            value = await credential_service.get_credential(key, default)
-            # Convert string values to appropriate types
-            if isinstance(default, bool):
-                value = str(value).lower() == "true" if value is not None else default
-            elif isinstance(default, int):
-                value = int(value) if value is not None else default
-            elif isinstance(default, float):
-                value = float(value) if value is not None else default
-            self._settings_cache[key] = value
-            return value
-        except Exception as e:
-            safe_logfire_error(f"Error getting setting {key}: {e}, using default: {default}")
-            # Make sure we return the default value with correct type
-            self._settings_cache[key] = default
-            return default
-
-    async def _get_min_code_length(self) -> int:
-        """Get minimum code block length setting."""
-        return await self._get_setting("MIN_CODE_BLOCK_LENGTH", 250)
-
-    async def _get_max_code_length(self) -> int:
-        """Get maximum code block length setting."""
-        return await self._get_setting("MAX_CODE_BLOCK_LENGTH", 5000)
-
-    async def _is_complete_block_detection_enabled(self) -> bool:
-        """Check if complete block detection is enabled."""
-        return await self._get_setting("ENABLE_COMPLETE_BLOCK_DETECTION", True)
-
-    async def _is_language_patterns_enabled(self) -> bool:
-        """Check if language-specific patterns are enabled."""
-        return await self._get_setting("ENABLE_LANGUAGE_SPECIFIC_PATTERNS", True)
-
-    async def _is_prose_filtering_enabled(self) -> bool:
-        """Check if prose filtering is enabled."""
-        return await self._get_setting("ENABLE_PROSE_FILTERING", True)
+        self._settings: CodeExtractionSettings | None = None
 
-    async def _get_max_prose_ratio(self) -> float:
-        """Get maximum allowed prose ratio."""
-        return await self._get_setting("MAX_PROSE_RATIO", 0.15)
-
-    async def _get_min_code_indicators(self) -> int:
-        """Get minimum required code indicators."""
-        return await self._get_setting("MIN_CODE_INDICATORS", 3)
-
-    async def _is_diagram_filtering_enabled(self) -> bool:
-        """Check if diagram filtering is enabled."""
-        return await self._get_setting("ENABLE_DIAGRAM_FILTERING", True)
-
-    async def _is_contextual_length_enabled(self) -> bool:
-        """Check if contextual length adjustment is enabled."""
-        return await self._get_setting("ENABLE_CONTEXTUAL_LENGTH", True)
-
-    async def _get_context_window_size(self) -> int:
-        """Get context window size for code blocks."""
-        return await self._get_setting("CONTEXT_WINDOW_SIZE", 1000)
+    async def _get_settings(self) -> CodeExtractionSettings:
+        """Load the settings snapshot with one lookup on first use."""
+        if self._settings is None:
+            try:
+                values = await credential_service.get_credentials_by_category("code_extraction")
+            except Exception as e:
+                safe_logfire_error(f"Error getting code extraction settings: {e}, using defaults")
+                values = {}
+            self._settings = CodeExtractionSettings.from_credentials(values)
+        return self._settings
 
-    async def _is_code_summaries_enabled(self) -> bool:
-        """Check if code summaries generation is enabled."""
-        return await self._get_setting("ENABLE_CODE_SUMMARIES", True)
+    @property
+    def settings(self) -> CodeExtractionSettings:
+        """The settings snapshot, or the defaults before _get_settings has loaded it."""
+        return self._settings or _DEFAULT_SETTINGS
 
     async def extract_and_store_code_examples(
         self,
@@ -160,6 +151,7 @@ class CodeExtractionService:
         progress_range = end_progress - start_progress
         extract_end = start_progress + int(progress_range * 0.4)
         summary_end = start_progress + int(progress_range * 0.8)
+        settings = await self._get_settings()
 
         # Extract code blocks from all documents
         all_code_blocks = await self._extract_code_blocks_from_documents(
@@ -177,6 +169,29 @@ class CodeExtractionService:
                 })
             return 0
 
+        # Drop snippets repeated across pages before paying for summaries and embeddings
+        page_urls = list(dict.fromkeys(item["source_url"] for item in all_code_blocks))
+        if settings.code_deduplication:
+            all_code_blocks = await self._skip_duplicate_code_blocks(all_code_blocks)
+            if not all_code_blocks:
+                # Still clear the pages' previous rows, they are covered by other pages now
+                await add_code_examples_to_supabase(
+                    client=self.supabase_client,
+                    urls=[],
+                    chunk_numbers=[],
+                    code_examples=[],
+                    summaries=[],
+                    metadatas=[],
+                    replaced_urls=page_urls,
+                )
+                if progress_callback:
+                    await progress_callback({
+                        "status": "code_extraction",
+                        "percentage": end_progress,
+                        "log": "All code examples were already stored for this source",
+                    })
+                return 0
+
         # Log what we found
         safe_logfire_info(f"Found {len(all_code_blocks)} total code blocks to process")
         for i, block_data in enumerate(all_code_blocks[:3]):
@@ -195,9 +210,67 @@ class CodeExtractionService:
 
         # Store code examples in database with final phase progress
         return await self._store_code_examples(
-            storage_data, url_to_full_document, progress_callback, summary_end, end_progress
+            storage_data,
+            url_to_full_document,
+            progress_callback,
+            summary_end,
+            end_progress,
+            replaced_urls=page_urls,
         )
 
+    async def _skip_duplicate_code_blocks(
+        self, all_code_blocks: list[dict[str, Any]]
+    ) -> list[dict[str, Any]]:
+        """
+        Drop code blocks whose normalized code is already covered elsewhere in the source.
+
+        The first copy of a snippet in this crawl is kept and lists the other pages it
+        appears on under ``duplicate_urls``. Snippets already stored for the source on a
+        page outside this crawl are dropped and the new pages are recorded on the stored
+        example instead. Stored examples on pages in this crawl don't count, since those
+        rows are about to be replaced.
+
+        Returns:
+            The code blocks that still need summaries, embeddings and rows
+        """
+        page_urls = {item["source_url"] for item in all_code_blocks}
+        kept: dict[tuple[str, str], dict[str, Any]] = {}
+        for item in all_code_blocks:
+            key = (item["source_id"], compute_code_fingerprint(item["block"]["code"]))
+            if key in kept:
+                duplicate_urls = kept[key]["block"].setdefault("duplicate_urls", [])
+                if item["source_url"] not in duplicate_urls:
+                    duplicate_urls.append(item["source_url"])
+            else:
+                kept[key] = item
+
+        try:
+            existing = await find_existing_code_examples(
+                self.supabase_client,
+                list({source_id for source_id, _ in kept}),
+                [fingerprint for _, fingerprint in kept],
+            )
+        except Exception as e:
+            safe_logfire_error(f"Code fingerprint lookup failed, storing all snippets: {e}")
+            existing = {}
+
+        remaining = []
+        for key, item in kept.items():
+            stored = [row for row in existing.get(key, []) if row["url"] not in page_urls]
+            if not stored:
+                remaining.append(item)
+                continue
+            urls = [item["source_url"], *item["block"].get("duplicate_urls", [])]
+            await add_duplicate_references(self.supabase_client, stored[0], urls)
+
+        skipped = len(all_code_blocks) - len(remaining)
+        if skipped:
+            safe_logfire_info(
+                f"Skipped {skipped} duplicate code blocks | unique={len(remaining)} "
+                f"| already_stored={len(kept) - len(remaining)}"
+            )
+        return remaining
+
     async def _extract_code_blocks_from_documents(
         self,
         crawl_results: list[dict[str, Any]],
@@ -300,7 +373,13 @@ class CodeExtractionService:
 
                     # Use dynamic minimum for markdown extraction
                     base_min_length = 250  # Default for markdown
-                    code_blocks = extract_code_blocks(md, min_length=base_min_length)
+                    # Parse in a worker process; large pages would otherwise stall the loop
+                    code_blocks = await run_cpu_bound(
+                        extract_code_blocks,
+                        md,
+                        base_min_length,
+                        (await self._get_settings()).as_credentials(),
+                    )
                     safe_logfire_info(
                         f"Found {len(code_blocks)} code blocks from markdown | url={source_url}"
                     )
@@ -342,17 +421,92 @@ class CodeExtractionService:
 
     async def _extract_html_code_blocks(self, content: str) -> list[dict[str, Any]]:
         """
-        Extract code blocks from HTML patterns in content.
-        This is a fallback when markdown conversion didn't preserve code blocks.
+        Extract code blocks from HTML content.
+
+        Uses the streaming parser unless ENABLE_STREAMING_HTML_PARSER is off, in which
+        case the per-layout regex patterns are used.
+
+        Args:
+            content: The HTML to extract code blocks from
+
+        Returns:
+            List of code blocks with metadata
+        """
+        settings = await self._get_settings()
+        if settings.streaming_html_parser:
+            return await self._extract_html_code_blocks_streaming(content)
+        return await self._extract_html_code_blocks_regex(content)
+
+    async def _extract_html_code_blocks_streaming(self, content: str) -> list[dict[str, Any]]:
+        """
+        Extract code blocks with the single-pass HTML parser.
+
+        Parsing is linear in the page size and runs in a worker process for large pages.
+        Context before and after each block is the page's text rather than raw markup.
+
+        Args:
+            content: The HTML to extract code blocks from
+
+        Returns:
+            List of code blocks with metadata
+        """
+        settings = await self._get_settings()
+        safe_logfire_info(f"Parsing HTML of length {len(content)} for code extraction")
+
+        raw_blocks = await run_cpu_bound(
+            parse_html_code_blocks, content, settings.context_window_size
+        )
+
+        code_blocks = []
+        for raw in raw_blocks:
+            language = raw["language"]
+            source_type = raw["source_type"]
+            # The parser already decoded entities and dropped tags; decoding again would
+            # strip tags that are part of the code itself
+            cleaned_code = self._clean_code_content(raw["code"], language, decode_html=False)
+
+            if source_type == "code":
+                # Standalone <code> elements, only returned when the page has no code blocks
+                min_length = 100
+            else:
+                context_for_length = f"{raw['context_before'][-500:]}\n{raw['context_after'][:500]}"
+                min_length = self._calculate_min_length(language, context_for_length)
+            if len(cleaned_code) < min_length:
+                continue
+
+            if not self._validate_code_quality(cleaned_code, language):
+                safe_logfire_info(
+                    f"Code block failed validation | source_type={source_type} | language={language} | length={len(cleaned_code)}"
+                )
+                continue
+
+            context_before = raw["context_before"]
+            context_after = raw["context_after"]
+            code_blocks.append({
+                "code": cleaned_code,
+                "language": language,
+                "context_before": context_before,
+                "context_after": context_after,
+                "full_context": f"{context_before}\n\n{cleaned_code}\n\n{context_after}",
+                "source_type": source_type,
+            })
+
+        safe_logfire_info(
+            f"Streaming HTML extraction complete | candidates={len(raw_blocks)} | extracted={len(code_blocks)}"
+        )
+        return code_blocks
+
+    async def _extract_html_code_blocks_regex(self, content: str) -> list[dict[str, Any]]:
+        """
+        Extract code blocks by matching each known highlighter layout's regex.
 
         Args:
             content: The content to search for HTML code patterns
-            min_length: Minimum length for code blocks
 
         Returns:
             List of code blocks with metadata
         """
-        import re
+        await self._get_settings()
 
         # Add detailed logging
         safe_logfire_info(f"Processing HTML of length {len(content)} for code extraction")
@@ -373,7 +527,7 @@ class CodeExtractionService:
         )
 
         # Check for any pre tags with different attributes
-        pre_matches = re.findall(r"<pre[^>]*>", content[:5000], re.IGNORECASE)
+        pre_matches = patterns.PRE_TAG_PATTERN.findall(content[:5000])
         if pre_matches:
             safe_logfire_info(f"Found {len(pre_matches)} <pre> tags in first 5000 chars")
             for i, pre_tag in enumerate(pre_matches[:3]):  # Show first 3
@@ -382,134 +536,9 @@ class CodeExtractionService:
         code_blocks = []
         extracted_positions = set()  # Track already extracted code block positions
 
-        # Comprehensive patterns for various code block formats
-        # Order matters - more specific patterns first
-        patterns = [
-            # GitHub/GitLab patterns
-            (
-                r'<div[^>]*class=["\'][^"\']*highlight[^"\']*["\'][^>]*>.*?<pre[^>]*class=["\'][^"\']*(?:language-)?(\w+)[^"\']*["\'][^>]*><code[^>]*>(.*?)</code></pre>',
-                "github-highlight",
-            ),
-            (
-                r'<div[^>]*class=["\'][^"\']*snippet-clipboard-content[^"\']*["\'][^>]*>.*?<pre[^>]*><code[^>]*>(.*?)</code></pre>',
-                "github-snippet",
-            ),
-            # Docusaurus patterns
-            (
-                r'<div[^>]*class=["\'][^"\']*codeBlockContainer[^"\']*["\'][^>]*>.*?<pre[^>]*class=["\'][^"\']*prism-code[^"\']*language-(\w+)[^"\']*["\'][^>]*>(.*?)</pre>',
-                "docusaurus",
-            ),
-            (
-                r'<div[^>]*class=["\'][^"\']*language-(\w+)[^"\']*["\'][^>]*>.*?<pre[^>]*class=["\'][^"\']*prism-code[^"\']*["\'][^>]*>(.*?)</pre>',
-                "docusaurus-alt",
-            ),
-            # Milkdown specific patterns - check their actual HTML structure
-            (
-                r'<pre[^>]*><code[^>]*class=["\'][^"\']*language-(\w+)[^"\']*["\'][^>]*>(.*?)</code></pre>',
-                "milkdown-typed",
-            ),
-            (
-                r'<div[^>]*class=["\'][^"\']*code-wrapper[^"\']*["\'][^>]*>.*?<pre[^>]*>(.*?)</pre>',
-                "milkdown-wrapper",
-            ),
-            (
-                r'<div[^>]*class=["\'][^"\']*code-block-wrapper[^"\']*["\'][^>]*>.*?<pre[^>]*><code[^>]*>(.*?)</code></pre>',
-                "milkdown-wrapper-code",
-            ),
-            (
-                r'<div[^>]*class=["\'][^"\']*milkdown-code-block[^"\']*["\'][^>]*>.*?<pre[^>]*><code[^>]*>(.*?)</code></pre>',
-                "milkdown-code-block",
-            ),
-            (
-                r'<pre[^>]*class=["\'][^"\']*code-block[^"\']*["\'][^>]*><code[^>]*>(.*?)</code></pre>',
-                "milkdown",
-            ),
-            (r"<div[^>]*data-code-block[^>]*>.*?<pre[^>]*>(.*?)</pre>", "milkdown-alt"),
-            (
-                r'<div[^>]*class=["\'][^"\']*milkdown[^"\']*["\'][^>]*>.*?<pre[^>]*><code[^>]*>(.*?)</code></pre>',
-                "milkdown-div",
-            ),
-            # Monaco Editor - capture all view-lines content
-            (
-                r'<div[^>]*class=["\'][^"\']*monaco-editor[^"\']*["\'][^>]*>.*?<div[^>]*class=["\'][^"\']*view-lines[^"\']*[^>]*>(.*?)</div>(?=.*?</div>.*?</div>)',
-                "monaco",
-            ),
-            # CodeMirror patterns
-            (
-                r'<div[^>]*class=["\'][^"\']*cm-content[^"\']*["\'][^>]*>((?:<div[^>]*class=["\'][^"\']*cm-line[^"\']*["\'][^>]*>.*?</div>\s*)+)</div>',
-                "codemirror",
-            ),
-            (
-                r'<div[^>]*class=["\'][^"\']*CodeMirror[^"\']*["\'][^>]*>.*?<div[^>]*class=["\'][^"\']*CodeMirror-code[^"\']*["\'][^>]*>(.*?)</div>',
-                "codemirror-legacy",
-            ),
-            # Prism.js with language - must be before generic pre
-            (
-                r'<pre[^>]*class=["\'][^"\']*language-(\w+)[^"\']*["\'][^>]*>\s*<code[^>]*>(.*?)</code>\s*</pre>',
-                "prism",
-            ),
-            (
-                r'<pre[^>]*>\s*<code[^>]*class=["\'][^"\']*language-(\w+)[^"\']*["\'][^>]*>(.*?)</code>\s*</pre>',
-                "prism-alt",
-            ),
-            # highlight.js - must be before generic pre/code
-            (
-                r'<pre[^>]*><code[^>]*class=["\'][^"\']*hljs(?:\s+language-(\w+))?[^"\']*["\'][^>]*>(.*?)</code></pre>',
-                "hljs",
-            ),
-            (
-                r'<pre[^>]*class=["\'][^"\']*hljs[^"\']*["\'][^>]*><code[^>]*>(.*?)</code></pre>',
-                "hljs-pre",
-            ),
-            # Shiki patterns (VitePress, Astro, etc.)
-            (
-                r'<pre[^>]*class=["\'][^"\']*shiki[^"\']*["\'][^>]*(?:.*?style=["\'][^"\']*background-color[^"\']*["\'])?[^>]*>\s*<code[^>]*>(.*?)</code>\s*</pre>',
-                "shiki",
-            ),
-            (r'<pre[^>]*class=["\'][^"\']*astro-code[^"\']*["\'][^>]*>(.*?)</pre>', "astro-shiki"),
-            (
-                r'<div[^>]*class=["\'][^"\']*astro-code[^"\']*["\'][^>]*>.*?<pre[^>]*>(.*?)</pre>',
-                "astro-wrapper",
-            ),
-            # VitePress/Vue patterns
-            (
-                r'<div[^>]*class=["\'][^"\']*language-(\w+)[^"\']*["\'][^>]*>.*?<pre[^>]*>(.*?)</pre>',
-                "vitepress",
-            ),
-            (
-                r'<div[^>]*class=["\'][^"\']*vp-code[^"\']*["\'][^>]*>.*?<pre[^>]*>(.*?)</pre>',
-                "vitepress-vp",
-            ),
-            # Nextra patterns
-            (r"<div[^>]*data-nextra-code[^>]*>.*?<pre[^>]*>(.*?)</pre>", "nextra"),
-            (
-                r'<pre[^>]*class=["\'][^"\']*nx-[^"\']*["\'][^>]*><code[^>]*>(.*?)</code></pre>',
-                "nextra-nx",
-            ),
-            # Standard pre/code patterns - should be near the end
-            (
-                r'<pre[^>]*><code[^>]*class=["\'][^"\']*language-(\w+)[^"\']*["\'][^>]*>(.*?)</code></pre>',
-                "standard-lang",
-            ),
-            (r"<pre[^>]*>\s*<code[^>]*>(.*?)</code>\s*</pre>", "standard"),
-            # Generic patterns - should be last
-            (
-                r'<div[^>]*class=["\'][^"\']*code-block[^"\']*["\'][^>]*>.*?<pre[^>]*>(.*?)</pre>',
-                "generic-div",
-            ),
-            (
-                r'<div[^>]*class=["\'][^"\']*codeblock[^"\']*["\'][^>]*>(.*?)</div>',
-                "generic-codeblock",
-            ),
-            (
-                r'<div[^>]*class=["\'][^"\']*highlight[^"\']*["\'][^>]*>.*?<pre[^>]*>(.*?)</pre>',
-                "highlight",
-            ),
-        ]
-
-        for pattern_tuple in patterns:
-            pattern_str, source_type = pattern_tuple
-            matches = list(re.finditer(pattern_str, content, re.DOTALL | re.IGNORECASE))
+        # Only patterns whose marker classes and tags occur in the page can match
+        for source_type, pattern, _ in patterns.html_patterns_for(content):
+            matches = list(pattern.finditer(content))
 
             # Log pattern matches for Milkdown patterns and CodeMirror
             if matches and (
@@ -534,7 +563,7 @@ class CodeExtractionService:
                     code_content = match.group(1).strip()
                     # Try to extract language from the full match
                     full_match = match.group(0)
-                    lang_match = re.search(r'class=["\'].*?language-(\w+)', full_match)
+                    lang_match = patterns.LANGUAGE_CLASS_PATTERN.search(full_match)
                     language = lang_match.group(1) if lang_match else ""
 
                 # Get the start position for complete block extraction
@@ -543,46 +572,42 @@ class CodeExtractionService:
                 # For CodeMirror, extract text from cm-lines
                 if source_type == "codemirror":
                     # Extract text from each cm-line div
-                    cm_lines = re.findall(
-                        r'<div[^>]*class=["\'][^"\']*cm-line[^"\']*["\'][^>]*>(.*?)</div>',
-                        code_content,
-                        re.DOTALL,
-                    )
+                    cm_lines = patterns.CM_LINE_PATTERN.findall(code_content)
                     if cm_lines:
                         # Clean each line and join
                         cleaned_lines = []
                         for line in cm_lines:
                             # Remove span tags but keep content
-                            line = re.sub(r"<span[^>]*>", "", line)
-                            line = re.sub(r"</span>", "", line)
+                            line = patterns.SPAN_OPEN_PATTERN.sub("", line)
+                            line = patterns.SPAN_CLOSE_PATTERN.sub("", line)
                             # Remove other HTML tags
-                            line = re.sub(r"<[^>]+>", "", line)
+                            line = patterns.TAG_PATTERN.sub("", line)
                             cleaned_lines.append(line)
                         code_content = "\n".join(cleaned_lines)
                     else:
                         # Fallback: just clean HTML
-                        code_content = re.sub(r"<span[^>]*>", "", code_content)
-                        code_content = re.sub(r"</span>", "", code_content)
-                        code_content = re.sub(r"<[^>]+>", "\n", code_content)
+                        code_content = patterns.SPAN_OPEN_PATTERN.sub("", code_content)
+                        code_content = patterns.SPAN_CLOSE_PATTERN.sub("", code_content)
+                        code_content = patterns.TAG_PATTERN.sub("\n", code_content)
 
                 # For Monaco, extract text from nested divs
                 if source_type == "monaco":
                     # Extract actual code from Monaco's complex structure
-                    code_content = re.sub(r"<div[^>]*>", "\n", code_content)
-                    code_content = re.sub(r"</div>", "", code_content)
-                    code_content = re.sub(r"<span[^>]*>", "", code_content)
-                    code_content = re.sub(r"</span>", "", code_content)
+                    code_content = patterns.DIV_OPEN_PATTERN.sub("\n", code_content)
+                    code_content = patterns.DIV_CLOSE_PATTERN.sub("", code_content)
+                    code_content = patterns.SPAN_OPEN_PATTERN.sub("", code_content)
+                    code_content = patterns.SPAN_CLOSE_PATTERN.sub("", code_content)
 
                 # Calculate dynamic minimum length
                 context_for_length = content[max(0, code_start_pos - 500) : code_start_pos + 500]
-                min_length = await self._calculate_min_length(language, context_for_length)
+                min_length = self._calculate_min_length(language, context_for_length)
 
                 # Skip if initial content is too short
                 if len(code_content) < min_length:
                     # Try to find complete block if we have a language
                     if language and code_start_pos > 0:
                         # Look for complete code block
-                        complete_code, block_end_pos = await self._find_complete_code_block(
+                        complete_code, block_end_pos = self._find_complete_code_block(
                             content, code_start_pos, min_length, language
                         )
                         if len(complete_code) >= min_length:
@@ -621,7 +646,7 @@ class CodeExtractionService:
                     cleaned_code = self._clean_code_content(code_content, language)
 
                     # Validate code quality
-                    if await self._validate_code_quality(cleaned_code, language):
+                    if self._validate_code_quality(cleaned_code, language):
                         # Log successful extraction
                         safe_logfire_info(
                             f"Extracted code block | source_type={source_type} | language={language} | min_length={min_length} | original_length={len(code_content)} | cleaned_length={len(cleaned_code)}"
@@ -642,8 +667,7 @@ class CodeExtractionService:
 
         # Pattern 2: <code>...</code> (standalone)
         if not code_blocks:  # Only if we didn't find pre/code blocks
-            code_pattern = r"<code[^>]*>(.*?)</code>"
-            matches = re.finditer(code_pattern, content, re.DOTALL | re.IGNORECASE)
+            matches = patterns.STANDALONE_CODE_PATTERN.finditer(content)
 
             for match in matches:
                 code_content = match.group(1).strip()
@@ -653,7 +677,7 @@ class CodeExtractionService:
                 # Check if it's multiline or substantial enough and validate quality
                 # Use a minimal length for standalone code tags
                 if len(cleaned_code) >= 100 and ("\n" in cleaned_code or len(cleaned_code) > 100):
-                    if await self._validate_code_quality(cleaned_code, ""):
+                    if self._validate_code_quality(cleaned_code, ""):
                         start_pos = match.start()
                         end_pos = match.end()
                         context_before = content[max(0, start_pos - 1000) : start_pos].strip()
@@ -692,7 +716,11 @@ class CodeExtractionService:
         Returns:
             List of code blocks with metadata
         """
-        import re
+        settings = await self._get_settings()
+        if min_length is None:
+            indented_min_length = settings.min_code_length
+        else:
+            indented_min_length = min_length
 
         safe_logfire_info(
             f"🔍 TEXT FILE EXTRACTION START | url={url} | content_length={len(content)}"
@@ -708,8 +736,7 @@ class CodeExtractionService:
 
         # Method 1: Look for triple backtick code blocks (Markdown style)
         # Pattern allows for additional text after language (e.g., "typescript TypeScript")
-        backtick_pattern = r"```(\w*)[^\n]*\n(.*?)```"
-        matches = list(re.finditer(backtick_pattern, content, re.DOTALL | re.MULTILINE))
+        matches = list(patterns.BACKTICK_BLOCK_PATTERN.finditer(content))
         safe_logfire_info(f"📊 Backtick pattern matches: {len(matches)}")
 
         for i, match in enumerate(matches):
@@ -728,7 +755,7 @@ class CodeExtractionService:
             # Calculate dynamic minimum length
             context_around = content[max(0, start_pos - 500) : min(len(content), end_pos + 500)]
             if min_length is None:
-                actual_min_length = await self._calculate_min_length(language, context_around)
+                actual_min_length = self._calculate_min_length(language, context_around)
             else:
                 actual_min_length = min_length
 
@@ -741,7 +768,7 @@ class CodeExtractionService:
                 cleaned_code = self._clean_code_content(code_content, language)
                 safe_logfire_info(f"🧹 After cleaning: length={len(cleaned_code)}")
 
-                if await self._validate_code_quality(cleaned_code, language):
+                if self._validate_code_quality(cleaned_code, language):
                     safe_logfire_info(
                         f"✅ VALID backtick code block | language={language} | length={len(cleaned_code)}"
                     )
@@ -763,22 +790,18 @@ class CodeExtractionService:
                 )
 
         # Method 2: Look for language-labeled code blocks (e.g., "TypeScript:" or "Python example:")
-        language_pattern = r"(?:^|\n)((?:typescript|javascript|python|java|c\+\+|rust|go|ruby|php|swift|kotlin|scala|r|matlab|julia|dart|elixir|erlang|haskell|clojure|lua|perl|shell|bash|sql|html|css|xml|json|yaml|toml|ini|dockerfile|makefile|cmake|gradle|maven|npm|yarn|pip|cargo|gem|pod|composer|nuget|apt|yum|brew|choco|snap|flatpak|appimage|msi|exe|dmg|pkg|deb|rpm|tar|zip|7z|rar|gz|bz2|xz|zst|lz4|lzo|lzma|lzip|lzop|compress|uncompress|gzip|gunzip|bzip2|bunzip2|xz|unxz|zstd|unzstd|lz4|unlz4|lzo|unlzo|lzma|unlzma|lzip|lunzip|lzop|unlzop)\s*(?:code|example|snippet)?)[:\s]*\n((?:(?:^[ \t]+.*\n?)+)|(?:.*\n)+?)(?=\n(?:[A-Z][a-z]+\s*:|^\s*$|\n#|\n\*|\n-|\n\d+\.))"
-        matches = re.finditer(language_pattern, content, re.IGNORECASE | re.MULTILINE)
+        matches = patterns.LANGUAGE_LABEL_PATTERN.finditer(content)
 
         for match in matches:
             language_info = match.group(1).lower()
             # Extract just the language name
-            language = (
-                re.match(r"(\w+)", language_info).group(1)
-                if re.match(r"(\w+)", language_info)
-                else ""
-            )
+            word_match = patterns.LEADING_WORD_PATTERN.match(language_info)
+            language = word_match.group(1) if word_match else ""
             code_content = match.group(2).strip()
 
             # Calculate dynamic minimum length for language-labeled blocks
             if min_length is None:
-                actual_min_length_lang = await self._calculate_min_length(
+                actual_min_length_lang = self._calculate_min_length(
                     language, code_content[:500]
                 )
             else:
@@ -793,7 +816,7 @@ class CodeExtractionService:
 
                 # Clean and validate
                 cleaned_code = self._clean_code_content(code_content, language)
-                if await self._validate_code_quality(cleaned_code, language):
+                if self._validate_code_quality(cleaned_code, language):
                     safe_logfire_info(
                         f"Found language-labeled code block | language={language} | length={len(cleaned_code)}"
                     )
@@ -825,7 +848,7 @@ class CodeExtractionService:
                         current_indent = indent
                         block_start_idx = i
                     current_block.append(line)
-                elif current_block and len("\n".join(current_block)) >= min_length:
+                elif current_block and len("\n".join(current_block)) >= indented_min_length:
                     # End of indented block, check if it's code
                     code_content = "\n".join(current_block)
 
@@ -840,7 +863,7 @@ class CodeExtractionService:
 
                     # Clean and validate
                     cleaned_code = self._clean_code_content(code_content, language)
-                    if await self._validate_code_quality(cleaned_code, language):
+                    if self._validate_code_quality(cleaned_code, language):
                         safe_logfire_info(
                             f"Found indented code block | language={language} | length={len(cleaned_code)}"
                         )
@@ -879,46 +902,8 @@ class CodeExtractionService:
         Try to detect programming language from code content.
         This is a simple heuristic approach.
         """
-        import re
-
-        # Language detection patterns
-        patterns = {
-            "python": [
-                r"\bdef\s+\w+\s*\(",
-                r"\bclass\s+\w+",
-                r"\bimport\s+\w+",
-                r"\bfrom\s+\w+\s+import",
-            ],
-            "javascript": [
-                r"\bfunction\s+\w+\s*\(",
-                r"\bconst\s+\w+\s*=",
-                r"\blet\s+\w+\s*=",
-                r"\bvar\s+\w+\s*=",
-            ],
-            "typescript": [
-                r"\binterface\s+\w+",
-                r":\s*\w+\[\]",
-                r"\btype\s+\w+\s*=",
-                r"\bclass\s+\w+.*\{",
-            ],
-            "java": [
-                r"\bpublic\s+class\s+\w+",
-                r"\bprivate\s+\w+\s+\w+",
-                r"\bpublic\s+static\s+void\s+main",
-            ],
-            "rust": [r"\bfn\s+\w+\s*\(", r"\blet\s+mut\s+\w+", r"\bimpl\s+\w+", r"\bstruct\s+\w+"],
-            "go": [r"\bfunc\s+\w+\s*\(", r"\bpackage\s+\w+", r"\btype\s+\w+\s+struct"],
-        }
-
-        # Count matches for each language
-        scores = {}
-        for lang, lang_patterns in patterns.items():
-            score = 0
-            for pattern in lang_patterns:
-                if re.search(pattern, code, re.MULTILINE):
-                    score += 1
-            if score > 0:
-                scores[lang] = score
+        # Score each language by how many of its signatures occur
+        scores = Counter(patterns.LANGUAGE_SIGNATURES.matching(code))
 
         # Return language with highest score
         if scores:
@@ -926,7 +911,7 @@ class CodeExtractionService:
 
         return ""
 
-    async def _find_complete_code_block(
+    def _find_complete_code_block(
         self,
         content: str,
         start_pos: int,
@@ -951,27 +936,14 @@ class CodeExtractionService:
             return content[start_pos:], len(content)
 
         # Look for natural code boundaries
-        boundary_patterns = [
-            r"\n}\s*$",  # Closing brace at end of line
-            r"\n}\s*;?\s*$",  # Closing brace with optional semicolon
-            r"\n\)\s*;?\s*$",  # Closing parenthesis
-            r"\n\s*$\n\s*$",  # Double newline (paragraph break)
-            r"\n(?=class\s)",  # Before next class
-            r"\n(?=function\s)",  # Before next function
-            r"\n(?=def\s)",  # Before next Python function
-            r"\n(?=export\s)",  # Before next export
-            r"\n(?=const\s)",  # Before next const declaration
-            r"\n(?=//)",  # Before comment block
-            r"\n(?=#)",  # Before Python comment
-            r"\n(?=\*)",  # Before JSDoc/comment
-            r"\n(?=```)",  # Before next code block
-        ]
+        boundary_patterns = patterns.BOUNDARY_PATTERNS
 
         # Add language-specific patterns if available
-        if language and language.lower() in self.LANGUAGE_PATTERNS:
-            lang_patterns = self.LANGUAGE_PATTERNS[language.lower()]
-            if "block_end" in lang_patterns:
-                boundary_patterns.insert(0, lang_patterns["block_end"])
+        if language and language.lower() in patterns.LANGUAGE_BLOCK_ENDS:
+            boundary_patterns = [
+                patterns.LANGUAGE_BLOCK_ENDS[language.lower()],
+                *boundary_patterns,
+            ]
 
         # Extend until we find a boundary
         extended_pos = start_pos + min_length
@@ -981,7 +953,7 @@ class CodeExtractionService:
             lookahead = content[extended_pos:lookahead_end]
 
             for pattern in boundary_patterns:
-                match = re.search(pattern, lookahead, re.MULTILINE)
+                match = pattern.search(lookahead)
                 if match:
                     final_pos = extended_pos + match.end()
                     return content[start_pos:final_pos].rstrip(), final_pos
@@ -991,14 +963,14 @@ class CodeExtractionService:
 
             # Cap at maximum length
             if max_length is None:
-                max_length = await self._get_max_code_length()
+                max_length = self.settings.max_code_length
             if extended_pos - start_pos > max_length:
                 break
 
         # Return what we have
         return content[start_pos:extended_pos].rstrip(), extended_pos
 
-    async def _calculate_min_length(self, language: str, context: str) -> int:
+    def _calculate_min_length(self, language: str, context: str) -> int:
         """
         Calculate appropriate minimum length based on language and context.
 
@@ -1011,9 +983,9 @@ class CodeExtractionService:
         """
         # Base lengths by language
         # Check if contextual length adjustment is enabled
-        if not await self._is_contextual_length_enabled():
+        if not self.settings.contextual_length:
             # Return default minimum length
-            return await self._get_min_code_length()
+            return self.settings.min_code_length
 
         # Base lengths by language
         base_lengths = {
@@ -1035,7 +1007,7 @@ class CodeExtractionService:
         }
 
         # Get default minimum from settings
-        default_min = await self._get_min_code_length()
+        default_min = self.settings.min_code_length
         min_length = base_lengths.get(language.lower(), default_min)
 
         # Adjust based on context clues
@@ -1052,22 +1024,20 @@ class CodeExtractionService:
 
     def _decode_html_entities(self, text: str) -> str:
         """Decode common HTML entities and clean HTML tags from code."""
-        import re
-
         # First, handle span tags that wrap individual tokens
         # Check if spans are being used for syntax highlighting (no spaces between tags)
         if "</span><span" in text:
             # This indicates syntax highlighting - preserve the structure
-            text = re.sub(r"</span>", "", text)
-            text = re.sub(r"<span[^>]*>", "", text)
+            text = patterns.SPAN_CLOSE_PATTERN.sub("", text)
+            text = patterns.SPAN_OPEN_PATTERN.sub("", text)
         else:
             # Normal span usage - might need spacing
             # Only add space if there isn't already whitespace
-            text = re.sub(r"</span>(?=[A-Za-z0-9])", " ", text)
-            text = re.sub(r"<span[^>]*>", "", text)
+            text = patterns.SPAN_CLOSE_BEFORE_WORD_PATTERN.sub(" ", text)
+            text = patterns.SPAN_OPEN_PATTERN.sub("", text)
 
         # Remove any other HTML tags but preserve their content
-        text = re.sub(r"</?[^>]+>", "", text)
+        text = patterns.ANY_TAG_PATTERN.sub("", text)
 
         # Decode HTML entities
         replacements = {
@@ -1089,13 +1059,16 @@ class CodeExtractionService:
         # Replace escaped newlines with actual newlines
         text = text.replace("\\n", "\n")
 
-        # Clean up excessive whitespace while preserving intentional spacing
+        return self._collapse_line_spaces(text)
+
+    def _collapse_line_spaces(self, text: str) -> str:
+        """Collapse runs of spaces and trim trailing spaces on every line."""
         # Replace multiple spaces with single space, but preserve newlines
         lines = text.split("\n")
         cleaned_lines = []
         for line in lines:
             # Replace multiple spaces with single space
-            line = re.sub(r" +", " ", line)
+            line = patterns.SPACE_RUN_PATTERN.sub(" ", line)
             # Trim trailing spaces but preserve leading spaces (indentation)
             line = line.rstrip()
             cleaned_lines.append(line)
@@ -1104,57 +1077,34 @@ class CodeExtractionService:
 
         return text
 
-    def _clean_code_content(self, code: str, language: str = "") -> str:
+    def _clean_code_content(self, code: str, language: str = "", decode_html: bool = True) -> str:
         """
         Clean and fix common issues in extracted code content.
 
         Args:
             code: The code content to clean
             language: The detected language (optional)
+            decode_html: Strip tags and decode entities; off for text that is already decoded
 
         Returns:
             Cleaned code content
         """
-        import re
-
         # First apply HTML entity decoding and tag cleaning
-        code = self._decode_html_entities(code)
+        if decode_html:
+            code = self._decode_html_entities(code)
+        else:
+            code = self._collapse_line_spaces(code)
 
         # Fix common concatenation issues from span removal
-        # Common patterns where spaces are missing between keywords
-        spacing_fixes = [
-            # Import statements
-            (r"(\b(?:from|import|as)\b)([A-Za-z])", r"\1 \2"),
-            # Function/class definitions
-            (r"(\b(?:def|class|async|await|return|raise|yield)\b)([A-Za-z])", r"\1 \2"),
-            # Control flow
-            (r"(\b(?:if|elif|else|for|while|try|except|finally|with)\b)([A-Za-z])", r"\1 \2"),
-            # Type hints and declarations
-            (
-                r"(\b(?:int|str|float|bool|list|dict|tuple|set|None|True|False)\b)([A-Za-z])",
-                r"\1 \2",
-            ),
-            # Common Python keywords
-            (r"(\b(?:and|or|not|in|is|lambda)\b)([A-Za-z])", r"\1 \2"),
-            # Fix missing spaces around operators (but be careful with negative numbers)
-            (r"([A-Za-z_)])(\+|-|\*|/|=|<|>|%)", r"\1 \2"),
-            (r"(\+|-|\*|/|=|<|>|%)([A-Za-z_(])", r"\1 \2"),
-        ]
-
-        for pattern, replacement in spacing_fixes:
-            code = re.sub(pattern, replacement, code)
+        for pattern, replacement in patterns.SPACING_FIXES:
+            code = pattern.sub(replacement, code)
 
         # Fix specific patterns for different languages
         if language.lower() in ["python", "py"]:
             # Fix Python-specific issues
-            code = re.sub(r"(\b(?:from|import)\b)(\w+)(\b(?:import)\b)", r"\1 \2 \3", code)
+            code = patterns.PYTHON_IMPORT_FIX_PATTERN.sub(r"\1 \2 \3", code)
             # Fix missing colons
-            code = re.sub(
-                r"(\b(?:def|class|if|elif|else|for|while|try|except|finally|with)\b[^:]+)$",
-                r"\1:",
-                code,
-                flags=re.MULTILINE,
-            )
+            code = patterns.PYTHON_MISSING_COLON_PATTERN.sub(r"\1:", code)
 
         # Remove backticks that might have been included
         if code.startswith("```") and code.endswith("```"):
@@ -1174,12 +1124,12 @@ class CodeExtractionService:
             stripped = line.lstrip()
             indent = line[: len(line) - len(stripped)]
             # Clean the rest of the line
-            cleaned = re.sub(r" {2,}", " ", stripped)
+            cleaned = patterns.DOUBLE_SPACE_RUN_PATTERN.sub(" ", stripped)
             cleaned_lines.append(indent + cleaned)
 
         return "\n".join(cleaned_lines).strip()
 
-    async def _validate_code_quality(self, code: str, language: str = "") -> bool:
+    def _validate_code_quality(self, code: str, language: str = "") -> bool:
         """
         Enhanced validation to ensure extracted content is actual code.
 
@@ -1190,61 +1140,30 @@ class CodeExtractionService:
         Returns:
             True if code passes quality checks, False otherwise
         """
-        import re
+        settings = self.settings
 
         # Basic checks
         if not code or len(code.strip()) < 20:
             return False
 
         # Skip diagram languages if filtering is enabled
-        if await self._is_diagram_filtering_enabled():
+        if settings.diagram_filtering:
             if language.lower() in ["mermaid", "plantuml", "graphviz", "dot", "diagram"]:
                 safe_logfire_info(f"Skipping diagram language: {language}")
                 return False
 
         # Check for common formatting issues that indicate poor extraction
-        bad_patterns = [
-            # Concatenated keywords without spaces (but allow camelCase)
-            r"\b(from|import|def|class|if|for|while|return)(?=[a-z])",
-            # HTML entities that weren't decoded
-            r"&[lg]t;|&amp;|&quot;|&#\d+;",
-            # Excessive HTML tags
-            r"<[^>]{50,}>",  # Very long HTML tags
-            # Multiple spans in a row (indicates poor extraction)
-            r"(<span[^>]*>){5,}",
-            # Suspicious character sequences
-            r"[^\s]{200,}",  # Very long unbroken strings (increased threshold)
-        ]
-
-        for pattern in bad_patterns:
-            if re.search(pattern, code):
-                safe_logfire_info(f"Code failed quality check: pattern '{pattern}' found")
-                return False
+        bad_match = patterns.BAD_CODE_PATTERN.search(code)
+        if bad_match:
+            safe_logfire_info(f"Code failed quality check: {bad_match.lastgroup} found")
+            return False
 
         # Check for minimum code complexity using various indicators
-        code_indicators = {
-            "function_calls": r"\w+\s*\([^)]*\)",
-            "assignments": r"\w+\s*=\s*.+",
-            "control_flow": r"\b(if|for|while|switch|case|try|catch|except)\b",
-            "declarations": r"\b(var|let|const|def|class|function|interface|type|struct|enum)\b",
-            "imports": r"\b(import|from|require|include|using|use)\b",
-            "brackets": r"[\{\}\[\]]",
-            "operators": r"[\+\-\*\/\%\&\|\^<>=!]",
-            "method_chains": r"\.\w+",
-            "arrows": r"(=>|->)",
-            "keywords": r"\b(return|break|continue|yield|await|async)\b",
-        }
-
-        indicator_count = 0
-        indicator_details = []
-        for name, pattern in code_indicators.items():
-            if re.search(pattern, code):
-                indicator_count += 1
-                indicator_details.append(name)
+        indicator_details = patterns.CODE_INDICATORS.matching(code)
+        indicator_count = len(indicator_details)
 
         # Require minimum code indicators
-        min_indicators = await self._get_min_code_indicators()
-        if indicator_count < min_indicators:
+        if indicator_count < settings.min_code_indicators:
             safe_logfire_info(
                 f"Code has insufficient indicators: {indicator_count} found ({', '.join(indicator_details)})"
             )
@@ -1258,19 +1177,9 @@ class CodeExtractionService:
             return False
 
         # Count comment lines (various comment styles)
-        comment_patterns = [
-            r"^\s*(//|#|/\*|\*|<!--)",  # Single line comments
-            r'^\s*"""',  # Python docstrings
-            r"^\s*'''",  # Python docstrings alt
-            r"^\s*\*\s",  # JSDoc style
-        ]
-
-        comment_lines = 0
-        for line in lines:
-            for pattern in comment_patterns:
-                if re.match(pattern, line.strip()):
-                    comment_lines += 1
-                    break
+        comment_lines = sum(
+            1 for line in lines if patterns.COMMENT_LINE_PATTERN.match(line.strip())
+        )
 
         # Allow up to 70% comments (documentation is important)
         if non_empty_lines and comment_lines / len(non_empty_lines) > 0.7:
@@ -1308,22 +1217,12 @@ class CodeExtractionService:
             return False
 
         # Check if it's mostly prose/documentation
-        prose_indicators = [
-            r"\b(the|this|that|these|those|is|are|was|were|will|would|should|could|have|has|had)\b",
-            r"[.!?]\s+[A-Z]",  # Sentence endings followed by capital letter
-            r"\b(however|therefore|furthermore|moreover|nevertheless)\b",
-        ]
-
-        prose_score = 0
-        word_count = len(code.split())
-        for pattern in prose_indicators:
-            matches = len(re.findall(pattern, code, re.IGNORECASE))
-            prose_score += matches
-
-        # Check prose filtering
-        if await self._is_prose_filtering_enabled():
-            max_prose_ratio = await self._get_max_prose_ratio()
-            if word_count > 0 and prose_score / word_count > max_prose_ratio:
+        if settings.prose_filtering:
+            word_count = len(code.split())
+            prose_score = len(patterns.PROSE_WORD_PATTERN.findall(code)) + len(
+                patterns.SENTENCE_BREAK_PATTERN.findall(code)
+            )
+            if word_count > 0 and prose_score / word_count > settings.max_prose_ratio:
                 safe_logfire_info(
                     f"Code appears to be prose: prose_score={prose_score}, word_count={word_count}"
                 )
@@ -1349,7 +1248,7 @@ class CodeExtractionService:
             List of summary results
         """
         # Check if code summaries are enabled
-        if not await self._is_code_summaries_enabled():
+        if not (await self._get_settings()).code_summaries:
             safe_logfire_info("Code summaries generation is disabled, returning default summaries")
             # Return default summaries for all code blocks
             default_summaries = []
@@ -1373,9 +1272,6 @@ class CodeExtractionService:
 
         # Progress is handled by generate_code_summaries_batch
 
-        # Use default max workers
-        max_workers = 3
-
         # Extract just the code blocks for batch processing
         code_blocks_for_summaries = [item["block"] for item in all_code_blocks]
 
@@ -1399,7 +1295,7 @@ class CodeExtractionService:
             summary_progress_callback = mapped_callback
 
         return await generate_code_summaries_batch(
-            code_blocks_for_summaries, max_workers, progress_callback=summary_progress_callback
+            code_blocks_for_summaries, progress_callback=summary_progress_callback
         )
 
     def _prepare_code_examples_for_storage(
@@ -1441,6 +1337,8 @@ class CodeExtractionService:
                 "example_name": example_name,
                 "title": example_name,
             }
+            if block.get("duplicate_urls"):
+                code_meta["duplicate_urls"] = block["duplicate_urls"]
             code_metadatas.append(code_meta)
 
         return {
@@ -1458,6 +1356,7 @@ class CodeExtractionService:
         progress_callback: Callable | None = None,
         start_progress: int = 0,
         end_progress: int = 100,
+        replaced_urls: list[str] | None = None,
     ) -> int:
         """
         Store code examples in the database.
@@ -1507,6 +1406,7 @@ class CodeExtractionService:
                 url_to_full_document=url_to_full_document,
                 progress_callback=storage_progress_callback,
                 provider=None,  # Use configured provider
+                replaced_urls=replaced_urls,
             )
 
             # Report final progress for code storage phase (not overall completion)
@@ -0,0 +1,439 @@
+"""
+Code Extraction Patterns
+
+Precompiled pattern bank for CodeExtractionService.
+
+Extraction used to hand pattern strings to ``re`` for every block, paying a pattern
+cache lookup per call and scanning each block once per check. The patterns here are
+compiled once at import and grouped so a block needs as few passes as possible:
+
+- Checks that only ask whether any of several patterns occurs are one alternation.
+- Patterns that can only match where a keyword occurs (``def``, ``class``, ``fn``...)
+  are gated on a single keyword scan, so only those whose keyword is present run.
+- HTML code block patterns are gated on literal markers every match must contain
+  (class names and tags), checked against one lowercased copy of the page, which
+  skips most of the expensive full-page scans.
+
+Every grouping gives the same answers as running the original patterns one by one.
+"""
+
+import re
+from typing import NamedTuple
+
+# Language-specific patterns for better extraction
+LANGUAGE_PATTERNS = {
+    "typescript": {
+        "block_start": r"^\s*(export\s+)?(class|interface|function|const|type|enum)\s+\w+",
+        "block_end": r"^\}(\s*;)?$",
+        "min_indicators": [":", "{", "}", "=>", "function", "class", "interface", "type"],
+    },
+    "javascript": {
+        "block_start": r"^\s*(export\s+)?(class|function|const|let|var)\s+\w+",
+        "block_end": r"^\}(\s*;)?$",
+        "min_indicators": ["function", "{", "}", "=>", "const", "let", "var"],
+    },
+    "python": {
+        "block_start": r"^\s*(class|def|async\s+def)\s+\w+",
+        "block_end": r"^\S",  # Unindented line
+        "min_indicators": ["def", ":", "return", "self", "import", "class"],
+    },
+    "java": {
+        "block_start": r"^\s*(public|private|protected)?\s*(class|interface|enum)\s+\w+",
+        "block_end": r"^\}$",
+        "min_indicators": ["class", "public", "private", "{", "}", ";"],
+    },
+    "rust": {
+        "block_start": r"^\s*(pub\s+)?(fn|struct|impl|trait|enum)\s+\w+",
+        "block_end": r"^\}$",
+        "min_indicators": ["fn", "let", "mut", "impl", "struct", "->"],
+    },
+    "go": {
+        "block_start": r"^\s*(func|type|struct)\s+\w+",
+        "block_end": r"^\}$",
+        "min_indicators": ["func", "type", "struct", "{", "}", ":="],
+    },
+}
+
+LANGUAGE_BLOCK_ENDS = {
+    language: re.compile(info["block_end"], re.MULTILINE)
+    for language, info in LANGUAGE_PATTERNS.items()
+}
+
+
+class KeywordGatedPatterns:
+    """
+    Named patterns checked with one keyword scan plus only the searches that can match.
+
+    Each entry is ``(name, keywords, pattern)``. A match of ``pattern`` must contain
+    one of ``keywords`` as a whole word, so the pattern is only searched when the
+    keyword scan found one of them. Entries without keywords are always searched, and
+    entries without a pattern match as soon as one of their keywords occurs.
+    """
+
+    def __init__(
+        self, entries: list[tuple[str, tuple[str, ...], str | None]], flags: int = 0
+    ):
+        self._entries = [
+            (name, frozenset(keywords), re.compile(pattern, flags) if pattern else None)
+            for name, keywords, pattern in entries
+        ]
+        # Longest first so a keyword that prefixes another can't shadow it
+        keywords = sorted({k for _, ks, _ in entries for k in ks}, key=len, reverse=True)
+        self._keyword_scan = re.compile(
+            r"\b(?:" + "|".join(map(re.escape, keywords)) + r")\b", flags
+        )
+
+    def matching(self, text: str) -> list[str]:
+        """Names of the entries that match somewhere in text, in entry order."""
+        present = set(self._keyword_scan.findall(text))
+        return [
+            name
+            for name, keywords, pattern in self._entries
+            if (not keywords or not keywords.isdisjoint(present))
+            and (pattern is None or pattern.search(text))
+        ]
+
+
+# Language detection signatures, scored by how many of a language's entries match
+LANGUAGE_SIGNATURES = KeywordGatedPatterns(
+    [
+        ("python", ("def",), r"\bdef\s+\w+\s*\("),
+        ("python", ("class",), r"\bclass\s+\w+"),
+        ("python", ("import",), r"\bimport\s+\w+"),
+        ("python", ("from",), r"\bfrom\s+\w+\s+import"),
+        ("javascript", ("function",), r"\bfunction\s+\w+\s*\("),
+        ("javascript", ("const",), r"\bconst\s+\w+\s*="),
+        ("javascript", ("let",), r"\blet\s+\w+\s*="),
+        ("javascript", ("var",), r"\bvar\s+\w+\s*="),
+        ("typescript", ("interface",), r"\binterface\s+\w+"),
+        ("typescript", (), r":\s*\w+\[\]"),
+        ("typescript", ("type",), r"\btype\s+\w+\s*="),
+        ("typescript", ("class",), r"\bclass\s+\w+.*\{"),
+        ("java", ("public",), r"\bpublic\s+class\s+\w+"),
+        ("java", ("private",), r"\bprivate\s+\w+\s+\w+"),
+        ("java", ("public",), r"\bpublic\s+static\s+void\s+main"),
+        ("rust", ("fn",), r"\bfn\s+\w+\s*\("),
+        ("rust", ("let",), r"\blet\s+mut\s+\w+"),
+        ("rust", ("impl",), r"\bimpl\s+\w+"),
+        ("rust", ("struct",), r"\bstruct\s+\w+"),
+        ("go", ("func",), r"\bfunc\s+\w+\s*\("),
+        ("go", ("package",), r"\bpackage\s+\w+"),
+        ("go", ("type",), r"\btype\s+\w+\s+struct"),
+    ],
+    re.MULTILINE,
+)
+
+# Signs of real code, a block needs MIN_CODE_INDICATORS of them
+CODE_INDICATORS = KeywordGatedPatterns([
+    ("function_calls", (), r"\w+\s*\([^)]*\)"),
+    ("assignments", (), r"\w+\s*=\s*.+"),
+    (
+        "control_flow",
+        ("if", "for", "while", "switch", "case", "try", "catch", "except"),
+        None,
+    ),
+    (
+        "declarations",
+        ("var", "let", "const", "def", "class", "function", "interface", "type", "struct", "enum"),
+        None,
+    ),
+    ("imports", ("import", "from", "require", "include", "using", "use"), None),
+    ("brackets", (), r"[\{\}\[\]]"),
+    ("operators", (), r"[\+\-\*\/\%\&\|\^<>=!]"),
+    ("method_chains", (), r"\.\w+"),
+    ("arrows", (), r"(=>|->)"),
+    ("keywords", ("return", "break", "continue", "yield", "await", "async"), None),
+])
+
+# Signs of a poor extraction, any one of them rejects a block
+BAD_CODE_PATTERN = re.compile(
+    # Concatenated keywords without spaces (but allow camelCase)
+    r"(?P<concatenated_keyword>\b(from|import|def|class|if|for|while|return)(?=[a-z]))"
+    # HTML entities that weren't decoded
+    r"|(?P<html_entity>&[lg]t;|&amp;|&quot;|&#\d+;)"
+    # Very long HTML tags
+    r"|(?P<long_tag><[^>]{50,}>)"
+    # Multiple spans in a row
+    r"|(?P<span_run>(<span[^>]*>){5,})"
+    # Very long unbroken strings
+    r"|(?P<long_token>[^\s]{200,})"
+)
+
+# Comment lines of the common styles, including docstring and JSDoc openers
+COMMENT_LINE_PATTERN = re.compile(r"\s*(//|#|/\*|\*|<!--|\"\"\"|''')")
+
+# Prose markers; the two word lists are disjoint, so one count covers both
+PROSE_WORD_PATTERN = re.compile(
+    r"\b(the|this|that|these|those|is|are|was|were|will|would|should|could|have|has|had"
+    r"|however|therefore|furthermore|moreover|nevertheless)\b",
+    re.IGNORECASE,
+)
+# Sentence endings followed by capital letter
+SENTENCE_BREAK_PATTERN = re.compile(r"[.!?]\s+[A-Z]", re.IGNORECASE)
+
+# Natural code boundaries, in order of preference
+BOUNDARY_PATTERNS = [
+    re.compile(pattern, re.MULTILINE)
+    for pattern in (
+        r"\n}\s*$",  # Closing brace at end of line
+        r"\n}\s*;?\s*$",  # Closing brace with optional semicolon
+        r"\n\)\s*;?\s*$",  # Closing parenthesis
+        r"\n\s*$\n\s*$",  # Double newline (paragraph break)
+        r"\n(?=class\s)",  # Before next class
+        r"\n(?=function\s)",  # Before next function
+        r"\n(?=def\s)",  # Before next Python function
+        r"\n(?=export\s)",  # Before next export
+        r"\n(?=const\s)",  # Before next const declaration
+        r"\n(?=//)",  # Before comment block
+        r"\n(?=#)",  # Before Python comment
+        r"\n(?=\*)",  # Before JSDoc/comment
+        r"\n(?=```)",  # Before next code block
+    )
+]
+
+
+class HtmlCodePattern(NamedTuple):
+    """A code block pattern, with lowercase markers every match of it contains."""
+
+    source_type: str
+    pattern: re.Pattern
+    markers: tuple[str, ...]
+
+
+def _html(pattern: str, source_type: str, *markers: str) -> HtmlCodePattern:
+    return HtmlCodePattern(source_type, re.compile(pattern, re.DOTALL | re.IGNORECASE), markers)
+
+
+# Comprehensive patterns for various code block formats
+# Order matters - more specific patterns first
+HTML_CODE_PATTERNS = [
+    # GitHub/GitLab patterns
+    _html(
+        r'<div[^>]*class=["\'][^"\']*highlight[^"\']*["\'][^>]*>.*?<pre[^>]*class=["\'][^"\']*(?:language-)?(\w+)[^"\']*["\'][^>]*><code[^>]*>(.*?)</code></pre>',
+        "github-highlight",
+        "highlight", "<pre", "<code",
+    ),
+    _html(
+        r'<div[^>]*class=["\'][^"\']*snippet-clipboard-content[^"\']*["\'][^>]*>.*?<pre[^>]*><code[^>]*>(.*?)</code></pre>',
+        "github-snippet",
+        "snippet-clipboard-content", "<pre", "<code",
+    ),
+    # Docusaurus patterns
+    _html(
+        r'<div[^>]*class=["\'][^"\']*codeBlockContainer[^"\']*["\'][^>]*>.*?<pre[^>]*class=["\'][^"\']*prism-code[^"\']*language-(\w+)[^"\']*["\'][^>]*>(.*?)</pre>',
+        "docusaurus",
+        "codeblockcontainer", "prism-code", "language-",
+    ),
+    _html(
+        r'<div[^>]*class=["\'][^"\']*language-(\w+)[^"\']*["\'][^>]*>.*?<pre[^>]*class=["\'][^"\']*prism-code[^"\']*["\'][^>]*>(.*?)</pre>',
+        "docusaurus-alt",
+        "language-", "prism-code",
+    ),
+    # Milkdown specific patterns - check their actual HTML structure
+    _html(
+        r'<pre[^>]*><code[^>]*class=["\'][^"\']*language-(\w+)[^"\']*["\'][^>]*>(.*?)</code></pre>',
+        "milkdown-typed",
+        "<pre", "<code", "language-",
+    ),
+    _html(
+        r'<div[^>]*class=["\'][^"\']*code-wrapper[^"\']*["\'][^>]*>.*?<pre[^>]*>(.*?)</pre>',
+        "milkdown-wrapper",
+        "code-wrapper", "<pre",
+    ),
+    _html(
+        r'<div[^>]*class=["\'][^"\']*code-block-wrapper[^"\']*["\'][^>]*>.*?<pre[^>]*><code[^>]*>(.*?)</code></pre>',
+        "milkdown-wrapper-code",
+        "code-block-wrapper", "<pre", "<code",
+    ),
+    _html(
+        r'<div[^>]*class=["\'][^"\']*milkdown-code-block[^"\']*["\'][^>]*>.*?<pre[^>]*><code[^>]*>(.*?)</code></pre>',
+        "milkdown-code-block",
+        "milkdown-code-block", "<pre", "<code",
+    ),
+    _html(
+        r'<pre[^>]*class=["\'][^"\']*code-block[^"\']*["\'][^>]*><code[^>]*>(.*?)</code></pre>',
+        "milkdown",
+        "code-block", "<pre", "<code",
+    ),
+    _html(
+        r"<div[^>]*data-code-block[^>]*>.*?<pre[^>]*>(.*?)</pre>",
+        "milkdown-alt",
+        "data-code-block", "<pre",
+    ),
+    _html(
+        r'<div[^>]*class=["\'][^"\']*milkdown[^"\']*["\'][^>]*>.*?<pre[^>]*><code[^>]*>(.*?)</code></pre>',
+        "milkdown-div",
+        "milkdown", "<pre", "<code",
+    ),
+    # Monaco Editor - capture all view-lines content
+    _html(
+        r'<div[^>]*class=["\'][^"\']*monaco-editor[^"\']*["\'][^>]*>.*?<div[^>]*class=["\'][^"\']*view-lines[^"\']*[^>]*>(.*?)</div>(?=.*?</div>.*?</div>)',
+        "monaco",
+        "monaco-editor", "view-lines",
+    ),
+    # CodeMirror patterns
+    _html(
+        r'<div[^>]*class=["\'][^"\']*cm-content[^"\']*["\'][^>]*>((?:<div[^>]*class=["\'][^"\']*cm-line[^"\']*["\'][^>]*>.*?</div>\s*)+)</div>',
+        "codemirror",
+        "cm-content", "cm-line",
+    ),
+    _html(
+        r'<div[^>]*class=["\'][^"\']*CodeMirror[^"\']*["\'][^>]*>.*?<div[^>]*class=["\'][^"\']*CodeMirror-code[^"\']*["\'][^>]*>(.*?)</div>',
+        "codemirror-legacy",
+        "codemirror-code",
+    ),
+    # Prism.js with language - must be before generic pre
+    _html(
+        r'<pre[^>]*class=["\'][^"\']*language-(\w+)[^"\']*["\'][^>]*>\s*<code[^>]*>(.*?)</code>\s*</pre>',
+        "prism",
+        "<pre", "language-", "<code",
+    ),
+    _html(
+        r'<pre[^>]*>\s*<code[^>]*class=["\'][^"\']*language-(\w+)[^"\']*["\'][^>]*>(.*?)</code>\s*</pre>',
+        "prism-alt",
+        "<pre", "<code", "language-",
+    ),
+    # highlight.js - must be before generic pre/code
+    _html(
+        r'<pre[^>]*><code[^>]*class=["\'][^"\']*hljs(?:\s+language-(\w+))?[^"\']*["\'][^>]*>(.*?)</code></pre>',
+        "hljs",
+        "<pre", "<code", "hljs",
+    ),
+    _html(
+        r'<pre[^>]*class=["\'][^"\']*hljs[^"\']*["\'][^>]*><code[^>]*>(.*?)</code></pre>',
+        "hljs-pre",
+        "hljs", "<pre", "<code",
+    ),
+    # Shiki patterns (VitePress, Astro, etc.)
+    _html(
+        r'<pre[^>]*class=["\'][^"\']*shiki[^"\']*["\'][^>]*(?:.*?style=["\'][^"\']*background-color[^"\']*["\'])?[^>]*>\s*<code[^>]*>(.*?)</code>\s*</pre>',
+        "shiki",
+        "shiki", "<pre", "<code",
+    ),
+    _html(
+        r'<pre[^>]*class=["\'][^"\']*astro-code[^"\']*["\'][^>]*>(.*?)</pre>',
+        "astro-shiki",
+        "astro-code", "<pre",
+    ),
+    _html(
+        r'<div[^>]*class=["\'][^"\']*astro-code[^"\']*["\'][^>]*>.*?<pre[^>]*>(.*?)</pre>',
+        "astro-wrapper",
+        "astro-code", "<pre",
+    ),
+    # VitePress/Vue patterns
+    _html(
+        r'<div[^>]*class=["\'][^"\']*language-(\w+)[^"\']*["\'][^>]*>.*?<pre[^>]*>(.*?)</pre>',
+        "vitepress",
+        "language-", "<pre",
+    ),
+    _html(
+        r'<div[^>]*class=["\'][^"\']*vp-code[^"\']*["\'][^>]*>.*?<pre[^>]*>(.*?)</pre>',
+        "vitepress-vp",
+        "vp-code", "<pre",
+    ),
+    # Nextra patterns
+    _html(
+        r"<div[^>]*data-nextra-code[^>]*>.*?<pre[^>]*>(.*?)</pre>",
+        "nextra",
+        "data-nextra-code", "<pre",
+    ),
+    _html(
+        r'<pre[^>]*class=["\'][^"\']*nx-[^"\']*["\'][^>]*><code[^>]*>(.*?)</code></pre>',
+        "nextra-nx",
+        "nx-", "<pre", "<code",
+    ),
+    # Standard pre/code patterns - should be near the end
+    _html(
+        r'<pre[^>]*><code[^>]*class=["\'][^"\']*language-(\w+)[^"\']*["\'][^>]*>(.*?)</code></pre>',
+        "standard-lang",
+        "<pre", "<code", "language-",
+    ),
+    _html(r"<pre[^>]*>\s*<code[^>]*>(.*?)</code>\s*</pre>", "standard", "<pre", "<code"),
+    # Generic patterns - should be last
+    _html(
+        r'<div[^>]*class=["\'][^"\']*code-block[^"\']*["\'][^>]*>.*?<pre[^>]*>(.*?)</pre>',
+        "generic-div",
+        "code-block", "<pre",
+    ),
+    _html(
+        r'<div[^>]*class=["\'][^"\']*codeblock[^"\']*["\'][^>]*>(.*?)</div>',
+        "generic-codeblock",
+        "codeblock",
+    ),
+    _html(
+        r'<div[^>]*class=["\'][^"\']*highlight[^"\']*["\'][^>]*>.*?<pre[^>]*>(.*?)</pre>',
+        "highlight",
+        "highlight", "<pre",
+    ),
+]
+
+
+def html_patterns_for(content: str) -> list[HtmlCodePattern]:
+    """The HTML code block patterns that can match content, in priority order."""
+    lowered = content.lower()
+    present: dict[str, bool] = {}
+    candidates = []
+    for entry in HTML_CODE_PATTERNS:
+        for marker in entry.markers:
+            if marker not in present:
+                present[marker] = marker in lowered
+            if not present[marker]:
+                break
+        else:
+            candidates.append(entry)
+    return candidates
+
+
+# Standalone <code> elements, tried when no block pattern matched
+STANDALONE_CODE_PATTERN = re.compile(r"<code[^>]*>(.*?)</code>", re.DOTALL | re.IGNORECASE)
+PRE_TAG_PATTERN = re.compile(r"<pre[^>]*>", re.IGNORECASE)
+LANGUAGE_CLASS_PATTERN = re.compile(r'class=["\'].*?language-(\w+)')
+CM_LINE_PATTERN = re.compile(
+    r'<div[^>]*class=["\'][^"\']*cm-line[^"\']*["\'][^>]*>(.*?)</div>', re.DOTALL
+)
+
+# Tag cleanup
+SPAN_OPEN_PATTERN = re.compile(r"<span[^>]*>")
+SPAN_CLOSE_PATTERN = re.compile(r"</span>")
+SPAN_CLOSE_BEFORE_WORD_PATTERN = re.compile(r"</span>(?=[A-Za-z0-9])")
+DIV_OPEN_PATTERN = re.compile(r"<div[^>]*>")
+DIV_CLOSE_PATTERN = re.compile(r"</div>")
+TAG_PATTERN = re.compile(r"<[^>]+>")
+ANY_TAG_PATTERN = re.compile(r"</?[^>]+>")
+SPACE_RUN_PATTERN = re.compile(r" +")
+DOUBLE_SPACE_RUN_PATTERN = re.compile(r" {2,}")
+
+# Fix common concatenation issues from span removal, applied in order
+SPACING_FIXES = [
+    (re.compile(pattern), replacement)
+    for pattern, replacement in (
+        # Import statements
+        (r"(\b(?:from|import|as)\b)([A-Za-z])", r"\1 \2"),
+        # Function/class definitions
+        (r"(\b(?:def|class|async|await|return|raise|yield)\b)([A-Za-z])", r"\1 \2"),
+        # Control flow
+        (r"(\b(?:if|elif|else|for|while|try|except|finally|with)\b)([A-Za-z])", r"\1 \2"),
+        # Type hints and declarations
+        (
+            r"(\b(?:int|str|float|bool|list|dict|tuple|set|None|True|False)\b)([A-Za-z])",
+            r"\1 \2",
+        ),
+        # Common Python keywords
+        (r"(\b(?:and|or|not|in|is|lambda)\b)([A-Za-z])", r"\1 \2"),
+        # Fix missing spaces around operators (but be careful with negative numbers)
+        (r"([A-Za-z_)])(\+|-|\*|/|=|<|>|%)", r"\1 \2"),
+        (r"(\+|-|\*|/|=|<|>|%)([A-Za-z_(])", r"\1 \2"),
+    )
+]
+PYTHON_IMPORT_FIX_PATTERN = re.compile(r"(\b(?:from|import)\b)(\w+)(\b(?:import)\b)")
+PYTHON_MISSING_COLON_PATTERN = re.compile(
+    r"(\b(?:def|class|if|elif|else|for|while|try|except|finally|with)\b[^:]+)$", re.MULTILINE
+)
+
+# Plain text files
+BACKTICK_BLOCK_PATTERN = re.compile(r"```(\w*)[^\n]*\n(.*?)```", re.DOTALL | re.MULTILINE)
+LANGUAGE_LABEL_PATTERN = re.compile(
+    r"(?:^|\n)((?:typescript|javascript|python|java|c\+\+|rust|go|ruby|php|swift|kotlin|scala|r|matlab|julia|dart|elixir|erlang|haskell|clojure|lua|perl|shell|bash|sql|html|css|xml|json|yaml|toml|ini|dockerfile|makefile|cmake|gradle|maven|npm|yarn|pip|cargo|gem|pod|composer|nuget|apt|yum|brew|choco|snap|flatpak|appimage|msi|exe|dmg|pkg|deb|rpm|tar|zip|7z|rar|gz|bz2|xz|zst|lz4|lzo|lzma|lzip|lzop|compress|uncompress|gzip|gunzip|bzip2|bunzip2|xz|unxz|zstd|unzstd|lz4|unlz4|lzo|unlzo|lzma|unlzma|lzip|lunzip|lzop|unlzop)\s*(?:code|example|snippet)?)[:\s]*\n((?:(?:^[ \t]+.*\n?)+)|(?:.*\n)+?)(?=\n(?:[A-Z][a-z]+\s*:|^\s*$|\n#|\n\*|\n-|\n\d+\.))",
+    re.IGNORECASE | re.MULTILINE,
+)
+LEADING_WORD_PATTERN = re.compile(r"(\w+)")
@@ -68,6 +68,8 @@ class DocumentStorageOperations:
         all_metadatas = []
         source_word_counts = {}
         url_to_full_document = {}
+        url_to_etag = {}
+        chunking_options = await storage_service.get_chunking_options()
         
         # Process and chunk each document
         for doc_index, doc in enumerate(crawl_results):
@@ -83,9 +85,14 @@ class DocumentStorageOperations:
             
             # Store full document for code extraction context
             url_to_full_document[source_url] = markdown_content
+            if doc.get('etag'):
+                url_to_etag[source_url] = doc['etag']
             
             # CHUNK THE CONTENT
-            chunks = storage_service.smart_chunk_text(markdown_content, chunk_size=5000)
+            # Large documents are chunked in a worker process so the event loop stays free
+            chunks = await storage_service.smart_chunk_text_async(
+                markdown_content, chunk_size=5000, **chunking_options
+            )
             
             # Use the original source_id for all documents
             source_id = original_source_id
@@ -151,7 +158,8 @@ class DocumentStorageOperations:
             progress_callback=progress_callback,  # Pass the callback for progress updates
             enable_parallel_batches=True,  # Enable parallel processing
             provider=None,  # Use configured provider
-            cancellation_check=cancellation_check  # Pass cancellation check
+            cancellation_check=cancellation_check,  # Pass cancellation check
+            url_to_etag=url_to_etag
         )
         
         # Calculate actual chunk count
@@ -0,0 +1,401 @@
+"""
+HTML Code Block Parser
+
+Single-pass, streaming extraction of code blocks from HTML.
+
+The pattern-based extractor in CodeExtractionService runs a regex per doc-site
+layout over the whole page, and patterns like ``<div ...highlight...>.*?<pre`` can
+backtrack for a long time on multi-megabyte pages. This parser walks the page once
+with the standard library's incremental ``html.parser`` and emits each code block
+with its language hint and the plain text around it, so the work is linear in the
+page size and HTML can be fed in chunks as it arrives.
+
+Code blocks are ``<pre>`` elements, CodeMirror ``cm-content`` editors and Monaco
+``view-lines`` editors. Standalone ``<code>`` elements are only returned when a page
+has none of those, like the pattern-based extractor.
+
+Usage:
+    parser = CodeBlockParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+        for block in parser.pop_blocks():
+            ...
+    parser.close()
+    remaining = parser.pop_blocks()
+"""
+
+import re
+from collections.abc import Iterable, Iterator
+from html.parser import HTMLParser
+from typing import Any
+
+DEFAULT_CONTEXT_CHARS = 1000
+# Larger blocks are generated or minified content, not examples; they are skipped
+# instead of buffered
+DEFAULT_MAX_BLOCK_CHARS = 200_000
+DEFAULT_FEED_CHARS = 64 * 1024
+# Open elements tracked; deeper nesting only loses its line and text breaks
+_MAX_STACK_DEPTH = 256
+# Wrapping elements searched for language and layout hints, nearest first
+_HINT_ANCESTORS = 3
+# html.parser holds an unterminated tag, comment or declaration and rescans it on every
+# feed, then once per "<" on close. Buffered markup older than this is treated as text,
+# which keeps such pages linear
+_MAX_MARKUP_CHARS = 256 * 1024
+# Stuck tails on close at most this long are left to html.parser's own recovery
+_MAX_CLOSE_RECOVERY_CHARS = 4096
+# Enough of an unterminated <script> or <style> to find its end tag across feeds
+_CDATA_TAIL_CHARS = 64
+
+_VOID_TAGS = frozenset({
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param",
+    "source", "track", "wbr",
+})
+# Their text is not page content
+_IGNORED_TAGS = frozenset({"script", "style", "noscript", "template"})
+# Start a new line inside code blocks (one element per line in most editors)
+_CODE_LINE_TAGS = frozenset({"div", "p", "li", "tr"})
+# Separate the surrounding text so words from adjacent elements don't run together
+_TEXT_BREAK_TAGS = frozenset({
+    "address", "article", "aside", "blockquote", "br", "dd", "div", "dl", "dt", "footer",
+    "h1", "h2", "h3", "h4", "h5", "h6", "header", "hr", "li", "main", "nav", "ol", "p",
+    "pre", "section", "table", "td", "th", "tr", "ul",
+})
+
+_LANGUAGE_CLASS = re.compile(r"(?:^|\s)(?:language|lang|highlight-source)-(\w+)")
+_HORIZONTAL_SPACE = re.compile(r"[^\S\n]+")
+_LINE_BREAKS = re.compile(r" ?\n[\s]*")
+
+# Layout markers found in the classes of a block or its ancestors, in priority order
+_SOURCE_TYPES = [
+    ("prism-code", "docusaurus"),
+    ("codeblockcontainer", "docusaurus"),
+    ("astro-code", "astro-shiki"),
+    ("shiki", "shiki"),
+    ("vp-code", "vitepress-vp"),
+    ("hljs", "hljs"),
+    ("snippet-clipboard-content", "github-snippet"),
+    ("highlight", "github-highlight"),
+    ("milkdown", "milkdown"),
+    ("code-block", "generic-div"),
+    ("codeblock", "generic-codeblock"),
+    ("nx-", "nextra-nx"),
+    ("language-", "prism"),
+]
+
+
+def _collapse_space(text: str) -> str:
+    """Collapse whitespace runs, keeping single line breaks; gives the same text in pieces."""
+    return _LINE_BREAKS.sub("\n", _HORIZONTAL_SPACE.sub(" ", text))
+
+
+def _squash_text(text: str) -> str:
+    return _collapse_space(text).strip()
+
+
+def _language_hint(classes: Iterable[str], attrs: Iterable[dict[str, str]]) -> str:
+    for attr in attrs:
+        language = attr.get("data-language") or attr.get("data-lang")
+        if language:
+            return language
+    for class_attr in classes:
+        match = _LANGUAGE_CLASS.search(class_attr)
+        if match:
+            return match.group(1)
+    return ""
+
+
+class _OpenBlock:
+    """A code block being collected."""
+
+    __slots__ = (
+        "kind", "end_tag", "depth", "parts", "size", "inner", "ancestors", "overflow", "before",
+        "line_starts",
+    )
+
+    def __init__(
+        self, kind: str, end_tag: str, attrs: dict[str, str], ancestors: list[dict[str, str]],
+        before: str,
+    ):
+        self.kind = kind
+        self.end_tag = end_tag
+        self.depth = 1
+        self.parts: list[str] = []
+        self.size = 0
+        # Attributes of the block and its nested elements, then of its ancestors innermost
+        # first; the first language hint found wins
+        self.inner = [attrs]
+        self.ancestors = ancestors
+        self.overflow = False
+        self.before = before
+        # Block size when each open line element started, to spot empty lines
+        self.line_starts: list[int] = []
+
+
+class CodeBlockParser(HTMLParser):
+    """
+    Incremental parser that collects code blocks and the text around them.
+
+    Each block is a dict with ``code``, ``language``, ``context_before``,
+    ``context_after`` and ``source_type``. Blocks become available from pop_blocks
+    once ``context_chars`` of following text has been seen, or on close.
+    """
+
+    def __init__(
+        self,
+        context_chars: int = DEFAULT_CONTEXT_CHARS,
+        max_block_chars: int = DEFAULT_MAX_BLOCK_CHARS,
+    ):
+        super().__init__(convert_charrefs=True)
+        self.context_chars = context_chars
+        self.max_block_chars = max_block_chars
+        self.skipped_oversized = 0
+
+        self._stack: list[tuple[str, dict[str, str]]] = []
+        self._ignored_depth = 0
+        self._block: _OpenBlock | None = None
+        # Recent text outside code blocks, trimmed to roughly context_chars
+        self._recent: list[str] = []
+        self._recent_size = 0
+        # Finished blocks still collecting context_after: [block dict, parts, size]
+        self._pending: list[list[Any]] = []
+        self._ready: list[dict[str, Any]] = []
+        self._standalone: list[dict[str, Any]] = []
+        self._found_block = False
+
+    # Results
+
+    def pop_blocks(self) -> list[dict[str, Any]]:
+        """Return and forget the blocks whose surrounding text is complete."""
+        ready, self._ready = self._ready, []
+        return ready
+
+    def feed(self, data: str) -> None:
+        super().feed(data)
+        excess = len(self.rawdata) - _MAX_MARKUP_CHARS
+        if excess <= 0:
+            return
+        if self.cdata_elem:
+            # Script and style text is ignored anyway
+            self.rawdata = self.rawdata[-_CDATA_TAIL_CHARS:]
+        else:
+            self.rawdata = self.rawdata[:excess].replace("<", "&lt;") + self.rawdata[excess:]
+            self.goahead(False)
+
+    def close(self) -> None:
+        """Finish parsing and release every remaining block."""
+        if not self.cdata_elem and len(self.rawdata) > _MAX_CLOSE_RECOVERY_CHARS:
+            self.rawdata = self.rawdata.replace("<", "&lt;")
+        super().close()
+        if self._block is not None:
+            self._finish_block()
+        for block, parts, _ in self._pending:
+            block["context_after"] = _squash_text("".join(parts))[: self.context_chars]
+            if block["source_type"] != "code":
+                self._ready.append(block)
+        self._pending = []
+        # Standalone <code> elements count only when the page has no real code blocks
+        if not self._found_block:
+            self._ready.extend(self._standalone)
+        self._standalone = []
+
+    # Parser callbacks
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        attr_map = {name: value or "" for name, value in attrs}
+
+        if tag in _IGNORED_TAGS:
+            self._ignored_depth += 1
+            return
+
+        block = self._block
+        if block is not None:
+            if tag == block.end_tag:
+                block.depth += 1
+            if tag == "br":
+                self._append_code("\n")
+            elif tag in _CODE_LINE_TAGS:
+                self._append_code("\n", line_break=True)
+                block.line_starts.append(block.size)
+            if tag == "code" or attr_map.get("class"):
+                block.inner.append(attr_map)
+        else:
+            if tag in _TEXT_BREAK_TAGS:
+                self._append_text("\n")
+            self._maybe_open_block(tag, attr_map)
+
+        if tag not in _VOID_TAGS and len(self._stack) < _MAX_STACK_DEPTH:
+            self._stack.append((tag, attr_map))
+
+    def handle_endtag(self, tag: str) -> None:
+        if tag in _IGNORED_TAGS:
+            self._ignored_depth = max(0, self._ignored_depth - 1)
+            return
+
+        for index in range(len(self._stack) - 1, -1, -1):
+            if self._stack[index][0] == tag:
+                del self._stack[index:]
+                break
+
+        block = self._block
+        if block is None:
+            if tag in _TEXT_BREAK_TAGS:
+                self._append_text("\n")
+            return
+
+        if tag == block.end_tag:
+            block.depth -= 1
+            if block.depth == 0:
+                self._finish_block()
+                return
+        if tag in _CODE_LINE_TAGS and block.line_starts:
+            # Empty line elements are blank lines; others end their line unless a <br> did
+            empty = block.line_starts.pop() == block.size
+            self._append_code("\n", line_break=not empty)
+
+    def handle_data(self, data: str) -> None:
+        if self._ignored_depth:
+            return
+        if self._block is not None:
+            self._append_code(data)
+            if self._block.kind != "code":
+                return
+        # Inline code is part of the sentence around it
+        self._append_text(data)
+
+    # Internals
+
+    def _maybe_open_block(self, tag: str, attrs: dict[str, str]) -> None:
+        classes = attrs.get("class", "")
+        if tag == "pre":
+            kind, end_tag = "pre", "pre"
+        elif tag == "div" and "cm-content" in classes.split():
+            kind, end_tag = "codemirror", "div"
+        elif tag == "div" and "view-lines" in classes.split():
+            kind, end_tag = "monaco", "div"
+        elif tag == "code" and not self._found_block:
+            kind, end_tag = "code", "code"
+        else:
+            return
+
+        ancestors = [element_attrs for _, element_attrs in self._stack[-_HINT_ANCESTORS:]][::-1]
+        self._block = _OpenBlock(kind, end_tag, attrs, ancestors, self._recent_text())
+
+    def _append_code(self, data: str, line_break: bool = False) -> None:
+        block = self._block
+        if block.overflow:
+            return
+        # Line breaks are only needed after text on the current line
+        if line_break and (not block.parts or block.parts[-1].endswith("\n")):
+            return
+        block.parts.append(data)
+        block.size += len(data)
+        if block.size > self.max_block_chars:
+            block.overflow = True
+            block.parts = []
+
+    def _append_text(self, data: str) -> None:
+        self._recent.append(data)
+        self._recent_size += len(data)
+        if self._recent_size > 2 * self.context_chars:
+            text = "".join(self._recent)[-self.context_chars :]
+            self._recent = [text]
+            self._recent_size = len(text)
+
+        if not self._pending:
+            return
+        still_pending = []
+        for entry in self._pending:
+            block, parts, size = entry
+            parts.append(data)
+            entry[2] = size + len(data)
+            if entry[2] >= self.context_chars:
+                # Whitespace collapses, so only release once the collapsed text is long
+                # enough; the result then doesn't depend on how the page was chunked
+                text = _collapse_space("".join(parts))
+                if len(text.strip()) >= self.context_chars:
+                    block["context_after"] = text.strip()[: self.context_chars]
+                    if block["source_type"] != "code":
+                        self._ready.append(block)
+                    continue
+                entry[1] = [text]
+                entry[2] = len(text.strip())
+            still_pending.append(entry)
+        self._pending = still_pending
+
+    def _recent_text(self) -> str:
+        return _squash_text("".join(self._recent)[-self.context_chars :])
+
+    def _finish_block(self) -> None:
+        block, self._block = self._block, None
+        if block.overflow:
+            self.skipped_oversized += 1
+            return
+
+        code = "".join(block.parts)
+        if not code.strip():
+            return
+
+        hints = block.inner + block.ancestors
+        classes = [attrs.get("class", "") for attrs in hints]
+        if block.kind == "pre":
+            class_text = " ".join(classes).lower()
+            source_type = next(
+                (name for marker, name in _SOURCE_TYPES if marker in class_text), "standard"
+            )
+        else:
+            source_type = block.kind
+
+        result = {
+            "code": code.strip("\n"),
+            "language": _language_hint(classes, hints),
+            "context_before": block.before,
+            "context_after": "",
+            "source_type": source_type,
+        }
+
+        if block.kind == "code":
+            # Held back until close, in case the page turns out to have real code blocks
+            self._standalone.append(result)
+            self._pending.append([result, [], 0])
+            return
+
+        if not self._found_block:
+            self._found_block = True
+            self._pending = [entry for entry in self._pending if entry[0]["source_type"] != "code"]
+            self._standalone = []
+        self._pending.append([result, [], 0])
+
+
+def iter_html_code_blocks(
+    html: str | Iterable[str],
+    context_chars: int = DEFAULT_CONTEXT_CHARS,
+    max_block_chars: int = DEFAULT_MAX_BLOCK_CHARS,
+    feed_chars: int = DEFAULT_FEED_CHARS,
+) -> Iterator[dict[str, Any]]:
+    """
+    Stream code blocks out of HTML given as one string or as an iterable of chunks.
+
+    Yields:
+        Block dicts with code, language, context_before, context_after and source_type
+    """
+    parser = CodeBlockParser(context_chars=context_chars, max_block_chars=max_block_chars)
+    chunks = (
+        (html[i : i + feed_chars] for i in range(0, len(html), feed_chars))
+        if isinstance(html, str)
+        else html
+    )
+    for chunk in chunks:
+        parser.feed(chunk)
+        yield from parser.pop_blocks()
+    parser.close()
+    yield from parser.pop_blocks()
+
+
+def parse_html_code_blocks(
+    html: str,
+    context_chars: int = DEFAULT_CONTEXT_CHARS,
+    max_block_chars: int = DEFAULT_MAX_BLOCK_CHARS,
+) -> list[dict[str, Any]]:
+    """Extract all code blocks from an HTML page; picklable entry point for worker processes."""
+    return list(iter_html_code_blocks(html, context_chars, max_block_chars))
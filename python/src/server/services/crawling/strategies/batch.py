@@ -172,6 +172,7 @@ class BatchCrawlStrategy:
                         "url": original_url,
                         "markdown": result.markdown,
                         "html": result.html,  # Use raw HTML
+                        "etag": (result.response_headers or {}).get("etag"),
                     })
                 else:
                     logger.warning(
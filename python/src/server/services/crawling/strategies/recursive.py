@@ -190,7 +190,8 @@ class RecursiveCrawlStrategy:
                         results_all.append({
                             'url': original_url,
                             'markdown': result.markdown,
-                            'html': result.html  # Always use raw HTML for code extraction
+                            'html': result.html,  # Always use raw HTML for code extraction
+                            'etag': (result.response_headers or {}).get('etag')
                         })
                         depth_successful += 1
                         
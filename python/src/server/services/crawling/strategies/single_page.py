@@ -182,6 +182,7 @@ class SinglePageCrawlStrategy:
                     "url": original_url,  # Use original URL for tracking
                     "markdown": result.markdown,
                     "html": result.html,  # Use raw HTML instead of cleaned_html for code extraction
+                    "etag": (result.response_headers or {}).get("etag"),
                     "title": result.title or "Untitled",
                     "links": result.links,
                     "content_length": len(result.markdown)
@@ -254,7 +255,12 @@ class SinglePageCrawlStrategy:
                 # Report completion progress
                 await report_progress(end_progress, f"Text file crawled successfully: {original_url}")
                 
-                return [{'url': original_url, 'markdown': result.markdown, 'html': result.html}]
+                return [{
+                    'url': original_url,
+                    'markdown': result.markdown,
+                    'html': result.html,
+                    'etag': (result.response_headers or {}).get('etag')
+                }]
             else:
                 logger.error(f"Failed to crawl {url}: {result.error_message}")
                 return []
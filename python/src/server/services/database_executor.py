@@ -0,0 +1,153 @@
+"""
+Database Executor
+
+Non-blocking access to the synchronous supabase-py client for async code.
+
+Every ``.execute()`` on a Supabase query is a blocking HTTP round trip. Calling it
+directly inside ``async def`` freezes the event loop, and with it Socket.IO progress
+and every concurrent request. This module runs those calls on a dedicated, bounded
+thread pool so the loop stays responsive. It also caps how many queries are in flight
+against PostgREST at once and records per-operation timings.
+
+Usage:
+    response = await execute_query(client.table("archon_sources").select("*"), "list_sources")
+    success, result = await run_db(project_service.list_projects)
+"""
+
+import asyncio
+import functools
+import os
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, TypeVar
+
+from ..config.logfire_config import search_logger
+
+T = TypeVar("T")
+
+DEFAULT_MAX_WORKERS = 10
+DEFAULT_SLOW_QUERY_SECONDS = 1.0
+
+
+@dataclass
+class QueryStats:
+    """Aggregated timings for one kind of database operation"""
+
+    count: int = 0
+    errors: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+
+    def record(self, elapsed: float, failed: bool) -> None:
+        self.count += 1
+        self.errors += int(failed)
+        self.total_seconds += elapsed
+        self.max_seconds = max(self.max_seconds, elapsed)
+
+
+class DatabaseExecutor:
+    """Runs blocking Supabase calls on a bounded thread pool and times them."""
+
+    def __init__(
+        self,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        slow_query_seconds: float = DEFAULT_SLOW_QUERY_SECONDS,
+    ):
+        self.max_workers = max_workers
+        self.slow_query_seconds = slow_query_seconds
+        self._executor: ThreadPoolExecutor | None = None
+        self._stats: dict[str, QueryStats] = {}
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="supabase"
+            )
+        return self._executor
+
+    async def run(self, func: Callable[..., T], *args, operation: str | None = None, **kwargs) -> T:
+        """
+        Run a blocking database call without blocking the event loop.
+
+        Args:
+            func: Callable that performs one or more blocking database calls
+            *args: Positional arguments for func
+            operation: Label used for timing stats and slow-query logs
+            **kwargs: Keyword arguments for func
+
+        Returns:
+            Whatever func returns
+        """
+        operation = operation or getattr(func, "__qualname__", None) or "query"
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        failed = False
+        try:
+            return await loop.run_in_executor(
+                self._get_executor(), functools.partial(func, *args, **kwargs)
+            )
+        except Exception:
+            failed = True
+            raise
+        finally:
+            elapsed = time.perf_counter() - start
+            self._stats.setdefault(operation, QueryStats()).record(elapsed, failed)
+            if elapsed >= self.slow_query_seconds:
+                search_logger.warning(f"Slow database operation {operation}: {elapsed:.2f}s")
+
+    async def execute(self, query: Any, operation: str | None = None) -> Any:
+        """Execute a Supabase query or RPC builder off the event loop."""
+        return await self.run(query.execute, operation=operation or "execute")
+
+    def get_stats(self) -> dict[str, dict[str, float]]:
+        """Per-operation call counts, errors and latencies."""
+        return {
+            operation: {
+                "count": stats.count,
+                "errors": stats.errors,
+                "avg_seconds": stats.total_seconds / stats.count if stats.count else 0.0,
+                "max_seconds": stats.max_seconds,
+            }
+            for operation, stats in self._stats.items()
+        }
+
+    def shutdown(self) -> None:
+        """Stop the worker threads; a later call starts a fresh pool."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+# Global executor instance
+_database_executor: DatabaseExecutor | None = None
+
+
+def get_database_executor() -> DatabaseExecutor:
+    """Get the global database executor, sized from DB_MAX_CONCURRENT_QUERIES."""
+    global _database_executor
+    if _database_executor is None:
+        _database_executor = DatabaseExecutor(
+            max_workers=int(os.getenv("DB_MAX_CONCURRENT_QUERIES", str(DEFAULT_MAX_WORKERS))),
+            slow_query_seconds=float(
+                os.getenv("DB_SLOW_QUERY_SECONDS", str(DEFAULT_SLOW_QUERY_SECONDS))
+            ),
+        )
+    return _database_executor
+
+
+async def execute_query(query: Any, operation: str | None = None) -> Any:
+    """Execute a Supabase query builder on the shared database executor."""
+    return await get_database_executor().execute(query, operation)
+
+
+async def run_db(func: Callable[..., T], *args, **kwargs) -> T:
+    """Run a blocking function that talks to the database on the shared executor."""
+    return await get_database_executor().run(func, *args, **kwargs)
+
+
+def shutdown_database_executor() -> None:
+    """Stop the shared executor's worker threads on application shutdown."""
+    if _database_executor is not None:
+        _database_executor.shutdown()
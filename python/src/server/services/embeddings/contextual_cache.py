@@ -0,0 +1,116 @@
+"""
+Contextual Embedding Cache
+
+Persistent cache for the situating contexts generated by contextual embeddings.
+
+Entries are keyed on (chat model, SHA-256 of the document preview sent to the model,
+SHA-256 of the chunk) and stored in a local SQLite database next to the embedding
+cache. Re-crawling a source whose pages and chunks have not changed then needs no
+LLM calls at all for this stage. Entries expire after a TTL so prompt or model
+behaviour changes eventually take effect, and the cache is size-bounded with least
+recently used eviction.
+"""
+
+import asyncio
+import hashlib
+import json
+from pathlib import Path
+
+from .sqlite_cache import DEFAULT_CACHE_DIR, SQLiteLRUCache
+
+DEFAULT_MAX_SIZE_MB = 128
+DEFAULT_TTL_HOURS = 720
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def make_contextual_cache_key(model: str, document_preview: str, chunk: str) -> str:
+    """Build the cache key for a chunk's context."""
+    return f"{model}:{_sha256(document_preview)}:{_sha256(chunk)}"
+
+
+class ContextualCache(SQLiteLRUCache):
+    """SQLite-backed cache of generated chunk contexts with TTL and LRU eviction."""
+
+    table = "contextual_cache"
+    value_column = "context"
+    value_type = "TEXT"
+
+    def __init__(
+        self,
+        db_path: str | Path,
+        max_size_bytes: int = DEFAULT_MAX_SIZE_MB * 1024**2,
+        ttl_seconds: float = DEFAULT_TTL_HOURS * 3600,
+    ):
+        super().__init__(db_path, max_size_bytes, ttl_seconds)
+
+    def get_many(self, model: str, pairs: list[tuple[str, str]]) -> dict[int, str]:
+        """
+        Look up cached contexts.
+
+        Args:
+            model: Chat model that generates the contexts
+            pairs: (document preview, chunk) pairs to look up
+
+        Returns:
+            Mapping of index in ``pairs`` to the cached context, for unexpired hits only
+        """
+        return self._get([make_contextual_cache_key(model, preview, chunk) for preview, chunk in pairs])
+
+    def put_many(self, model: str, items: list[tuple[str, str, str]]) -> None:
+        """
+        Store generated contexts, evicting expired and least recently used entries if needed.
+
+        Args:
+            model: Chat model that generated the contexts
+            items: (document preview, chunk, context) triples to store
+        """
+        self._put({
+            make_contextual_cache_key(model, preview, chunk): context
+            for preview, chunk, context in items
+        })
+
+    async def aget_many(self, model: str, pairs: list[tuple[str, str]]) -> dict[int, str]:
+        """Async wrapper for get_many that keeps SQLite I/O off the event loop."""
+        return await asyncio.to_thread(self.get_many, model, pairs)
+
+    async def aput_many(self, model: str, items: list[tuple[str, str, str]]) -> None:
+        """Async wrapper for put_many that keeps SQLite I/O off the event loop."""
+        await asyncio.to_thread(self.put_many, model, items)
+
+
+# Global cache instance
+_contextual_cache: ContextualCache | None = None
+
+
+def get_contextual_cache(
+    max_size_mb: int | None = None, ttl_hours: float | None = None
+) -> ContextualCache:
+    """Get the global contextual cache instance, applying new limits if given."""
+    global _contextual_cache
+    if _contextual_cache is None:
+        _contextual_cache = ContextualCache(DEFAULT_CACHE_DIR / "contextual.sqlite3")
+    if max_size_mb is not None:
+        _contextual_cache.max_size_bytes = max_size_mb * 1024**2
+    if ttl_hours is not None:
+        _contextual_cache.ttl_seconds = ttl_hours * 3600
+    return _contextual_cache
+
+
+class CodeSummaryCache(ContextualCache):
+    """
+    Cache of generated code summaries, keyed like contexts on (chat model, hash of the
+    snippet's context, hash of its normalized code) and stored as JSON.
+    """
+
+    def get_many(self, model: str, pairs: list[tuple[str, str]]) -> dict[int, dict[str, str]]:
+        """Look up cached summaries for (context, code) pairs."""
+        return {i: json.loads(cached) for i, cached in super().get_many(model, pairs).items()}
+
+    def put_many(self, model: str, items: list[tuple[str, str, dict[str, str]]]) -> None:
+        """Store (context, code, summary) triples."""
+        super().put_many(
+            model, [(context, code, json.dumps(summary)) for context, code, summary in items]
+        )
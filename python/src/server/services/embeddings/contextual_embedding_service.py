@@ -5,6 +5,8 @@ Handles generation of contextual embeddings for improved RAG retrieval.
 Includes proper rate limiting for OpenAI API calls.
 """
 
+import asyncio
+import json
 import os
 
 import openai
@@ -12,6 +14,16 @@ import openai
 from ...config.logfire_config import search_logger
 from ..llm_provider_service import get_llm_client
 from ..threading_service import get_threading_service
+from .contextual_cache import ContextualCache, get_contextual_cache
+from .token_batching import count_tokens, count_tokens_batch, pack_token_batches
+
+# Tokens used by the instructions and system message around the chunk sections
+_PROMPT_OVERHEAD_TOKENS = 100
+# Attempts per batch request when the provider rate limits us
+_CONTEXT_MAX_ATTEMPTS = 3
+# Characters of the source document shown as context, for single and batch requests
+# alike so both paths share contextual cache entries
+_DOCUMENT_PREVIEW_CHARS = 5000
 
 
 async def generate_contextual_embedding(
@@ -46,15 +58,9 @@ async def generate_contextual_embedding(
 
     threading_service = get_threading_service()
 
-    # Estimate tokens: document preview (5000 chars ≈ 1250 tokens) + chunk + prompt
-    estimated_tokens = 1250 + len(chunk.split()) + 100  # Rough estimate
-
-    try:
-        # Use rate limiting before making the API call
-        async with threading_service.rate_limited_operation(estimated_tokens):
-            async with get_llm_client(provider=provider) as client:
-                prompt = f"""<document>
-{full_document[:5000]}
+    document_preview = full_document[:_DOCUMENT_PREVIEW_CHARS]
+    prompt = f"""<document>
+{document_preview}
 </document>
 Here is the chunk we want to situate within the whole document
 <chunk>
@@ -62,9 +68,28 @@ Here is the chunk we want to situate within the whole document
 </chunk>
 Please give a short succinct context to situate this chunk within the overall document for the purposes of improving search retrieval of the chunk. Answer only with the succinct context and nothing else."""
 
-                # Get model from provider configuration
-                model = await _get_model_choice(provider)
+    try:
+        # Get model from provider configuration
+        model = await _get_model_choice(provider)
+
+        # Reuse the context generated for this exact document preview and chunk
+        cache = await _load_contextual_cache()
+        if cache is not None:
+            try:
+                cached = await cache.aget_many(model, [(document_preview, chunk)])
+                if 0 in cached:
+                    return f"{cached[0]}\n---\n{chunk}", True
+            except Exception as e:
+                search_logger.warning(f"Contextual cache lookup failed: {e}, bypassing cache")
+                cache = None
+
+        # Charge the rate limiter with the exact prompt size plus the response budget
+        prompt_tokens = await asyncio.to_thread(count_tokens, prompt, model_choice)
+        estimated_tokens = prompt_tokens + _PROMPT_OVERHEAD_TOKENS + 200
 
+        # Use rate limiting before making the API call
+        async with threading_service.rate_limited_operation(estimated_tokens, "contextual_embeddings"):
+            async with get_llm_client(provider=provider) as client:
                 response = await client.chat.completions.create(
                     model=model,
                     messages=[
@@ -81,7 +106,13 @@ Please give a short succinct context to situate this chunk within the overall do
                 context = response.choices[0].message.content.strip()
                 contextual_text = f"{context}\n---\n{chunk}"
 
-                return contextual_text, True
+        if cache is not None and context:
+            try:
+                await cache.aput_many(model, [(document_preview, chunk, context)])
+            except Exception as e:
+                search_logger.warning(f"Failed to write context to cache: {e}")
+
+        return contextual_text, True
 
     except Exception as e:
         if "rate_limit_exceeded" in str(e) or "429" in str(e):
@@ -110,6 +141,25 @@ async def process_chunk_with_context(
     return await generate_contextual_embedding(full_document, content)
 
 
+async def _load_contextual_cache(rag_settings: dict | None = None) -> ContextualCache | None:
+    """Get the contextual cache if CONTEXTUAL_CACHE_ENABLED, loading RAG settings if not given."""
+    try:
+        if rag_settings is None:
+            from ..credential_service import credential_service
+
+            rag_settings = await credential_service.get_credentials_by_category("rag_strategy")
+
+        if str(rag_settings.get("CONTEXTUAL_CACHE_ENABLED", "false")).lower() != "true":
+            return None
+        return get_contextual_cache(
+            max_size_mb=int(rag_settings.get("CONTEXTUAL_CACHE_MAX_MB", "128")),
+            ttl_hours=float(rag_settings.get("CONTEXTUAL_CACHE_TTL_HOURS", "720")),
+        )
+    except Exception as e:
+        search_logger.warning(f"Contextual cache unavailable: {e}, bypassing cache")
+        return None
+
+
 async def _get_model_choice(provider: str | None = None) -> str:
     """Get model choice from credential service."""
     from ..credential_service import credential_service
@@ -127,10 +177,17 @@ async def generate_contextual_embeddings_batch(
     full_documents: list[str], chunks: list[str], provider: str = None
 ) -> list[tuple[str, bool]]:
     """
-    Generate contextual information for multiple chunks in a single API call to avoid rate limiting.
-
-    This processes ALL chunks passed to it in a single API call.
-    The caller should batch appropriately (e.g., 10 chunks at a time).
+    Generate contextual information for multiple chunks using batched API calls to avoid rate limiting.
+
+    Chunks whose document preview and content are unchanged since an earlier run are
+    served from the contextual cache when CONTEXTUAL_CACHE_ENABLED is set. The rest are
+    grouped by source document so each request carries the shared document
+    preview once, followed by an indexed list of that document's chunks. Groups are
+    split to stay within CONTEXTUAL_EMBEDDING_MAX_TOKENS prompt tokens as measured by
+    the local tokenizer, and every request is charged to the rate limiter with its
+    exact prompt size plus the response budget. The model answers with a JSON object
+    mapping chunk indexes to contexts. The caller should still batch appropriately
+    (e.g., 50 chunks at a time).
 
     Args:
         full_documents: List of complete document texts
@@ -143,76 +200,111 @@ async def generate_contextual_embeddings_batch(
         - Boolean indicating if contextual embedding was performed
     """
     try:
-        async with get_llm_client(provider=provider) as client:
-            # Get model choice from credential service (RAG setting)
-            model_choice = await _get_model_choice(provider)
+        from ..credential_service import credential_service
+
+        try:
+            rag_settings = await credential_service.get_credentials_by_category("rag_strategy")
+            max_prompt_tokens = int(rag_settings.get("CONTEXTUAL_EMBEDDING_MAX_TOKENS", "16000"))
+        except Exception as e:
+            search_logger.warning(f"Failed to load contextual embedding settings: {e}, using defaults")
+            rag_settings = {}
+            max_prompt_tokens = 16000
+
+        # Get model choice from credential service (RAG setting)
+        model_choice = await _get_model_choice(provider)
+
+        results: list[tuple[str, bool]] = [(chunk, False) for chunk in chunks]
+
+        # Each request carries its document's preview once, however many chunks it packs
+        doc_previews = [doc[:_DOCUMENT_PREVIEW_CHARS] for doc in full_documents[: len(chunks)]]
+
+        # Serve chunks whose document preview and content are unchanged from the cache
+        cache = await _load_contextual_cache(rag_settings)
+        cached: dict[int, str] = {}
+        if cache is not None:
+            try:
+                cached = await cache.aget_many(
+                    model_choice, list(zip(doc_previews, chunks, strict=False))
+                )
+            except Exception as e:
+                search_logger.warning(f"Contextual cache lookup failed: {e}, bypassing cache")
+                cache = None
+            for i, context in cached.items():
+                results[i] = (context + "\n\n" + chunks[i], True)
+            if cached:
+                search_logger.info(
+                    f"Contextual cache: {len(cached)} hits, {len(doc_previews) - len(cached)} misses"
+                )
 
-            # Build batch prompt for ALL chunks at once
-            batch_prompt = (
-                "Process the following chunks and provide contextual information for each:\\n\\n"
-            )
+        # Group the remaining chunk indexes by document preview, keeping first-seen order
+        groups: dict[str, list[int]] = {}
+        for i, preview in enumerate(doc_previews):
+            if i not in cached:
+                groups.setdefault(preview, []).append(i)
+        if not groups:
+            return results
 
-            for i, (doc, chunk) in enumerate(zip(full_documents, chunks, strict=False)):
-                # Use only 2000 chars of document context to save tokens
-                doc_preview = doc[:2000] if len(doc) > 2000 else doc
-                batch_prompt += f"CHUNK {i + 1}:\\n"
-                batch_prompt += f"<document_preview>\\n{doc_preview}\\n</document_preview>\\n"
-                batch_prompt += f"<chunk>\\n{chunk[:500]}\\n</chunk>\\n\\n"  # Limit chunk preview
-
-            batch_prompt += "For each chunk, provide a short succinct context to situate it within the overall document for improving search retrieval. Format your response as:\\nCHUNK 1: [context]\\nCHUNK 2: [context]\\netc."
-
-            # Make single API call for ALL chunks
-            response = await client.chat.completions.create(
-                model=model_choice,
-                messages=[
-                    {
-                        "role": "system",
-                        "content": "You are a helpful assistant that generates contextual information for document chunks.",
-                    },
-                    {"role": "user", "content": batch_prompt},
-                ],
-                temperature=0,
-                max_tokens=100 * len(chunks),  # Limit response size
+        previews = list(groups)
+        pending = [i for indexes in groups.values() for i in indexes]
+        items = {i: chunks[i][:500] for i in pending}  # Limit chunk preview
+        token_counts = await asyncio.to_thread(
+            count_tokens_batch, previews + [items[i] for i in pending], model_choice
+        )
+        preview_tokens = token_counts[: len(previews)]
+        item_tokens = dict(zip(pending, token_counts[len(previews) :], strict=True))
+
+        threading_service = get_threading_service()
+
+        # Requests for different documents are independent: send them concurrently and let
+        # the rate limiter pace them
+        requests: list[tuple[str, int, list[int]]] = []
+        for preview, doc_tokens in zip(previews, preview_tokens, strict=True):
+            indexes = groups[preview]
+            # Whatever the preview leaves of the budget goes to the chunk list
+            packed = pack_token_batches(
+                [item_tokens[i] for i in indexes], max(max_prompt_tokens - doc_tokens, 1)
             )
+            requests.extend((preview, doc_tokens, [indexes[p] for p in request]) for request in packed)
 
-            # Parse response
-            response_text = response.choices[0].message.content
-
-            # Extract contexts from response
-            lines = response_text.strip().split("\\n")
-            chunk_contexts = {}
-
-            for line in lines:
-                if line.strip().startswith("CHUNK"):
-                    parts = line.split(":", 1)
-                    if len(parts) == 2:
-                        chunk_num = int(parts[0].strip().split()[1]) - 1
-                        context = parts[1].strip()
-                        chunk_contexts[chunk_num] = context
-
-            # Build results
-            results = []
-            for i, chunk in enumerate(chunks):
-                if i in chunk_contexts:
+        async with get_llm_client(provider=provider) as client:
+
+            async def run_request(preview: str, doc_tokens: int, request_indexes: list[int]):
+                try:
+                    return await _generate_contexts_request(
+                        client,
+                        model_choice,
+                        preview,
+                        [items[i] for i in request_indexes],
+                        prompt_tokens=doc_tokens + sum(item_tokens[i] for i in request_indexes),
+                        threading_service=threading_service,
+                    )
+                except openai.RateLimitError as e:
+                    _log_rate_limit(e)
+                except Exception as e:
+                    search_logger.error(f"Error in contextual embedding request: {e}")
+                # Only this request's chunks fall back to their plain text
+                return {}
+
+            responses = await asyncio.gather(*(run_request(*request) for request in requests))
+
+        generated = []
+        for (preview, _, request_indexes), contexts in zip(requests, responses, strict=True):
+            for position, i in enumerate(request_indexes):
+                if position in contexts:
                     # Combine context with full chunk (not truncated)
-                    contextual_text = chunk_contexts[i] + "\\n\\n" + chunk
-                    results.append((contextual_text, True))
-                else:
-                    results.append((chunk, False))
+                    results[i] = (contexts[position] + "\n\n" + chunks[i], True)
+                    generated.append((preview, chunks[i], contexts[position]))
 
-            return results
+        if cache is not None and generated:
+            try:
+                await cache.aput_many(model_choice, generated)
+            except Exception as e:
+                search_logger.warning(f"Failed to write contexts to cache: {e}")
+
+        return results
 
     except openai.RateLimitError as e:
-        if "insufficient_quota" in str(e):
-            search_logger.warning(f"⚠️ QUOTA EXHAUSTED in contextual embeddings: {e}")
-            search_logger.warning(
-                "OpenAI quota exhausted - proceeding without contextual embeddings"
-            )
-        else:
-            search_logger.warning(f"Rate limit hit in contextual embeddings batch: {e}")
-            search_logger.warning(
-                "Rate limit hit - proceeding without contextual embeddings for this batch"
-            )
+        _log_rate_limit(e)
         # Return non-contextual for all chunks
         return [(chunk, False) for chunk in chunks]
 
@@ -220,3 +312,110 @@ async def generate_contextual_embeddings_batch(
         search_logger.error(f"Error in contextual embedding batch: {e}")
         # Return non-contextual for all chunks
         return [(chunk, False) for chunk in chunks]
+
+
+def _log_rate_limit(e: openai.RateLimitError) -> None:
+    if "insufficient_quota" in str(e):
+        search_logger.warning(f"⚠️ QUOTA EXHAUSTED in contextual embeddings: {e}")
+        search_logger.warning("OpenAI quota exhausted - proceeding without contextual embeddings")
+    else:
+        search_logger.warning(f"Rate limit hit in contextual embeddings batch: {e}")
+        search_logger.warning(
+            "Rate limit hit - proceeding without contextual embeddings for this batch"
+        )
+
+
+async def _generate_contexts_request(
+    client,
+    model_choice: str,
+    document_preview: str,
+    chunk_previews: list[str],
+    prompt_tokens: int,
+    threading_service,
+) -> dict[int, str]:
+    """
+    Send one contextual-embedding request for chunks of a single document.
+
+    Returns:
+        Mapping of position within ``chunk_previews`` to the generated context
+
+    Raises:
+        openai.RateLimitError: When the provider still throttles after all attempts
+    """
+    chunk_list = "".join(
+        f'<chunk index="{i + 1}">\n{chunk}\n</chunk>\n' for i, chunk in enumerate(chunk_previews)
+    )
+    batch_prompt = (
+        f"<document_preview>\n{document_preview}\n</document_preview>\n\n"
+        f"The following chunks all come from the document above:\n\n{chunk_list}\n"
+        "For each chunk, provide a short succinct context to situate it within the overall "
+        "document for improving search retrieval. Respond with only a JSON object mapping "
+        'each chunk index to its context, for example: {"1": "context", "2": "context"}'
+    )
+
+    max_tokens = 100 * len(chunk_previews)  # Limit response size
+
+    for attempt in range(1, _CONTEXT_MAX_ATTEMPTS + 1):
+        try:
+            # A 429 raised out of the block backs off every caller sharing the
+            # controller, so the next attempt waits there
+            async with threading_service.rate_limited_operation(
+                prompt_tokens + _PROMPT_OVERHEAD_TOKENS + max_tokens, "contextual_embeddings"
+            ):
+                response = await client.chat.completions.create(
+                    model=model_choice,
+                    messages=[
+                        {
+                            "role": "system",
+                            "content": "You are a helpful assistant that generates contextual information for document chunks. You always answer with valid JSON.",
+                        },
+                        {"role": "user", "content": batch_prompt},
+                    ],
+                    response_format={"type": "json_object"},
+                    temperature=0,
+                    max_tokens=max_tokens,
+                )
+            break
+        except openai.RateLimitError:
+            if attempt == _CONTEXT_MAX_ATTEMPTS:
+                raise
+            search_logger.warning(
+                f"Rate limit hit generating contexts, "
+                f"retry {attempt}/{_CONTEXT_MAX_ATTEMPTS - 1} after provider backoff"
+            )
+
+    return _parse_contexts(response.choices[0].message.content or "", len(chunk_previews))
+
+
+def _parse_contexts(response_text: str, count: int) -> dict[int, str]:
+    """
+    Parse a JSON contexts response into a mapping of chunk position to context.
+
+    Accepts the object wrapped in a markdown code fence or surrounded by stray text,
+    and ignores indexes outside ``1..count``. Chunks without a usable context are
+    left out so the caller falls back to the plain chunk.
+    """
+    start = response_text.find("{")
+    end = response_text.rfind("}")
+    if start == -1 or end < start:
+        search_logger.warning("Contextual embedding response contained no JSON object")
+        return {}
+
+    try:
+        parsed = json.loads(response_text[start : end + 1])
+    except json.JSONDecodeError as e:
+        search_logger.warning(f"Failed to parse contextual embedding response as JSON: {e}")
+        return {}
+
+    if not isinstance(parsed, dict):
+        return {}
+
+    contexts = {}
+    for key, value in parsed.items():
+        try:
+            position = int(key) - 1
+        except (TypeError, ValueError):
+            continue
+        if 0 <= position < count and isinstance(value, str) and value.strip():
+            contexts[position] = value.strip()
+    return contexts
@@ -0,0 +1,137 @@
+"""
+Embedding Micro-Batcher
+
+Coalesces concurrent single-text embedding requests into batched provider calls.
+
+Search paths embed one query at a time. Under burst load that turns into hundreds of
+one-item provider requests per second. The micro-batcher holds each request for a few
+milliseconds (or until enough requests have queued up), sends them as one batch, and
+fans the results back out to every waiting caller. Identical texts that are already
+queued or in flight share a single embedding.
+"""
+
+import asyncio
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from ...config.logfire_config import search_logger
+
+DEFAULT_MAX_WAIT_MS = 5.0
+DEFAULT_MAX_BATCH_SIZE = 64
+
+BatchFunction = Callable[..., Awaitable[Any]]
+
+
+class EmbeddingMicroBatcher:
+    """Collects concurrent embedding requests and flushes them as batches."""
+
+    def __init__(
+        self,
+        batch_fn: BatchFunction,
+        max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+    ):
+        """
+        Initialize the micro-batcher.
+
+        Args:
+            batch_fn: Async function with the create_embeddings_batch signature
+            max_wait_ms: Maximum time a request waits for others to join its batch
+            max_batch_size: Flush immediately once this many texts are queued
+        """
+        self.batch_fn = batch_fn
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch_size = max_batch_size
+
+        # Queued texts per provider, waiting for the next flush
+        self._queues: dict[str | None, list[str]] = {}
+        self._flush_handles: dict[str | None, asyncio.TimerHandle] = {}
+        # Futures for texts that are queued or in flight, used to coalesce duplicates
+        self._futures: dict[tuple[str | None, str], asyncio.Future] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    async def submit(self, text: str, provider: str | None = None) -> Any:
+        """
+        Request an embedding for a single text.
+
+        Returns:
+            A single-item batch result from ``batch_fn`` for this text
+        """
+        key = (provider, text)
+        future = self._futures.get(key)
+
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._futures[key] = future
+
+            queue = self._queues.setdefault(provider, [])
+            queue.append(text)
+
+            if len(queue) >= self.max_batch_size:
+                self._flush(provider)
+            elif provider not in self._flush_handles:
+                self._flush_handles[provider] = loop.call_later(
+                    self.max_wait, self._flush, provider
+                )
+
+        # Shield so one cancelled caller doesn't cancel the result for the others
+        return await asyncio.shield(future)
+
+    def _flush(self, provider: str | None) -> None:
+        handle = self._flush_handles.pop(provider, None)
+        if handle is not None:
+            handle.cancel()
+
+        texts = self._queues.pop(provider, [])
+        if not texts:
+            return
+
+        task = asyncio.get_running_loop().create_task(self._run_batch(provider, texts))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, provider: str | None, texts: list[str]) -> None:
+        try:
+            result = await self.batch_fn(texts, provider=provider)
+            per_text = self._split_result(result, texts)
+            for text in texts:
+                future = self._futures.pop((provider, text), None)
+                if future is not None and not future.done():
+                    future.set_result(per_text[text])
+        except Exception as e:
+            search_logger.error(f"Embedding micro-batch of {len(texts)} texts failed: {e}")
+            for text in texts:
+                future = self._futures.pop((provider, text), None)
+                if future is not None and not future.done():
+                    future.set_exception(e)
+
+    @staticmethod
+    def _split_result(result: Any, texts: list[str]) -> dict[str, Any]:
+        """Split a batch result into one single-item result per text."""
+        result_type = type(result)
+        embeddings = dict(zip(result.texts_processed, result.embeddings, strict=False))
+
+        # Failures are reported in input order, skipping texts that succeeded
+        failed_items = iter(result.failed_items)
+
+        per_text = {}
+        for text in texts:
+            single = result_type()
+            if text in embeddings:
+                single.add_success(embeddings[text], text)
+            else:
+                failure = next(failed_items, None)
+                if failure is not None:
+                    single.failed_items.append(failure)
+                    single.failure_count += 1
+            per_text[text] = single
+        return per_text
+
+    def stats(self) -> dict[str, int]:
+        """Current queue and in-flight counts."""
+        return {
+            "queued": sum(len(queue) for queue in self._queues.values()),
+            "pending_futures": len(self._futures),
+            "running_batches": len(self._tasks),
+        }
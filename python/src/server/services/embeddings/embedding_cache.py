@@ -0,0 +1,109 @@
+"""
+Embedding Cache
+
+Persistent, content-addressed cache for embedding vectors.
+
+Entries are keyed on (embedding provider, model, dimensions, SHA-256 of the text) and
+stored as float32 blobs in a local SQLite database. The cache is size-bounded and
+evicts the least recently used entries once it grows past its configured limit, so
+it can be left enabled across re-crawls without growing unbounded.
+"""
+
+import asyncio
+import hashlib
+from collections.abc import Sequence
+from pathlib import Path
+
+import numpy as np
+
+from .sqlite_cache import DEFAULT_CACHE_DIR, SQLiteLRUCache
+
+DEFAULT_MAX_SIZE_MB = 512
+
+
+def make_cache_key(provider: str, model: str, dimensions: int, text: str) -> str:
+    """Build the content-addressed key for an embedding."""
+    text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return f"{provider}:{model}:{dimensions}:{text_hash}"
+
+
+class EmbeddingCache(SQLiteLRUCache):
+    """SQLite-backed embedding cache with size-bounded LRU eviction."""
+
+    table = "embedding_cache"
+    value_column = "embedding"
+    value_type = "BLOB"
+
+    def __init__(self, db_path: str | Path, max_size_bytes: int = DEFAULT_MAX_SIZE_MB * 1024**2):
+        super().__init__(db_path, max_size_bytes)
+
+    def get_many(
+        self, provider: str, model: str, dimensions: int, texts: list[str]
+    ) -> dict[int, np.ndarray]:
+        """
+        Look up cached embeddings.
+
+        Args:
+            provider: Embedding provider name
+            model: Embedding model name
+            dimensions: Embedding dimensions
+            texts: Texts to look up
+
+        Returns:
+            Mapping of index in ``texts`` to the cached float32 embedding, for hits only
+        """
+        hits = self._get([make_cache_key(provider, model, dimensions, text) for text in texts])
+        return {i: np.frombuffer(blob, dtype=np.float32) for i, blob in hits.items()}
+
+    def put_many(
+        self,
+        provider: str,
+        model: str,
+        dimensions: int,
+        items: list[tuple[str, Sequence[float] | np.ndarray]],
+    ) -> None:
+        """
+        Store embeddings in the cache, evicting least recently used entries if needed.
+
+        Args:
+            provider: Embedding provider name
+            model: Embedding model name
+            dimensions: Embedding dimensions
+            items: (text, embedding) pairs to store
+        """
+        self._put({
+            make_cache_key(provider, model, dimensions, text): (
+                np.asarray(embedding, dtype=np.float32).tobytes()
+            )
+            for text, embedding in items
+        })
+
+    async def aget_many(
+        self, provider: str, model: str, dimensions: int, texts: list[str]
+    ) -> dict[int, np.ndarray]:
+        """Async wrapper for get_many that keeps SQLite I/O off the event loop."""
+        return await asyncio.to_thread(self.get_many, provider, model, dimensions, texts)
+
+    async def aput_many(
+        self,
+        provider: str,
+        model: str,
+        dimensions: int,
+        items: list[tuple[str, Sequence[float] | np.ndarray]],
+    ) -> None:
+        """Async wrapper for put_many that keeps SQLite I/O off the event loop."""
+        await asyncio.to_thread(self.put_many, provider, model, dimensions, items)
+
+
+# Global cache instance
+_embedding_cache: EmbeddingCache | None = None
+
+
+def get_embedding_cache(max_size_mb: int | None = None) -> EmbeddingCache:
+    """Get the global embedding cache instance, resizing it if a new limit is given."""
+    global _embedding_cache
+    if _embedding_cache is None:
+        _embedding_cache = EmbeddingCache(DEFAULT_CACHE_DIR / "embeddings.sqlite3")
+    if max_size_mb is not None:
+        _embedding_cache.max_size_bytes = max_size_mb * 1024**2
+    return _embedding_cache
@@ -6,36 +6,58 @@ Handles all OpenAI embedding operations with proper rate limiting and error hand
 
 import asyncio
 import os
+from collections.abc import Sequence
+from contextlib import asynccontextmanager, nullcontext
 from dataclasses import dataclass, field
 from typing import Any
 
+import numpy as np
 import openai
 
 from ...config.logfire_config import safe_span, search_logger
 from ..credential_service import credential_service
 from ..llm_provider_service import get_embedding_model, get_llm_client
 from ..threading_service import get_threading_service
+from .embedding_batcher import EmbeddingMicroBatcher
+from .embedding_cache import get_embedding_cache
 from .embedding_exceptions import (
     EmbeddingAPIError,
     EmbeddingError,
     EmbeddingQuotaExhaustedError,
     EmbeddingRateLimitError,
 )
+from .local_embedding_provider import (
+    DEFAULT_LOCAL_EMBEDDING_MODEL,
+    LOCAL_PROVIDER_NAME,
+    get_local_embedding_provider,
+)
+from .token_batching import count_tokens_batch, pack_token_batches
 
 
 @dataclass
 class EmbeddingBatchResult:
-    """Result of batch embedding creation with success/failure tracking."""
+    """
+    Result of batch embedding creation with success/failure tracking.
+
+    Embeddings are held as contiguous float32 NumPy vectors rather than lists of
+    Python floats (~6KB instead of ~50KB per 1536-dim vector). Convert with
+    ``.tolist()`` only when serializing, e.g. for a database insert.
+    """
 
-    embeddings: list[list[float]] = field(default_factory=list)
+    embeddings: list[np.ndarray] = field(default_factory=list)
     failed_items: list[dict[str, Any]] = field(default_factory=list)
     success_count: int = 0
     failure_count: int = 0
     texts_processed: list[str] = field(default_factory=list)  # Successfully processed texts
-
-    def add_success(self, embedding: list[float], text: str):
-        """Add a successful embedding."""
-        self.embeddings.append(embedding)
+    # Input index of each successfully processed text, so duplicates map back unambiguously
+    indices_processed: list[int] = field(default_factory=list)
+
+    def add_success(
+        self, embedding: Sequence[float] | np.ndarray, text: str, index: int | None = None
+    ):
+        """Add a successful embedding for the input text at ``index`` (default: next position)."""
+        self.indices_processed.append(self.total_requested if index is None else index)
+        self.embeddings.append(np.asarray(embedding, dtype=np.float32))
         self.texts_processed.append(text)
         self.success_count += 1
 
@@ -63,15 +85,88 @@ class EmbeddingBatchResult:
     def total_requested(self) -> int:
         return self.success_count + self.failure_count
 
+    def embeddings_array(self) -> np.ndarray:
+        """All successful embeddings stacked into one (n, dimensions) float32 array."""
+        if not self.embeddings:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.vstack(self.embeddings)
+
 
 # Provider-aware client factory
 get_openai_client = get_llm_client
 
+@asynccontextmanager
+async def _get_embedding_client(
+    provider: str | None, use_local: bool, rag_settings: dict[str, Any]
+):
+    """Yield the local embedding provider or a remote OpenAI-compatible client."""
+    if use_local:
+        yield get_local_embedding_provider(
+            model_name=rag_settings.get("LOCAL_EMBEDDING_MODEL") or DEFAULT_LOCAL_EMBEDDING_MODEL,
+            workers=int(rag_settings.get("LOCAL_EMBEDDING_WORKERS") or 0) or None,
+            backend=rag_settings.get("LOCAL_EMBEDDING_BACKEND") or "torch",
+        )
+    else:
+        async with get_llm_client(provider=provider, use_embedding_provider=True) as client:
+            yield client
+
+
+def _embedding_provider_name(provider: str | None, rag_settings: dict[str, Any]) -> str:
+    """Name of the provider that embeds: an override, the local provider or the LLM provider."""
+    if provider:
+        return provider
+    if rag_settings.get("EMBEDDING_PROVIDER") == LOCAL_PROVIDER_NAME:
+        return LOCAL_PROVIDER_NAME
+    return rag_settings.get("LLM_PROVIDER") or "openai"
+
+
+async def get_embedding_signature(provider: str | None = None) -> str:
+    """
+    Describe the embedding space new vectors are created in.
+
+    The signature names the provider, model and dimensions, so stored vectors can be
+    told apart from ones a different embedding configuration would produce.
+    """
+    try:
+        rag_settings = await credential_service.get_credentials_by_category("rag_strategy")
+    except Exception as e:
+        search_logger.warning(f"Failed to load embedding settings: {e}, using defaults")
+        rag_settings = {}
+
+    provider_name = _embedding_provider_name(provider, rag_settings)
+    if provider_name == LOCAL_PROVIDER_NAME:
+        model = rag_settings.get("LOCAL_EMBEDDING_MODEL") or DEFAULT_LOCAL_EMBEDDING_MODEL
+    else:
+        model = await get_embedding_model(provider=provider)
+    dimensions = rag_settings.get("EMBEDDING_DIMENSIONS", "1536")
+    return f"{provider_name}:{model}:{dimensions}"
+
+
+# Micro-batcher for single-text embeddings, bound to the event loop it was created on
+_embedding_batcher: EmbeddingMicroBatcher | None = None
+_embedding_batcher_loop: asyncio.AbstractEventLoop | None = None
+
+
+def get_embedding_batcher() -> EmbeddingMicroBatcher:
+    """Get the micro-batcher used by create_embedding for the running event loop."""
+    global _embedding_batcher, _embedding_batcher_loop
+    loop = asyncio.get_running_loop()
+    if _embedding_batcher is None or _embedding_batcher_loop is not loop:
+        # Resolve create_embeddings_batch at call time so it can be patched
+        _embedding_batcher = EmbeddingMicroBatcher(
+            lambda texts, provider=None: create_embeddings_batch(texts, provider=provider)
+        )
+        _embedding_batcher_loop = loop
+    return _embedding_batcher
+
 
 async def create_embedding(text: str, provider: str | None = None) -> list[float]:
     """
     Create an embedding for a single text using the configured provider.
 
+    Concurrent calls are coalesced by the embedding micro-batcher into a single
+    provider request, and identical texts already in flight share one result.
+
     Args:
         text: Text to create an embedding for
         provider: Optional provider override
@@ -85,7 +180,7 @@ async def create_embedding(text: str, provider: str | None = None) -> list[float
         EmbeddingAPIError: For other API errors
     """
     try:
-        result = await create_embeddings_batch([text], provider=provider)
+        result = await get_embedding_batcher().submit(text, provider=provider)
         if not result.embeddings:
             # Check if there were failures
             if result.has_failures and result.failed_items:
@@ -106,7 +201,7 @@ async def create_embedding(text: str, provider: str | None = None) -> list[float
                 raise EmbeddingAPIError(
                     "No embeddings returned from batch creation", text_preview=text
                 )
-        return result.embeddings[0]
+        return result.embeddings[0].tolist()
     except EmbeddingError:
         # Re-raise our custom exceptions
         raise
@@ -142,6 +237,14 @@ async def create_embeddings_batch(
     "skip, don't corrupt" principle - failed items are tracked but not stored
     with zero embeddings.
 
+    Batches are packed up to EMBEDDING_MAX_TOKENS_PER_REQUEST tokens (and at most
+    EMBEDDING_BATCH_SIZE texts) using a local tokenizer, and the exact token count
+    is charged to the rate limiter.
+
+    Up to EMBEDDING_MAX_CONCURRENT_BATCHES batches are kept in flight at once,
+    each still going through the threading service rate limiter. Results are
+    returned in the same order as the input texts.
+
     Args:
         texts: List of texts to create embeddings for
         websocket: Optional WebSocket for progress updates
@@ -174,55 +277,189 @@ async def create_embeddings_batch(
 
     texts = validated_texts
 
-    result = EmbeddingBatchResult()
     threading_service = get_threading_service()
 
+    # Outcomes are keyed by input index so the result keeps the caller's order
+    # even when batches complete out of order
+    successes: dict[int, np.ndarray] = {}
+    failures: dict[int, tuple[Exception, int | None]] = {}
+
+    def build_result() -> EmbeddingBatchResult:
+        result = EmbeddingBatchResult()
+        for idx, text in enumerate(texts):
+            if idx in successes:
+                result.add_success(successes[idx], text, idx)
+            elif idx in failures:
+                error, batch_index = failures[idx]
+                result.add_failure(text, error, batch_index)
+        return result
+
     with safe_span(
         "create_embeddings_batch", text_count=len(texts), total_chars=sum(len(t) for t in texts)
     ) as span:
         try:
-            async with get_llm_client(provider=provider, use_embedding_provider=True) as client:
-                # Load batch size and dimensions from settings
-                try:
-                    rag_settings = await credential_service.get_credentials_by_category(
-                        "rag_strategy"
-                    )
-                    batch_size = int(rag_settings.get("EMBEDDING_BATCH_SIZE", "100"))
-                    embedding_dimensions = int(rag_settings.get("EMBEDDING_DIMENSIONS", "1536"))
-                except Exception as e:
-                    search_logger.warning(f"Failed to load embedding settings: {e}, using defaults")
-                    batch_size = 100
-                    embedding_dimensions = 1536
+            # Load batch size and dimensions from settings
+            try:
+                rag_settings = await credential_service.get_credentials_by_category(
+                    "rag_strategy"
+                )
+                batch_size = int(rag_settings.get("EMBEDDING_BATCH_SIZE", "100"))
+                max_batch_tokens = int(
+                    rag_settings.get("EMBEDDING_MAX_TOKENS_PER_REQUEST", "50000")
+                )
+                embedding_dimensions = int(rag_settings.get("EMBEDDING_DIMENSIONS", "1536"))
+                max_concurrent_batches = int(
+                    rag_settings.get("EMBEDDING_MAX_CONCURRENT_BATCHES", "3")
+                )
+                use_cache = rag_settings.get("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+                cache_max_mb = int(rag_settings.get("EMBEDDING_CACHE_MAX_MB", "512"))
+            except Exception as e:
+                search_logger.warning(f"Failed to load embedding settings: {e}, using defaults")
+                batch_size = 100
+                max_batch_tokens = 50000
+                embedding_dimensions = 1536
+                max_concurrent_batches = 3
+                use_cache = True
+                cache_max_mb = 512
+                rag_settings = {}
+
+            provider_name = _embedding_provider_name(provider, rag_settings)
+            use_local = provider_name == LOCAL_PROVIDER_NAME
+
+            async with _get_embedding_client(provider, use_local, rag_settings) as client:
+                if use_local:
+                    # Local inference isn't token-metered; let every worker stay busy
+                    embedding_model = client.model_name
+                    max_concurrent_batches = max(max_concurrent_batches, client.workers)
+                else:
+                    embedding_model = await get_embedding_model(provider=provider)
+                pending = list(range(len(texts)))
 
+                # Serve unchanged texts from the persistent cache and only send misses
+                cache = None
+                if use_cache:
+                    try:
+                        cache = get_embedding_cache(cache_max_mb)
+                        cached = await cache.aget_many(
+                            provider_name, embedding_model, embedding_dimensions, texts
+                        )
+                    except Exception as e:
+                        search_logger.warning(f"Embedding cache lookup failed: {e}, bypassing cache")
+                        cache = None
+                        cached = {}
+
+                    if cached:
+                        successes.update(cached)
+                        pending = [idx for idx in pending if idx not in cached]
+                        span.set_attribute("cache_hits", len(cached))
+                        search_logger.info(
+                            f"Embedding cache: {len(cached)} hits, {len(pending)} misses"
+                        )
+
+                # Pack requests up to the token budget (and at most batch_size items)
+                # using real token counts from the local tokenizer
+                token_counts = await asyncio.to_thread(
+                    count_tokens_batch, [texts[idx] for idx in pending], embedding_model
+                )
+                tokens_by_index = dict(zip(pending, token_counts, strict=True))
+                batches = [
+                    [pending[position] for position in positions]
+                    for positions in pack_token_batches(token_counts, max_batch_tokens, batch_size)
+                ]
+                # Bounded in-flight window - batch N+1 is sent while batch N is awaited
+                window = asyncio.Semaphore(max(1, max_concurrent_batches))
+                quota_exhausted = asyncio.Event()
                 total_tokens_used = 0
 
-                for i in range(0, len(texts), batch_size):
-                    batch = texts[i : i + batch_size]
-                    batch_index = i // batch_size
+                async def report_progress():
+                    processed = len(successes) + len(failures)
 
-                    try:
-                        # Estimate tokens for this batch
-                        batch_tokens = sum(len(text.split()) for text in batch) * 1.3
-                        total_tokens_used += batch_tokens
+                    if progress_callback:
+                        progress = (processed / len(texts)) * 100
+
+                        message = f"Processed {processed}/{len(texts)} texts"
+                        if failures:
+                            message += f" ({len(failures)} failed)"
+
+                        await progress_callback(message, progress)
+
+                    # WebSocket update
+                    if websocket:
+                        ws_progress = (processed / len(texts)) * 100
+                        await websocket.send_json({
+                            "type": "embedding_progress",
+                            "processed": processed,
+                            "successful": len(successes),
+                            "failed": len(failures),
+                            "total": len(texts),
+                            "percentage": ws_progress,
+                        })
+
+                async def embed_batch(batch_index: int, indices: list[int]):
+                    nonlocal total_tokens_used
+                    batch = [texts[idx] for idx in indices]
+
+                    async with window:
+                        try:
+                            if quota_exhausted.is_set():
+                                # Another batch exhausted the quota - don't bother the provider
+                                raise EmbeddingQuotaExhaustedError(
+                                    "OpenAI quota exhausted", tokens_used=total_tokens_used
+                                )
+
+                            batch_tokens = sum(tokens_by_index[idx] for idx in indices)
+                            total_tokens_used += batch_tokens
 
-                        # Rate limit each batch
-                        async with threading_service.rate_limited_operation(batch_tokens):
                             retry_count = 0
                             max_retries = 3
 
                             while retry_count < max_retries:
+                                # Rate limit each attempt (local inference has no provider limits).
+                                # A 429 raised out of the block backs off every caller sharing
+                                # the adaptive concurrency controller, so a retry waits there.
+                                rate_limit = (
+                                    nullcontext()
+                                    if use_local
+                                    else threading_service.rate_limited_operation(batch_tokens, "embeddings")
+                                )
                                 try:
-                                    # Create embeddings for this batch
-                                    embedding_model = await get_embedding_model(provider=provider)
-                                    response = await client.embeddings.create(
-                                        model=embedding_model,
-                                        input=batch,
-                                        dimensions=embedding_dimensions,
+                                    async with rate_limit:
+                                        # Create embeddings for this batch
+                                        response = await client.embeddings.create(
+                                            model=embedding_model,
+                                            input=batch,
+                                            dimensions=embedding_dimensions,
+                                        )
+                                    # One contiguous float32 matrix per response; rows are views
+                                    embeddings = np.asarray(
+                                        [item.embedding for item in response.data],
+                                        dtype=np.float32,
                                     )
 
                                     # Add successful embeddings
-                                    for text, item in zip(batch, response.data, strict=False):
-                                        result.add_success(item.embedding, text)
+                                    for idx, embedding in zip(indices, embeddings, strict=False):
+                                        successes[idx] = embedding
+
+                                    for idx in indices[len(embeddings) :]:
+                                        failures[idx] = (
+                                            EmbeddingAPIError(
+                                                "Provider returned fewer embeddings than requested"
+                                            ),
+                                            batch_index,
+                                        )
+
+                                    if cache is not None:
+                                        try:
+                                            await cache.aput_many(
+                                                provider_name,
+                                                embedding_model,
+                                                embedding_dimensions,
+                                                list(zip(batch, embeddings, strict=False)),
+                                            )
+                                        except Exception as e:
+                                            search_logger.warning(
+                                                f"Failed to write embeddings to cache: {e}"
+                                            )
 
                                     break  # Success, exit retry loop
 
@@ -230,91 +467,61 @@ async def create_embeddings_batch(
                                     error_message = str(e)
                                     if "insufficient_quota" in error_message:
                                         # Quota exhausted is critical - stop everything
+                                        quota_exhausted.set()
                                         tokens_so_far = total_tokens_used - batch_tokens
-                                        cost_so_far = (tokens_so_far / 1_000_000) * 0.02
 
                                         search_logger.error(
                                             f"⚠️ QUOTA EXHAUSTED at batch {batch_index}! "
-                                            f"Processed {result.success_count} texts successfully.",
+                                            f"Processed {len(successes)} texts successfully.",
                                             exc_info=True,
                                         )
-
-                                        # Add remaining texts as failures
-                                        for text in texts[i:]:
-                                            result.add_failure(
-                                                text,
-                                                EmbeddingQuotaExhaustedError(
-                                                    "OpenAI quota exhausted",
-                                                    tokens_used=tokens_so_far,
-                                                ),
-                                                batch_index,
-                                            )
-
-                                        # Return what we have so far
-                                        span.set_attribute("quota_exhausted", True)
-                                        span.set_attribute("partial_success", True)
-                                        return result
-
+                                        raise EmbeddingQuotaExhaustedError(
+                                            "OpenAI quota exhausted", tokens_used=tokens_so_far
+                                        ) from e
+
+                                    # Regular rate limit - retry once the shared backoff has passed
+                                    retry_count += 1
+                                    if retry_count < max_retries:
+                                        search_logger.warning(
+                                            f"Rate limit hit for batch {batch_index}, "
+                                            f"retry {retry_count}/{max_retries} after provider backoff"
+                                        )
                                     else:
-                                        # Regular rate limit - retry
-                                        retry_count += 1
-                                        if retry_count < max_retries:
-                                            wait_time = 2**retry_count
-                                            search_logger.warning(
-                                                f"Rate limit hit for batch {batch_index}, "
-                                                f"waiting {wait_time}s before retry {retry_count}/{max_retries}"
-                                            )
-                                            await asyncio.sleep(wait_time)
-                                        else:
-                                            raise  # Will be caught by outer try
+                                        raise  # Will be caught by outer try
 
-                    except Exception as e:
-                        # This batch failed - track failures but continue with next batch
-                        search_logger.error(f"Batch {batch_index} failed: {e}", exc_info=True)
+                        except Exception as e:
+                            # This batch failed - track failures but continue with other batches
+                            if not isinstance(e, EmbeddingQuotaExhaustedError):
+                                search_logger.error(
+                                    f"Batch {batch_index} failed: {e}", exc_info=True
+                                )
 
-                        for text in batch:
                             if isinstance(e, EmbeddingError):
-                                result.add_failure(text, e, batch_index)
+                                error = e
                             else:
-                                result.add_failure(
-                                    text,
-                                    EmbeddingAPIError(
-                                        f"Failed to create embedding: {str(e)}", original_error=e
-                                    ),
-                                    batch_index,
+                                error = EmbeddingAPIError(
+                                    f"Failed to create embedding: {str(e)}", original_error=e
                                 )
+                            for idx in indices:
+                                failures[idx] = (error, batch_index)
 
-                    # Progress reporting
-                    if progress_callback:
-                        processed = result.success_count + result.failure_count
-                        progress = (processed / len(texts)) * 100
+                    await report_progress()
 
-                        message = f"Processed {processed}/{len(texts)} texts"
-                        if result.has_failures:
-                            message += f" ({result.failure_count} failed)"
+                await asyncio.gather(*(
+                    embed_batch(batch_index, indices) for batch_index, indices in enumerate(batches)
+                ))
 
-                        await progress_callback(message, progress)
+                result = build_result()
 
-                    # WebSocket update
-                    if websocket:
-                        processed = result.success_count + result.failure_count
-                        ws_progress = (processed / len(texts)) * 100
-                        await websocket.send_json({
-                            "type": "embedding_progress",
-                            "processed": processed,
-                            "successful": result.success_count,
-                            "failed": result.failure_count,
-                            "total": len(texts),
-                            "percentage": ws_progress,
-                        })
-
-                    # Yield control
-                    await asyncio.sleep(0.01)
+                if quota_exhausted.is_set():
+                    span.set_attribute("quota_exhausted", True)
+                    span.set_attribute("partial_success", result.success_count > 0)
 
                 span.set_attribute("embeddings_created", result.success_count)
                 span.set_attribute("embeddings_failed", result.failure_count)
                 span.set_attribute("success", not result.has_failures)
                 span.set_attribute("total_tokens_used", total_tokens_used)
+                span.set_attribute("max_concurrent_batches", max_concurrent_batches)
 
                 return result
 
@@ -324,13 +531,14 @@ async def create_embeddings_batch(
             search_logger.error(f"Catastrophic failure in batch embedding: {e}", exc_info=True)
 
             # Mark remaining texts as failed
-            processed_count = result.success_count + result.failure_count
-            for text in texts[processed_count:]:
-                result.add_failure(
-                    text, EmbeddingAPIError(f"Catastrophic failure: {str(e)}", original_error=e)
-                )
+            for idx in range(len(texts)):
+                if idx not in successes and idx not in failures:
+                    failures[idx] = (
+                        EmbeddingAPIError(f"Catastrophic failure: {str(e)}", original_error=e),
+                        None,
+                    )
 
-            return result
+            return build_result()
 
 
 # Deprecated functions - kept for backward compatibility
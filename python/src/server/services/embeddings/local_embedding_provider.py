@@ -0,0 +1,223 @@
+"""
+Local Embedding Provider
+
+Runs sentence-transformers embedding models on CPU in a process pool, for offline
+deployments and for bulk re-indexing without per-token cost.
+
+Each worker process loads the model once and encodes whole batches, so the event loop
+never blocks on inference and all cores are used. The provider exposes the small part
+of the OpenAI client interface that create_embeddings_batch relies on
+(``client.embeddings.create(...).data[i].embedding``), so selecting it with
+EMBEDDING_PROVIDER=local keeps caching, batching and EmbeddingBatchResult failure
+tracking unchanged.
+"""
+
+import asyncio
+import importlib.util
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+
+from ...config.logfire_config import search_logger
+
+LOCAL_PROVIDER_NAME = "local"
+DEFAULT_LOCAL_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+SENTENCE_TRANSFORMERS_AVAILABLE = importlib.util.find_spec("sentence_transformers") is not None
+
+
+def _require_sentence_transformers() -> None:
+    """Raise a setup error if the optional sentence-transformers dependency is missing."""
+    if not SENTENCE_TRANSFORMERS_AVAILABLE:
+        raise RuntimeError(
+            f"EMBEDDING_PROVIDER={LOCAL_PROVIDER_NAME} requires sentence-transformers, which is "
+            "not installed. Build the server image with "
+            "--build-arg INSTALL_LOCAL_EMBEDDINGS=true, or install the extra with: "
+            "pip install 'archon[local-embeddings]'"
+        )
+
+# Model loaded once per worker process by _init_worker
+_worker_model: Any = None
+
+
+def _init_worker(model_name: str, backend: str) -> None:
+    """Load the model in a worker process."""
+    global _worker_model
+
+    # One inference thread per process - parallelism comes from the pool
+    os.environ.setdefault("OMP_NUM_THREADS", "1")
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+    from sentence_transformers import SentenceTransformer
+
+    if backend == "torch":
+        import torch
+
+        torch.set_num_threads(1)
+        _worker_model = SentenceTransformer(model_name, device="cpu")
+    else:
+        _worker_model = SentenceTransformer(model_name, device="cpu", backend=backend)
+
+
+def _encode_batch(texts: list[str], batch_size: int) -> np.ndarray:
+    """Encode a batch of texts in a worker process into a (n, dim) float32 array."""
+    vectors = _worker_model.encode(
+        texts,
+        batch_size=batch_size,
+        convert_to_numpy=True,
+        normalize_embeddings=True,
+        show_progress_bar=False,
+    )
+    return vectors.astype(np.float32, copy=False)
+
+
+@dataclass
+class _EmbeddingItem:
+    embedding: np.ndarray
+
+
+@dataclass
+class _EmbeddingResponse:
+    data: list[_EmbeddingItem]
+
+
+class LocalEmbeddings:
+    """OpenAI-style ``embeddings`` namespace backed by the local process pool."""
+
+    def __init__(self, provider: "LocalEmbeddingProvider"):
+        self._provider = provider
+
+    async def create(
+        self, model: str, input: list[str], dimensions: int | None = None, **kwargs
+    ) -> _EmbeddingResponse:
+        vectors = await self._provider.embed(input, dimensions)
+        return _EmbeddingResponse(data=[_EmbeddingItem(embedding=v) for v in vectors])
+
+
+class LocalEmbeddingProvider:
+    """CPU embedding provider running a sentence-transformers model in a process pool."""
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_LOCAL_EMBEDDING_MODEL,
+        workers: int | None = None,
+        backend: str = "torch",
+        encode_batch_size: int = 32,
+    ):
+        """
+        Initialize the provider. Worker processes are started lazily on first use.
+
+        Args:
+            model_name: sentence-transformers model name or local path
+            workers: Number of worker processes (defaults to the number of cores)
+            backend: Inference backend - "torch" or "onnx"
+            encode_batch_size: Batch size used inside each worker for inference
+        """
+        self.model_name = model_name
+        self.workers = workers or os.cpu_count() or 1
+        self.backend = backend
+        self.encode_batch_size = encode_batch_size
+        self.embeddings = LocalEmbeddings(self)
+        self._executor: ProcessPoolExecutor | None = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            _require_sentence_transformers()
+            # spawn avoids forking a process that is running an event loop and thread pools
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.model_name, self.backend),
+            )
+            search_logger.info(
+                f"Started local embedding pool: model={self.model_name}, "
+                f"workers={self.workers}, backend={self.backend}"
+            )
+        return self._executor
+
+    async def embed(self, texts: list[str], dimensions: int | None = None) -> np.ndarray:
+        """
+        Embed texts in the process pool into a (n, dimensions) float32 array.
+
+        Vectors shorter than ``dimensions`` are zero-padded so they fit the configured
+        vector column; padding leaves cosine similarity unchanged.
+        """
+        if not texts:
+            return np.empty((0, dimensions or 0), dtype=np.float32)
+
+        loop = asyncio.get_running_loop()
+        vectors = np.asarray(
+            await loop.run_in_executor(
+                self._get_executor(), _encode_batch, list(texts), self.encode_batch_size
+            ),
+            dtype=np.float32,
+        )
+
+        if dimensions:
+            native = vectors.shape[1]
+            if native > dimensions:
+                raise ValueError(
+                    f"Local model {self.model_name} produces {native}-dimensional embeddings, "
+                    f"more than EMBEDDING_DIMENSIONS={dimensions}"
+                )
+            if native < dimensions:
+                padded = np.zeros((len(vectors), dimensions), dtype=np.float32)
+                padded[:, :native] = vectors
+                vectors = padded
+
+        return vectors
+
+    def shutdown(self, cancel_futures: bool = True) -> None:
+        """
+        Stop the worker processes without waiting for them.
+
+        Workers exit in the background once their current batch is done; with
+        cancel_futures=False, batches already queued are embedded first.
+        """
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=cancel_futures)
+            self._executor = None
+
+
+# Global provider instance
+_local_provider: LocalEmbeddingProvider | None = None
+
+
+def get_local_embedding_provider(
+    model_name: str = DEFAULT_LOCAL_EMBEDDING_MODEL,
+    workers: int | None = None,
+    backend: str = "torch",
+) -> LocalEmbeddingProvider:
+    """
+    Get the global local embedding provider, restarting it if its configuration changed.
+
+    Fails right away if sentence-transformers is missing, rather than on every batch.
+    """
+    global _local_provider
+    _require_sentence_transformers()
+    workers = workers or os.cpu_count() or 1
+    if _local_provider is not None and (
+        _local_provider.model_name != model_name
+        or _local_provider.workers != workers
+        or _local_provider.backend != backend
+    ):
+        # Called on the event loop, so don't block on the old pool; batches already
+        # queued on it still complete for their callers
+        _local_provider.shutdown(cancel_futures=False)
+        _local_provider = None
+    if _local_provider is None:
+        _local_provider = LocalEmbeddingProvider(model_name, workers=workers, backend=backend)
+    return _local_provider
+
+
+def shutdown_local_embedding_provider() -> None:
+    """Stop the global local embedding provider's worker processes, if running."""
+    global _local_provider
+    if _local_provider is not None:
+        _local_provider.shutdown()
+        _local_provider = None
@@ -0,0 +1,226 @@
+"""
+SQLite LRU Cache
+
+Shared storage for the persistent, content-addressed caches (embeddings, generated
+contexts, code summaries).
+
+Each cache is a single SQLite table of key -> value rows with their size and access
+times. The cache is size-bounded and evicts the least recently used entries once it
+grows past its configured limit; with a TTL, entries older than it are also treated
+as misses and dropped. Subclasses build the keys and convert values to and from the
+stored column.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from ...config.logfire_config import search_logger
+
+DEFAULT_CACHE_DIR = Path(os.getenv("ARCHON_CACHE_DIR", Path.home() / ".cache" / "archon"))
+
+# Evict down to this fraction of the limit so we don't evict on every insert
+_EVICTION_TARGET_RATIO = 0.9
+# SQLite limits the number of host parameters per statement
+_SQL_PARAM_CHUNK = 500
+
+
+class SQLiteLRUCache:
+    """SQLite-backed key/value cache with size-bounded LRU eviction and an optional TTL."""
+
+    # Table and value column, set by subclasses
+    table: str
+    value_column: str
+    value_type: str = "BLOB"
+
+    def __init__(
+        self, db_path: str | Path, max_size_bytes: int, ttl_seconds: float | None = None
+    ):
+        self.db_path = Path(db_path)
+        self.max_size_bytes = max_size_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {self.table} (
+                    key TEXT PRIMARY KEY,
+                    {self.value_column} {self.value_type} NOT NULL,
+                    size_bytes INTEGER NOT NULL,
+                    created_at REAL NOT NULL DEFAULT 0,
+                    last_accessed REAL NOT NULL
+                )
+                """
+            )
+            # Caches written before entries carried a creation time
+            columns = {row[1] for row in conn.execute(f"PRAGMA table_info({self.table})")}
+            if "created_at" not in columns:
+                conn.execute(
+                    f"ALTER TABLE {self.table} ADD COLUMN created_at REAL NOT NULL DEFAULT 0"
+                )
+            conn.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_{self.table}_last_accessed "
+                f"ON {self.table}(last_accessed)"
+            )
+            row = conn.execute(f"SELECT COALESCE(SUM(size_bytes), 0) FROM {self.table}").fetchone()
+            self._total_bytes = int(row[0])
+            self._conn = conn
+        return self._conn
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    def _get(self, keys: list[str]) -> dict[int, bytes | str]:
+        """
+        Look up stored values.
+
+        Returns:
+            Mapping of index in ``keys`` to the stored value, for unexpired hits only
+        """
+        if not keys:
+            return {}
+
+        found: dict[str, bytes | str] = {}
+        now = time.time()
+        expired = []
+
+        with self._lock:
+            conn = self._connect()
+            unique_keys = list(dict.fromkeys(keys))
+            for start in range(0, len(unique_keys), _SQL_PARAM_CHUNK):
+                chunk = unique_keys[start : start + _SQL_PARAM_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(
+                    f"SELECT key, {self.value_column}, size_bytes, created_at FROM {self.table} "
+                    f"WHERE key IN ({placeholders})",
+                    chunk,
+                ).fetchall()
+                for key, value, size, created_at in rows:
+                    if self._expired(created_at, now):
+                        expired.append((key, size))
+                    else:
+                        found[key] = value
+
+            if expired:
+                conn.executemany(
+                    f"DELETE FROM {self.table} WHERE key = ?", [(key,) for key, _ in expired]
+                )
+                self._total_bytes -= sum(size for _, size in expired)
+            if found:
+                conn.executemany(
+                    f"UPDATE {self.table} SET last_accessed = ? WHERE key = ?",
+                    [(now, key) for key in found],
+                )
+            if expired or found:
+                conn.commit()
+
+        hits = {i: found[key] for i, key in enumerate(keys) if key in found}
+        self.hits += len(hits)
+        self.misses += len(keys) - len(hits)
+        return hits
+
+    def _put(self, rows: dict[str, bytes | str]) -> None:
+        """Store key -> value rows, evicting expired and least recently used entries if needed."""
+        if not rows:
+            return
+
+        now = time.time()
+        sized = {
+            key: (value, len(value.encode("utf-8")) if isinstance(value, str) else len(value))
+            for key, value in rows.items()
+        }
+
+        with self._lock:
+            conn = self._connect()
+            keys = list(sized)
+            for start in range(0, len(keys), _SQL_PARAM_CHUNK):
+                chunk = keys[start : start + _SQL_PARAM_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                row = conn.execute(
+                    f"SELECT COALESCE(SUM(size_bytes), 0) FROM {self.table} WHERE key IN ({placeholders})",
+                    chunk,
+                ).fetchone()
+                self._total_bytes -= int(row[0])
+
+            conn.executemany(
+                f"INSERT OR REPLACE INTO {self.table} "
+                f"(key, {self.value_column}, size_bytes, created_at, last_accessed) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(key, value, size, now, now) for key, (value, size) in sized.items()],
+            )
+            self._total_bytes += sum(size for _, size in sized.values())
+
+            if self._total_bytes > self.max_size_bytes:
+                self._evict(conn, now)
+
+            conn.commit()
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        """Drop expired entries, then least recently used ones until under the target size."""
+        expired = 0
+        if self.ttl_seconds is not None:
+            row = conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM {self.table} "
+                "WHERE created_at < ?",
+                (now - self.ttl_seconds,),
+            ).fetchone()
+            if row[0]:
+                conn.execute(
+                    f"DELETE FROM {self.table} WHERE created_at < ?", (now - self.ttl_seconds,)
+                )
+                self._total_bytes -= int(row[1])
+            expired = row[0]
+
+        target = int(self.max_size_bytes * _EVICTION_TARGET_RATIO)
+        to_free = self._total_bytes - target
+        evicted = 0
+        victims = []
+        if to_free > 0:
+            cursor = conn.execute(
+                f"SELECT key, size_bytes FROM {self.table} ORDER BY last_accessed ASC"
+            )
+            for key, size in cursor:
+                if to_free <= 0:
+                    break
+                victims.append((key,))
+                to_free -= size
+                evicted += size
+
+            conn.executemany(f"DELETE FROM {self.table} WHERE key = ?", victims)
+            self._total_bytes -= evicted
+
+        search_logger.debug(
+            f"Cache {self.table} expired {expired} and evicted {len(victims)} entries, "
+            f"size now {self._total_bytes} bytes"
+        )
+
+    def clear(self) -> None:
+        """Remove all cached entries."""
+        with self._lock:
+            conn = self._connect()
+            conn.execute(f"DELETE FROM {self.table}")
+            conn.commit()
+            self._total_bytes = 0
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    @property
+    def size_bytes(self) -> int:
+        return self._total_bytes
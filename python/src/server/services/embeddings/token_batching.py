@@ -0,0 +1,114 @@
+"""
+Token Batching
+
+Token counting and token-budget batch packing for embedding and LLM requests.
+
+Token counts come from a local BPE tokenizer (tiktoken) so requests can be filled up to
+the provider's per-request token limit and the rate limiter is charged with real token
+usage instead of a word-count guess. When tiktoken or its encoding files are unavailable
+(e.g. offline with an empty tiktoken cache) counting falls back to a character heuristic.
+"""
+
+from collections.abc import Sequence
+from functools import lru_cache
+from typing import Any
+
+try:
+    import tiktoken
+
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    tiktoken = None
+    TIKTOKEN_AVAILABLE = False
+
+from ...config.logfire_config import search_logger
+
+# Encoding used by the text-embedding-3 / ada-002 family and a good proxy for other providers
+DEFAULT_ENCODING = "cl100k_base"
+# Average characters per token for English text, used when no tokenizer is available
+_CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=16)
+def get_encoder(model: str | None = None) -> Any | None:
+    """
+    Get a tiktoken encoder for a model, falling back to the default encoding.
+
+    Returns None if tiktoken is not installed or the encoding cannot be loaded.
+    """
+    if not TIKTOKEN_AVAILABLE:
+        return None
+
+    try:
+        if model:
+            try:
+                return tiktoken.encoding_for_model(model)
+            except KeyError:
+                # Unknown model (e.g. Ollama/Gemini) - use the default encoding
+                pass
+        return tiktoken.get_encoding(DEFAULT_ENCODING)
+    except Exception as e:
+        search_logger.warning(f"Failed to load tokenizer, falling back to estimates: {e}")
+        return None
+
+
+def count_tokens(text: str, model: str | None = None) -> int:
+    """Count tokens in a single text."""
+    return count_tokens_batch([text], model)[0]
+
+
+def count_tokens_batch(texts: Sequence[str], model: str | None = None) -> list[int]:
+    """
+    Count tokens for many texts at once.
+
+    Args:
+        texts: Texts to count
+        model: Optional model name used to pick the encoding
+
+    Returns:
+        Token count per text, in input order
+    """
+    encoder = get_encoder(model)
+    if encoder is None:
+        return [max(1, len(text) // _CHARS_PER_TOKEN) if text else 0 for text in texts]
+
+    # encode_ordinary_batch skips special-token checks and runs on tiktoken's thread pool
+    return [len(tokens) for tokens in encoder.encode_ordinary_batch(list(texts))]
+
+
+def pack_token_batches(
+    token_counts: Sequence[int], max_tokens: int, max_items: int | None = None
+) -> list[list[int]]:
+    """
+    Greedily pack items into contiguous batches that fit a token budget.
+
+    Items keep their original order. An item larger than the budget on its own is
+    placed in a batch by itself so it cannot take other items down with it.
+
+    Args:
+        token_counts: Token count per item
+        max_tokens: Maximum total tokens per batch
+        max_items: Optional maximum number of items per batch
+
+    Returns:
+        List of batches, each a list of positions into ``token_counts``
+    """
+    batches: list[list[int]] = []
+    current: list[int] = []
+    current_tokens = 0
+
+    for position, tokens in enumerate(token_counts):
+        over_tokens = current_tokens + tokens > max_tokens
+        over_items = max_items is not None and len(current) >= max_items
+        if current and (over_tokens or over_items):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+
+        current.append(position)
+        current_tokens += tokens
+
+    if current:
+        batches.append(current)
+
+    return batches
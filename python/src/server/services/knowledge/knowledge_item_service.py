@@ -4,9 +4,11 @@ Knowledge Item Service
 Handles all knowledge item CRUD operations and data transformations.
 """
 
+import asyncio
 from typing import Any
 
 from ...config.logfire_config import safe_logfire_error, safe_logfire_info
+from ..database_executor import execute_query
 
 
 class KnowledgeItemService:
@@ -73,15 +75,16 @@ class KnowledgeItemService:
                     f"title.ilike.{search_pattern},summary.ilike.{search_pattern},source_id.ilike.{search_pattern}"
                 )
 
-            count_result = count_query.execute()
-            total = count_result.count if hasattr(count_result, "count") else 0
-
             # Apply pagination at database level
             start_idx = (page - 1) * per_page
             query = query.range(start_idx, start_idx + per_page - 1)
 
-            # Execute query
-            result = query.execute()
+            # Run the count and the page query concurrently
+            count_result, result = await asyncio.gather(
+                execute_query(count_query, operation="list_items:count"),
+                execute_query(query, operation="list_items:page"),
+            )
+            total = count_result.count if hasattr(count_result, "count") else 0
             sources = result.data if result.data else []
 
             # Get source IDs for batch queries
@@ -96,12 +99,25 @@ class KnowledgeItemService:
             chunk_counts = {}
 
             if source_ids:
-                # Batch fetch first URLs
-                urls_result = (
+                # Batch fetch first URLs and, concurrently, code example counts per
+                # source - NO CONTENT, just counts!
+                urls_query = (
                     self.supabase.from_("archon_crawled_pages")
                     .select("source_id, url")
                     .in_("source_id", source_ids)
-                    .execute()
+                )
+                count_queries = [
+                    self.supabase.from_("archon_code_examples")
+                    .select("id", count="exact", head=True)
+                    .eq("source_id", source_id)
+                    for source_id in source_ids
+                ]
+                urls_result, *count_results = await asyncio.gather(
+                    execute_query(urls_query, operation="list_items:first_urls"),
+                    *(
+                        execute_query(count_query, operation="list_items:code_example_count")
+                        for count_query in count_queries
+                    ),
                 )
 
                 # Group URLs by source_id (take first one for each)
@@ -109,15 +125,7 @@ class KnowledgeItemService:
                     if item["source_id"] not in first_urls:
                         first_urls[item["source_id"]] = item["url"]
 
-                # Get code example counts per source - NO CONTENT, just counts!
-                # Fetch counts individually for each source
-                for source_id in source_ids:
-                    count_result = (
-                        self.supabase.from_("archon_code_examples")
-                        .select("id", count="exact", head=True)
-                        .eq("source_id", source_id)
-                        .execute()
-                    )
+                for source_id, count_result in zip(source_ids, count_results, strict=True):
                     code_example_counts[source_id] = (
                         count_result.count if hasattr(count_result, "count") else 0
                     )
@@ -206,12 +214,11 @@ class KnowledgeItemService:
             safe_logfire_info(f"Getting knowledge item | source_id={source_id}")
 
             # Get the source record
-            result = (
+            result = await execute_query(
                 self.supabase.from_("archon_sources")
                 .select("*")
                 .eq("source_id", source_id)
                 .single()
-                .execute()
             )
 
             if not result.data:
@@ -265,11 +272,10 @@ class KnowledgeItemService:
 
             if metadata_updates:
                 # Get current metadata
-                current_response = (
+                current_response = await execute_query(
                     self.supabase.table("archon_sources")
                     .select("metadata")
                     .eq("source_id", source_id)
-                    .execute()
                 )
                 if current_response.data:
                     current_metadata = current_response.data[0].get("metadata", {})
@@ -279,11 +285,10 @@ class KnowledgeItemService:
                     update_data["metadata"] = metadata_updates
 
             # Perform the update
-            result = (
+            result = await execute_query(
                 self.supabase.table("archon_sources")
                 .update(update_data)
                 .eq("source_id", source_id)
-                .execute()
             )
 
             if result.data:
@@ -312,7 +317,9 @@ class KnowledgeItemService:
         """
         try:
             # Query the sources table
-            result = self.supabase.from_("archon_sources").select("*").order("source_id").execute()
+            result = await execute_query(
+                self.supabase.from_("archon_sources").select("*").order("source_id")
+            )
 
             # Format the sources
             sources = []
@@ -394,12 +401,11 @@ class KnowledgeItemService:
     async def _get_first_page_url(self, source_id: str) -> str:
         """Get the first page URL for a source."""
         try:
-            pages_response = (
+            pages_response = await execute_query(
                 self.supabase.from_("archon_crawled_pages")
                 .select("url")
                 .eq("source_id", source_id)
                 .limit(1)
-                .execute()
             )
 
             if pages_response.data:
@@ -413,11 +419,10 @@ class KnowledgeItemService:
     async def _get_code_examples(self, source_id: str) -> list[dict[str, Any]]:
         """Get code examples for a source."""
         try:
-            code_examples_response = (
+            code_examples_response = await execute_query(
                 self.supabase.from_("archon_code_examples")
                 .select("id, content, summary, metadata")
                 .eq("source_id", source_id)
-                .execute()
             )
 
             return code_examples_response.data if code_examples_response.data else []
@@ -455,11 +460,10 @@ class KnowledgeItemService:
         """Get the actual number of chunks for a source."""
         try:
             # Count the actual rows in crawled_pages for this source
-            result = (
+            result = await execute_query(
                 self.supabase.table("archon_crawled_pages")
                 .select("*", count="exact")
                 .eq("source_id", source_id)
-                .execute()
             )
 
             # Return the count of pages (chunks)
@@ -9,10 +9,12 @@ import time
 from contextlib import asynccontextmanager
 from typing import Any
 
+import httpx
 import openai
 
 from ..config.logfire_config import get_logger
 from .credential_service import credential_service
+from .threading_service import get_threading_service
 
 logger = get_logger(__name__)
 
@@ -38,6 +40,30 @@ def _set_cached_settings(key: str, value: Any) -> None:
     _settings_cache[key] = (value, time.time())
 
 
+async def _observe_rate_limits(response: httpx.Response) -> None:
+    """Feed the provider's remaining-budget headers to the concurrency controller."""
+    if response.status_code == 429:
+        # A 429 reaches the caller as RateLimitError, and rate_limited_operation records
+        # it there; counting it here too would cut the limit twice for one throttle
+        return
+    try:
+        get_threading_service().concurrency_controller.observe_response(
+            response.status_code, response.headers
+        )
+    except Exception as e:
+        logger.debug(f"Failed to record rate limit headers: {e}")
+
+
+def _create_http_client() -> httpx.AsyncClient:
+    """HTTP client with the SDK's defaults plus rate limit header observation."""
+    return openai.DefaultAsyncHttpxClient(event_hooks={"response": [_observe_rate_limits]})
+
+
+# The SDK would otherwise retry 429s on its own, unseen by the shared controller; callers
+# retry after the controller's backoff instead
+_CLIENT_MAX_RETRIES = 0
+
+
 @asynccontextmanager
 async def get_llm_client(provider: str | None = None, use_embedding_provider: bool = False):
     """
@@ -97,7 +123,11 @@ async def get_llm_client(provider: str | None = None, use_embedding_provider: bo
             if not api_key:
                 raise ValueError("OpenAI API key not found")
 
-            client = openai.AsyncOpenAI(api_key=api_key)
+            client = openai.AsyncOpenAI(
+                api_key=api_key,
+                http_client=_create_http_client(),
+                max_retries=_CLIENT_MAX_RETRIES,
+            )
             logger.info("OpenAI client created successfully")
 
         elif provider_name == "ollama":
@@ -105,6 +135,8 @@ async def get_llm_client(provider: str | None = None, use_embedding_provider: bo
             client = openai.AsyncOpenAI(
                 api_key="ollama",  # Required but unused by Ollama
                 base_url=base_url or "http://localhost:11434/v1",
+                http_client=_create_http_client(),
+                max_retries=_CLIENT_MAX_RETRIES,
             )
             logger.info(f"Ollama client created successfully with base URL: {base_url}")
 
@@ -115,6 +147,8 @@ async def get_llm_client(provider: str | None = None, use_embedding_provider: bo
             client = openai.AsyncOpenAI(
                 api_key=api_key,
                 base_url=base_url or "https://generativelanguage.googleapis.com/v1beta/openai/",
+                http_client=_create_http_client(),
+                max_retries=_CLIENT_MAX_RETRIES,
             )
             logger.info("Google Gemini client created successfully")
 
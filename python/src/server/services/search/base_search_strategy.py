@@ -10,6 +10,8 @@ from typing import Any
 from supabase import Client
 
 from ...config.logfire_config import get_logger, safe_span
+from ..database_executor import execute_query
+from ..storage.vector_storage import HALFVEC_RPCS, get_vector_storage_mode
 
 logger = get_logger(__name__)
 
@@ -30,6 +32,7 @@ class BaseSearchStrategy:
         match_count: int,
         filter_metadata: dict | None = None,
         table_rpc: str = "match_archon_crawled_pages",
+        include_metadata: bool = True,
     ) -> list[dict[str, Any]]:
         """
         Perform basic vector similarity search.
@@ -41,6 +44,8 @@ class BaseSearchStrategy:
             match_count: Number of results to return
             filter_metadata: Optional metadata filters
             table_rpc: The RPC function to call (match_archon_crawled_pages or match_archon_code_examples)
+            include_metadata: Whether page metadata is joined onto crawled page chunks; without
+                it results carry only chunk-level metadata
 
         Returns:
             List of matching documents with similarity scores
@@ -60,8 +65,17 @@ class BaseSearchStrategy:
                 else:
                     rpc_params["filter"] = {}
 
+                # Flags are only sent when they differ from the defaults, so the call also
+                # works on databases whose search functions predate them
+                if not include_metadata and table_rpc == "match_archon_crawled_pages":
+                    rpc_params["include_metadata"] = False
+                if table_rpc in HALFVEC_RPCS and await get_vector_storage_mode() == "half":
+                    rpc_params["use_halfvec"] = True
+
                 # Execute search
-                response = self.supabase_client.rpc(table_rpc, rpc_params).execute()
+                response = await execute_query(
+                    self.supabase_client.rpc(table_rpc, rpc_params), operation=table_rpc
+                )
 
                 # Filter by similarity threshold
                 filtered_results = []
@@ -11,16 +11,30 @@ Strategy combines:
 4. Intelligent result merging with preference ordering
 """
 
+import asyncio
 from typing import Any
 
 from supabase import Client
 
 from ...config.logfire_config import get_logger, safe_span
+from ..database_executor import execute_query
 from ..embeddings.embedding_service import create_embedding
+from ..storage.page_storage_service import merge_page_metadata
 from .keyword_extractor import build_search_terms, extract_keywords
 
 logger = get_logger(__name__)
 
+# Embeds each chunk's page metadata in keyword search results
+PAGE_METADATA_EMBED = "page:archon_pages(metadata)"
+# Cleared once a keyword search finds the archon_pages relation missing (pre-migration database)
+_pages_relation_available = True
+
+
+def _is_missing_pages_relation(error: Exception) -> bool:
+    """Whether a PostgREST error means archon_pages (or its relationship) doesn't exist."""
+    # PGRST200: no relationship found, PGRST205: table not in the schema cache, 42P01: undefined table
+    return getattr(error, "code", None) in ("PGRST200", "PGRST205", "42P01") or "archon_pages" in str(error)
+
 
 class HybridSearchStrategy:
     """Strategy class implementing hybrid search combining vector and keyword search"""
@@ -53,6 +67,7 @@ class HybridSearchStrategy:
         Returns:
             List of matching documents ranked by keyword relevance
         """
+        global _pages_relation_available
         try:
             # Extract keywords from the query
             keywords = extract_keywords(query, min_length=2, max_keywords=8)
@@ -71,36 +86,29 @@ class HybridSearchStrategy:
             all_results = []
             seen_ids = set()
 
-            # Search for each keyword individually to get better coverage
-            for keyword in search_terms[:6]:  # Limit to avoid too many queries
-                # Build the query with appropriate fields
-                if select_fields:
-                    query_builder = self.supabase_client.from_(table_name).select(select_fields)
-                else:
-                    query_builder = self.supabase_client.from_(table_name).select("*")
-
-                # Add keyword search condition with wildcards
-                search_pattern = f"%{keyword}%"
-
-                # Handle different search patterns based on table
-                if table_name == "archon_code_examples":
-                    # Search both content and summary for code examples
-                    query_builder = query_builder.or_(
-                        f"content.ilike.{search_pattern},summary.ilike.{search_pattern}"
-                    )
-                else:
-                    query_builder = query_builder.ilike("content", search_pattern)
-
-                # Add metadata filters if provided
-                if filter_metadata:
-                    if "source" in filter_metadata and table_name in ["documents", "crawled_pages"]:
-                        query_builder = query_builder.eq("source_id", filter_metadata["source"])
-                    elif "source_id" in filter_metadata:
-                        query_builder = query_builder.eq("source_id", filter_metadata["source_id"])
-
-                # Execute query with limit
-                response = query_builder.limit(match_count * 2).execute()
+            try:
+                keyword_queries, responses = await self._run_keyword_queries(
+                    search_terms, match_count, table_name, filter_metadata, select_fields
+                )
+            except Exception as e:
+                if not (select_fields and PAGE_METADATA_EMBED in select_fields and _is_missing_pages_relation(e)):
+                    raise
+                # Databases without the archon_pages migration can't embed page metadata;
+                # stop asking for it and search the chunks on their own
+                _pages_relation_available = False
+                logger.warning(
+                    "archon_pages is not available, keyword search continues without page metadata. "
+                    "Apply the latest migration to enable it."
+                )
+                keyword_queries, responses = await self._run_keyword_queries(
+                    search_terms,
+                    match_count,
+                    table_name,
+                    filter_metadata,
+                    select_fields.replace(f", {PAGE_METADATA_EMBED}", ""),
+                )
 
+            for (keyword, _), response in zip(keyword_queries, responses, strict=True):
                 if response.data:
                     for result in response.data:
                         result_id = result.get("id")
@@ -140,12 +148,57 @@ class HybridSearchStrategy:
             logger.error(f"Keyword search failed: {e}")
             return []
 
+    async def _run_keyword_queries(
+        self,
+        search_terms: list[str],
+        match_count: int,
+        table_name: str,
+        filter_metadata: dict | None,
+        select_fields: str | None,
+    ) -> tuple[list[tuple[str, Any]], list[Any]]:
+        """Run one ilike query per search term concurrently, returning (queries, responses) in term order."""
+        # Search for each keyword individually to get better coverage
+        keyword_queries = []
+        for keyword in search_terms[:6]:  # Limit to avoid too many queries
+            # Build the query with appropriate fields
+            if select_fields:
+                query_builder = self.supabase_client.from_(table_name).select(select_fields)
+            else:
+                query_builder = self.supabase_client.from_(table_name).select("*")
+
+            # Add keyword search condition with wildcards
+            search_pattern = f"%{keyword}%"
+
+            # Handle different search patterns based on table
+            if table_name == "archon_code_examples":
+                # Search both content and summary for code examples
+                query_builder = query_builder.or_(
+                    f"content.ilike.{search_pattern},summary.ilike.{search_pattern}"
+                )
+            else:
+                query_builder = query_builder.ilike("content", search_pattern)
+
+            # Add metadata filters if provided
+            if filter_metadata:
+                if "source" in filter_metadata and table_name in ["documents", "crawled_pages"]:
+                    query_builder = query_builder.eq("source_id", filter_metadata["source"])
+                elif "source_id" in filter_metadata:
+                    query_builder = query_builder.eq("source_id", filter_metadata["source_id"])
+
+            keyword_queries.append((keyword, query_builder.limit(match_count * 2)))
+
+        responses = await asyncio.gather(
+            *(execute_query(query, operation=f"keyword_search:{table_name}") for _, query in keyword_queries)
+        )
+        return keyword_queries, list(responses)
+
     async def search_documents_hybrid(
         self,
         query: str,
         query_embedding: list[float],
         match_count: int,
         filter_metadata: dict | None = None,
+        include_metadata: bool = True,
     ) -> list[dict[str, Any]]:
         """
         Perform hybrid search on archon_crawled_pages table combining vector and keyword search.
@@ -155,6 +208,7 @@ class HybridSearchStrategy:
             query_embedding: Pre-computed query embedding
             match_count: Number of results to return
             filter_metadata: Optional metadata filter dict
+            include_metadata: Whether page metadata is merged into each chunk's metadata
 
         Returns:
             List of matching documents with boosted scores for dual matches
@@ -167,16 +221,23 @@ class HybridSearchStrategy:
                     match_count=match_count * 2,  # Get more for filtering
                     filter_metadata=filter_metadata,
                     table_rpc="match_archon_crawled_pages",
+                    include_metadata=include_metadata,
                 )
 
                 # 2. Get keyword search results
+                select_fields = "id, url, chunk_number, content, metadata, source_id"
+                if include_metadata and _pages_relation_available:
+                    select_fields += f", {PAGE_METADATA_EMBED}"
                 keyword_results = await self.keyword_search(
                     query=query,
                     match_count=match_count * 2,
                     table_name="archon_crawled_pages",
                     filter_metadata=filter_metadata,
-                    select_fields="id, url, chunk_number, content, metadata, source_id",
+                    select_fields=select_fields,
                 )
+                for result in keyword_results:
+                    page = result.pop("page", None) or {}
+                    result["metadata"] = merge_page_metadata(page.get("metadata"), result.get("metadata"))
 
                 # 3. Combine and merge results intelligently
                 combined_results = self._merge_search_results(
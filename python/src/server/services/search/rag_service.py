@@ -91,6 +91,7 @@ class RAGService:
         filter_metadata: dict | None = None,
         use_hybrid_search: bool = False,
         cached_api_key: str | None = None,
+        include_metadata: bool = True,
     ) -> list[dict[str, Any]]:
         """
         Document search with hybrid search capability.
@@ -101,6 +102,7 @@ class RAGService:
             filter_metadata: Optional metadata filter dict
             use_hybrid_search: Whether to use hybrid search
             cached_api_key: Deprecated parameter for compatibility
+            include_metadata: Whether results carry their page's metadata (url, title, tags...)
 
         Returns:
             List of matching documents
@@ -126,6 +128,7 @@ class RAGService:
                         query_embedding=query_embedding,
                         match_count=match_count,
                         filter_metadata=filter_metadata,
+                        include_metadata=include_metadata,
                     )
                     span.set_attribute("search_mode", "hybrid")
                 else:
@@ -134,6 +137,7 @@ class RAGService:
                         query_embedding=query_embedding,
                         match_count=match_count,
                         filter_metadata=filter_metadata,
+                        include_metadata=include_metadata,
                     )
                     span.set_attribute("search_mode", "vector")
 
@@ -15,10 +15,108 @@ from typing import Any
 from urllib.parse import urlparse
 
 from ...config.logfire_config import get_logger, safe_span
+from ..cpu_process_pool import run_cpu_bound
+from .token_chunker import DEFAULT_CHUNK_MAX_TOKENS, chunk_text_by_tokens
 
 logger = get_logger(__name__)
 
 
+def chunk_text_by_characters(text: str, chunk_size: int = 5000) -> list[str]:
+    """
+    Split text into chunks of at most chunk_size characters at natural boundaries.
+
+    See BaseStorageService.smart_chunk_text for the boundary preferences.
+    """
+    chunks = []
+    start = 0
+    text_length = len(text)
+
+    while start < text_length:
+        # Determine the end of this chunk
+        end = start + chunk_size
+
+        # If we're at the end of the text, take what's left
+        if end >= text_length:
+            chunk = text[start:].strip()
+            if chunk:
+                chunks.append(chunk)
+            break
+
+        # Try to find a good break point
+        chunk = text[start:end]
+
+        # First, try to break at a code block boundary
+        code_block_pos = chunk.rfind("```")
+        if code_block_pos != -1 and code_block_pos > chunk_size * 0.3:
+            end = start + code_block_pos
+
+        # If no code block, try paragraph break
+        elif "\n\n" in chunk:
+            last_break = chunk.rfind("\n\n")
+            if last_break > chunk_size * 0.3:
+                end = start + last_break
+
+        # If no paragraph break, try sentence break
+        elif ". " in chunk:
+            last_period = chunk.rfind(". ")
+            if last_period > chunk_size * 0.3:
+                end = start + last_period + 1
+
+        # Extract chunk and clean it up
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+
+        # Move start position for next chunk
+        start = end
+
+    return chunks
+
+
+def chunk_text(
+    text: str, chunk_size: int = 5000, max_tokens: int | None = None, overlap_tokens: int = 0
+) -> list[str]:
+    """Chunk by tokens when max_tokens is set, otherwise by characters."""
+    if max_tokens:
+        return chunk_text_by_tokens(text, max_tokens, overlap_tokens)
+    return chunk_text_by_characters(text, chunk_size)
+
+
+def extract_chunk_metadata(
+    chunk: str, base_metadata: dict[str, Any] | None = None
+) -> dict[str, Any]:
+    """Extract headers and basic statistics from a text chunk."""
+    # Extract headers
+    headers = re.findall(r"^(#+)\s+(.+)$", chunk, re.MULTILINE)
+    header_str = "; ".join([f"{h[0]} {h[1]}" for h in headers]) if headers else ""
+
+    # Extract basic stats
+    metadata = {
+        "headers": header_str,
+        "char_count": len(chunk),
+        "word_count": len(chunk.split()),
+        "line_count": len(chunk.splitlines()),
+        "has_code": "```" in chunk,
+        "has_links": "http" in chunk or "www." in chunk,
+    }
+
+    # Merge with base metadata if provided
+    if base_metadata:
+        metadata.update(base_metadata)
+
+    return metadata
+
+
+def chunk_text_with_metadata(
+    text: str, chunk_size: int = 5000, max_tokens: int | None = None, overlap_tokens: int = 0
+) -> list[tuple[str, dict[str, Any]]]:
+    """Chunk text and extract each chunk's metadata in one pass, for the process pool."""
+    return [
+        (chunk, extract_chunk_metadata(chunk))
+        for chunk in chunk_text(text, chunk_size, max_tokens, overlap_tokens)
+    ]
+
+
 class BaseStorageService(ABC):
     """Base class for all storage services with common functionality."""
 
@@ -36,7 +134,36 @@ class BaseStorageService(ABC):
 
         self.threading_service = get_utils_threading_service()
 
-    def smart_chunk_text(self, text: str, chunk_size: int = 5000) -> list[str]:
+    async def get_chunking_options(self) -> dict[str, int]:
+        """
+        Read the chunking strategy from the RAG settings.
+
+        Returns:
+            Keyword arguments for smart_chunk_text: empty for character chunking, or
+            max_tokens/overlap_tokens when CHUNKING_STRATEGY is "tokens"
+        """
+        try:
+            from ..credential_service import credential_service
+
+            rag_settings = await credential_service.get_credentials_by_category("rag_strategy")
+        except Exception as e:
+            logger.warning(f"Failed to load chunking settings, using character chunking: {e}")
+            return {}
+
+        if rag_settings.get("CHUNKING_STRATEGY", "characters").lower() != "tokens":
+            return {}
+        return {
+            "max_tokens": int(rag_settings.get("CHUNK_MAX_TOKENS", str(DEFAULT_CHUNK_MAX_TOKENS))),
+            "overlap_tokens": int(rag_settings.get("CHUNK_OVERLAP_TOKENS", "0")),
+        }
+
+    def smart_chunk_text(
+        self,
+        text: str,
+        chunk_size: int = 5000,
+        max_tokens: int | None = None,
+        overlap_tokens: int = 0,
+    ) -> list[str]:
         """
         Split text into chunks intelligently, preserving context.
 
@@ -48,7 +175,9 @@ class BaseStorageService(ABC):
 
         Args:
             text: Text to chunk
-            chunk_size: Maximum chunk size (default: 5000)
+            chunk_size: Maximum chunk size in characters (default: 5000)
+            max_tokens: If set, chunk by token count instead, see chunk_text_by_tokens
+            overlap_tokens: Tokens of context repeated between token-sized chunks
 
         Returns:
             List of text chunks
@@ -57,53 +186,15 @@ class BaseStorageService(ABC):
             logger.warning("Invalid text provided for chunking")
             return []
 
-        chunks = []
-        start = 0
-        text_length = len(text)
-
-        while start < text_length:
-            # Determine the end of this chunk
-            end = start + chunk_size
-
-            # If we're at the end of the text, take what's left
-            if end >= text_length:
-                chunk = text[start:].strip()
-                if chunk:
-                    chunks.append(chunk)
-                break
-
-            # Try to find a good break point
-            chunk = text[start:end]
-
-            # First, try to break at a code block boundary
-            code_block_pos = chunk.rfind("```")
-            if code_block_pos != -1 and code_block_pos > chunk_size * 0.3:
-                end = start + code_block_pos
-
-            # If no code block, try paragraph break
-            elif "\n\n" in chunk:
-                last_break = chunk.rfind("\n\n")
-                if last_break > chunk_size * 0.3:
-                    end = start + last_break
-
-            # If no paragraph break, try sentence break
-            elif ". " in chunk:
-                last_period = chunk.rfind(". ")
-                if last_period > chunk_size * 0.3:
-                    end = start + last_period + 1
-
-            # Extract chunk and clean it up
-            chunk = text[start:end].strip()
-            if chunk:
-                chunks.append(chunk)
-
-            # Move start position for next chunk
-            start = end
-
-        return chunks
+        return chunk_text(text, chunk_size, max_tokens, overlap_tokens)
 
     async def smart_chunk_text_async(
-        self, text: str, chunk_size: int = 5000, progress_callback: Callable | None = None
+        self,
+        text: str,
+        chunk_size: int = 5000,
+        progress_callback: Callable | None = None,
+        max_tokens: int | None = None,
+        overlap_tokens: int = 0,
     ) -> list[str]:
         """
         Async version of smart_chunk_text with optional progress reporting.
@@ -112,6 +203,8 @@ class BaseStorageService(ABC):
             text: Text to chunk
             chunk_size: Maximum chunk size
             progress_callback: Optional callback for progress updates
+            max_tokens: If set, chunk by token count instead of characters
+            overlap_tokens: Tokens of context repeated between token-sized chunks
 
         Returns:
             List of text chunks
@@ -120,13 +213,14 @@ class BaseStorageService(ABC):
             "smart_chunk_text_async", text_length=len(text), chunk_size=chunk_size
         ) as span:
             try:
-                # For large texts, run chunking in thread pool
-                if len(text) > 50000:  # 50KB threshold
-                    chunks = await self.threading_service.run_cpu_intensive(
-                        self.smart_chunk_text, text, chunk_size
-                    )
-                else:
-                    chunks = self.smart_chunk_text(text, chunk_size)
+                if not text or not isinstance(text, str):
+                    logger.warning("Invalid text provided for chunking")
+                    return []
+
+                # Large texts are chunked in a worker process, away from the event loop
+                chunks = await run_cpu_bound(
+                    chunk_text, text, chunk_size, max_tokens, overlap_tokens
+                )
 
                 if progress_callback:
                     await progress_callback("Text chunking completed", 100)
@@ -146,6 +240,33 @@ class BaseStorageService(ABC):
                 logger.error(f"Error chunking text: {e}")
                 raise
 
+    async def chunk_text_with_metadata_async(
+        self,
+        text: str,
+        chunk_size: int = 5000,
+        max_tokens: int | None = None,
+        overlap_tokens: int = 0,
+    ) -> list[tuple[str, dict[str, Any]]]:
+        """
+        Chunk text and extract per-chunk metadata in a single worker process round trip.
+
+        Args:
+            text: Text to chunk
+            chunk_size: Maximum chunk size in characters
+            max_tokens: If set, chunk by token count instead of characters
+            overlap_tokens: Tokens of context repeated between token-sized chunks
+
+        Returns:
+            List of (chunk, metadata) tuples
+        """
+        if not text or not isinstance(text, str):
+            logger.warning("Invalid text provided for chunking")
+            return []
+
+        return await run_cpu_bound(
+            chunk_text_with_metadata, text, chunk_size, max_tokens, overlap_tokens
+        )
+
     def extract_metadata(
         self, chunk: str, base_metadata: dict[str, Any] | None = None
     ) -> dict[str, Any]:
@@ -159,25 +280,7 @@ class BaseStorageService(ABC):
         Returns:
             Dictionary containing metadata
         """
-        # Extract headers
-        headers = re.findall(r"^(#+)\s+(.+)$", chunk, re.MULTILINE)
-        header_str = "; ".join([f"{h[0]} {h[1]}" for h in headers]) if headers else ""
-
-        # Extract basic stats
-        metadata = {
-            "headers": header_str,
-            "char_count": len(chunk),
-            "word_count": len(chunk.split()),
-            "line_count": len(chunk.splitlines()),
-            "has_code": "```" in chunk,
-            "has_links": "http" in chunk or "www." in chunk,
-        }
-
-        # Merge with base metadata if provided
-        if base_metadata:
-            metadata.update(base_metadata)
-
-        return metadata
+        return extract_chunk_metadata(chunk, base_metadata)
 
     def extract_source_id(self, url: str) -> str:
         """
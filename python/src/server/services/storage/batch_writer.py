@@ -0,0 +1,124 @@
+"""
+Batch Writer
+
+Writes batches of chunk or code example rows with a bisecting retry.
+
+A batch that keeps failing after the usual retries is split in half and each half is
+retried recursively. A single poison row in a batch of n then costs O(log n) extra
+statements instead of n per-row inserts, and the good rows around it still land.
+Rows that fail on their own are quarantined in archon_failed_chunks together with
+the error so they can be inspected or replayed later.
+"""
+
+import asyncio
+from typing import Any
+
+from ...config.logfire_config import search_logger
+from ..database_executor import execute_query
+
+DEAD_LETTER_TABLE = "archon_failed_chunks"
+
+
+async def quarantine_rows(
+    client, target_table: str, rows: list[dict[str, Any]], error: Exception
+) -> None:
+    """Record rows that could not be written in the dead-letter table, best effort."""
+    records = [
+        {
+            "target_table": target_table,
+            "url": row.get("url"),
+            "chunk_number": row.get("chunk_number"),
+            "source_id": row.get("source_id"),
+            # The embedding is recomputed on replay, no need to keep 1536 floats around
+            "payload": {k: v for k, v in row.items() if k not in ("embedding", "embedding_half")},
+            "error": str(error)[:2000],
+        }
+        for row in rows
+    ]
+    try:
+        await execute_query(client.table(DEAD_LETTER_TABLE).insert(records), "quarantine_rows")
+    except Exception as e:
+        search_logger.error(f"Failed to quarantine {len(rows)} rows for {target_table}: {e}")
+
+
+async def write_rows(
+    client,
+    table: str,
+    rows: list[dict[str, Any]],
+    on_conflict: str | None = None,
+    max_retries: int = 3,
+    retry_delay: float = 1.0,
+    cancellation_check: Any | None = None,
+) -> int:
+    """
+    Write rows, retrying the whole batch and then bisecting it to isolate bad rows.
+
+    Args:
+        client: Supabase client
+        table: Target table
+        rows: Rows to write
+        on_conflict: Comma-separated conflict columns to upsert on; plain insert if None
+        max_retries: Attempts for the whole batch before bisecting, to ride out transient errors
+        retry_delay: Initial delay between whole-batch attempts, doubled each time
+        cancellation_check: Optional callable that raises if the operation was cancelled
+
+    Returns:
+        Number of rows written
+
+    Raises:
+        ValueError: If max_retries is less than 1
+    """
+    if max_retries < 1:
+        raise ValueError(f"max_retries must be at least 1, got {max_retries}")
+    if not rows:
+        return 0
+
+    async def attempt(batch: list[dict[str, Any]]) -> None:
+        if cancellation_check:
+            cancellation_check()
+        builder = client.table(table)
+        query = (
+            builder.upsert(batch, on_conflict=on_conflict) if on_conflict else builder.insert(batch)
+        )
+        await execute_query(query, operation=f"write:{table}")
+
+    for retry in range(max_retries):
+        try:
+            await attempt(rows)
+            return len(rows)
+        except Exception as e:
+            last_error = e
+            if retry < max_retries - 1:
+                search_logger.warning(
+                    f"Error writing batch to {table} (attempt {retry + 1}/{max_retries}): {e}"
+                )
+                await asyncio.sleep(retry_delay)
+                retry_delay *= 2  # Exponential backoff
+            else:
+                search_logger.error(
+                    f"Failed to write batch of {len(rows)} to {table} after {max_retries} "
+                    f"attempts: {e}. Bisecting to isolate failing rows."
+                )
+
+    async def bisect(batch: list[dict[str, Any]], error: Exception) -> int:
+        if len(batch) == 1:
+            search_logger.error(
+                f"Quarantining row for {batch[0].get('url')} "
+                f"(chunk {batch[0].get('chunk_number')}): {error}"
+            )
+            await quarantine_rows(client, table, batch, error)
+            return 0
+
+        written = 0
+        middle = len(batch) // 2
+        for half in (batch[:middle], batch[middle:]):
+            try:
+                await attempt(half)
+                written += len(half)
+            except Exception as e:
+                written += await bisect(half, e)
+        return written
+
+    written = await bisect(rows, last_error)
+    search_logger.info(f"Bisecting write to {table}: {written}/{len(rows)} rows written")
+    return written
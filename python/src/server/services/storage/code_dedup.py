@@ -0,0 +1,159 @@
+"""
+Code Deduplication
+
+Near-duplicate grouping for extracted code blocks.
+
+Comparing every pair of blocks with ``difflib.SequenceMatcher`` is O(n^2) comparisons
+of O(len^2) each, which dominates extraction time on pages with hundreds of snippets.
+Here each block gets a MinHash signature over character shingles, and locality
+sensitive hashing (LSH) over signature bands proposes candidate pairs in roughly linear
+time. Candidates are screened with the signatures' Jaccard estimate and only the
+survivors are confirmed with the exact SequenceMatcher ratio, so blocks are still
+grouped by the same similarity measure and threshold as before.
+
+Small inputs skip the signatures and compare all pairs, which is cheaper at that size
+and exact.
+"""
+
+from collections import defaultdict
+from difflib import SequenceMatcher
+
+import numpy as np
+
+# Character shingle length for MinHash
+SHINGLE_SIZE = 5
+# Signature length; BANDS * ROWS_PER_BAND must equal it
+NUM_PERMUTATIONS = 128
+# 32 bands of 4 rows make pairs with Jaccard similarity around 0.42 or higher likely
+# candidates. Character-shingle Jaccard runs well below SequenceMatcher's ratio for the
+# same pair, so the bar is set low and precision comes from the exact confirmation.
+BANDS = 32
+ROWS_PER_BAND = 4
+# Candidates whose full signatures agree on less than this are dropped before the exact
+# check. Banding alone lets through many pairs of unrelated snippets that share a
+# vocabulary; pairs at the 0.85 ratio threshold sit far above this estimate.
+MIN_ESTIMATED_JACCARD = 0.35
+# At or below this many distinct blocks, compare all pairs directly
+EXACT_PAIRWISE_MAX = 32
+
+_HASH_BASE = np.uint64(1099511628211)
+_rng = np.random.default_rng(0x5EED)
+# Odd multipliers and offsets for multiply-shift hashing, fixed so signatures are stable
+_PERM_A = _rng.integers(1, 2**63, size=NUM_PERMUTATIONS, dtype=np.uint64) | np.uint64(1)
+_PERM_B = _rng.integers(0, 2**63, size=NUM_PERMUTATIONS, dtype=np.uint64)
+
+
+def shingle_hashes(text: str, size: int = SHINGLE_SIZE) -> np.ndarray:
+    """Hash every distinct ``size``-byte shingle of the text's UTF-8 encoding."""
+    data = np.frombuffer(text.encode("utf-8"), dtype=np.uint8).astype(np.uint64)
+    size = max(1, min(size, len(data)))
+    count = len(data) - size + 1
+    if count <= 0:
+        return np.zeros(1, dtype=np.uint64)
+
+    # Polynomial hash of each window, built up one byte offset at a time (wraps mod 2^64)
+    hashes = np.zeros(count, dtype=np.uint64)
+    for offset in range(size):
+        hashes = hashes * _HASH_BASE + data[offset : offset + count]
+    return np.unique(hashes)
+
+
+def minhash_signature(text: str) -> np.ndarray:
+    """Compute the MinHash signature of a text's shingle set."""
+    shingles = shingle_hashes(text)
+    # Multiply-shift: the top 32 bits of a*x + b are a good universal hash of x
+    permuted = (shingles[:, None] * _PERM_A[None, :] + _PERM_B[None, :]) >> np.uint64(32)
+    return permuted.min(axis=0)
+
+
+def estimate_jaccard(signature1: np.ndarray, signature2: np.ndarray) -> float:
+    """Estimate Jaccard similarity of two shingle sets from their signatures."""
+    return float(np.mean(signature1 == signature2))
+
+
+def similarity(text1: str, text2: str, threshold: float = 0.0) -> float:
+    """
+    SequenceMatcher ratio of two texts, short-circuiting pairs that can't reach threshold.
+
+    Returns 0.0 for pairs whose upper bound is already below threshold.
+    """
+    if text1 == text2:
+        return 1.0
+    matcher = SequenceMatcher(None, text1, text2)
+    if matcher.real_quick_ratio() < threshold or matcher.quick_ratio() < threshold:
+        return 0.0
+    return matcher.ratio()
+
+
+def _candidate_pairs(texts: list[str]) -> dict[int, set[int]]:
+    """Map each text index to the later indices that are likely near-duplicates of it."""
+    signatures = [minhash_signature(text) for text in texts]
+
+    buckets: dict[tuple[int, bytes], list[int]] = defaultdict(list)
+    for index, signature in enumerate(signatures):
+        for band in range(BANDS):
+            rows = signature[band * ROWS_PER_BAND : (band + 1) * ROWS_PER_BAND]
+            buckets[(band, rows.tobytes())].append(index)
+
+    sharing: dict[int, set[int]] = defaultdict(set)
+    for members in buckets.values():
+        for position, index in enumerate(members):
+            sharing[index].update(members[position + 1 :])
+
+    candidates: dict[int, set[int]] = defaultdict(set)
+    for index, others in sharing.items():
+        for other in others:
+            if estimate_jaccard(signatures[index], signatures[other]) >= MIN_ESTIMATED_JACCARD:
+                candidates[index].add(other)
+    return candidates
+
+
+def group_similar_texts(texts: list[str], threshold: float = 0.85) -> list[list[int]]:
+    """
+    Group texts whose SequenceMatcher ratio to a group's first member meets threshold.
+
+    Groups are built greedily in input order: each ungrouped text starts a group and
+    absorbs every later ungrouped text similar enough to it. This matches comparing all
+    pairs in order, except that above EXACT_PAIRWISE_MAX distinct texts only LSH
+    candidates are compared.
+
+    Args:
+        texts: Texts to group, typically already normalized
+        threshold: Minimum SequenceMatcher ratio to join a group
+
+    Returns:
+        Groups of indices into ``texts``, each sorted, in order of their first index
+    """
+    # Identical texts always land in the same group, so compare one representative each
+    first_index: dict[str, int] = {}
+    copies: dict[int, list[int]] = defaultdict(list)
+    for index, text in enumerate(texts):
+        representative = first_index.setdefault(text, index)
+        copies[representative].append(index)
+
+    representatives = list(copies)
+    unique_texts = [texts[index] for index in representatives]
+
+    if len(unique_texts) <= EXACT_PAIRWISE_MAX:
+        candidates = {i: set(range(i + 1, len(unique_texts))) for i in range(len(unique_texts))}
+    else:
+        candidates = _candidate_pairs(unique_texts)
+
+    groups: list[list[int]] = []
+    grouped: set[int] = set()
+    for i, text in enumerate(unique_texts):
+        if i in grouped:
+            continue
+        grouped.add(i)
+        members = [i]
+        for j in sorted(candidates.get(i, ())):
+            if j in grouped:
+                continue
+            if similarity(text, unique_texts[j], threshold) >= threshold:
+                members.append(j)
+                grouped.add(j)
+
+        groups.append(
+            sorted(index for member in members for index in copies[representatives[member]])
+        )
+    return groups
@@ -5,19 +5,30 @@ Handles extraction and storage of code examples from documents.
 """
 
 import asyncio
+import hashlib
 import json
 import os
 import re
 from collections.abc import Callable
-from difflib import SequenceMatcher
 from typing import Any
 from urllib.parse import urlparse
 
+import openai
 from supabase import Client
 
 from ...config.logfire_config import search_logger
+from ..database_executor import execute_query
+from ..embeddings.contextual_cache import CodeSummaryCache
 from ..embeddings.contextual_embedding_service import generate_contextual_embeddings_batch
 from ..embeddings.embedding_service import create_embeddings_batch
+from ..embeddings.sqlite_cache import DEFAULT_CACHE_DIR
+from ..embeddings.token_batching import count_tokens_batch
+from ..llm_provider_service import get_llm_client
+from ..threading_service import get_threading_service
+from .batch_writer import write_rows
+from .code_dedup import group_similar_texts, similarity
+from .postgres_bulk_loader import resolve_bulk_loader
+from .vector_storage import embedding_columns, resolve_vector_storage_mode
 
 
 def _get_model_choice() -> str:
@@ -75,6 +86,57 @@ def _normalize_code_for_comparison(code: str) -> str:
     return normalized
 
 
+def compute_code_fingerprint(code: str) -> str:
+    """Hash a code example's normalized text to spot the same snippet on other pages."""
+    return hashlib.sha256(_normalize_code_for_comparison(code).encode("utf-8")).hexdigest()
+
+
+# Fingerprints per lookup query, keeps the PostgREST request URL short
+_FINGERPRINT_QUERY_BATCH_SIZE = 100
+
+
+async def find_existing_code_examples(
+    client, source_ids: list[str], fingerprints: list[str]
+) -> dict[tuple[str, str], list[dict[str, Any]]]:
+    """
+    Look up stored code examples with the given fingerprints in the given sources.
+
+    Returns:
+        Mapping of (source_id, fingerprint) to the matching rows (id, url, metadata)
+    """
+    existing: dict[tuple[str, str], list[dict[str, Any]]] = {}
+    unique_fingerprints = list(dict.fromkeys(fingerprints))
+    for i in range(0, len(unique_fingerprints), _FINGERPRINT_QUERY_BATCH_SIZE):
+        response = await execute_query(
+            client.table("archon_code_examples")
+            .select("id, url, source_id, metadata, code_fingerprint")
+            .in_("source_id", source_ids)
+            .in_("code_fingerprint", unique_fingerprints[i : i + _FINGERPRINT_QUERY_BATCH_SIZE]),
+            operation="find_code_fingerprints",
+        )
+        for row in response.data or []:
+            existing.setdefault((row["source_id"], row["code_fingerprint"]), []).append(row)
+    return existing
+
+
+async def add_duplicate_references(client, row: dict[str, Any], urls: list[str]) -> None:
+    """Record pages that repeat a stored code example in its metadata, best effort."""
+    metadata = dict(row.get("metadata") or {})
+    known = set(metadata.get("duplicate_urls", []))
+    new_urls = [url for url in urls if url not in known and url != row["url"]]
+    if not new_urls:
+        return
+
+    metadata["duplicate_urls"] = sorted(known.union(new_urls))
+    try:
+        await execute_query(
+            client.table("archon_code_examples").update({"metadata": metadata}).eq("id", row["id"]),
+            operation="add_duplicate_references",
+        )
+    except Exception as e:
+        search_logger.warning(f"Failed to record duplicate references for {row['url']}: {e}")
+
+
 def _calculate_code_similarity(code1: str, code2: str) -> float:
     """
     Calculate similarity between two code strings using normalized comparison.
@@ -90,10 +152,8 @@ def _calculate_code_similarity(code1: str, code2: str) -> float:
     norm1 = _normalize_code_for_comparison(code1)
     norm2 = _normalize_code_for_comparison(code2)
 
-    # Use difflib's SequenceMatcher for similarity calculation
-    similarity = SequenceMatcher(None, norm1, norm2).ratio()
-
-    return similarity
+    # Same SequenceMatcher ratio code_dedup uses to confirm its MinHash/LSH candidate pairs
+    return similarity(norm1, norm2)
 
 
 def _select_best_code_variant(similar_blocks: list[dict[str, Any]]) -> dict[str, Any]:
@@ -154,13 +214,17 @@ def _select_best_code_variant(similar_blocks: list[dict[str, Any]]) -> dict[str,
     return best_block
 
 
-def extract_code_blocks(markdown_content: str, min_length: int = None) -> list[dict[str, Any]]:
+def extract_code_blocks(
+    markdown_content: str, min_length: int = None, settings: dict[str, str] | None = None
+) -> list[dict[str, Any]]:
     """
     Extract code blocks from markdown content along with context.
 
     Args:
         markdown_content: The markdown content to extract code blocks from
         min_length: Minimum length of code blocks to extract (default: from settings or 250)
+        settings: Optional settings keyed by setting name with string values, used
+            instead of the credential cache (e.g. in a worker process)
 
     Returns:
         List of dictionaries containing code blocks and their context
@@ -170,6 +234,8 @@ def extract_code_blocks(markdown_content: str, min_length: int = None) -> list[d
         from ...services.credential_service import credential_service
 
         def _get_setting_fallback(key: str, default: str) -> str:
+            if settings is not None and key in settings:
+                return settings[key]
             if credential_service._cache_initialized and key in credential_service._cache:
                 return credential_service._cache[key]
             return os.getenv(key, default)
@@ -227,7 +293,7 @@ def extract_code_blocks(markdown_content: str, min_length: int = None) -> list[d
             search_logger.info(
                 f"Attempting to extract from inner content (length: {len(inner_content)})"
             )
-            return extract_code_blocks(inner_content, min_length)
+            return extract_code_blocks(inner_content, min_length, settings)
         # For normal language identifiers (e.g., ```python, ```javascript), process normally
         # No need to skip anything - the extraction logic will handle it correctly
         start_offset = 0
@@ -451,30 +517,16 @@ def extract_code_blocks(markdown_content: str, min_length: int = None) -> list[d
 
     search_logger.debug(f"Starting deduplication process for {len(code_blocks)} code blocks")
 
-    # Group similar code blocks together
+    # Group similar code blocks together; MinHash/LSH proposes candidate pairs and the
+    # normalized SequenceMatcher ratio confirms them
     similarity_threshold = 0.85  # 85% similarity threshold
+    normalized_codes = [_normalize_code_for_comparison(block["code"]) for block in code_blocks]
     grouped_blocks = []
-    processed_indices = set()
 
-    for i, block1 in enumerate(code_blocks):
-        if i in processed_indices:
-            continue
-
-        # Start a new group with this block
-        similar_group = [block1]
-        processed_indices.add(i)
-
-        # Find all similar blocks
-        for j, block2 in enumerate(code_blocks):
-            if j <= i or j in processed_indices:
-                continue
-
-            similarity = _calculate_code_similarity(block1["code"], block2["code"])
-
-            if similarity >= similarity_threshold:
-                similar_group.append(block2)
-                processed_indices.add(j)
-                search_logger.debug(f"Found similar code blocks with {similarity:.2f} similarity")
+    for group in group_similar_texts(normalized_codes, similarity_threshold):
+        similar_group = [code_blocks[index] for index in group]
+        if len(similar_group) > 1:
+            search_logger.debug(f"Found {len(similar_group)} similar code block variants")
 
         # Select the best variant from the similar group
         best_variant = _select_best_code_variant(similar_group)
@@ -489,252 +541,365 @@ def extract_code_blocks(markdown_content: str, min_length: int = None) -> list[d
     return grouped_blocks
 
 
-def generate_code_example_summary(
-    code: str, context_before: str, context_after: str, language: str = "", provider: str = None
-) -> dict[str, str]:
-    """
-    Generate a summary and name for a code example using its surrounding context.
+# Attempts per code summary request when the provider rate limits us
+_SUMMARY_MAX_ATTEMPTS = 3
+# Characters of code and of each side of the context sent to the model per snippet
+_SUMMARY_CODE_CHARS = 1500
+_SUMMARY_CONTEXT_CHARS = 500
+# Response budget per snippet in a request
+_SUMMARY_RESPONSE_TOKENS = 200
 
-    Args:
-        code: The code example
-        context_before: Context before the code
-        context_after: Context after the code
-        language: The code language (if known)
-        provider: Optional provider override
+_CODE_SUMMARY_SYSTEM_PROMPT = (
+    "You are a helpful assistant that analyzes code examples and provides JSON responses "
+    "with example names and summaries."
+)
 
-    Returns:
-        A dictionary with 'summary' and 'example_name'
+
+def _fallback_summary(language: str = "") -> dict[str, str]:
+    """Placeholder name and summary for a code example that could not be summarized."""
+    return {
+        "example_name": f"Code Example{f' ({language})' if language else ''}",
+        "summary": "Code example for demonstration purposes.",
+    }
+
+
+def _summary_inputs(block: dict[str, Any]) -> tuple[str, str, str, str]:
+    """Truncate a code block to the (code, context_before, context_after, language) sent."""
+    return (
+        block["code"][:_SUMMARY_CODE_CHARS],
+        block.get("context_before", "")[-_SUMMARY_CONTEXT_CHARS:],
+        block.get("context_after", "")[:_SUMMARY_CONTEXT_CHARS],
+        block.get("language", ""),
+    )
+
+
+def _summary_cache_pair(block: dict[str, Any]) -> tuple[str, str]:
     """
-    # Get model choice from credential service (RAG setting)
-    model_choice = _get_model_choice()
+    Build the (context, code) pair a code block's summary is cached under.
+
+    The code is normalized so re-crawls that only bump versions or whitespace still hit.
+    """
+    code, context_before, context_after, language = _summary_inputs(block)
+    context = f"{language}\n{context_before}\n{context_after}"
+    return context, _normalize_code_for_comparison(code)
+
+
+# Global summary cache instance
+_code_summary_cache: CodeSummaryCache | None = None
 
-    # Create the prompt
-    prompt = f"""<context_before>
-{context_before[-500:] if len(context_before) > 500 else context_before}
-</context_before>
 
-<code_example language="{language}">
-{code[:1500] if len(code) > 1500 else code}
-</code_example>
+def get_code_summary_cache(
+    max_size_mb: int | None = None, ttl_hours: float | None = None
+) -> CodeSummaryCache:
+    """
+    Get the global code summary cache instance, applying new limits if given.
 
-<context_after>
-{context_after[:500] if len(context_after) > 500 else context_after}
-</context_after>
+    Summaries are stored as JSON in their own SQLite file, keyed on (chat model, hash of
+    the snippet's context, hash of its normalized code).
+    """
+    global _code_summary_cache
+    if _code_summary_cache is None:
+        _code_summary_cache = CodeSummaryCache(DEFAULT_CACHE_DIR / "code_summaries.sqlite3")
+    if max_size_mb is not None:
+        _code_summary_cache.max_size_bytes = max_size_mb * 1024**2
+    if ttl_hours is not None:
+        _code_summary_cache.ttl_seconds = ttl_hours * 3600
+    return _code_summary_cache
+
+
+def _load_code_summary_cache(rag_settings: dict) -> CodeSummaryCache | None:
+    """Get the code summary cache if CODE_SUMMARY_CACHE_ENABLED."""
+    try:
+        if str(rag_settings.get("CODE_SUMMARY_CACHE_ENABLED", "true")).lower() != "true":
+            return None
+        return get_code_summary_cache(
+            max_size_mb=int(rag_settings.get("CODE_SUMMARY_CACHE_MAX_MB", "64")),
+            ttl_hours=float(rag_settings.get("CODE_SUMMARY_CACHE_TTL_HOURS", "720")),
+        )
+    except Exception as e:
+        search_logger.warning(f"Code summary cache unavailable: {e}, bypassing cache")
+        return None
+
+
+def _build_code_summaries_prompt(blocks: list[dict[str, Any]]) -> str:
+    """Build one prompt asking for a name and summary of each indexed code example."""
+    examples = []
+    for index, block in enumerate(blocks, start=1):
+        code, context_before, context_after, language = _summary_inputs(block)
+        examples.append(
+            f'<code_example index="{index}" language="{language}">\n'
+            f"<context_before>\n{context_before}\n</context_before>\n"
+            f"<code>\n{code}\n</code>\n"
+            f"<context_after>\n{context_after}\n</context_after>\n"
+            "</code_example>\n"
+        )
 
-Based on the code example and its surrounding context, provide:
+    return f"""{"".join(examples)}
+For each code example above, based on the code and its surrounding context, provide:
 1. A concise, action-oriented name (1-4 words) that describes what this code DOES, not what it is. Focus on the action or purpose.
    Good examples: "Parse JSON Response", "Validate Email Format", "Connect PostgreSQL", "Handle File Upload", "Sort Array Items", "Fetch User Data"
    Bad examples: "Function Example", "Code Snippet", "JavaScript Code", "API Code"
 2. A summary (2-3 sentences) that describes what this code example demonstrates and its purpose
 
-Format your response as JSON:
+Format your response as a JSON object mapping each example index to its result:
 {{
-  "example_name": "Action-oriented name (1-4 words)",
-  "summary": "2-3 sentence description of what the code demonstrates"
+  "1": {{
+    "example_name": "Action-oriented name (1-4 words)",
+    "summary": "2-3 sentence description of what the code demonstrates"
+  }}
 }}
 """
 
-    try:
-        # Get LLM client using fallback
-        try:
-            import os
 
-            import openai
+def _parse_code_summaries(response_text: str, count: int) -> dict[int, dict[str, str]]:
+    """
+    Parse a JSON summaries response into a mapping of example position to summary.
 
-            api_key = os.getenv("OPENAI_API_KEY")
-            if not api_key:
-                # Try to get from credential service with direct fallback
-                from ..credential_service import credential_service
+    Accepts the object wrapped in a markdown code fence or surrounded by stray text, and
+    ignores indexes outside ``1..count``. Examples without both a name and a summary are
+    left out so the caller falls back to a placeholder for them.
+    """
+    start = response_text.find("{")
+    end = response_text.rfind("}")
+    if start == -1 or end < start:
+        search_logger.warning("Code summary response contained no JSON object")
+        return {}
 
-                if (
-                    credential_service._cache_initialized
-                    and "OPENAI_API_KEY" in credential_service._cache
-                ):
-                    cached_key = credential_service._cache["OPENAI_API_KEY"]
-                    if isinstance(cached_key, dict) and cached_key.get("is_encrypted"):
-                        api_key = credential_service._decrypt_value(cached_key["encrypted_value"])
-                    else:
-                        api_key = cached_key
-                else:
-                    api_key = os.getenv("OPENAI_API_KEY", "")
+    try:
+        parsed = json.loads(response_text[start : end + 1])
+    except json.JSONDecodeError as e:
+        search_logger.warning(f"Failed to parse code summary response as JSON: {e}")
+        return {}
 
-            if not api_key:
-                raise ValueError("No OpenAI API key available")
+    if not isinstance(parsed, dict):
+        return {}
 
-            client = openai.OpenAI(api_key=api_key)
-        except Exception as e:
-            search_logger.error(
-                f"Failed to create LLM client fallback: {e} - returning default values"
-            )
-            return {
-                "example_name": f"Code Example{f' ({language})' if language else ''}",
-                "summary": "Code example for demonstration purposes.",
-            }
+    summaries = {}
+    for key, value in parsed.items():
+        try:
+            position = int(key) - 1
+        except (TypeError, ValueError):
+            continue
+        if not (0 <= position < count) or not isinstance(value, dict):
+            continue
+        name, summary = value.get("example_name"), value.get("summary")
+        if isinstance(name, str) and name.strip() and isinstance(summary, str) and summary.strip():
+            summaries[position] = {"example_name": name.strip(), "summary": summary.strip()}
+    return summaries
 
-        search_logger.debug(
-            f"Calling OpenAI API with model: {model_choice}, language: {language}, code length: {len(code)}"
-        )
 
-        response = client.chat.completions.create(
-            model=model_choice,
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a helpful assistant that analyzes code examples and provides JSON responses with example names and summaries.",
-                },
-                {"role": "user", "content": prompt},
-            ],
-            response_format={"type": "json_object"},
-        )
+async def _request_code_summaries(
+    client, model_choice: str, blocks: list[dict[str, Any]], threading_service
+) -> dict[int, dict[str, str]]:
+    """
+    Send one summary request for several code examples, retrying when rate limited.
 
-        response_content = response.choices[0].message.content.strip()
-        search_logger.debug(f"OpenAI API response: {repr(response_content[:200])}...")
+    Returns:
+        Mapping of position within ``blocks`` to the generated summary
 
-        result = json.loads(response_content)
+    Raises:
+        openai.RateLimitError: When the provider still throttles after all attempts
+    """
+    prompt = _build_code_summaries_prompt(blocks)
+    max_tokens = _SUMMARY_RESPONSE_TOKENS * len(blocks)
+    # Charge the limiter with the prompt's real token count plus the response budget
+    prompt_tokens = await asyncio.to_thread(
+        count_tokens_batch, [_CODE_SUMMARY_SYSTEM_PROMPT, prompt], model_choice
+    )
+    estimated_tokens = sum(prompt_tokens) + max_tokens
 
-        # Validate the response has the required fields
-        if not result.get("example_name") or not result.get("summary"):
-            search_logger.warning(f"Incomplete response from OpenAI: {result}")
+    for attempt in range(1, _SUMMARY_MAX_ATTEMPTS + 1):
+        try:
+            # A 429 raised out of the block backs off every caller sharing the
+            # controller, so the next attempt waits there
+            async with threading_service.rate_limited_operation(estimated_tokens, "code_summaries"):
+                response = await client.chat.completions.create(
+                    model=model_choice,
+                    messages=[
+                        {"role": "system", "content": _CODE_SUMMARY_SYSTEM_PROMPT},
+                        {"role": "user", "content": prompt},
+                    ],
+                    response_format={"type": "json_object"},
+                    max_tokens=max_tokens,
+                )
+            break
+        except openai.RateLimitError:
+            if attempt == _SUMMARY_MAX_ATTEMPTS:
+                raise
+            search_logger.warning(
+                f"Rate limit hit generating code summaries, "
+                f"retry {attempt}/{_SUMMARY_MAX_ATTEMPTS - 1} after provider backoff"
+            )
 
-        final_result = {
-            "example_name": result.get(
-                "example_name", f"Code Example{f' ({language})' if language else ''}"
-            ),
-            "summary": result.get("summary", "Code example for demonstration purposes."),
-        }
+    return _parse_code_summaries(response.choices[0].message.content or "", len(blocks))
 
-        search_logger.info(
-            f"Generated code example summary - Name: '{final_result['example_name']}', Summary length: {len(final_result['summary'])}"
-        )
-        return final_result
 
-    except json.JSONDecodeError as e:
-        search_logger.error(
-            f"Failed to parse JSON response from OpenAI: {e}, Response: {repr(response_content) if 'response_content' in locals() else 'No response'}"
-        )
-        return {
-            "example_name": f"Code Example{f' ({language})' if language else ''}",
-            "summary": "Code example for demonstration purposes.",
-        }
-    except Exception as e:
-        search_logger.error(f"Error generating code example summary: {e}, Model: {model_choice}")
-        return {
-            "example_name": f"Code Example{f' ({language})' if language else ''}",
-            "summary": "Code example for demonstration purposes.",
-        }
+async def generate_code_example_summary(
+    code: str, context_before: str, context_after: str, language: str = "", provider: str = None
+) -> dict[str, str]:
+    """
+    Generate a summary and name for a code example using its surrounding context.
+
+    Args:
+        code: The code example
+        context_before: Context before the code
+        context_after: Context after the code
+        language: The code language (if known)
+        provider: Optional provider override
+
+    Returns:
+        A dictionary with 'summary' and 'example_name'
+    """
+    block = {
+        "code": code,
+        "context_before": context_before,
+        "context_after": context_after,
+        "language": language,
+    }
+    summaries = await generate_code_summaries_batch([block], provider=provider)
+    return summaries[0]
 
 
 async def generate_code_summaries_batch(
-    code_blocks: list[dict[str, Any]], max_workers: int = None, progress_callback=None
+    code_blocks: list[dict[str, Any]],
+    max_workers: int = None,
+    progress_callback=None,
+    provider: str = None,
 ) -> list[dict[str, str]]:
     """
-    Generate summaries for multiple code blocks with rate limiting and proper worker management.
+    Generate summaries for multiple code blocks with batched requests and a persistent cache.
+
+    Blocks whose normalized code and context were summarized before by the same model are
+    served from the code summary cache when CODE_SUMMARY_CACHE_ENABLED is set, and
+    identical blocks within the call are summarized once. The rest are packed
+    CODE_SUMMARY_BATCH_SIZE to a request, and the model answers with a JSON object of
+    names and summaries keyed by example index. Up to max_workers requests run
+    concurrently on one pooled async client, each charged to the shared rate limiter.
 
     Args:
         code_blocks: List of code block dictionaries
-        max_workers: Maximum number of concurrent API requests
+        max_workers: Maximum number of concurrent API requests, defaults to
+            CODE_SUMMARY_MAX_WORKERS
         progress_callback: Optional callback for progress updates (async function)
+        provider: Optional provider override
 
     Returns:
-        List of summary dictionaries
+        List of summary dictionaries, a placeholder for blocks that could not be summarized
     """
     if not code_blocks:
         return []
 
-    # Get max_workers from settings if not provided
-    if max_workers is None:
+    try:
+        from ..credential_service import credential_service
+
+        rag_settings = await credential_service.get_credentials_by_category("rag_strategy")
+    except Exception as e:
+        search_logger.warning(f"Failed to load code summary settings: {e}, using defaults")
+        rag_settings = {}
+
+    try:
+        if max_workers is None:
+            max_workers = int(rag_settings.get("CODE_SUMMARY_MAX_WORKERS", "3"))
+        batch_size = int(rag_settings.get("CODE_SUMMARY_BATCH_SIZE", "8"))
+    except (TypeError, ValueError):
+        max_workers, batch_size = 3, 8
+    max_workers, batch_size = max(1, max_workers), max(1, batch_size)
+    model_choice = rag_settings.get("MODEL_CHOICE") or _get_model_choice()
+
+    results: list[dict[str, str] | None] = [None] * len(code_blocks)
+    pairs = [_summary_cache_pair(block) for block in code_blocks]
+
+    cache = _load_code_summary_cache(rag_settings)
+    if cache is not None:
         try:
-            from ...services.credential_service import credential_service
+            for i, cached in (await cache.aget_many(model_choice, pairs)).items():
+                results[i] = cached
+        except Exception as e:
+            search_logger.warning(f"Code summary cache lookup failed: {e}, bypassing cache")
+            cache = None
 
-            if (
-                credential_service._cache_initialized
-                and "CODE_SUMMARY_MAX_WORKERS" in credential_service._cache
-            ):
-                max_workers = int(credential_service._cache["CODE_SUMMARY_MAX_WORKERS"])
-            else:
-                max_workers = int(os.getenv("CODE_SUMMARY_MAX_WORKERS", "3"))
-        except:
-            max_workers = 3  # Default fallback
+    # One request slot per distinct (context, code) pair; copies share its summary
+    copies: dict[tuple[str, str], list[int]] = {}
+    for i, pair in enumerate(pairs):
+        if results[i] is None:
+            copies.setdefault(pair, []).append(i)
+    pending = list(copies)
+    requests = [pending[i : i + batch_size] for i in range(0, len(pending), batch_size)]
 
     search_logger.info(
-        f"Generating summaries for {len(code_blocks)} code blocks with max_workers={max_workers}"
+        f"Generating summaries for {len(code_blocks)} code blocks: "
+        f"{len(code_blocks) - sum(map(len, copies.values()))} cached, {len(pending)} to "
+        f"generate in {len(requests)} requests with max_workers={max_workers}"
     )
 
-    # Semaphore to limit concurrent requests
     semaphore = asyncio.Semaphore(max_workers)
-    completed_count = 0
+    threading_service = get_threading_service()
+    completed_count = len(code_blocks) - sum(map(len, copies.values()))
     lock = asyncio.Lock()
 
-    async def generate_single_summary_with_limit(block: dict[str, Any]) -> dict[str, str]:
+    async def summarize_request(client, request: list[tuple[str, str]]) -> None:
         nonlocal completed_count
+        blocks = [code_blocks[copies[pair][0]] for pair in request]
         async with semaphore:
-            # Add delay between requests to avoid rate limiting
-            await asyncio.sleep(0.5)  # 500ms delay between requests
-
-            # Run the synchronous function in a thread
-            loop = asyncio.get_event_loop()
-            result = await loop.run_in_executor(
-                None,
-                generate_code_example_summary,
-                block["code"],
-                block["context_before"],
-                block["context_after"],
-                block.get("language", ""),
-            )
+            try:
+                summaries = await _request_code_summaries(
+                    client, model_choice, blocks, threading_service
+                )
+            except openai.RateLimitError as e:
+                if "insufficient_quota" in str(e):
+                    search_logger.error(f"Quota exhausted generating code summaries: {e}")
+                else:
+                    search_logger.error(f"Rate limit persisted generating code summaries: {e}")
+                summaries = {}
+            except Exception as e:
+                search_logger.error(f"Error generating code summaries, Model: {model_choice}: {e}")
+                summaries = {}
 
-            # Update progress
-            async with lock:
-                completed_count += 1
-                if progress_callback:
-                    # Simple progress based on summaries completed
-                    progress_percentage = int((completed_count / len(code_blocks)) * 100)
-                    await progress_callback({
-                        "status": "code_extraction",
-                        "percentage": progress_percentage,
-                        "log": f"Generated {completed_count}/{len(code_blocks)} code summaries",
-                        "completed_summaries": completed_count,
-                        "total_summaries": len(code_blocks),
-                    })
-
-            return result
-
-    # Process all blocks concurrently but with rate limiting
-    try:
-        summaries = await asyncio.gather(
-            *[generate_single_summary_with_limit(block) for block in code_blocks],
-            return_exceptions=True,
-        )
+        generated = []
+        for position, pair in enumerate(request):
+            summary = summaries.get(position)
+            if summary is None:
+                continue
+            for i in copies[pair]:
+                results[i] = dict(summary)
+            generated.append((*pair, summary))
 
-        # Handle any exceptions in the results
-        final_summaries = []
-        for i, summary in enumerate(summaries):
-            if isinstance(summary, Exception):
-                search_logger.error(f"Error generating summary for code block {i}: {summary}")
-                # Use fallback summary
-                language = code_blocks[i].get("language", "")
-                fallback = {
-                    "example_name": f"Code Example{f' ({language})' if language else ''}",
-                    "summary": "Code example for demonstration purposes.",
-                }
-                final_summaries.append(fallback)
-            else:
-                final_summaries.append(summary)
+        if cache is not None and generated:
+            try:
+                await cache.aput_many(model_choice, generated)
+            except Exception as e:
+                search_logger.warning(f"Failed to write code summaries to cache: {e}")
+
+        async with lock:
+            completed_count += sum(len(copies[pair]) for pair in request)
+            if progress_callback:
+                await progress_callback({
+                    "status": "code_extraction",
+                    "percentage": int((completed_count / len(code_blocks)) * 100),
+                    "log": f"Generated {completed_count}/{len(code_blocks)} code summaries",
+                    "completed_summaries": completed_count,
+                    "total_summaries": len(code_blocks),
+                })
+
+    if requests:
+        try:
+            async with get_llm_client(provider=provider) as client:
+                outcomes = await asyncio.gather(
+                    *[summarize_request(client, request) for request in requests],
+                    return_exceptions=True,
+                )
+            for outcome in outcomes:
+                if isinstance(outcome, Exception):
+                    search_logger.error(f"Error in code summary request: {outcome}")
+        except Exception as e:
+            search_logger.error(f"Error in batch summary generation: {e}")
 
-        search_logger.info(f"Successfully generated {len(final_summaries)} code summaries")
-        return final_summaries
+    final_summaries = []
+    for block, summary in zip(code_blocks, results, strict=True):
+        final_summaries.append(summary or _fallback_summary(block.get("language", "")))
 
-    except Exception as e:
-        search_logger.error(f"Error in batch summary generation: {e}")
-        # Return fallback summaries for all blocks
-        fallback_summaries = []
-        for block in code_blocks:
-            language = block.get("language", "")
-            fallback = {
-                "example_name": f"Code Example{f' ({language})' if language else ''}",
-                "summary": "Code example for demonstration purposes.",
-            }
-            fallback_summaries.append(fallback)
-        return fallback_summaries
+    search_logger.info(f"Successfully generated {len(final_summaries)} code summaries")
+    return final_summaries
 
 
 async def add_code_examples_to_supabase(
@@ -748,6 +913,7 @@ async def add_code_examples_to_supabase(
     url_to_full_document: dict[str, str] | None = None,
     progress_callback: Callable | None = None,
     provider: str | None = None,
+    replaced_urls: list[str] | None = None,
 ):
     """
     Add code examples to the Supabase code_examples table in batches.
@@ -762,12 +928,14 @@ async def add_code_examples_to_supabase(
         batch_size: Size of each batch for insertion
         url_to_full_document: Optional mapping of URLs to full document content
         progress_callback: Optional async callback for progress updates
+        replaced_urls: Additional URLs whose existing examples should be removed, e.g.
+            pages whose snippets were all duplicates of examples stored elsewhere
     """
-    if not urls:
+    if not urls and not replaced_urls:
         return
 
     # Delete existing records for these URLs
-    unique_urls = list(set(urls))
+    unique_urls = list(set(urls).union(replaced_urls or []))
     for url in unique_urls:
         try:
             client.table("archon_code_examples").delete().eq("url", url).execute()
@@ -806,6 +974,17 @@ async def add_code_examples_to_supabase(
         f"Using contextual embeddings for code examples: {use_contextual_embeddings}"
     )
 
+    try:
+        from ..credential_service import credential_service
+
+        rag_settings = await credential_service.get_credentials_by_category("rag_strategy")
+        bulk_loader = resolve_bulk_loader(rag_settings)
+        vector_storage_mode = resolve_vector_storage_mode(rag_settings)
+    except Exception as e:
+        search_logger.warning(f"Failed to load storage backend setting: {e}, using Supabase REST")
+        bulk_loader = None
+        vector_storage_mode = "full"
+
     # Process in batches
     total_items = len(urls)
     for i in range(0, total_items, batch_size):
@@ -860,31 +1039,15 @@ async def add_code_examples_to_supabase(
                 f"Successful: {result.success_count}"
             )
 
-        # Use only successful embeddings
-        valid_embeddings = result.embeddings
-        successful_texts = result.texts_processed
-
-        if not valid_embeddings:
+        if not result.embeddings:
             search_logger.warning("Skipping batch - no successful embeddings created")
             continue
 
-        # Prepare batch data - only for successful embeddings
+        # Prepare batch data - only for successful embeddings, each mapped back to its
+        # input position so identical code examples keep their own url and chunk_number
         batch_data = []
-        for j, (embedding, text) in enumerate(
-            zip(valid_embeddings, successful_texts, strict=False)
-        ):
-            # Find the original index
-            orig_idx = None
-            for k, orig_text in enumerate(batch_texts):
-                if orig_text == text:
-                    orig_idx = k
-                    break
-
-            if orig_idx is None:
-                search_logger.warning("Could not map embedding back to original code example")
-                continue
-
-            idx = i + orig_idx  # Get the global index
+        for batch_idx, embedding in zip(result.indices_processed, result.embeddings, strict=False):
+            idx = i + batch_idx  # Get the global index
 
             # Use source_id from metadata if available, otherwise extract from URL
             if metadatas[idx] and "source_id" in metadatas[idx]:
@@ -900,47 +1063,22 @@ async def add_code_examples_to_supabase(
                 "summary": summaries[idx],
                 "metadata": metadatas[idx],  # Store as JSON object, not string
                 "source_id": source_id,
-                "embedding": embedding,
+                **embedding_columns(embedding.tolist(), vector_storage_mode),
+                "code_fingerprint": compute_code_fingerprint(code_examples[idx]),
             })
 
-        # Insert batch into Supabase with retry logic
-        max_retries = 3
-        retry_delay = 1.0
-
-        for retry in range(max_retries):
+        # Bulk load over a direct Postgres connection when configured
+        loaded = False
+        if bulk_loader is not None:
             try:
-                client.table("archon_code_examples").insert(batch_data).execute()
-                # Success - break out of retry loop
-                break
+                await bulk_loader.upsert("archon_code_examples", batch_data)
+                loaded = True
             except Exception as e:
-                if retry < max_retries - 1:
-                    search_logger.warning(
-                        f"Error inserting batch into Supabase (attempt {retry + 1}/{max_retries}): {e}"
-                    )
-                    search_logger.info(f"Retrying in {retry_delay} seconds...")
-                    import time
+                search_logger.warning(f"Bulk load failed, falling back to REST inserts: {e}")
 
-                    time.sleep(retry_delay)
-                    retry_delay *= 2  # Exponential backoff
-                else:
-                    # Final attempt failed
-                    search_logger.error(f"Failed to insert batch after {max_retries} attempts: {e}")
-                    # Optionally, try inserting records one by one as a last resort
-                    search_logger.info("Attempting to insert records individually...")
-                    successful_inserts = 0
-                    for record in batch_data:
-                        try:
-                            client.table("archon_code_examples").insert(record).execute()
-                            successful_inserts += 1
-                        except Exception as individual_error:
-                            search_logger.error(
-                                f"Failed to insert individual record for URL {record['url']}: {individual_error}"
-                            )
-
-                    if successful_inserts > 0:
-                        search_logger.info(
-                            f"Successfully inserted {successful_inserts}/{len(batch_data)} records individually"
-                        )
+        if not loaded:
+            # Insert with retries, bisecting the batch to isolate and quarantine bad rows
+            await write_rows(client, "archon_code_examples", batch_data)
 
         search_logger.info(
             f"Inserted batch {i // batch_size + 1} of {(total_items + batch_size - 1) // batch_size} code examples"
@@ -5,14 +5,23 @@ Handles storage of documents in Supabase with parallel processing support.
 """
 
 import asyncio
+import hashlib
 import os
 from typing import Any
 from urllib.parse import urlparse
 
 from ...config.logfire_config import safe_span, search_logger
 from ..credential_service import credential_service
+from ..database_executor import execute_query
 from ..embeddings.contextual_embedding_service import generate_contextual_embeddings_batch
-from ..embeddings.embedding_service import create_embeddings_batch
+from ..embeddings.embedding_service import create_embeddings_batch, get_embedding_signature
+from .batch_writer import write_rows
+from .page_storage_service import build_page_rows, split_page_metadata, upsert_pages
+from .postgres_bulk_loader import PostgresBulkLoader, resolve_bulk_loader
+from .vector_storage import embedding_columns, resolve_vector_storage_mode
+
+# Rows fetched per request when diffing stored chunks; matches PostgREST's default max-rows
+_EXISTING_ROWS_PAGE_SIZE = 1000
 
 
 async def add_documents_to_supabase(
@@ -27,6 +36,7 @@ async def add_documents_to_supabase(
     enable_parallel_batches: bool = True,
     provider: str | None = None,
     cancellation_check: Any | None = None,
+    url_to_etag: dict[str, str] | None = None,
 ) -> None:
     """
     Add documents to Supabase with threading optimizations.
@@ -43,6 +53,7 @@ async def add_documents_to_supabase(
         batch_size: Size of each batch for insertion
         progress_callback: Optional async callback function for progress reporting
         provider: Optional provider override for embeddings
+        url_to_etag: Optional mapping of URLs to the ETag their page was served with
     """
     with safe_span(
         "add_documents_to_supabase", total_documents=len(contents), batch_size=batch_size
@@ -59,60 +70,22 @@ async def add_documents_to_supabase(
                 batch_size = int(rag_settings.get("DOCUMENT_STORAGE_BATCH_SIZE", "50"))
             delete_batch_size = int(rag_settings.get("DELETE_BATCH_SIZE", "50"))
             enable_parallel = rag_settings.get("ENABLE_PARALLEL_BATCHES", "true").lower() == "true"
+            incremental = rag_settings.get("INCREMENTAL_CRAWL_ENABLED", "false").lower() == "true"
+            pipeline_depth = max(1, int(rag_settings.get("DOCUMENT_STORAGE_PIPELINE_DEPTH", "2")))
+            bulk_loader = resolve_bulk_loader(rag_settings)
+            vector_storage_mode = resolve_vector_storage_mode(rag_settings)
         except Exception as e:
             search_logger.warning(f"Failed to load storage settings: {e}, using defaults")
             if batch_size is None:
                 batch_size = 50
             delete_batch_size = 50
             enable_parallel = True
-
-        # Get unique URLs to delete existing records
-        unique_urls = list(set(urls))
-
-        # Delete existing records for these URLs in batches
-        try:
-            if unique_urls:
-                # Delete in configured batch sizes
-                for i in range(0, len(unique_urls), delete_batch_size):
-                    # Check for cancellation before each delete batch
-                    if cancellation_check:
-                        cancellation_check()
-
-                    batch_urls = unique_urls[i : i + delete_batch_size]
-                    client.table("archon_crawled_pages").delete().in_("url", batch_urls).execute()
-                    # Yield control to allow Socket.IO to process messages
-                    if i + delete_batch_size < len(unique_urls):
-                        await asyncio.sleep(0.05)  # Reduced pause between delete batches
-                search_logger.info(
-                    f"Deleted existing records for {len(unique_urls)} URLs in batches"
-                )
-        except Exception as e:
-            search_logger.warning(f"Batch delete failed: {e}. Trying smaller batches as fallback.")
-            # Fallback: delete in smaller batches with rate limiting
-            failed_urls = []
-            fallback_batch_size = max(10, delete_batch_size // 5)
-            for i in range(0, len(unique_urls), fallback_batch_size):
-                # Check for cancellation before each fallback delete batch
-                if cancellation_check:
-                    cancellation_check()
-
-                batch_urls = unique_urls[i : i + 10]
-                try:
-                    client.table("archon_crawled_pages").delete().in_("url", batch_urls).execute()
-                    await asyncio.sleep(0.05)  # Rate limit to prevent overwhelming
-                except Exception as inner_e:
-                    search_logger.error(
-                        f"Error deleting batch of {len(batch_urls)} URLs: {inner_e}"
-                    )
-                    failed_urls.extend(batch_urls)
-
-            if failed_urls:
-                search_logger.error(f"Failed to delete {len(failed_urls)} URLs")
+            incremental = False
+            pipeline_depth = 2
+            bulk_loader = None
+            vector_storage_mode = "full"
 
         # Check if contextual embeddings are enabled
-        # Fix: Get from credential service instead of environment
-        from ..credential_service import credential_service
-
         try:
             use_contextual_embeddings = await credential_service.get_credential(
                 "USE_CONTEXTUAL_EMBEDDINGS", "false", decrypt=True
@@ -123,244 +96,279 @@ async def add_documents_to_supabase(
             # Fallback to environment variable
             use_contextual_embeddings = os.getenv("USE_CONTEXTUAL_EMBEDDINGS", "false") == "true"
 
+        # The hash covers the embedding configuration too, so switching the model, its
+        # dimensions or contextual embeddings re-embeds chunks whose text is unchanged
+        try:
+            embedding_signature = await get_embedding_signature(provider)
+            embedding_signature += f":contextual={use_contextual_embeddings}"
+        except Exception as e:
+            search_logger.warning(f"Failed to resolve embedding model: {e}. Rewriting all chunks.")
+            embedding_signature = ""
+            incremental = False
+
+        content_hashes = [
+            compute_chunk_hash(content, embedding_signature) for content in contents
+        ]
+
+        # Pages are refreshed in place: chunks are upserted on (url, chunk_number) and rows
+        # past each page's new chunk count are trimmed once everything is written, so a page
+        # never reads as empty while it is being re-crawled
+        chunk_counts: dict[str, int] = {}
+        for url, chunk_number in zip(urls, chunk_numbers, strict=False):
+            chunk_counts[url] = max(chunk_counts.get(url, 0), chunk_number + 1)
+
+        # Page-level metadata and the full text are stored once per URL in archon_pages and
+        # chunks reference their page by id. Databases without the pages table keep the
+        # full metadata on every chunk.
+        try:
+            page_ids = await upsert_pages(
+                client,
+                build_page_rows(urls, metadatas, url_to_full_document, chunk_counts, url_to_etag),
+                cancellation_check,
+            )
+        except Exception as e:
+            search_logger.warning(f"Page upsert failed: {e}. Storing full metadata on chunks.")
+            page_ids = {}
+
+        # Incremental mode skips chunks whose stored content is unchanged
+        if incremental:
+            try:
+                write_indices = await _plan_incremental_update(
+                    client, urls, chunk_numbers, content_hashes, delete_batch_size, cancellation_check
+                )
+
+                unchanged = len(contents) - len(write_indices)
+                search_logger.info(
+                    f"Incremental update: {unchanged} unchanged chunks kept, "
+                    f"{len(write_indices)} to write"
+                )
+                span.set_attribute("unchanged_chunks", unchanged)
+
+                if unchanged:
+                    urls = [urls[i] for i in write_indices]
+                    chunk_numbers = [chunk_numbers[i] for i in write_indices]
+                    contents = [contents[i] for i in write_indices]
+                    metadatas = [metadatas[i] for i in write_indices]
+                    content_hashes = [content_hashes[i] for i in write_indices]
+            except Exception as e:
+                search_logger.warning(
+                    f"Incremental update failed: {e}. Falling back to rewriting all chunks."
+                )
+
+        # Get max workers setting FIRST before using it
+        if use_contextual_embeddings:
+            try:
+                max_workers = await credential_service.get_credential(
+                    "CONTEXTUAL_EMBEDDINGS_MAX_WORKERS", "4", decrypt=True
+                )
+                max_workers = int(max_workers)
+            except:
+                max_workers = 4
+        else:
+            max_workers = 1
+
         # Initialize batch tracking for simplified progress
         completed_batches = 0
+        embedded_batches = 0
         total_batches = (len(contents) + batch_size - 1) // batch_size
 
-        # Process in batches to avoid memory issues
-        for batch_num, i in enumerate(range(0, len(contents), batch_size), 1):
-            # Check for cancellation before each batch
-            if cancellation_check:
-                cancellation_check()
-
-            batch_end = min(i + batch_size, len(contents))
-
-            # Get batch slices
-            batch_urls = urls[i:batch_end]
-            batch_chunk_numbers = chunk_numbers[i:batch_end]
-            batch_contents = contents[i:batch_end]
-            batch_metadatas = metadatas[i:batch_end]
+        # Embedding and inserting run as a two-stage pipeline: batch N+1 is embedded while
+        # batch N is written. The bounded queue is the backpressure that keeps embedded
+        # batches from piling up in memory when the database is the slower stage.
+        ready: asyncio.Queue = asyncio.Queue(maxsize=pipeline_depth)
+
+        # Chunks whose embedding failed; their stored rows from an earlier crawl would
+        # otherwise keep the old content and vector
+        failed_chunks: dict[str, list[int]] = {}
+
+        def stage_info(stage: str, batch_num: int, chunks: int) -> dict:
+            return {
+                "storage_stage": stage,
+                "current_batch": batch_num,
+                "total_batches": total_batches,
+                "completed_batches": completed_batches,
+                "embedded_batches": embedded_batches,
+                "chunks_in_batch": chunks,
+                "max_workers": max_workers if use_contextual_embeddings else 0,
+            }
+
+        async def embed_batches():
+            nonlocal embedded_batches
+
+            # Process in batches to avoid memory issues
+            for batch_num, i in enumerate(range(0, len(contents), batch_size), 1):
+                # Check for cancellation before each batch
+                if cancellation_check:
+                    cancellation_check()
 
-            # Simple batch progress - only track completed batches
-            current_percentage = int((completed_batches / total_batches) * 100)
+                batch_end = min(i + batch_size, len(contents))
 
-            # Get max workers setting FIRST before using it
-            if use_contextual_embeddings:
-                try:
-                    max_workers = await credential_service.get_credential(
-                        "CONTEXTUAL_EMBEDDINGS_MAX_WORKERS", "4", decrypt=True
-                    )
-                    max_workers = int(max_workers)
-                except:
-                    max_workers = 4
-            else:
-                max_workers = 1
+                # Get batch slices
+                batch_urls = urls[i:batch_end]
+                batch_chunk_numbers = chunk_numbers[i:batch_end]
+                batch_contents = contents[i:batch_end]
+                batch_metadatas = metadatas[i:batch_end]
+                batch_hashes = content_hashes[i:batch_end]
 
-            # Report batch start with simplified progress
-            if progress_callback and asyncio.iscoroutinefunction(progress_callback):
-                await progress_callback(
+                await report_progress(
                     f"Processing batch {batch_num}/{total_batches} ({len(batch_contents)} chunks)",
-                    current_percentage,
-                    {
-                        "current_batch": batch_num,
-                        "total_batches": total_batches,
-                        "completed_batches": completed_batches,
-                        "chunks_in_batch": len(batch_contents),
-                        "max_workers": max_workers if use_contextual_embeddings else 0,
-                    },
+                    int((completed_batches / total_batches) * 100),
+                    stage_info("embedding", batch_num, len(batch_contents)),
                 )
 
-            # Skip batch start progress to reduce Socket.IO traffic
-            # Only report on completion
+                # Apply contextual embedding to each chunk if enabled
+                if use_contextual_embeddings:
+                    # Prepare full documents list for batch processing
+                    full_documents = []
+                    for j, content in enumerate(batch_contents):
+                        url = batch_urls[j]
+                        full_document = url_to_full_document.get(url, "")
+                        full_documents.append(full_document)
+
+                    # Get contextual embedding batch size from settings
+                    try:
+                        contextual_batch_size = int(
+                            rag_settings.get("CONTEXTUAL_EMBEDDING_BATCH_SIZE", "50")
+                        )
+                    except:
+                        contextual_batch_size = 50
 
-            # Apply contextual embedding to each chunk if enabled
-            if use_contextual_embeddings:
-                # Prepare full documents list for batch processing
-                full_documents = []
-                for j, content in enumerate(batch_contents):
-                    url = batch_urls[j]
-                    full_document = url_to_full_document.get(url, "")
-                    full_documents.append(full_document)
+                    try:
+                        # Process in smaller sub-batches to avoid token limits
+                        contextual_contents = []
+                        successful_count = 0
 
-                # Get contextual embedding batch size from settings
-                try:
-                    contextual_batch_size = int(
-                        rag_settings.get("CONTEXTUAL_EMBEDDING_BATCH_SIZE", "50")
-                    )
-                except:
-                    contextual_batch_size = 50
+                        for ctx_i in range(0, len(batch_contents), contextual_batch_size):
+                            # Check for cancellation before each contextual sub-batch
+                            if cancellation_check:
+                                cancellation_check()
 
-                try:
-                    # Process in smaller sub-batches to avoid token limits
-                    contextual_contents = []
-                    successful_count = 0
+                            ctx_end = min(ctx_i + contextual_batch_size, len(batch_contents))
+
+                            sub_batch_contents = batch_contents[ctx_i:ctx_end]
+                            sub_batch_docs = full_documents[ctx_i:ctx_end]
 
-                    for ctx_i in range(0, len(batch_contents), contextual_batch_size):
-                        # Check for cancellation before each contextual sub-batch
-                        if cancellation_check:
-                            cancellation_check()
+                            # Process sub-batch with a single API call
+                            sub_results = await generate_contextual_embeddings_batch(
+                                sub_batch_docs, sub_batch_contents
+                            )
 
-                        ctx_end = min(ctx_i + contextual_batch_size, len(batch_contents))
+                            # Extract results from this sub-batch
+                            for idx, (contextual_text, success) in enumerate(sub_results):
+                                contextual_contents.append(contextual_text)
+                                if success:
+                                    original_idx = ctx_i + idx
+                                    batch_metadatas[original_idx]["contextual_embedding"] = True
+                                    successful_count += 1
 
-                        sub_batch_contents = batch_contents[ctx_i:ctx_end]
-                        sub_batch_docs = full_documents[ctx_i:ctx_end]
+                        search_logger.info(
+                            f"Batch {batch_num}: Generated {successful_count}/{len(batch_contents)} contextual embeddings using batch API (sub-batch size: {contextual_batch_size})"
+                        )
 
-                        # Process sub-batch with a single API call
-                        sub_results = await generate_contextual_embeddings_batch(
-                            sub_batch_docs, sub_batch_contents
+                    except Exception as e:
+                        search_logger.error(f"Error in batch contextual embedding: {e}")
+                        # Fallback to original contents
+                        contextual_contents = batch_contents
+                        search_logger.warning(
+                            f"Batch {batch_num}: Falling back to original content due to error"
                         )
+                else:
+                    # If not using contextual embeddings, use original contents
+                    contextual_contents = batch_contents
 
-                        # Extract results from this sub-batch
-                        for idx, (contextual_text, success) in enumerate(sub_results):
-                            contextual_contents.append(contextual_text)
-                            if success:
-                                original_idx = ctx_i + idx
-                                batch_metadatas[original_idx]["contextual_embedding"] = True
-                                successful_count += 1
+                # Create embeddings for the batch - no progress reporting
+                # Don't pass websocket to avoid Socket.IO issues
+                result = await create_embeddings_batch(contextual_contents, provider=provider)
 
-                    search_logger.info(
-                        f"Batch {batch_num}: Generated {successful_count}/{len(batch_contents)} contextual embeddings using batch API (sub-batch size: {contextual_batch_size})"
+                # Log any failures
+                if result.has_failures:
+                    search_logger.error(
+                        f"Batch {batch_num}: Failed to create {result.failure_count} embeddings. "
+                        f"Successful: {result.success_count}. Errors: {[item['error'] for item in result.failed_items[:3]]}"
                     )
 
-                except Exception as e:
-                    search_logger.error(f"Error in batch contextual embedding: {e}")
-                    # Fallback to original contents
-                    contextual_contents = batch_contents
+                if result.has_failures:
+                    embedded = set(result.indices_processed)
+                    for j, url in enumerate(batch_urls):
+                        if j not in embedded:
+                            failed_chunks.setdefault(url, []).append(batch_chunk_numbers[j])
+
+                if not result.embeddings:
                     search_logger.warning(
-                        f"Batch {batch_num}: Falling back to original content due to error"
+                        f"Skipping batch {batch_num} - no successful embeddings created"
                     )
-            else:
-                # If not using contextual embeddings, use original contents
-                contextual_contents = batch_contents
-
-            # Create embeddings for the batch - no progress reporting
-            # Don't pass websocket to avoid Socket.IO issues
-            result = await create_embeddings_batch(contextual_contents, provider=provider)
-
-            # Log any failures
-            if result.has_failures:
-                search_logger.error(
-                    f"Batch {batch_num}: Failed to create {result.failure_count} embeddings. "
-                    f"Successful: {result.success_count}. Errors: {[item['error'] for item in result.failed_items[:3]]}"
-                )
-
-            # Use only successful embeddings
-            batch_embeddings = result.embeddings
-            successful_texts = result.texts_processed
-
-            if not batch_embeddings:
-                search_logger.warning(
-                    f"Skipping batch {batch_num} - no successful embeddings created"
-                )
-                completed_batches += 1
-                continue
-
-            # Prepare batch data - only for successful embeddings
-            batch_data = []
-            # Map successful texts back to their original indices
-            for j, (embedding, text) in enumerate(
-                zip(batch_embeddings, successful_texts, strict=False)
-            ):
-                # Find the original index of this text
-                orig_idx = None
-                for idx, orig_text in enumerate(contextual_contents):
-                    if orig_text == text:
-                        orig_idx = idx
-                        break
-
-                if orig_idx is None:
-                    search_logger.warning("Could not map embedding back to original text")
+                    await ready.put((batch_num, []))
                     continue
 
-                j = orig_idx  # Use original index for metadata lookup
-                # Use source_id from metadata if available, otherwise extract from URL
-                if batch_metadatas[j].get("source_id"):
-                    source_id = batch_metadatas[j]["source_id"]
-                else:
-                    # Fallback: Extract source_id from URL
-                    parsed_url = urlparse(batch_urls[j])
-                    source_id = parsed_url.netloc or parsed_url.path
-
-                data = {
-                    "url": batch_urls[j],
-                    "chunk_number": batch_chunk_numbers[j],
-                    "content": text,  # Use the successful text
-                    "metadata": {"chunk_size": len(text), **batch_metadatas[j]},
-                    "source_id": source_id,
-                    "embedding": embedding,  # Use the successful embedding
-                }
-                batch_data.append(data)
-
-            # Insert batch with retry logic - no progress reporting
-
-            max_retries = 3
-            retry_delay = 1.0
-
-            for retry in range(max_retries):
-                # Check for cancellation before each retry attempt
-                if cancellation_check:
-                    cancellation_check()
-
-                try:
-                    client.table("archon_crawled_pages").insert(batch_data).execute()
-
-                    # Increment completed batches and report simple progress
-                    completed_batches += 1
-                    # Ensure last batch reaches 100%
-                    if completed_batches == total_batches:
-                        new_percentage = 100
+                # Prepare batch data - only for successful embeddings, each mapped back to
+                # its input position so duplicate texts keep their own url and chunk_number
+                batch_data = []
+                for j, embedding, text in zip(
+                    result.indices_processed, result.embeddings, result.texts_processed, strict=False
+                ):
+                    # Use source_id from metadata if available, otherwise extract from URL
+                    if batch_metadatas[j].get("source_id"):
+                        source_id = batch_metadatas[j]["source_id"]
                     else:
-                        new_percentage = int((completed_batches / total_batches) * 100)
-
-                    complete_msg = (
-                        f"Completed batch {batch_num}/{total_batches} ({len(batch_data)} chunks)"
-                    )
-
-                    # Simple batch completion info
-                    batch_info = {
-                        "completed_batches": completed_batches,
-                        "total_batches": total_batches,
-                        "current_batch": batch_num,
-                        "chunks_processed": len(batch_data),
-                        "max_workers": max_workers if use_contextual_embeddings else 0,
+                        # Fallback: Extract source_id from URL
+                        parsed_url = urlparse(batch_urls[j])
+                        source_id = parsed_url.netloc or parsed_url.path
+
+                    metadata = {"chunk_size": len(text), **batch_metadatas[j]}
+                    data = {
+                        "url": batch_urls[j],
+                        "chunk_number": batch_chunk_numbers[j],
+                        "content": text,  # Use the successful text
+                        "metadata": metadata,
+                        "source_id": source_id,
+                        # Serialize the float32 vector only at the insert boundary
+                        **embedding_columns(embedding.tolist(), vector_storage_mode),
+                        "content_hash": batch_hashes[j],
                     }
-                    await report_progress(complete_msg, new_percentage, batch_info)
-                    break
-
-                except Exception as e:
-                    if retry < max_retries - 1:
-                        search_logger.warning(
-                            f"Error inserting batch (attempt {retry + 1}/{max_retries}): {e}"
-                        )
-                        await asyncio.sleep(retry_delay)
-                        retry_delay *= 2  # Exponential backoff
-                    else:
-                        search_logger.error(
-                            f"Failed to insert batch after {max_retries} attempts: {e}"
-                        )
-                        # Try individual inserts as last resort
-                        successful_inserts = 0
-                        for record in batch_data:
-                            # Check for cancellation before each individual insert
-                            if cancellation_check:
-                                cancellation_check()
+                    if page_ids:
+                        # Every row in a request needs the same keys, so page_id is always set
+                        data["page_id"] = page_ids.get(batch_urls[j])
+                        if data["page_id"] is not None:
+                            data["metadata"] = split_page_metadata(metadata)[1]
+                    batch_data.append(data)
+
+                embedded_batches += 1
+                # Blocks while the writer is pipeline_depth batches behind
+                await ready.put((batch_num, batch_data))
+
+        async def insert_batches():
+            nonlocal completed_batches
+
+            while True:
+                batch_num, batch_data = await ready.get()
+                if batch_data:
+                    await _insert_batch(client, batch_data, cancellation_check, bulk_loader)
+
+                # Increment completed batches and report simple progress
+                completed_batches += 1
+                # Ensure last batch reaches 100%
+                if completed_batches == total_batches:
+                    new_percentage = 100
+                else:
+                    new_percentage = int((completed_batches / total_batches) * 100)
+
+                batch_info = stage_info("stored", batch_num, len(batch_data))
+                batch_info["chunks_processed"] = len(batch_data)
+                await report_progress(
+                    f"Completed batch {batch_num}/{total_batches} ({len(batch_data)} chunks)",
+                    new_percentage,
+                    batch_info,
+                )
 
-                            try:
-                                client.table("archon_crawled_pages").insert(record).execute()
-                                successful_inserts += 1
-                            except Exception as individual_error:
-                                search_logger.error(
-                                    f"Failed individual insert for {record['url']}: {individual_error}"
-                                )
+                if completed_batches == total_batches:
+                    return
 
-                        search_logger.info(
-                            f"Individual inserts: {successful_inserts}/{len(batch_data)} successful"
-                        )
+        if total_batches:
+            await _run_pipeline(embed_batches(), insert_batches())
 
-            # Minimal delay between batches to prevent overwhelming
-            if i + batch_size < len(contents):
-                # Only yield control briefly to keep Socket.IO responsive
-                await asyncio.sleep(0.1)  # Reduced from 1.5s/0.5s to 0.1s
+        if failed_chunks:
+            await _delete_failed_chunks(client, failed_chunks, cancellation_check)
+        await _trim_stale_chunks(client, chunk_counts, delete_batch_size, cancellation_check)
 
         # Send final 100% progress report to ensure UI shows completion
         if progress_callback and asyncio.iscoroutinefunction(progress_callback):
@@ -378,3 +386,183 @@ async def add_documents_to_supabase(
 
         span.set_attribute("success", True)
         span.set_attribute("total_processed", len(contents))
+
+
+def compute_chunk_hash(content: str, embedding_signature: str = "") -> str:
+    """
+    Hash a chunk's original text to detect unchanged chunks on re-crawl.
+
+    The embedding signature (model, dimensions, contextual flag) is hashed along with
+    the text, so a chunk embedded under a different configuration reads as changed.
+    """
+    digest = hashlib.sha256(content.encode("utf-8"))
+    if embedding_signature:
+        digest.update(b"\0" + embedding_signature.encode("utf-8"))
+    return digest.hexdigest()
+
+
+async def _fetch_existing_chunk_hashes(
+    client, urls: list[str], url_batch_size: int, cancellation_check: Any | None = None
+) -> dict[tuple[str, int], str | None]:
+    """Load (url, chunk_number) -> content hash for the stored chunks of the given URLs."""
+    existing = {}
+    for i in range(0, len(urls), url_batch_size):
+        if cancellation_check:
+            cancellation_check()
+
+        batch_urls = urls[i : i + url_batch_size]
+        offset = 0
+        # PostgREST caps rows per response, so page through large result sets
+        while True:
+            response = await execute_query(
+                client.table("archon_crawled_pages")
+                .select("url, chunk_number, content_hash")
+                .in_("url", batch_urls)
+                .order("url")
+                .order("chunk_number")
+                .range(offset, offset + _EXISTING_ROWS_PAGE_SIZE - 1),
+                operation="fetch_chunk_hashes",
+            )
+            rows = response.data or []
+            for row in rows:
+                existing[(row["url"], row["chunk_number"])] = row.get("content_hash")
+            if len(rows) < _EXISTING_ROWS_PAGE_SIZE:
+                break
+            offset += _EXISTING_ROWS_PAGE_SIZE
+    return existing
+
+
+async def _plan_incremental_update(
+    client,
+    urls: list[str],
+    chunk_numbers: list[int],
+    content_hashes: list[str],
+    url_batch_size: int,
+    cancellation_check: Any | None = None,
+) -> list[int]:
+    """
+    Diff new chunks against the stored ones for the same URLs.
+
+    A chunk is unchanged when its (url, chunk_number) is stored with the same content hash.
+    Changed chunks are overwritten by the upsert and vanished ones removed by the tail trim,
+    so only the chunks to write need to be known.
+
+    Returns:
+        Indices of the new chunks that need embedding and writing
+    """
+    existing = await _fetch_existing_chunk_hashes(
+        client, list(dict.fromkeys(urls)), url_batch_size, cancellation_check
+    )
+
+    return [
+        i
+        for i, (url, chunk_number, content_hash) in enumerate(
+            zip(urls, chunk_numbers, content_hashes, strict=False)
+        )
+        if existing.get((url, chunk_number)) != content_hash
+    ]
+
+
+async def _trim_stale_chunks(
+    client, chunk_counts: dict[str, int], batch_size: int, cancellation_check: Any | None = None
+) -> None:
+    """Delete stored chunks at or beyond each URL's new chunk count."""
+    items = list(chunk_counts.items())
+    for i in range(0, len(items), batch_size):
+        if cancellation_check:
+            cancellation_check()
+
+        batch = items[i : i + batch_size]
+        try:
+            await execute_query(
+                client.rpc(
+                    "trim_archon_crawled_pages",
+                    {"urls": [url for url, _ in batch], "chunk_counts": [n for _, n in batch]},
+                ),
+                operation="trim_stale_chunks",
+            )
+        except Exception as e:
+            # Databases set up before the trim function existed: trim URL by URL
+            search_logger.warning(f"Trim RPC failed: {e}. Trimming URLs individually.")
+            for url, chunk_count in batch:
+                try:
+                    await execute_query(
+                        client.table("archon_crawled_pages")
+                        .delete()
+                        .eq("url", url)
+                        .gte("chunk_number", chunk_count),
+                        operation="trim_stale_chunks",
+                    )
+                except Exception as inner_e:
+                    search_logger.error(f"Error trimming stale chunks for {url}: {inner_e}")
+
+
+async def _delete_failed_chunks(
+    client, failed_chunks: dict[str, list[int]], cancellation_check: Any | None = None
+) -> None:
+    """
+    Delete stored rows for chunks that could not be re-embedded.
+
+    The upsert leaves an existing row untouched when its new embedding fails, so the
+    row would keep stale content and a stale vector. Removing it lets the next crawl
+    see the chunk as missing and embed it again.
+    """
+    for url, numbers in failed_chunks.items():
+        if cancellation_check:
+            cancellation_check()
+        try:
+            await execute_query(
+                client.table("archon_crawled_pages")
+                .delete()
+                .eq("url", url)
+                .in_("chunk_number", numbers),
+                operation="delete_failed_chunks",
+            )
+        except Exception as e:
+            search_logger.error(f"Error deleting chunks that failed to embed for {url}: {e}")
+
+
+async def _run_pipeline(*stages) -> None:
+    """Run pipeline stages concurrently; if one fails, cancel the rest and re-raise."""
+    tasks = [asyncio.create_task(stage) for stage in stages]
+    try:
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    for task in done:
+        if task.exception() is not None:
+            raise task.exception()
+
+
+async def _insert_batch(
+    client,
+    batch_data: list[dict],
+    cancellation_check: Any | None = None,
+    bulk_loader: PostgresBulkLoader | None = None,
+) -> None:
+    """
+    Upsert a batch of chunks on (url, chunk_number).
+
+    With a bulk loader the batch is COPY-loaded over a direct Postgres connection first,
+    falling back to the REST path if that fails. REST writes retry with backoff and then
+    bisect the batch so failing rows are isolated and quarantined. The Supabase calls run
+    on the database executor so the event loop keeps embedding the next batch meanwhile.
+    """
+    if bulk_loader is not None:
+        try:
+            await bulk_loader.upsert("archon_crawled_pages", batch_data)
+            return
+        except Exception as e:
+            search_logger.warning(f"Bulk load failed, falling back to REST writes: {e}")
+
+    await write_rows(
+        client,
+        "archon_crawled_pages",
+        batch_data,
+        on_conflict="url,chunk_number",
+        cancellation_check=cancellation_check,
+    )
@@ -0,0 +1,111 @@
+"""
+Page Storage Service
+
+One ``archon_pages`` row per crawled URL holds what every chunk of that page used to
+repeat in its own metadata (url, title, description, source, knowledge type, tags),
+along with the page's full markdown, its content hash, the ETag it was served with and
+when it was last crawled. Chunks in ``archon_crawled_pages`` reference their page by
+``page_id`` and keep only chunk-level metadata; search merges the two back together.
+"""
+
+import hashlib
+from datetime import UTC, datetime
+from typing import Any
+from urllib.parse import urlparse
+
+from postgrest.types import ReturnMethod
+
+from ...config.logfire_config import search_logger
+from ..database_executor import execute_query
+
+# Metadata keys shared by every chunk of a page, stored once on the page row
+PAGE_METADATA_KEYS = frozenset({
+    "url",
+    "title",
+    "description",
+    "source",
+    "source_id",
+    "knowledge_type",
+    "crawl_type",
+    "tags",
+    "filename",
+})
+
+# Pages carry their full markdown, so keep upsert requests to a modest size
+_PAGE_UPSERT_BATCH_SIZE = 20
+
+
+def split_page_metadata(metadata: dict[str, Any]) -> tuple[dict[str, Any], dict[str, Any]]:
+    """Split chunk metadata into its (page-level, chunk-level) parts."""
+    page = {key: value for key, value in metadata.items() if key in PAGE_METADATA_KEYS}
+    chunk = {key: value for key, value in metadata.items() if key not in PAGE_METADATA_KEYS}
+    return page, chunk
+
+
+def merge_page_metadata(page_metadata: dict[str, Any] | None, chunk_metadata: dict[str, Any]) -> dict[str, Any]:
+    """Rebuild a chunk's full metadata; chunk keys win, matching the SQL ``||`` merge."""
+    return {**(page_metadata or {}), **(chunk_metadata or {})}
+
+
+def build_page_rows(
+    urls: list[str],
+    metadatas: list[dict[str, Any]],
+    url_to_full_document: dict[str, str],
+    chunk_counts: dict[str, int],
+    url_to_etag: dict[str, str] | None = None,
+) -> list[dict[str, Any]]:
+    """Build one page row per URL from the metadata of its first chunk."""
+    crawled_at = datetime.now(UTC).isoformat()
+    url_to_etag = url_to_etag or {}
+    rows: dict[str, dict[str, Any]] = {}
+    for url, metadata in zip(urls, metadatas, strict=False):
+        if url in rows:
+            continue
+        page_metadata, _ = split_page_metadata(metadata)
+        document = url_to_full_document.get(url)
+        # source_id is NOT NULL; fall back to the URL's host like chunk storage does
+        source_id = metadata.get("source_id")
+        if not source_id:
+            parsed_url = urlparse(url)
+            source_id = parsed_url.netloc or parsed_url.path
+        rows[url] = {
+            "url": url,
+            "source_id": source_id,
+            "metadata": page_metadata,
+            "content": document,
+            "content_hash": hashlib.sha256(document.encode("utf-8")).hexdigest() if document else None,
+            "etag": url_to_etag.get(url),
+            "chunk_count": chunk_counts.get(url, 0),
+            "last_crawled_at": crawled_at,
+        }
+    return list(rows.values())
+
+
+async def upsert_pages(client, rows: list[dict[str, Any]], cancellation_check: Any | None = None) -> dict[str, int]:
+    """
+    Upsert page rows on url.
+
+    Returns:
+        Mapping of url to page id for the stored pages
+    """
+    page_ids: dict[str, int] = {}
+    for i in range(0, len(rows), _PAGE_UPSERT_BATCH_SIZE):
+        if cancellation_check:
+            cancellation_check()
+
+        batch = rows[i : i + _PAGE_UPSERT_BATCH_SIZE]
+        batch_urls = [row["url"] for row in batch]
+        # Minimal return keeps PostgREST from echoing every page's markdown back
+        await execute_query(
+            client.table("archon_pages").upsert(batch, on_conflict="url", returning=ReturnMethod.minimal),
+            operation="upsert_pages",
+        )
+        response = await execute_query(
+            client.table("archon_pages").select("id, url").in_("url", batch_urls),
+            operation="fetch_page_ids",
+        )
+        for row in response.data or []:
+            page_ids[row["url"]] = row["id"]
+
+    search_logger.debug(f"Upserted {len(page_ids)} pages")
+    return page_ids
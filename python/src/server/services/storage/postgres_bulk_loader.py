@@ -0,0 +1,179 @@
+"""
+Postgres Bulk Loader
+
+Direct-Postgres ingestion path for crawled pages and code examples.
+
+Inserting through PostgREST means every 1536-float embedding is serialized as JSON text,
+each batch is a separate HTTP request, and a failed batch degrades into per-row inserts.
+This loader instead streams rows over an asyncpg connection with binary COPY into a
+temporary staging table, then merges them into the target table with a single
+``INSERT ... SELECT ... ON CONFLICT (url, chunk_number) DO UPDATE``. Both steps run in
+one transaction, so a batch lands completely or not at all.
+
+Enabled with DOCUMENT_STORAGE_BACKEND=postgres (rag_strategy setting) and a DATABASE_URL
+(or SUPABASE_DB_URL) connection string in the environment; otherwise callers keep using
+the Supabase REST client.
+"""
+
+import json
+import os
+from collections.abc import Sequence
+from typing import Any
+
+from ...config.logfire_config import search_logger
+
+# Staging column types per target table. Embeddings are staged as real[] because COPY uses
+# the binary protocol, which asyncpg has codecs for, and cast to vector on merge.
+_TABLE_COLUMNS: dict[str, dict[str, str]] = {
+    "archon_crawled_pages": {
+        "url": "varchar",
+        "chunk_number": "integer",
+        "content": "text",
+        "metadata": "jsonb",
+        "source_id": "text",
+        "embedding": "real[]",
+        "embedding_half": "real[]",
+        "content_hash": "text",
+        "page_id": "bigint",
+    },
+    "archon_code_examples": {
+        "url": "varchar",
+        "chunk_number": "integer",
+        "content": "text",
+        "summary": "text",
+        "metadata": "jsonb",
+        "source_id": "text",
+        "embedding": "real[]",
+        "embedding_half": "real[]",
+        "code_fingerprint": "text",
+    },
+}
+
+_CONFLICT_KEY = ("url", "chunk_number")
+# Staged real[] embeddings are cast to the column's pgvector type on merge
+_VECTOR_CASTS = {"embedding": "vector", "embedding_half": "halfvec"}
+
+
+def _staging_value(column: str, value: Any) -> Any:
+    if value is None:
+        return None
+    if column == "metadata":
+        return json.dumps(value)
+    if column in _VECTOR_CASTS:
+        return [float(x) for x in value]
+    return value
+
+
+def build_merge_sql(table: str, staging_table: str, columns: Sequence[str]) -> str:
+    """Build the INSERT ... SELECT that merges staged rows into the target table."""
+    select_exprs = ", ".join(
+        f"{column}::{_VECTOR_CASTS[column]}" if column in _VECTOR_CASTS else column
+        for column in columns
+    )
+    updates = ", ".join(
+        f"{column} = EXCLUDED.{column}" for column in columns if column not in _CONFLICT_KEY
+    )
+    return (
+        f"INSERT INTO {table} ({', '.join(columns)}) "
+        f"SELECT {select_exprs} FROM {staging_table} "
+        f"ON CONFLICT ({', '.join(_CONFLICT_KEY)}) DO UPDATE SET {updates}"
+    )
+
+
+class PostgresBulkLoader:
+    """Loads rows into Archon tables via asyncpg COPY and an upserting merge."""
+
+    def __init__(self, dsn: str, max_connections: int = 4):
+        self.dsn = dsn
+        self.max_connections = max_connections
+        self._pool = None
+
+    async def _get_pool(self):
+        if self._pool is None:
+            import asyncpg
+
+            # statement_cache_size=0 keeps this compatible with transaction-mode poolers
+            self._pool = await asyncpg.create_pool(
+                self.dsn, min_size=1, max_size=self.max_connections, statement_cache_size=0
+            )
+        return self._pool
+
+    async def upsert(self, table: str, rows: list[dict[str, Any]]) -> int:
+        """
+        Bulk upsert rows into a table keyed on (url, chunk_number).
+
+        Args:
+            table: archon_crawled_pages or archon_code_examples
+            rows: Row dicts in the same shape as the REST insert payload
+
+        Returns:
+            Number of rows written
+        """
+        if table not in _TABLE_COLUMNS:
+            raise ValueError(f"Bulk loading is not supported for table {table}")
+        if not rows:
+            return 0
+
+        column_types = _TABLE_COLUMNS[table]
+        columns = [column for column in column_types if any(column in row for row in rows)]
+
+        # ON CONFLICT DO UPDATE can't touch the same row twice in one statement, keep the last
+        deduped = {(row["url"], row["chunk_number"]): row for row in rows}
+        records = [
+            tuple(_staging_value(column, row.get(column)) for column in columns)
+            for row in deduped.values()
+        ]
+
+        staging_table = f"_stage_{table}"
+        pool = await self._get_pool()
+        async with pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute(
+                    f"CREATE TEMP TABLE {staging_table} "
+                    f"({', '.join(f'{c} {column_types[c]}' for c in columns)}) ON COMMIT DROP"
+                )
+                await conn.copy_records_to_table(staging_table, records=records, columns=columns)
+                await conn.execute(build_merge_sql(table, staging_table, columns))
+
+        search_logger.debug(f"Bulk loaded {len(records)} rows into {table}")
+        return len(records)
+
+    async def close(self) -> None:
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+
+# Global loader instance
+_bulk_loader: PostgresBulkLoader | None = None
+
+
+def get_postgres_bulk_loader() -> PostgresBulkLoader | None:
+    """Get the global bulk loader, or None when no direct database URL is configured."""
+    global _bulk_loader
+    if _bulk_loader is None:
+        dsn = os.getenv("DATABASE_URL") or os.getenv("SUPABASE_DB_URL")
+        if not dsn:
+            return None
+        _bulk_loader = PostgresBulkLoader(dsn)
+    return _bulk_loader
+
+
+def resolve_bulk_loader(rag_settings: dict[str, Any] | None) -> PostgresBulkLoader | None:
+    """Return the bulk loader if DOCUMENT_STORAGE_BACKEND selects it and it can be used."""
+    backend = (rag_settings or {}).get("DOCUMENT_STORAGE_BACKEND", "supabase").lower()
+    if backend != "postgres":
+        return None
+
+    loader = get_postgres_bulk_loader()
+    if loader is None:
+        search_logger.warning(
+            "DOCUMENT_STORAGE_BACKEND=postgres but DATABASE_URL is not set, using Supabase REST"
+        )
+    return loader
+
+
+async def close_postgres_bulk_loader() -> None:
+    """Close the global bulk loader's connection pool on application shutdown."""
+    if _bulk_loader is not None:
+        await _bulk_loader.close()
@@ -69,16 +69,13 @@ class DocumentStorageService(BaseStorageService):
 
                 await report_progress("Starting document processing...", 10)
 
-                # Use base class chunking
-                chunks = await self.smart_chunk_text_async(
-                    file_content,
-                    chunk_size=5000,
-                    progress_callback=lambda msg, pct: report_progress(
-                        f"Chunking: {msg}", 10 + float(pct) * 0.2
-                    ),
+                # Chunk and extract metadata in a worker process
+                chunked = await self.chunk_text_with_metadata_async(
+                    file_content, chunk_size=5000, **await self.get_chunking_options()
                 )
+                await report_progress("Chunking: Text chunking completed", 30)
 
-                if not chunks:
+                if not chunked:
                     raise ValueError("No content could be extracted from the document")
 
                 await report_progress("Preparing document chunks...", 30)
@@ -92,19 +89,16 @@ class DocumentStorageService(BaseStorageService):
                 total_word_count = 0
 
                 # Process chunks with metadata
-                for i, chunk in enumerate(chunks):
-                    # Use base class metadata extraction
-                    meta = self.extract_metadata(
-                        chunk,
-                        {
-                            "chunk_index": i,
-                            "url": doc_url,
-                            "source": source_id,
-                            "source_id": source_id,
-                            "knowledge_type": knowledge_type,
-                            "filename": filename,
-                        },
-                    )
+                for i, (chunk, chunk_meta) in enumerate(chunked):
+                    meta = {
+                        **chunk_meta,
+                        "chunk_index": i,
+                        "url": doc_url,
+                        "source": source_id,
+                        "source_id": source_id,
+                        "knowledge_type": knowledge_type,
+                        "filename": filename,
+                    }
 
                     if tags:
                         meta["tags"] = tags
@@ -155,18 +149,18 @@ class DocumentStorageService(BaseStorageService):
                 await report_progress("Document upload completed!", 100)
 
                 result = {
-                    "chunks_stored": len(chunks),
+                    "chunks_stored": len(chunked),
                     "total_word_count": total_word_count,
                     "source_id": source_id,
                     "filename": filename,
                 }
 
                 span.set_attribute("success", True)
-                span.set_attribute("chunks_stored", len(chunks))
+                span.set_attribute("chunks_stored", len(chunked))
                 span.set_attribute("total_word_count", total_word_count)
 
                 logger.info(
-                    f"Document upload completed successfully: filename={filename}, chunks_stored={len(chunks)}, total_word_count={total_word_count}"
+                    f"Document upload completed successfully: filename={filename}, chunks_stored={len(chunked)}, total_word_count={total_word_count}"
                 )
 
                 return True, result
@@ -230,20 +224,17 @@ class DocumentStorageService(BaseStorageService):
         # Extract text content
         content = document.get("content", "")
 
-        # Chunk the content
-        chunks = await self.smart_chunk_text_async(content)
+        # Chunk the content and extract metadata for each chunk
+        chunked = await self.chunk_text_with_metadata_async(content)
 
-        # Extract metadata for each chunk
         processed_chunks = []
-        for i, chunk in enumerate(chunks):
-            meta = self.extract_metadata(
-                chunk, {"chunk_index": i, "source": document.get("source", "unknown")}
-            )
+        for i, (chunk, meta) in enumerate(chunked):
+            meta.update({"chunk_index": i, "source": document.get("source", "unknown")})
             processed_chunks.append({"content": chunk, "metadata": meta})
 
         return {
             "chunks": processed_chunks,
-            "total_chunks": len(chunks),
+            "total_chunks": len(chunked),
             "source": document.get("source"),
         }
 
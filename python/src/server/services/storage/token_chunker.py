@@ -0,0 +1,180 @@
+"""
+Token Chunker
+
+Single-pass, token-budgeted text chunking.
+
+``BaseStorageService.smart_chunk_text`` sizes chunks in characters, which maps poorly
+onto the token limits of embedding models (a 5000 character chunk of code can be twice
+the tokens of the same length of prose). This chunker sizes chunks in tokens from the
+local tokenizer while keeping the same boundary preferences: code fences first, then
+paragraph breaks, then sentence ends, and only splits mid-content when a single span
+is larger than the budget on its own.
+
+The text is scanned once for boundaries, the resulting pieces are tokenized in one
+batch, and chunks are packed greedily from the piece token counts, so the cost is
+linear in the document size.
+"""
+
+import re
+from itertools import accumulate
+from typing import Any
+
+from ..embeddings.token_batching import _CHARS_PER_TOKEN, count_tokens_batch, get_encoder
+
+DEFAULT_CHUNK_MAX_TOKENS = 1000
+
+# Boundary priorities, higher is a better place to end a chunk
+_END = 4
+_FENCE = 3
+_PARAGRAPH = 2
+_SENTENCE = 1
+
+# A chunk is only ended early at a boundary once it holds this fraction of the budget
+_MIN_BREAK_FRACTION = 0.3
+
+_BOUNDARY_PATTERN = re.compile(r"```|\n\n|\. ")
+
+
+def split_at_boundaries(text: str) -> tuple[list[str], list[int]]:
+    """
+    Split text into pieces that end at candidate chunk boundaries.
+
+    Returns:
+        Tuple of (pieces, priorities) where priorities[i] rates the boundary after
+        pieces[i]. Joining the pieces gives back the original text.
+    """
+    pieces: list[str] = []
+    priorities: list[int] = []
+    start = 0
+    in_code_block = False
+
+    for match in _BOUNDARY_PATTERN.finditer(text):
+        marker = match.group()
+        if marker == "```":
+            # Break before an opening fence and after a closing one so blocks stay whole
+            cut = match.start() if not in_code_block else match.end()
+            priority = _FENCE
+            in_code_block = not in_code_block
+        elif marker == "\n\n":
+            cut = match.start()
+            priority = _SENTENCE if in_code_block else _PARAGRAPH
+        else:
+            cut = match.start() + 1
+            priority = _SENTENCE
+
+        if cut > start:
+            pieces.append(text[start:cut])
+            priorities.append(priority)
+            start = cut
+        elif pieces:
+            priorities[-1] = max(priorities[-1], priority)
+
+    if start < len(text):
+        pieces.append(text[start:])
+        priorities.append(_END)
+
+    return pieces, priorities
+
+
+def _hard_split(piece: str, max_tokens: int, encoder: Any | None) -> list[str]:
+    """Split a piece with no usable boundary into budget-sized slices."""
+    if encoder is None:
+        step = max_tokens * _CHARS_PER_TOKEN
+        return [piece[i : i + step] for i in range(0, len(piece), step)]
+
+    tokens = encoder.encode_ordinary(piece)
+    return [encoder.decode(tokens[i : i + max_tokens]) for i in range(0, len(tokens), max_tokens)]
+
+
+def chunk_text_by_tokens(
+    text: str,
+    max_tokens: int = DEFAULT_CHUNK_MAX_TOKENS,
+    overlap_tokens: int = 0,
+    model: str | None = None,
+) -> list[str]:
+    """
+    Split text into chunks of at most ``max_tokens`` tokens at natural boundaries.
+
+    Args:
+        text: Text to chunk
+        max_tokens: Token budget per chunk
+        overlap_tokens: Tokens of trailing context repeated at the start of the next
+            chunk. Overlap is taken in whole pieces (sentences or paragraphs), so it
+            may be shorter than requested but never splits a sentence.
+        model: Optional model name used to pick the tokenizer
+
+    Returns:
+        List of text chunks
+    """
+    if not text or not isinstance(text, str):
+        return []
+    if max_tokens < 1:
+        raise ValueError("max_tokens must be positive")
+    overlap_tokens = max(0, min(overlap_tokens, int(max_tokens * _MIN_BREAK_FRACTION)))
+
+    pieces, priorities = split_at_boundaries(text)
+    counts = count_tokens_batch(pieces, model)
+    # prefix[i] is the token count of pieces[:i]
+    prefix = [0, *accumulate(counts)]
+    min_break_tokens = max_tokens * _MIN_BREAK_FRACTION
+
+    chunks: list[str] = []
+
+    def emit(start: int, end: int) -> None:
+        chunk = "".join(pieces[start:end]).strip()
+        if chunk:
+            chunks.append(chunk)
+
+    def overlap_start(cut: int, floor: int) -> int:
+        # Walk back over whole pieces while they fit in the overlap budget
+        start = cut
+        while start > floor + 1 and prefix[cut] - prefix[start - 1] <= overlap_tokens:
+            start -= 1
+        return start
+
+    # The current chunk holds pieces[window_start:position]; pieces before fresh_start
+    # are overlap carried over from the previous chunk and are not valid cut points
+    window_start = fresh_start = 0
+    position = 0
+    total = len(pieces)
+
+    while position < total:
+        tokens = counts[position]
+
+        if tokens > max_tokens:
+            if position > fresh_start:
+                emit(window_start, position)
+            parts = _hard_split(pieces[position], max_tokens, get_encoder(model))
+            chunks.extend(part.strip() for part in parts if part.strip())
+            position += 1
+            window_start = fresh_start = position
+            continue
+
+        if prefix[position + 1] - prefix[window_start] <= max_tokens:
+            position += 1
+            continue
+
+        # Budget exceeded: end the chunk at the best boundary past the minimum fill,
+        # preferring higher priority and then the later position
+        cut = position
+        best_priority = -1
+        for end in range(fresh_start + 1, position + 1):
+            if prefix[end] - prefix[window_start] < min_break_tokens:
+                continue
+            if priorities[end - 1] >= best_priority:
+                best_priority = priorities[end - 1]
+                cut = end
+
+        if cut <= fresh_start:
+            # Only overlap in the window, drop it and start clean from here
+            window_start = fresh_start = position
+            continue
+
+        emit(window_start, cut)
+        window_start = overlap_start(cut, window_start) if overlap_tokens else cut
+        fresh_start = cut
+
+    if total > fresh_start:
+        emit(window_start, total)
+
+    return chunks
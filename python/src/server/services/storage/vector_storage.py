@@ -0,0 +1,137 @@
+"""
+Vector Storage
+
+Embeddings are stored at full precision in the ``embedding`` column (pgvector ``vector``,
+4 bytes per dimension) or, with VECTOR_STORAGE_MODE=half (rag_strategy setting), at half
+precision in the ``embedding_half`` column (``halfvec``, 2 bytes per dimension). Half
+precision halves the heap and ivfflat index pages a search reads, for a small recall
+cost; ``benchmarks/bench_vector_storage.py`` measures both on a local pgvector.
+
+Each row keeps its embedding in exactly one of the two columns and the match functions
+search the column of the configured mode, so after changing the mode existing rows have
+to be moved with the re-encode job (which also switches the setting):
+
+    uv run python -m src.server.services.storage.vector_storage half
+"""
+
+import argparse
+import asyncio
+from collections.abc import Callable
+from typing import Any
+
+from ...config.logfire_config import search_logger
+from ..database_executor import execute_query
+
+VECTOR_STORAGE_MODES = ("full", "half")
+# Match functions that take the use_halfvec flag, and the tables they search
+HALFVEC_RPCS = ("match_archon_crawled_pages", "match_archon_code_examples")
+EMBEDDING_TABLES = ("archon_crawled_pages", "archon_code_examples")
+
+# Rows moved per call of the re-encode function; each call is its own transaction
+REENCODE_BATCH_SIZE = 1000
+
+
+def resolve_vector_storage_mode(rag_settings: dict[str, Any] | None) -> str:
+    """Return the configured VECTOR_STORAGE_MODE, falling back to full precision."""
+    mode = str((rag_settings or {}).get("VECTOR_STORAGE_MODE", "full")).lower()
+    if mode not in VECTOR_STORAGE_MODES:
+        search_logger.warning(f"Unknown VECTOR_STORAGE_MODE {mode!r}, using full precision")
+        return "full"
+    return mode
+
+
+def embedding_columns(embedding: list[float], mode: str) -> dict[str, Any]:
+    """
+    Row columns holding an embedding in the given storage mode.
+
+    Full precision writes only ``embedding`` so databases without the half-precision
+    column keep working; half precision clears ``embedding`` so a rewritten row doesn't
+    keep a stale full-precision copy.
+    """
+    if mode == "half":
+        return {"embedding": None, "embedding_half": embedding}
+    return {"embedding": embedding}
+
+
+async def get_vector_storage_mode() -> str:
+    """Look up the storage mode from the (cached) RAG settings."""
+    try:
+        from ..credential_service import credential_service
+
+        rag_settings = await credential_service.get_credentials_by_category("rag_strategy")
+    except Exception as e:
+        search_logger.warning(f"Failed to load vector storage mode: {e}, using full precision")
+        return "full"
+    return resolve_vector_storage_mode(rag_settings)
+
+
+async def reencode_embeddings(
+    client,
+    mode: str,
+    batch_size: int = REENCODE_BATCH_SIZE,
+    progress_callback: Callable[[str, int], None] | None = None,
+) -> dict[str, int]:
+    """
+    Move every stored embedding into the column of the given storage mode.
+
+    Rows are converted in batches until none are left, then the target column's ivfflat
+    index is rebuilt, since it was built before the column had data to pick its lists from.
+    Space freed in the source column is reclaimed by (auto)vacuum.
+
+    Returns:
+        Number of rows re-encoded per table
+    """
+    if mode not in VECTOR_STORAGE_MODES:
+        raise ValueError(f"Unknown vector storage mode {mode!r}")
+
+    to_half = mode == "half"
+    moved: dict[str, int] = {}
+    for table in EMBEDDING_TABLES:
+        moved[table] = 0
+        while True:
+            response = await execute_query(
+                client.rpc(
+                    "reencode_archon_embeddings",
+                    {"target_table": table, "to_half": to_half, "batch_size": batch_size},
+                ),
+                operation="reencode_embeddings",
+            )
+            count = int(response.data or 0)
+            if not count:
+                break
+            moved[table] += count
+            if progress_callback:
+                progress_callback(table, moved[table])
+
+        await execute_query(
+            client.rpc("reindex_archon_embeddings", {"target_table": table, "to_half": to_half}),
+            operation="reindex_embeddings",
+        )
+        search_logger.info(f"Re-encoded {moved[table]} {table} embeddings to {mode} precision")
+    return moved
+
+
+async def _run_reencode(mode: str, batch_size: int) -> None:
+    from ..client_manager import get_supabase_client
+    from ..credential_service import credential_service
+
+    # Switch first so rows written while the job runs already land in the new column
+    await credential_service.set_credential("VECTOR_STORAGE_MODE", mode, category="rag_strategy")
+    await reencode_embeddings(
+        get_supabase_client(),
+        mode,
+        batch_size,
+        lambda table, count: print(f"{table}: {count} rows re-encoded", flush=True),
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Re-encode stored embeddings to a vector storage mode")
+    parser.add_argument("mode", choices=VECTOR_STORAGE_MODES)
+    parser.add_argument("--batch-size", type=int, default=REENCODE_BATCH_SIZE)
+    args = parser.parse_args()
+    asyncio.run(_run_reencode(args.mode, args.batch_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -9,8 +9,12 @@ Based on proven patterns from crawl4ai_mcp.py architecture.
 
 import asyncio
 import gc
+import os
+import re
+import sqlite3
 import threading
 import time
+from abc import ABC, abstractmethod
 from collections import deque
 from collections.abc import Callable
 from concurrent.futures import ThreadPoolExecutor
@@ -45,9 +49,18 @@ class RateLimitConfig:
 
     tokens_per_minute: int = 200_000  # OpenAI embedding limit
     requests_per_minute: int = 3000  # Request rate limit
-    max_concurrent: int = 2  # Concurrent request limit
+    max_concurrent: int = 2  # Initial concurrent request limit, adapted at runtime
     backoff_multiplier: float = 1.5  # Exponential backoff multiplier
     max_backoff: float = 60.0  # Maximum backoff delay in seconds
+    min_concurrent: int = 1  # Floor for the adaptive concurrency limit
+    max_concurrent_ceiling: int = 32  # Ceiling for the adaptive concurrency limit
+    decrease_factor: float = 0.5  # Multiplicative decrease on 429s and latency spikes
+    decrease_cooldown: float = 2.0  # Minimum seconds between multiplicative decreases
+    latency_spike_ratio: float = 3.0  # Latency above this multiple of the baseline is a spike
+    # Where request/token budgets live: None (in-process), sqlite:///path or redis://host
+    shared_state_url: str | None = field(
+        default_factory=lambda: os.getenv("RATE_LIMIT_STATE_URL") or None
+    )
 
 
 @dataclass
@@ -74,86 +87,476 @@ class ThreadingConfig:
     health_check_interval: float = 30  # System health check frequency
 
 
+class RateLimitStateBackend(ABC):
+    """
+    Storage for GCRA theoretical arrival times (TATs).
+
+    ``reserve`` must atomically read the TAT of every bucket, advance each by its cost
+    and return how long the caller has to wait before its reservation is valid.
+    The in-memory backend serves one process; the SQLite and Redis backends let
+    several worker processes share one provider budget.
+    """
+
+    @abstractmethod
+    def reserve(self, buckets: list[tuple[str, float, float, float]], now: float) -> float:
+        """
+        Reserve capacity in every bucket.
+
+        Args:
+            buckets: (key, emission interval, burst tolerance, cost) per bucket
+            now: Current wall-clock time
+
+        Returns:
+            Seconds to wait before the reservation may be used (0 if immediately)
+        """
+        pass
+
+    @abstractmethod
+    def peek(self, keys: list[str]) -> dict[str, float]:
+        """Current TAT per key, for usage reporting."""
+        pass
+
+
+def _gcra_advance(
+    tats: list[float | None], buckets: list[tuple[str, float, float, float]], now: float
+) -> tuple[list[float], float]:
+    """Advance each bucket's TAT by its cost; return the new TATs and the required wait."""
+    new_tats = []
+    wait = 0.0
+    for tat, (_, interval, tolerance, cost) in zip(tats, buckets, strict=True):
+        new_tat = max(tat or now, now) + cost * interval
+        wait = max(wait, new_tat - tolerance - now)
+        new_tats.append(new_tat)
+    return new_tats, wait
+
+
+class InMemoryRateLimitState(RateLimitStateBackend):
+    """Process-local TAT storage."""
+
+    def __init__(self):
+        self._tats: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def reserve(self, buckets: list[tuple[str, float, float, float]], now: float) -> float:
+        with self._lock:
+            tats = [self._tats.get(key) for key, *_ in buckets]
+            new_tats, wait = _gcra_advance(tats, buckets, now)
+            for (key, *_), tat in zip(buckets, new_tats, strict=True):
+                self._tats[key] = tat
+        return wait
+
+    def peek(self, keys: list[str]) -> dict[str, float]:
+        with self._lock:
+            return {key: self._tats[key] for key in keys if key in self._tats}
+
+
+class SQLiteRateLimitState(RateLimitStateBackend):
+    """TAT storage in a local SQLite file shared by processes on the same host."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            conn = sqlite3.connect(
+                self.db_path, timeout=30, isolation_level=None, check_same_thread=False
+            )
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limit_state (key TEXT PRIMARY KEY, tat REAL NOT NULL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def reserve(self, buckets: list[tuple[str, float, float, float]], now: float) -> float:
+        with self._lock:
+            conn = self._connect()
+            # IMMEDIATE takes the write lock up front, serializing reservations across processes
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                tats = []
+                for key, *_ in buckets:
+                    row = conn.execute(
+                        "SELECT tat FROM rate_limit_state WHERE key = ?", (key,)
+                    ).fetchone()
+                    tats.append(row[0] if row else None)
+                new_tats, wait = _gcra_advance(tats, buckets, now)
+                conn.executemany(
+                    "INSERT OR REPLACE INTO rate_limit_state (key, tat) VALUES (?, ?)",
+                    [(key, tat) for (key, *_), tat in zip(buckets, new_tats, strict=True)],
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return wait
+
+    def peek(self, keys: list[str]) -> dict[str, float]:
+        with self._lock:
+            conn = self._connect()
+            placeholders = ",".join("?" * len(keys))
+            rows = conn.execute(
+                f"SELECT key, tat FROM rate_limit_state WHERE key IN ({placeholders})", keys
+            ).fetchall()
+        return dict(rows)
+
+
+# Atomically advance every bucket's TAT. KEYS are the bucket keys; ARGV is ``now``
+# followed by (interval, tolerance, cost) per key. Returns the wait in seconds.
+_REDIS_GCRA_SCRIPT = """
+local now = tonumber(ARGV[1])
+local wait = 0
+local tats = {}
+for i, key in ipairs(KEYS) do
+    local base = 2 + (i - 1) * 3
+    local interval = tonumber(ARGV[base])
+    local tolerance = tonumber(ARGV[base + 1])
+    local cost = tonumber(ARGV[base + 2])
+    local tat = tonumber(redis.call('GET', key) or now)
+    if tat < now then tat = now end
+    tats[i] = tat + cost * interval
+    if tats[i] - tolerance - now > wait then wait = tats[i] - tolerance - now end
+end
+for i, key in ipairs(KEYS) do
+    local ttl = math.ceil((tats[i] - now) * 1000) + 60000
+    redis.call('SET', key, tostring(tats[i]), 'PX', ttl)
+end
+return tostring(wait)
+"""
+
+
+class RedisRateLimitState(RateLimitStateBackend):
+    """TAT storage in Redis (or a Redis-compatible server) shared across hosts."""
+
+    def __init__(self, url: str, prefix: str = "archon:ratelimit:"):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError(
+                "Redis rate limit state requires the redis package. Install it with: pip install redis"
+            ) from e
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url)
+        self._script = self._client.register_script(_REDIS_GCRA_SCRIPT)
+
+    def reserve(self, buckets: list[tuple[str, float, float, float]], now: float) -> float:
+        keys = [self.prefix + key for key, *_ in buckets]
+        args: list[float] = [now]
+        for _, interval, tolerance, cost in buckets:
+            args.extend((interval, tolerance, cost))
+        return float(self._script(keys=keys, args=args))
+
+    def peek(self, keys: list[str]) -> dict[str, float]:
+        values = self._client.mget([self.prefix + key for key in keys])
+        return {key: float(value) for key, value in zip(keys, values, strict=True) if value}
+
+
+def create_rate_limit_state(url: str | None) -> RateLimitStateBackend:
+    """
+    Build a rate limit state backend from a URL.
+
+    ``None`` or "memory" keeps state in-process, ``sqlite:///path/to/file.db`` shares it
+    between processes on one host and ``redis://host:6379/0`` across hosts.
+    """
+    if not url or url == "memory":
+        return InMemoryRateLimitState()
+    if url.startswith("sqlite:///"):
+        return SQLiteRateLimitState(url[len("sqlite:///") :])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisRateLimitState(url)
+    raise ValueError(f"Unsupported rate limit state URL: {url}")
+
+
 class RateLimiter:
-    """Thread-safe rate limiter with token bucket algorithm"""
+    """
+    Request and token rate limiter using GCRA (a token bucket kept as one timestamp).
 
-    def __init__(self, config: RateLimitConfig):
+    Each bucket stores only its theoretical arrival time, so checking and recording a
+    call is O(1) regardless of traffic. A caller reserves its share of both buckets
+    under a short lock and then sleeps outside it until the reservation is valid, so
+    waiting callers never block others, and reservations are honoured in the order
+    they were made (FIFO). Up to a full minute's budget may be used in a burst.
+    """
+
+    def __init__(self, config: RateLimitConfig, state: RateLimitStateBackend | None = None):
         self.config = config
-        self.request_times = deque()
-        self.token_usage = deque()
-        self.semaphore = asyncio.Semaphore(config.max_concurrent)
-        self._lock = asyncio.Lock()
+        self.state = state or create_rate_limit_state(config.shared_state_url)
+        self._shared = not isinstance(self.state, InMemoryRateLimitState)
+
+    def _buckets(self, estimated_tokens: int) -> list[tuple[str, float, float, float]]:
+        request_interval = 60.0 / self.config.requests_per_minute
+        token_interval = 60.0 / self.config.tokens_per_minute
+        # A single call can never need more than the whole per-minute budget
+        tokens = min(max(estimated_tokens, 0), self.config.tokens_per_minute)
+        # Bucket capacity is one minute's budget: a reservation is valid once the
+        # committed backlog (TAT - now) fits within 60 seconds
+        return [
+            ("requests", request_interval, 60.0, 1.0),
+            ("tokens", token_interval, 60.0, float(tokens)),
+        ]
 
     async def acquire(self, estimated_tokens: int = 8000) -> bool:
         """Acquire permission to make API call with token awareness"""
-        async with self._lock:
-            now = time.time()
-
-            # Clean old entries
-            self._clean_old_entries(now)
-
-            # Check if we can make the request
-            if not self._can_make_request(estimated_tokens):
-                wait_time = self._calculate_wait_time(estimated_tokens)
-                if wait_time > 0:
-                    logfire_logger.info(
-                        f"Rate limiting: waiting {wait_time:.1f}s",
-                        tokens=estimated_tokens,
-                        current_usage=self._get_current_usage(),
-                    )
-                    await asyncio.sleep(wait_time)
-                    return await self.acquire(estimated_tokens)
-                return False
-
-            # Record the request
-            self.request_times.append(now)
-            self.token_usage.append((now, estimated_tokens))
-            return True
-
-    def _can_make_request(self, estimated_tokens: int) -> bool:
-        """Check if request can be made within limits"""
-        # Check request rate limit
-        if len(self.request_times) >= self.config.requests_per_minute:
-            return False
-
-        # Check token usage limit
-        current_tokens = sum(tokens for _, tokens in self.token_usage)
-        if current_tokens + estimated_tokens > self.config.tokens_per_minute:
-            return False
+        buckets = self._buckets(estimated_tokens)
+        now = time.time()
+        if self._shared:
+            # File and network backends do blocking I/O
+            wait_time = await asyncio.to_thread(self.state.reserve, buckets, now)
+        else:
+            wait_time = self.state.reserve(buckets, now)
 
+        if wait_time > 0:
+            logfire_logger.info(
+                f"Rate limiting: waiting {wait_time:.1f}s",
+                tokens=estimated_tokens,
+                current_usage=self._get_current_usage(),
+            )
+            await asyncio.sleep(wait_time)
         return True
 
-    def _clean_old_entries(self, current_time: float):
-        """Remove entries older than 1 minute"""
-        cutoff_time = current_time - 60
+    def _get_current_usage(self) -> dict[str, int]:
+        """Get current usage statistics (budget committed over the next minute)"""
+        now = time.time()
+        try:
+            tats = self.state.peek(["requests", "tokens"])
+        except Exception:
+            tats = {}
+        requests = max(0.0, tats.get("requests", now) - now) / 60 * self.config.requests_per_minute
+        tokens = max(0.0, tats.get("tokens", now) - now) / 60 * self.config.tokens_per_minute
+        return {
+            "requests": round(requests),
+            "tokens": round(tokens),
+            "max_requests": self.config.requests_per_minute,
+            "max_tokens": self.config.tokens_per_minute,
+        }
 
-        while self.request_times and self.request_times[0] < cutoff_time:
-            self.request_times.popleft()
 
-        while self.token_usage and self.token_usage[0][0] < cutoff_time:
-            self.token_usage.popleft()
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+def _parse_duration(value: Any) -> float | None:
+    """Parse a rate limit reset/retry value such as "1s", "6m0s", "20ms" or "2.5" into seconds."""
+    if not isinstance(value, str) or not value.strip():
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    scale = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+    return sum(float(amount) * scale[unit] for amount, unit in parts)
+
+
+def _parse_int(value: Any) -> int | None:
+    if not isinstance(value, str):
+        return None
+    try:
+        return int(value.strip())
+    except ValueError:
+        return None
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """Whether an exception is a provider 429 (as opposed to an exhausted quota)."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    if status != 429 and type(error).__name__ != "RateLimitError":
+        return False
+    return "insufficient_quota" not in str(error)
+
+
+def retry_after_from_error(error: BaseException) -> float | None:
+    """Read Retry-After style headers from a provider error's HTTP response, if any."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if headers is None or not hasattr(headers, "get"):
+        return None
+    retry_after_ms = _parse_int(headers.get("retry-after-ms"))
+    if retry_after_ms is not None:
+        return retry_after_ms / 1000
+    return _parse_duration(headers.get("retry-after"))
+
+
+class AdaptiveConcurrencyController:
+    """
+    AIMD (additive increase, multiplicative decrease) limit on concurrent provider calls.
+
+    The limit grows by roughly one slot per window of successful calls and is cut by
+    ``decrease_factor`` when the provider answers 429 or latency spikes well above its
+    running baseline, like TCP congestion control. After a 429 every caller is held
+    back for the provider's Retry-After (or an exponential backoff if none is given).
+    ``x-ratelimit-remaining-*`` headers stop growth before the provider has to push
+    back, and a remaining count of zero holds calls until the advertised reset.
+
+    Waiters are served in FIFO order. All state is owned by the event loop thread.
+    """
 
-    def _calculate_wait_time(self, estimated_tokens: int) -> float:
-        """Calculate how long to wait before retrying"""
-        if not self.request_times:
-            return 0
+    def __init__(self, config: RateLimitConfig):
+        self.config = config
+        self.limit = float(max(config.min_concurrent, config.max_concurrent))
+        self.in_flight = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._blocked_until = 0.0
+        self._wake_handle: asyncio.TimerHandle | None = None
+        self._last_decrease = 0.0
+        self._consecutive_throttles = 0
+        # Typical latency differs a lot between kinds of call (an embedding batch, a
+        # summary, a whole agent run), so each operation keeps its own baseline
+        self._latency_baselines: dict[str, float] = {}
+        self._remaining_requests: int | None = None
+        self._remaining_tokens: int | None = None
+
+    @property
+    def current_limit(self) -> int:
+        return max(self.config.min_concurrent, int(self.limit))
+
+    async def acquire(self) -> None:
+        """Wait for a free slot (and for any provider backoff to pass)."""
+        while (delay := self._blocked_until - time.monotonic()) > 0:
+            await asyncio.sleep(delay)
+
+        if not self._waiters and self.in_flight < self.current_limit:
+            self.in_flight += 1
+            return
 
-        oldest_request = self.request_times[0]
-        time_since_oldest = time.time() - oldest_request
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # A slot was handed over just as we were cancelled - pass it on
+                self.release()
+            else:
+                try:
+                    self._waiters.remove(future)
+                except ValueError:
+                    pass
+            raise
+
+    def release(self) -> None:
+        """Return a slot taken by acquire()."""
+        self.in_flight = max(0, self.in_flight - 1)
+        self._wake()
+
+    def _wake(self) -> None:
+        """Hand free slots to waiters in arrival order, unless the provider asked us to wait."""
+        delay = self._blocked_until - time.monotonic()
+        if delay > 0:
+            if self._waiters and self._wake_handle is None:
+                loop = asyncio.get_running_loop()
+                self._wake_handle = loop.call_later(delay, self._wake_after_block)
+            return
 
-        if time_since_oldest < 60:
-            return 60 - time_since_oldest + 0.1
+        while self._waiters and self.in_flight < self.current_limit:
+            future = self._waiters.popleft()
+            if not future.done():
+                self.in_flight += 1
+                future.set_result(None)
 
-        return 0
+    def _wake_after_block(self) -> None:
+        self._wake_handle = None
+        self._wake()
 
-    def _get_current_usage(self) -> dict[str, int]:
-        """Get current usage statistics"""
-        current_tokens = sum(tokens for _, tokens in self.token_usage)
+    def record_success(self, latency: float, operation: str = "default") -> None:
+        """
+        Additive increase after a successful call, or a decrease on a latency spike.
+
+        The latency is compared with the running baseline of the same operation only.
+        """
+        self._consecutive_throttles = 0
+        baseline = self._latency_baselines.get(operation)
+
+        if baseline is not None and baseline > 0 and latency > baseline * self.config.latency_spike_ratio:
+            self._decrease(f"{operation} latency spike {latency:.2f}s vs baseline {baseline:.2f}s")
+        else:
+            # Exponentially weighted baseline, only fed by non-spike samples
+            self._latency_baselines[operation] = (
+                latency if baseline is None else 0.8 * baseline + 0.2 * latency
+            )
+            if self._has_headroom():
+                self.limit = min(
+                    float(self.config.max_concurrent_ceiling), self.limit + 1.0 / self.limit
+                )
+        self._wake()
+
+    def record_throttle(self, retry_after: float | None = None) -> None:
+        """Multiplicative decrease and a shared backoff after a provider 429."""
+        now = time.monotonic()
+        if now - self._last_decrease >= self.config.decrease_cooldown:
+            self._consecutive_throttles += 1
+            self._decrease("provider returned 429")
+
+        if retry_after is None:
+            retry_after = min(
+                self.config.max_backoff,
+                self.config.backoff_multiplier**self._consecutive_throttles,
+            )
+        self._block_for(min(retry_after, self.config.max_backoff))
+
+    def observe_response(self, status_code: int, headers: Any) -> None:
+        """Feed an HTTP response from the provider into the controller."""
+        if status_code == 429:
+            retry_after_ms = _parse_int(headers.get("retry-after-ms"))
+            retry_after = (
+                retry_after_ms / 1000
+                if retry_after_ms is not None
+                else _parse_duration(headers.get("retry-after"))
+            )
+            self.record_throttle(retry_after)
+            return
+
+        remaining_requests = _parse_int(headers.get("x-ratelimit-remaining-requests"))
+        remaining_tokens = _parse_int(headers.get("x-ratelimit-remaining-tokens"))
+        if remaining_requests is not None:
+            self._remaining_requests = remaining_requests
+        if remaining_tokens is not None:
+            self._remaining_tokens = remaining_tokens
+
+        if remaining_requests == 0:
+            self._block_for(_parse_duration(headers.get("x-ratelimit-reset-requests")) or 1.0)
+        elif remaining_tokens == 0:
+            self._block_for(_parse_duration(headers.get("x-ratelimit-reset-tokens")) or 1.0)
+
+    def _has_headroom(self) -> bool:
+        """Whether the provider's advertised remaining budget allows more concurrency."""
+        if self._remaining_requests is not None and self._remaining_requests <= self.in_flight:
+            return False
+        if self._remaining_tokens is not None and self._remaining_tokens <= 0:
+            return False
+        return True
+
+    def _decrease(self, reason: str) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < self.config.decrease_cooldown:
+            return
+        self._last_decrease = now
+        previous = self.current_limit
+        self.limit = max(float(self.config.min_concurrent), self.limit * self.config.decrease_factor)
+        logfire_logger.info(
+            f"Reducing provider concurrency: {reason}",
+            previous_limit=previous,
+            limit=self.current_limit,
+        )
+
+    def _block_for(self, seconds: float) -> None:
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    def get_stats(self) -> dict[str, Any]:
         return {
-            "requests": len(self.request_times),
-            "tokens": current_tokens,
-            "max_requests": self.config.requests_per_minute,
-            "max_tokens": self.config.tokens_per_minute,
+            "limit": self.current_limit,
+            "in_flight": self.in_flight,
+            "waiting": len(self._waiters),
+            "blocked_for": max(0.0, self._blocked_until - time.monotonic()),
+            "latency_baselines": dict(self._latency_baselines),
+            "remaining_requests": self._remaining_requests,
+            "remaining_tokens": self._remaining_tokens,
         }
 
 
@@ -452,7 +855,9 @@ class ThreadingService:
         rate_limit_config: RateLimitConfig | None = None,
     ):
         self.config = threading_config or ThreadingConfig()
-        self.rate_limiter = RateLimiter(rate_limit_config or RateLimitConfig())
+        rate_limit_config = rate_limit_config or RateLimitConfig()
+        self.rate_limiter = RateLimiter(rate_limit_config)
+        self.concurrency_controller = AdaptiveConcurrencyController(rate_limit_config)
         self.memory_dispatcher = MemoryAdaptiveDispatcher(self.config)
         self.websocket_processor = WebSocketSafeProcessor(self.config)
 
@@ -497,9 +902,18 @@ class ThreadingService:
         logfire_logger.info("Threading service stopped")
 
     @asynccontextmanager
-    async def rate_limited_operation(self, estimated_tokens: int = 8000):
-        """Context manager for rate-limited operations"""
-        async with self.rate_limiter.semaphore:
+    async def rate_limited_operation(self, estimated_tokens: int = 8000, operation: str = "default"):
+        """
+        Context manager for rate-limited operations.
+
+        Concurrency is governed by the shared adaptive controller: the outcome of the
+        wrapped call (success latency, or a provider 429 raised out of the block)
+        adjusts how many calls may run at once. ``operation`` names the kind of call
+        whose latency baseline the success is compared against.
+        """
+        controller = self.concurrency_controller
+        await controller.acquire()
+        try:
             can_proceed = await self.rate_limiter.acquire(estimated_tokens)
             if not can_proceed:
                 raise Exception("Rate limit exceeded")
@@ -507,11 +921,19 @@ class ThreadingService:
             start_time = time.time()
             try:
                 yield
+            except Exception as e:
+                if is_rate_limit_error(e):
+                    controller.record_throttle(retry_after_from_error(e))
+                raise
+            else:
+                controller.record_success(time.time() - start_time, operation)
             finally:
                 duration = time.time() - start_time
                 logfire_logger.debug(
                     "Rate limited operation completed", duration=duration, tokens=estimated_tokens
                 )
+        finally:
+            controller.release()
 
     async def run_cpu_intensive(self, func: Callable, *args, **kwargs) -> Any:
         """Run CPU-intensive function in thread pool"""
@@ -21,12 +21,37 @@ os.environ.setdefault("ARCHON_AGENTS_PORT", "8052")
 @pytest.fixture(autouse=True)
 def prevent_real_db_calls():
     """Automatically prevent any real database calls in all tests."""
-    with patch("supabase.create_client") as mock_create:
+    with (
+        patch("supabase.create_client") as mock_create,
+        # Don't let a client created under one test's mocks leak into the next test
+        patch.dict("src.server.services.client_manager._clients", clear=True),
+    ):
         # Make create_client raise an error if called without our mock
         mock_create.side_effect = Exception("Real database calls are not allowed in tests!")
         yield
 
 
+@pytest.fixture(autouse=True)
+def isolated_caches(tmp_path, monkeypatch):
+    """Give every test empty persistent caches under its own temporary directory."""
+    from src.server.services.embeddings import contextual_cache, embedding_cache
+    from src.server.services.storage import code_storage_service
+
+    singletons = [
+        (embedding_cache, "_embedding_cache"),
+        (contextual_cache, "_contextual_cache"),
+        (code_storage_service, "_code_summary_cache"),
+    ]
+    for module, name in singletons:
+        monkeypatch.setattr(module, "DEFAULT_CACHE_DIR", tmp_path / "cache")
+        monkeypatch.setattr(module, name, None)
+    yield
+    for module, name in singletons:
+        cache = getattr(module, name)
+        if cache is not None:
+            cache.close()
+
+
 @pytest.fixture
 def mock_supabase_client():
     """Mock Supabase client for testing."""
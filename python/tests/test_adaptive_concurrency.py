@@ -0,0 +1,191 @@
+"""
+Tests for the AIMD adaptive concurrency controller in the threading service.
+"""
+
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+
+from src.server.services.threading_service import (
+    AdaptiveConcurrencyController,
+    RateLimitConfig,
+    ThreadingService,
+    _parse_duration,
+    is_rate_limit_error,
+)
+
+
+class RateLimited(Exception):
+    status_code = 429
+
+
+def make_controller(**overrides) -> AdaptiveConcurrencyController:
+    settings = {"max_concurrent": 4, "decrease_cooldown": 0.0, **overrides}
+    return AdaptiveConcurrencyController(RateLimitConfig(**settings))
+
+
+class TestParsing:
+    @pytest.mark.parametrize(
+        "value,expected",
+        [("1s", 1.0), ("6m0s", 360.0), ("20ms", 0.02), ("1h2m3.5s", 3723.5), ("2.5", 2.5)],
+    )
+    def test_parse_duration(self, value, expected):
+        assert _parse_duration(value) == pytest.approx(expected)
+
+    def test_parse_duration_rejects_garbage(self):
+        assert _parse_duration("soon") is None
+        assert _parse_duration(None) is None
+        assert _parse_duration(MagicMock()) is None
+
+    def test_rate_limit_detection(self):
+        assert is_rate_limit_error(RateLimited("slow down"))
+        assert not is_rate_limit_error(RateLimited("insufficient_quota"))
+        assert not is_rate_limit_error(ValueError("429 in the message only"))
+
+
+class TestAIMD:
+    def test_additive_increase_is_about_one_slot_per_window(self):
+        controller = make_controller()
+        for _ in range(4):
+            controller.record_success(0.1)
+        assert controller.current_limit == 4
+        assert controller.limit == pytest.approx(4.9, abs=0.1)
+        controller.record_success(0.1)
+        assert controller.current_limit == 5
+
+    def test_throttle_halves_the_limit_and_blocks(self):
+        controller = make_controller()
+        controller.record_throttle(retry_after=0.5)
+        assert controller.current_limit == 2
+        assert controller.get_stats()["blocked_for"] > 0.4
+
+    def test_limit_respects_floor_and_ceiling(self):
+        controller = make_controller(max_concurrent_ceiling=5)
+        for _ in range(100):
+            controller.record_success(0.1)
+        assert controller.current_limit == 5
+        for _ in range(10):
+            controller.record_throttle(retry_after=0)
+        assert controller.current_limit == 1
+
+    def test_decreases_are_rate_limited_by_cooldown(self):
+        controller = AdaptiveConcurrencyController(RateLimitConfig(max_concurrent=8))
+        controller.record_throttle(retry_after=0)
+        controller.record_throttle(retry_after=0)
+        assert controller.current_limit == 4
+
+    def test_latency_spike_decreases(self):
+        controller = make_controller()
+        for _ in range(5):
+            controller.record_success(0.1)
+        before = controller.current_limit
+        controller.record_success(1.0)
+        assert controller.current_limit < before
+
+    def test_latency_baselines_are_kept_per_operation(self):
+        controller = make_controller()
+        for _ in range(5):
+            controller.record_success(0.1, "embeddings")
+        before = controller.current_limit
+
+        # A multi-second agent run is not a spike against the embedding baseline
+        controller.record_success(8.0, "agent_run")
+        assert controller.current_limit >= before
+        assert controller.get_stats()["latency_baselines"] == {
+            "embeddings": pytest.approx(0.1),
+            "agent_run": 8.0,
+        }
+
+        controller.record_success(1.0, "embeddings")
+        assert controller.current_limit < before
+
+    def test_remaining_requests_header_stops_growth(self):
+        controller = make_controller()
+        controller.in_flight = 3
+        controller.observe_response(200, {"x-ratelimit-remaining-requests": "2"})
+        for _ in range(10):
+            controller.record_success(0.1)
+        assert controller.current_limit == 4
+
+    def test_exhausted_budget_blocks_until_reset(self):
+        controller = make_controller()
+        controller.observe_response(
+            200, {"x-ratelimit-remaining-tokens": "0", "x-ratelimit-reset-tokens": "2s"}
+        )
+        assert controller.get_stats()["blocked_for"] > 1.5
+
+    def test_429_response_uses_retry_after_ms(self):
+        controller = make_controller()
+        controller.observe_response(429, {"retry-after-ms": "300"})
+        assert controller.current_limit == 2
+        assert 0.2 < controller.get_stats()["blocked_for"] <= 0.3
+
+
+class TestAcquire:
+    @pytest.mark.asyncio
+    async def test_waiters_are_served_in_fifo_order(self):
+        controller = make_controller(max_concurrent=1)
+        await controller.acquire()
+
+        order = []
+
+        async def worker(name):
+            await controller.acquire()
+            order.append(name)
+            controller.release()
+
+        tasks = [asyncio.create_task(worker(i)) for i in range(5)]
+        await asyncio.sleep(0)
+        controller.release()
+        await asyncio.gather(*tasks)
+
+        assert order == [0, 1, 2, 3, 4]
+        assert controller.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_does_not_leak_a_slot(self):
+        controller = make_controller(max_concurrent=1)
+        await controller.acquire()
+
+        waiter = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+        controller.release()
+        assert controller.in_flight == 0
+        await asyncio.wait_for(controller.acquire(), timeout=1)
+
+    @pytest.mark.asyncio
+    async def test_acquire_waits_out_a_throttle(self):
+        controller = make_controller()
+        controller.record_throttle(retry_after=0.05)
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await controller.acquire()
+        assert loop.time() - start >= 0.04
+
+
+class TestRateLimitedOperation:
+    @pytest.mark.asyncio
+    async def test_outcomes_feed_the_controller(self):
+        service = ThreadingService(
+            rate_limit_config=RateLimitConfig(max_concurrent=4, decrease_cooldown=0.0)
+        )
+        controller = service.concurrency_controller
+
+        async with service.rate_limited_operation(100):
+            assert controller.in_flight == 1
+        assert controller.in_flight == 0
+        assert controller.limit > 4
+
+        error = RateLimited("too many requests")
+        error.response = MagicMock(headers={"retry-after": "0"})
+        with pytest.raises(RateLimited):
+            async with service.rate_limited_operation(100):
+                raise error
+        assert controller.current_limit == 2
+        assert controller.in_flight == 0
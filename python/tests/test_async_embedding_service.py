@@ -17,6 +17,7 @@ from src.server.services.embeddings.embedding_service import (
     EmbeddingBatchResult,
     create_embedding,
     create_embeddings_batch,
+    get_embedding_signature,
 )
 
 
@@ -87,9 +88,7 @@ class TestAsyncEmbeddingService:
 
                         # Verify the result
                         assert len(result) == 1536
-                        assert result[0] == 0.1
-                        assert result[1] == 0.2
-                        assert result[2] == 0.3
+                        assert result[:3] == pytest.approx([0.1, 0.2, 0.3])
 
                         # Verify API was called correctly
                         mock_llm_client.embeddings.create.assert_called_once()
@@ -195,8 +194,8 @@ class TestAsyncEmbeddingService:
                         assert len(result.embeddings) == 2
                         assert len(result.embeddings[0]) == 1536
                         assert len(result.embeddings[1]) == 1536
-                        assert result.embeddings[0][0] == 0.1
-                        assert result.embeddings[1][0] == 0.4
+                        assert result.embeddings[0][0] == pytest.approx(0.1)
+                        assert result.embeddings[1][0] == pytest.approx(0.4)
 
                         mock_llm_client.embeddings.create.assert_called_once()
 
@@ -467,3 +466,137 @@ class TestAsyncEmbeddingService:
                         assert result.success_count == 5
                         assert len(result.embeddings) == 5
                         assert result.texts_processed == texts
+
+    @pytest.mark.asyncio
+    async def test_create_embeddings_batch_concurrent_preserves_order(self, mock_threading_service):
+        """Test that concurrent batches finishing out of order still return input order"""
+        import asyncio
+
+        in_flight = 0
+        max_in_flight = 0
+
+        async def create(model, input, dimensions):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            # Earlier batches take longer, so they complete last
+            await asyncio.sleep(0.05 if input[0] == "text1" else 0.01)
+            in_flight -= 1
+            response = MagicMock()
+            response.data = [MagicMock(embedding=[float(text[-1])] * 1536) for text in input]
+            return response
+
+        mock_client = MagicMock()
+        mock_client.embeddings.create = AsyncMock(side_effect=create)
+
+        with patch(
+            "src.server.services.embeddings.embedding_service.get_threading_service",
+            return_value=mock_threading_service,
+        ):
+            with patch(
+                "src.server.services.embeddings.embedding_service.get_llm_client"
+            ) as mock_get_client:
+                with patch(
+                    "src.server.services.embeddings.embedding_service.get_embedding_model",
+                    return_value="text-embedding-3-small",
+                ):
+                    with patch(
+                        "src.server.services.embeddings.embedding_service.credential_service"
+                    ) as mock_cred:
+                        mock_cred.get_credentials_by_category = AsyncMock(
+                            return_value={
+                                "EMBEDDING_BATCH_SIZE": "2",
+                                "EMBEDDING_MAX_CONCURRENT_BATCHES": "2",
+                            }
+                        )
+                        mock_get_client.return_value = AsyncContextManager(mock_client)
+
+                        texts = ["text1", "text2", "text3", "text4", "text5"]
+                        result = await create_embeddings_batch(texts)
+
+                        assert mock_client.embeddings.create.call_count == 3
+                        assert max_in_flight == 2
+                        assert result.texts_processed == texts
+                        assert [emb[0] for emb in result.embeddings] == [1.0, 2.0, 3.0, 4.0, 5.0]
+
+    @pytest.mark.asyncio
+    async def test_create_embeddings_batch_partial_batch_failure(self, mock_threading_service):
+        """Test that one failing batch does not affect the other batches in flight"""
+
+        async def create(model, input, dimensions):
+            if "text3" in input:
+                raise Exception("Bad batch")
+            response = MagicMock()
+            response.data = [MagicMock(embedding=[0.1] * 1536) for _ in input]
+            return response
+
+        mock_client = MagicMock()
+        mock_client.embeddings.create = AsyncMock(side_effect=create)
+
+        with patch(
+            "src.server.services.embeddings.embedding_service.get_threading_service",
+            return_value=mock_threading_service,
+        ):
+            with patch(
+                "src.server.services.embeddings.embedding_service.get_llm_client"
+            ) as mock_get_client:
+                with patch(
+                    "src.server.services.embeddings.embedding_service.get_embedding_model",
+                    return_value="text-embedding-3-small",
+                ):
+                    with patch(
+                        "src.server.services.embeddings.embedding_service.credential_service"
+                    ) as mock_cred:
+                        mock_cred.get_credentials_by_category = AsyncMock(
+                            return_value={
+                                "EMBEDDING_BATCH_SIZE": "2",
+                                "EMBEDDING_MAX_CONCURRENT_BATCHES": "3",
+                            }
+                        )
+                        mock_get_client.return_value = AsyncContextManager(mock_client)
+
+                        texts = ["text1", "text2", "text3", "text4", "text5"]
+                        result = await create_embeddings_batch(texts)
+
+                        assert result.texts_processed == ["text1", "text2", "text5"]
+                        assert result.indices_processed == [0, 1, 4]
+                        assert result.failure_count == 2
+                        assert all("Bad batch" in item["error"] for item in result.failed_items)
+
+
+class TestEmbeddingSignature:
+    @pytest.mark.asyncio
+    async def test_signature_names_provider_model_and_dimensions(self):
+        with patch(
+            "src.server.services.embeddings.embedding_service.get_embedding_model",
+            return_value="text-embedding-3-large",
+        ):
+            with patch(
+                "src.server.services.embeddings.embedding_service.credential_service"
+            ) as mock_cred:
+                mock_cred.get_credentials_by_category = AsyncMock(
+                    return_value={"EMBEDDING_PROVIDER": "openai", "EMBEDDING_DIMENSIONS": "3072"}
+                )
+
+                assert await get_embedding_signature() == "openai:text-embedding-3-large:3072"
+
+    @pytest.mark.asyncio
+    async def test_local_signature_uses_the_local_model(self):
+        with patch(
+            "src.server.services.embeddings.embedding_service.get_embedding_model"
+        ) as mock_model:
+            with patch(
+                "src.server.services.embeddings.embedding_service.credential_service"
+            ) as mock_cred:
+                mock_cred.get_credentials_by_category = AsyncMock(
+                    return_value={
+                        "EMBEDDING_PROVIDER": "local",
+                        "LOCAL_EMBEDDING_MODEL": "BAAI/bge-small-en-v1.5",
+                        "EMBEDDING_DIMENSIONS": "384",
+                    }
+                )
+
+                signature = await get_embedding_signature()
+
+        assert signature == "local:BAAI/bge-small-en-v1.5:384"
+        mock_model.assert_not_called()
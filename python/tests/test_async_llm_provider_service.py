@@ -5,12 +5,13 @@ Tests all aspects of the async LLM provider service after sync function removal.
 Covers different providers (OpenAI, Ollama, Google) and error scenarios.
 """
 
-from unittest.mock import AsyncMock, MagicMock, patch
+from unittest.mock import ANY, AsyncMock, MagicMock, patch
 
 import pytest
 
 from src.server.services.llm_provider_service import (
     _get_cached_settings,
+    _observe_rate_limits,
     _set_cached_settings,
     get_embedding_model,
     get_llm_client,
@@ -103,7 +104,7 @@ class TestAsyncLLMProviderService:
 
                 async with get_llm_client() as client:
                     assert client == mock_client
-                    mock_openai.assert_called_once_with(api_key="test-openai-key")
+                    mock_openai.assert_called_once_with(api_key="test-openai-key", http_client=ANY, max_retries=0)
 
                 # Verify provider config was fetched
                 mock_credential_service.get_active_provider.assert_called_once_with("llm")
@@ -127,7 +128,10 @@ class TestAsyncLLMProviderService:
                 async with get_llm_client() as client:
                     assert client == mock_client
                     mock_openai.assert_called_once_with(
-                        api_key="ollama", base_url="http://localhost:11434/v1"
+                        api_key="ollama",
+                        base_url="http://localhost:11434/v1",
+                        http_client=ANY,
+                        max_retries=0,
                     )
 
     @pytest.mark.asyncio
@@ -151,6 +155,8 @@ class TestAsyncLLMProviderService:
                     mock_openai.assert_called_once_with(
                         api_key="test-google-key",
                         base_url="https://generativelanguage.googleapis.com/v1beta/openai/",
+                        http_client=ANY,
+                        max_retries=0,
                     )
 
     @pytest.mark.asyncio
@@ -171,7 +177,7 @@ class TestAsyncLLMProviderService:
 
                 async with get_llm_client(provider="openai") as client:
                     assert client == mock_client
-                    mock_openai.assert_called_once_with(api_key="override-key")
+                    mock_openai.assert_called_once_with(api_key="override-key", http_client=ANY, max_retries=0)
 
                 # Verify explicit provider API key was requested
                 mock_credential_service._get_provider_api_key.assert_called_once_with("openai")
@@ -199,7 +205,7 @@ class TestAsyncLLMProviderService:
 
                 async with get_llm_client(use_embedding_provider=True) as client:
                     assert client == mock_client
-                    mock_openai.assert_called_once_with(api_key="embedding-key")
+                    mock_openai.assert_called_once_with(api_key="embedding-key", http_client=ANY, max_retries=0)
 
                 # Verify embedding provider was requested
                 mock_credential_service.get_active_provider.assert_called_once_with("embedding")
@@ -472,3 +478,17 @@ class TestAsyncLLMProviderService:
 
                 # Should have been called once for each provider
                 assert mock_credential_service.get_active_provider.call_count == 3
+
+
+class TestRateLimitObservation:
+    @pytest.mark.asyncio
+    async def test_hook_leaves_429s_to_the_caller(self):
+        controller = MagicMock()
+        service = MagicMock(concurrency_controller=controller)
+        with patch("src.server.services.llm_provider_service.get_threading_service", return_value=service):
+            await _observe_rate_limits(MagicMock(status_code=429, headers={"retry-after": "1"}))
+            controller.observe_response.assert_not_called()
+
+            headers = {"x-ratelimit-remaining-requests": "10"}
+            await _observe_rate_limits(MagicMock(status_code=200, headers=headers))
+            controller.observe_response.assert_called_once_with(200, headers)
@@ -0,0 +1,142 @@
+"""Tests for the bisecting batch writer and its dead-letter quarantine."""
+
+import asyncio
+import math
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from src.server.services.storage.batch_writer import DEAD_LETTER_TABLE, write_rows
+
+MODULE = "src.server.services.storage.batch_writer"
+
+
+class FakeQuery:
+    def __init__(self, client, table, method, rows, kwargs):
+        self.client = client
+        self.table = table
+        self.method = method
+        self.rows = rows
+        self.kwargs = kwargs
+
+    def execute(self):
+        self.client.calls.append((self.table, self.method, len(self.rows), self.kwargs))
+        if self.table != DEAD_LETTER_TABLE and self.client.should_fail(self.rows):
+            raise RuntimeError("invalid input syntax")
+        self.client.written.setdefault(self.table, []).extend(self.rows)
+
+
+class FakeTable:
+    def __init__(self, client, name):
+        self.client = client
+        self.name = name
+
+    def insert(self, rows):
+        return FakeQuery(self.client, self.name, "insert", rows, {})
+
+    def upsert(self, rows, **kwargs):
+        return FakeQuery(self.client, self.name, "upsert", rows, kwargs)
+
+
+class FakeClient:
+    def __init__(self, should_fail):
+        self.should_fail = should_fail
+        self.calls = []
+        self.written = {}
+
+    def table(self, name):
+        return FakeTable(self, name)
+
+
+def rows(n):
+    return [
+        {
+            "url": "https://example.com/a",
+            "chunk_number": i,
+            "content": f"chunk {i}",
+            "source_id": "example.com",
+            "embedding": [0.1, 0.2],
+        }
+        for i in range(n)
+    ]
+
+
+@pytest.fixture
+def no_sleep():
+    with patch(f"{MODULE}.asyncio.sleep", new=AsyncMock()) as sleep:
+        yield sleep
+
+
+@pytest.mark.asyncio
+async def test_poison_row_is_isolated_in_logarithmic_calls(no_sleep):
+    client = FakeClient(lambda batch: any(row["chunk_number"] == 37 for row in batch))
+
+    written = await write_rows(client, "archon_crawled_pages", rows(100), max_retries=3)
+
+    assert written == 99
+    assert sorted(r["chunk_number"] for r in client.written["archon_crawled_pages"]) == [
+        i for i in range(100) if i != 37
+    ]
+
+    bisect_calls = [c for c in client.calls if c[0] != DEAD_LETTER_TABLE][3:]
+    # Two attempts per level of the split tree, far fewer than one insert per row
+    assert len(bisect_calls) <= 2 * math.ceil(math.log2(100))
+
+    (quarantined,) = client.written[DEAD_LETTER_TABLE]
+    assert quarantined["target_table"] == "archon_crawled_pages"
+    assert quarantined["chunk_number"] == 37
+    assert "embedding" not in quarantined["payload"]
+    assert "invalid input syntax" in quarantined["error"]
+
+
+@pytest.mark.asyncio
+async def test_transient_failure_is_retried_without_bisecting(no_sleep):
+    failures = iter([True, False])
+    client = FakeClient(lambda batch: next(failures))
+
+    written = await write_rows(client, "archon_code_examples", rows(10))
+
+    assert written == 10
+    assert [c[2] for c in client.calls] == [10, 10]
+    assert DEAD_LETTER_TABLE not in client.written
+    no_sleep.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_upsert_passes_conflict_columns():
+    client = FakeClient(lambda batch: False)
+
+    await write_rows(client, "archon_crawled_pages", rows(2), on_conflict="url,chunk_number")
+
+    assert client.calls == [
+        ("archon_crawled_pages", "upsert", 2, {"on_conflict": "url,chunk_number"})
+    ]
+
+
+@pytest.mark.asyncio
+async def test_cancellation_stops_the_write():
+    def cancelled():
+        raise asyncio.CancelledError()
+
+    client = FakeClient(lambda batch: False)
+    with pytest.raises(asyncio.CancelledError):
+        await write_rows(client, "archon_crawled_pages", rows(2), cancellation_check=cancelled)
+    assert client.calls == []
+
+
+@pytest.mark.asyncio
+async def test_at_least_one_attempt_is_required():
+    client = FakeClient(lambda batch: False)
+    with pytest.raises(ValueError, match="max_retries"):
+        await write_rows(client, "archon_crawled_pages", rows(2), max_retries=0)
+    assert client.calls == []
+
+
+@pytest.mark.asyncio
+async def test_single_attempt_bisects_on_failure():
+    client = FakeClient(lambda batch: any(row["chunk_number"] == 1 for row in batch))
+
+    written = await write_rows(client, "archon_crawled_pages", rows(2), max_retries=1)
+
+    assert written == 1
+    assert [c[2] for c in client.calls if c[0] != DEAD_LETTER_TABLE] == [2, 1, 1]
@@ -0,0 +1,120 @@
+"""Tests for MinHash/LSH grouping of near-duplicate code blocks."""
+
+import random
+from unittest.mock import patch
+
+import numpy as np
+
+from src.server.services.storage import code_dedup
+from src.server.services.storage.code_dedup import (
+    estimate_jaccard,
+    group_similar_texts,
+    minhash_signature,
+    similarity,
+)
+from src.server.services.storage.code_storage_service import extract_code_blocks
+
+_NAMES = ["client", "session", "request", "response", "result", "config", "handler", "items"]
+
+
+def make_snippet(rng: random.Random, lines: int = 12) -> str:
+    return "\n".join(
+        f"{rng.choice(_NAMES)}_{rng.randint(0, 999)} = "
+        f"{rng.choice(_NAMES)}.{rng.choice(_NAMES)}({rng.randint(0, 99)}, key='{rng.choice(_NAMES)}')"
+        for _ in range(lines)
+    )
+
+
+def make_variant(rng: random.Random, snippet: str) -> str:
+    lines = snippet.split("\n")
+    lines[rng.randrange(len(lines))] = "# tweaked line for this variant"
+    return "\n".join(lines)
+
+
+def make_corpus(originals: int, variants_per_original: int, seed: int = 3) -> list[str]:
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(originals):
+        snippet = make_snippet(rng)
+        texts.append(snippet)
+        texts.extend(make_variant(rng, snippet) for _ in range(variants_per_original))
+    rng.shuffle(texts)
+    return texts
+
+
+def pairwise_groups(texts: list[str], threshold: float = 0.85) -> list[list[int]]:
+    """The original all-pairs greedy grouping, as the reference."""
+    groups, grouped = [], set()
+    for i, text in enumerate(texts):
+        if i in grouped:
+            continue
+        grouped.add(i)
+        group = [i]
+        for j in range(i + 1, len(texts)):
+            if j not in grouped and similarity(text, texts[j]) >= threshold:
+                group.append(j)
+                grouped.add(j)
+        groups.append(group)
+    return groups
+
+
+class TestGroupSimilarTexts:
+    def test_small_inputs_match_pairwise_grouping(self):
+        texts = make_corpus(originals=8, variants_per_original=2)
+        assert group_similar_texts(texts) == pairwise_groups(texts)
+
+    def test_lsh_candidates_match_pairwise_grouping(self):
+        texts = make_corpus(originals=20, variants_per_original=2)
+        assert len(texts) > code_dedup.EXACT_PAIRWISE_MAX
+        assert group_similar_texts(texts) == pairwise_groups(texts)
+
+    def test_lsh_path_is_used_even_for_few_texts(self):
+        texts = make_corpus(originals=5, variants_per_original=2)
+        with patch.object(code_dedup, "EXACT_PAIRWISE_MAX", 0):
+            assert group_similar_texts(texts) == pairwise_groups(texts)
+
+    def test_exact_copies_join_their_first_occurrence(self):
+        rng = random.Random(1)
+        a, b = make_snippet(rng), make_snippet(rng)
+        assert group_similar_texts([a, b, a, b, a]) == [[0, 2, 4], [1, 3]]
+
+    def test_empty(self):
+        assert group_similar_texts([]) == []
+
+
+class TestMinHash:
+    def test_signatures_are_deterministic(self):
+        snippet = make_snippet(random.Random(5))
+        assert np.array_equal(minhash_signature(snippet), minhash_signature(snippet))
+        assert len(minhash_signature(snippet)) == code_dedup.NUM_PERMUTATIONS
+
+    def test_estimate_tracks_similarity(self):
+        rng = random.Random(7)
+        snippet = make_snippet(rng)
+        variant = make_variant(rng, snippet)
+        unrelated = make_snippet(rng)
+
+        near = estimate_jaccard(minhash_signature(snippet), minhash_signature(variant))
+        far = estimate_jaccard(minhash_signature(snippet), minhash_signature(unrelated))
+        assert near > 0.6
+        assert far < near
+
+    def test_short_texts_have_signatures(self):
+        assert len(minhash_signature("x")) == code_dedup.NUM_PERMUTATIONS
+        assert len(minhash_signature("")) == code_dedup.NUM_PERMUTATIONS
+
+
+def test_extract_code_blocks_consolidates_variants():
+    rng = random.Random(11)
+    snippet = make_snippet(rng, lines=15)
+    variant = make_variant(rng, snippet)
+    markdown = (
+        f"First example:\n\n```python\n{snippet}\n```\n\n"
+        f"Same thing again:\n\n```\n{variant}\n```\n\nDone."
+    )
+
+    blocks = extract_code_blocks(markdown, 100, {"ENABLE_PROSE_FILTERING": "false"})
+
+    assert len(blocks) == 1
+    assert blocks[0]["language"] == "python"
+    assert blocks[0]["consolidated_variants"] == 2
@@ -0,0 +1,147 @@
+"""
+Tests for the code extraction settings snapshot and precompiled pattern bank.
+"""
+
+import re
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from src.server.services.crawling import code_patterns as patterns
+from src.server.services.crawling.code_extraction_service import (
+    CodeExtractionService,
+    CodeExtractionSettings,
+)
+
+PYTHON_BLOCK = '''import asyncio
+from archon import Client
+
+async def fetch(client: Client, query: str) -> list[dict]:
+    results = await client.search(query=query, limit=5)
+    return [r for r in results if r["score"] > 0.5]
+'''
+
+
+class TestSettingsSnapshot:
+    def test_parses_string_values(self):
+        settings = CodeExtractionSettings.from_credentials({
+            "MIN_CODE_BLOCK_LENGTH": "120",
+            "MAX_PROSE_RATIO": "0.3",
+            "ENABLE_PROSE_FILTERING": "false",
+            "ENABLE_CODE_SUMMARIES": "True",
+        })
+
+        assert settings.min_code_length == 120
+        assert settings.max_prose_ratio == 0.3
+        assert settings.prose_filtering is False
+        assert settings.code_summaries is True
+        assert settings.max_code_length == 5000
+
+    def test_bad_values_fall_back_to_defaults(self):
+        settings = CodeExtractionSettings.from_credentials({"MIN_CODE_INDICATORS": "three"})
+        assert settings.min_code_indicators == 3
+
+    def test_credentials_round_trip(self):
+        settings = CodeExtractionSettings(min_code_length=90, diagram_filtering=False)
+        values = settings.as_credentials()
+
+        assert values["MIN_CODE_BLOCK_LENGTH"] == "90"
+        assert values["ENABLE_DIAGRAM_FILTERING"] == "false"
+        assert CodeExtractionSettings.from_credentials(values) == settings
+
+    async def test_settings_are_loaded_once_per_crawl(self):
+        lookup = AsyncMock(return_value={"MIN_CODE_BLOCK_LENGTH": "100"})
+        service = CodeExtractionService(MagicMock())
+
+        with patch(
+            "src.server.services.crawling.code_extraction_service.credential_service"
+        ) as credentials:
+            credentials.get_credentials_by_category = lookup
+            html = f"<pre><code>{PYTHON_BLOCK}</code></pre>"
+            await service._extract_html_code_blocks(html)
+            await service._extract_text_file_code_blocks("```python\n" + PYTHON_BLOCK + "```", "u")
+
+        lookup.assert_awaited_once_with("code_extraction")
+        assert service.settings.min_code_length == 100
+
+    async def test_lookup_failure_uses_defaults(self):
+        service = CodeExtractionService(MagicMock())
+
+        with patch(
+            "src.server.services.crawling.code_extraction_service.credential_service"
+        ) as credentials:
+            credentials.get_credentials_by_category = AsyncMock(side_effect=RuntimeError("db"))
+            settings = await service._get_settings()
+
+        assert settings == CodeExtractionSettings()
+
+
+class TestPatternBank:
+    def test_language_detection(self):
+        service = CodeExtractionService(MagicMock())
+
+        assert service._detect_language_from_content(PYTHON_BLOCK) == "python"
+        assert service._detect_language_from_content("fn main() {\n    let mut x = 1;\n}") == "rust"
+        assert service._detect_language_from_content("plain words only") == ""
+
+    def test_gated_patterns_match_ungated_search(self):
+        texts = [PYTHON_BLOCK, "type Point struct { X int }", "x: string[] = []", "", "classy"]
+        for text in texts:
+            expected = []
+            for name, keywords, pattern in patterns.CODE_INDICATORS._entries:
+                if pattern is None:
+                    pattern = re.compile(r"\b(" + "|".join(keywords) + r")\b")
+                if pattern.search(text):
+                    expected.append(name)
+            assert patterns.CODE_INDICATORS.matching(text) == expected
+
+    def test_bad_code_pattern_names_the_problem(self):
+        assert patterns.BAD_CODE_PATTERN.search("if x &lt; 3:").lastgroup == "html_entity"
+        assert patterns.BAD_CODE_PATTERN.search("x" * 200).lastgroup == "long_token"
+        assert patterns.BAD_CODE_PATTERN.search(PYTHON_BLOCK) is None
+
+    def test_html_patterns_are_gated_on_markers(self):
+        plain = patterns.html_patterns_for("<PRE><CODE>x = 1</CODE></PRE>")
+        assert [entry.source_type for entry in plain] == ["standard"]
+
+        shiki = patterns.html_patterns_for('<pre class="shiki"><code>x</code></pre>')
+        assert "shiki" in [entry.source_type for entry in shiki]
+        assert "docusaurus" not in [entry.source_type for entry in shiki]
+
+    def test_every_html_pattern_contains_its_markers(self):
+        for entry in patterns.HTML_CODE_PATTERNS:
+            source = entry.pattern.pattern.lower()
+            for marker in entry.markers:
+                assert marker in source, (entry.source_type, marker)
+
+
+class TestValidation:
+    @pytest.fixture
+    def service(self):
+        service = CodeExtractionService(MagicMock())
+        service._settings = CodeExtractionSettings()
+        return service
+
+    def test_accepts_code(self, service):
+        assert service._validate_code_quality(PYTHON_BLOCK, "python")
+
+    def test_rejects_prose(self, service):
+        prose = "This is the guide. It has the answers that you would need.\n" * 3
+        assert not service._validate_code_quality(prose + "x = f(1)", "")
+
+    def test_prose_filtering_follows_the_snapshot(self, service):
+        prose = "This is the guide. It has the answers that you would need.\n" * 3
+        code = prose + "x = f(1) {}"
+        service._settings = CodeExtractionSettings(prose_filtering=False)
+        assert service._validate_code_quality(code, "")
+
+    def test_diagrams_are_skipped(self, service):
+        assert not service._validate_code_quality(PYTHON_BLOCK, "mermaid")
+
+    async def test_indented_text_blocks_use_the_minimum_length_setting(self, service):
+        indented = "\n".join("    " + line for line in PYTHON_BLOCK.splitlines())
+        service._settings = CodeExtractionSettings(min_code_length=50)
+
+        blocks = await service._extract_text_file_code_blocks(f"Intro\n{indented}\nOutro\n", "u")
+
+        assert [block["source_type"] for block in blocks] == ["text_indented"]
@@ -0,0 +1,167 @@
+"""Tests for skipping code examples already stored elsewhere in the same source."""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from src.server.services.crawling.code_extraction_service import (
+    CodeExtractionService,
+    CodeExtractionSettings,
+)
+from src.server.services.storage.code_storage_service import compute_code_fingerprint
+
+STORAGE = "src.server.services.storage.code_storage_service"
+
+INSTALL = "pip install archon\narchon --init  # create config"
+QUICKSTART = "from archon import Client\nclient = Client()\nclient.crawl('https://example.com')"
+
+
+def code_item(url: str, code: str, source_id: str = "docs.example.com") -> dict:
+    return {"block": {"code": code, "language": "bash"}, "source_url": url, "source_id": source_id}
+
+
+def stored_row(row_id: int, url: str, code: str, source_id: str = "docs.example.com") -> dict:
+    return {
+        "id": row_id,
+        "url": url,
+        "source_id": source_id,
+        "metadata": {"example_name": "Install"},
+        "code_fingerprint": compute_code_fingerprint(code),
+    }
+
+
+@pytest.fixture
+def service():
+    service = CodeExtractionService(MagicMock())
+    service._settings = CodeExtractionSettings(code_deduplication=True, code_summaries=True)
+    return service
+
+
+def patch_lookup(rows: list[dict]):
+    """Patch the database calls: the fingerprint lookup returns rows, updates succeed."""
+
+    async def execute(query, operation=None):
+        return MagicMock(data=rows if operation == "find_code_fingerprints" else [])
+
+    return patch(f"{STORAGE}.execute_query", AsyncMock(side_effect=execute))
+
+
+class TestFingerprint:
+    def test_ignores_formatting_differences(self):
+        assert compute_code_fingerprint("x = f(a, b,)\n") == compute_code_fingerprint("x  =  f(a, b)")
+
+    def test_differs_for_different_code(self):
+        assert compute_code_fingerprint(INSTALL) != compute_code_fingerprint(QUICKSTART)
+
+
+class TestSkipDuplicateCodeBlocks:
+    @pytest.mark.asyncio
+    async def test_repeats_within_the_crawl_keep_the_first_copy(self, service):
+        items = [
+            code_item("https://docs.example.com/a", INSTALL),
+            code_item("https://docs.example.com/b", INSTALL),
+            code_item("https://docs.example.com/c", INSTALL + "\n"),
+            code_item("https://docs.example.com/c", QUICKSTART),
+        ]
+        with patch_lookup([]):
+            remaining = await service._skip_duplicate_code_blocks(items)
+
+        assert [item["source_url"] for item in remaining] == [
+            "https://docs.example.com/a",
+            "https://docs.example.com/c",
+        ]
+        assert remaining[0]["block"]["duplicate_urls"] == [
+            "https://docs.example.com/b",
+            "https://docs.example.com/c",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_snippets_stored_on_other_pages_are_referenced_not_stored(self, service):
+        items = [
+            code_item("https://docs.example.com/new", INSTALL),
+            code_item("https://docs.example.com/new", QUICKSTART),
+        ]
+        rows = [stored_row(7, "https://docs.example.com/old", INSTALL)]
+
+        with patch_lookup(rows) as execute:
+            remaining = await service._skip_duplicate_code_blocks(items)
+
+        assert [item["block"]["code"] for item in remaining] == [QUICKSTART]
+        update = service.supabase_client.table.return_value.update
+        update.assert_called_once_with({
+            "metadata": {
+                "example_name": "Install",
+                "duplicate_urls": ["https://docs.example.com/new"],
+            }
+        })
+        update.return_value.eq.assert_called_once_with("id", 7)
+        assert execute.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_stored_rows_on_recrawled_pages_do_not_count(self, service):
+        items = [code_item("https://docs.example.com/a", INSTALL)]
+        rows = [stored_row(7, "https://docs.example.com/a", INSTALL)]
+
+        with patch_lookup(rows):
+            remaining = await service._skip_duplicate_code_blocks(items)
+
+        assert remaining == items
+
+    @pytest.mark.asyncio
+    async def test_other_sources_do_not_count(self, service):
+        items = [code_item("https://docs.example.com/a", INSTALL)]
+        rows = [stored_row(7, "https://other.example.com/a", INSTALL, source_id="other.example.com")]
+
+        with patch_lookup(rows):
+            remaining = await service._skip_duplicate_code_blocks(items)
+
+        assert remaining == items
+
+
+@pytest.mark.asyncio
+async def test_only_unique_snippets_are_summarized_and_stored(service):
+    items = [
+        code_item("https://docs.example.com/a", INSTALL),
+        code_item("https://docs.example.com/b", INSTALL),
+        code_item("https://docs.example.com/b", QUICKSTART),
+    ]
+    summaries = AsyncMock(return_value=[{"summary": "s", "example_name": "n"}] * 2)
+    store = AsyncMock(return_value=2)
+
+    with (
+        patch_lookup([]),
+        patch.object(service, "_extract_code_blocks_from_documents", AsyncMock(return_value=items)),
+        patch.object(service, "_generate_code_summaries", summaries),
+        patch.object(service, "_store_code_examples", store),
+    ):
+        stored = await service.extract_and_store_code_examples([], {})
+
+    assert stored == 2
+    assert len(summaries.await_args.args[0]) == 2
+    storage_data = store.await_args.args[0]
+    assert storage_data["metadatas"][0]["duplicate_urls"] == ["https://docs.example.com/b"]
+    assert store.await_args.kwargs["replaced_urls"] == [
+        "https://docs.example.com/a",
+        "https://docs.example.com/b",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_pages_with_only_duplicates_still_clear_their_old_rows(service):
+    items = [code_item("https://docs.example.com/new", INSTALL)]
+    rows = [stored_row(7, "https://docs.example.com/old", INSTALL)]
+    add_examples = AsyncMock()
+
+    with (
+        patch_lookup(rows),
+        patch.object(service, "_extract_code_blocks_from_documents", AsyncMock(return_value=items)),
+        patch(
+            "src.server.services.crawling.code_extraction_service.add_code_examples_to_supabase",
+            add_examples,
+        ),
+    ):
+        stored = await service.extract_and_store_code_examples([], {})
+
+    assert stored == 0
+    assert add_examples.await_args.kwargs["urls"] == []
+    assert add_examples.await_args.kwargs["replaced_urls"] == ["https://docs.example.com/new"]
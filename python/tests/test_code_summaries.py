@@ -0,0 +1,239 @@
+"""
+Tests for batched, cached code example summary generation.
+"""
+
+import json
+import re
+from contextlib import ExitStack, asynccontextmanager
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from src.server.services.embeddings.contextual_cache import CodeSummaryCache
+from src.server.services.storage import code_storage_service as module
+from src.server.services.storage.code_storage_service import (
+    _parse_code_summaries,
+    generate_code_example_summary,
+    generate_code_summaries_batch,
+)
+
+
+def json_summaries_response(**kwargs):
+    """Answer a summary request with one name and summary per indexed example."""
+    prompt = kwargs["messages"][1]["content"]
+    indexes = re.findall(r'<code_example index="(\d+)"', prompt)
+    response = MagicMock()
+    response.choices = [
+        MagicMock(
+            message=MagicMock(
+                content=json.dumps({
+                    index: {"example_name": f"Name {index}", "summary": f"Summary {index}."}
+                    for index in indexes
+                })
+            )
+        )
+    ]
+    return response
+
+
+def make_client(side_effect=json_summaries_response):
+    client = MagicMock()
+    client.chat.completions.create = AsyncMock(side_effect=side_effect)
+    return client
+
+
+def patch_summary_service(client, **settings: str) -> ExitStack:
+    """Patch the LLM client, rate limiter and RAG settings used for code summaries."""
+
+    @asynccontextmanager
+    async def get_llm_client(provider=None):
+        yield client
+
+    @asynccontextmanager
+    async def rate_limited_operation(estimated_tokens, operation=None):
+        yield
+
+    threading_service = MagicMock()
+    threading_service.rate_limited_operation = rate_limited_operation
+    mock_cred = MagicMock()
+    mock_cred.get_credentials_by_category = AsyncMock(
+        return_value={"MODEL_CHOICE": "gpt-4.1-nano", **settings}
+    )
+
+    stack = ExitStack()
+    stack.enter_context(patch.object(module, "get_llm_client", get_llm_client))
+    stack.enter_context(
+        patch.object(module, "get_threading_service", return_value=threading_service)
+    )
+    stack.enter_context(
+        patch("src.server.services.credential_service.credential_service", mock_cred)
+    )
+    return stack
+
+
+def block(code: str, language: str = "python") -> dict:
+    return {"code": code, "context_before": "Before.", "context_after": "After.", "language": language}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = CodeSummaryCache(tmp_path / "code_summaries.sqlite3")
+    with patch.object(module, "_code_summary_cache", cache):
+        yield cache
+    cache.close()
+
+
+class TestBatchedSummaries:
+    async def test_packs_several_examples_per_request(self, cache):
+        client = make_client()
+        blocks = [block(f"print({i})") for i in range(5)]
+
+        with patch_summary_service(client, CODE_SUMMARY_BATCH_SIZE="2"):
+            summaries = await generate_code_summaries_batch(blocks)
+
+        assert client.chat.completions.create.call_count == 3
+        assert [s["example_name"] for s in summaries] == [
+            "Name 1", "Name 2", "Name 1", "Name 2", "Name 1"
+        ]
+        assert all(s["summary"].startswith("Summary") for s in summaries)
+
+    async def test_identical_examples_are_summarized_once(self, cache):
+        client = make_client()
+        blocks = [block("print('same')"), block("print('same')"), block("print('other')")]
+
+        with patch_summary_service(client, CODE_SUMMARY_BATCH_SIZE="8"):
+            summaries = await generate_code_summaries_batch(blocks)
+
+        prompt = client.chat.completions.create.call_args.kwargs["messages"][1]["content"]
+        assert prompt.count("<code_example index=") == 2
+        assert summaries[0] == summaries[1]
+
+    async def test_missing_and_failed_results_fall_back(self, cache):
+        def partial(**kwargs):
+            response = MagicMock()
+            response.choices = [
+                MagicMock(message=MagicMock(content='{"1": {"example_name": "Only One"}}'))
+            ]
+            return response
+
+        client = make_client(side_effect=partial)
+        blocks = [block("a = 1"), block("b = 2", language="")]
+
+        with patch_summary_service(client):
+            summaries = await generate_code_summaries_batch(blocks)
+
+        assert summaries == [
+            {"example_name": "Code Example (python)", "summary": "Code example for demonstration purposes."},
+            {"example_name": "Code Example", "summary": "Code example for demonstration purposes."},
+        ]
+
+    async def test_reports_progress(self, cache):
+        client = make_client()
+        progress = AsyncMock()
+
+        with patch_summary_service(client, CODE_SUMMARY_BATCH_SIZE="2"):
+            await generate_code_summaries_batch(
+                [block(f"x = {i}") for i in range(4)], progress_callback=progress
+            )
+
+        assert progress.call_args.args[0]["completed_summaries"] == 4
+        assert progress.call_args.args[0]["percentage"] == 100
+
+    async def test_limiter_is_charged_with_counted_tokens(self, cache):
+        charged = []
+
+        @asynccontextmanager
+        async def rate_limited_operation(estimated_tokens, operation=None):
+            charged.append(estimated_tokens)
+            yield
+
+        threading_service = MagicMock()
+        threading_service.rate_limited_operation = rate_limited_operation
+        counted = []
+
+        def count_tokens_batch(texts, model):
+            counted.append((len(texts), model))
+            return [100] * len(texts)
+
+        with (
+            patch_summary_service(make_client(), CODE_SUMMARY_BATCH_SIZE="8"),
+            patch.object(module, "get_threading_service", return_value=threading_service),
+            patch.object(module, "count_tokens_batch", side_effect=count_tokens_batch),
+        ):
+            await generate_code_summaries_batch([block("a = 1"), block("b = 2")])
+
+        # System and user prompt at 100 tokens each, plus the response budget per example
+        assert counted == [(2, "gpt-4.1-nano")]
+        assert charged == [200 + 2 * module._SUMMARY_RESPONSE_TOKENS]
+
+    async def test_single_example_uses_the_batch_path(self, cache):
+        client = make_client()
+
+        with patch_summary_service(client):
+            summary = await generate_code_example_summary("x = 1", "Before.", "After.", "python")
+
+        assert summary == {"example_name": "Name 1", "summary": "Summary 1."}
+
+
+class TestSummaryCache:
+    async def test_rerun_is_served_from_cache(self, cache):
+        client = make_client()
+        blocks = [block("import os\nos.getcwd()"), block("print('hi')")]
+
+        with patch_summary_service(client):
+            first = await generate_code_summaries_batch(blocks)
+            # Whitespace-only changes normalize to the same code
+            second = await generate_code_summaries_batch(
+                [block("import os\nos.getcwd()   "), block("print('hi')")]
+            )
+
+        assert client.chat.completions.create.call_count == 1
+        assert first == second
+
+    async def test_changed_context_is_a_miss(self, cache):
+        client = make_client()
+
+        with patch_summary_service(client):
+            await generate_code_summaries_batch([block("x = 1")])
+            changed = {**block("x = 1"), "context_before": "Different intro."}
+            await generate_code_summaries_batch([changed])
+
+        assert client.chat.completions.create.call_count == 2
+
+    async def test_cache_can_be_disabled(self, cache):
+        client = make_client()
+
+        with patch_summary_service(client, CODE_SUMMARY_CACHE_ENABLED="false"):
+            await generate_code_summaries_batch([block("x = 1")])
+            await generate_code_summaries_batch([block("x = 1")])
+
+        assert client.chat.completions.create.call_count == 2
+        assert cache.size_bytes == 0
+
+    async def test_fallbacks_are_not_cached(self, cache):
+        client = make_client(side_effect=RuntimeError("provider down"))
+
+        with patch_summary_service(client):
+            await generate_code_summaries_batch([block("x = 1")])
+
+        assert cache.size_bytes == 0
+
+
+class TestParseCodeSummaries:
+    def test_parses_fenced_json(self):
+        text = '```json\n{"1": {"example_name": "Read File", "summary": "Reads it."}}\n```'
+        assert _parse_code_summaries(text, 1) == {
+            0: {"example_name": "Read File", "summary": "Reads it."}
+        }
+
+    def test_ignores_out_of_range_and_incomplete_entries(self):
+        text = json.dumps({
+            "0": {"example_name": "Zero", "summary": "No."},
+            "2": {"example_name": "Two", "summary": "Yes."},
+            "3": {"example_name": "Three", "summary": "Out of range."},
+            "1": {"example_name": "", "summary": "Missing name."},
+        })
+        assert _parse_code_summaries(text, 2) == {1: {"example_name": "Two", "summary": "Yes."}}
+
+    def test_invalid_json_yields_no_summaries(self):
+        assert _parse_code_summaries("not json {", 1) == {}
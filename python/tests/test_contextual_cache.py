@@ -0,0 +1,83 @@
+"""
+Tests for the persistent contextual-embedding cache.
+"""
+
+from unittest.mock import patch
+
+import pytest
+
+from src.server.services.embeddings.contextual_cache import (
+    ContextualCache,
+    make_contextual_cache_key,
+)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ContextualCache(tmp_path / "contextual.sqlite3")
+    yield cache
+    cache.close()
+
+
+class TestContextualCache:
+    def test_key_depends_on_model_preview_and_chunk(self):
+        base = make_contextual_cache_key("model-a", "doc", "chunk")
+        assert base == make_contextual_cache_key("model-a", "doc", "chunk")
+        assert base != make_contextual_cache_key("model-b", "doc", "chunk")
+        assert base != make_contextual_cache_key("model-a", "doc v2", "chunk")
+        assert base != make_contextual_cache_key("model-a", "doc", "chunk v2")
+
+    def test_round_trip(self, cache):
+        cache.put_many("m", [("doc", "a", "context a"), ("doc", "b", "context b")])
+
+        hits = cache.get_many("m", [("doc", "b"), ("doc", "missing"), ("doc", "a")])
+
+        assert hits == {0: "context b", 2: "context a"}
+        assert cache.hits == 2
+        assert cache.misses == 1
+
+    def test_persists_across_instances(self, tmp_path):
+        path = tmp_path / "contextual.sqlite3"
+        first = ContextualCache(path)
+        first.put_many("m", [("doc", "a", "context")])
+        first.close()
+
+        second = ContextualCache(path)
+        assert second.get_many("m", [("doc", "a")]) == {0: "context"}
+        assert second.size_bytes == len("context")
+        second.close()
+
+    def test_expired_entries_are_misses_and_removed(self, cache):
+        cache.ttl_seconds = 60
+        with patch("src.server.services.embeddings.sqlite_cache.time.time", return_value=1000):
+            cache.put_many("m", [("doc", "a", "context")])
+
+        with patch("src.server.services.embeddings.sqlite_cache.time.time", return_value=1030):
+            assert cache.get_many("m", [("doc", "a")]) == {0: "context"}
+
+        with patch("src.server.services.embeddings.sqlite_cache.time.time", return_value=1061):
+            assert cache.get_many("m", [("doc", "a")]) == {}
+
+        assert cache.size_bytes == 0
+
+    def test_lru_eviction(self, tmp_path):
+        # Each 10-byte context; room for 3 entries
+        cache = ContextualCache(tmp_path / "contextual.sqlite3", max_size_bytes=30)
+        for name in "abc":
+            cache.put_many("m", [("doc", name, name * 10)])
+
+        # Touch "a" so "b" becomes least recently used
+        cache.get_many("m", [("doc", "a")])
+        cache.put_many("m", [("doc", "d", "d" * 10)])
+
+        hits = cache.get_many("m", [("doc", name) for name in "abcd"])
+        assert 1 not in hits
+        assert 0 in hits and 3 in hits
+        assert cache.size_bytes <= 30
+        cache.close()
+
+    def test_replacing_entry_does_not_double_count(self, cache):
+        cache.put_many("m", [("doc", "a", "first")])
+        cache.put_many("m", [("doc", "a", "second")])
+        assert cache.size_bytes == len("second")
+        assert cache.get_many("m", [("doc", "a")]) == {0: "second"}
@@ -0,0 +1,314 @@
+"""
+Tests for document-grouped contextual embedding generation.
+"""
+
+import asyncio
+import json
+from contextlib import ExitStack
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import openai
+import pytest
+
+from src.server.services.embeddings import contextual_cache as cache_module
+from src.server.services.embeddings.contextual_cache import ContextualCache
+from src.server.services.embeddings.contextual_embedding_service import (
+    _parse_contexts,
+    generate_contextual_embedding,
+    generate_contextual_embeddings_batch,
+)
+
+
+class AsyncContextManager:
+    """Helper class for properly mocking async context managers"""
+
+    def __init__(self, return_value):
+        self.return_value = return_value
+
+    async def __aenter__(self):
+        return self.return_value
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+
+def json_contexts_response(**kwargs):
+    """Answer a contextual request with one JSON context per indexed chunk."""
+    prompt = kwargs["messages"][1]["content"]
+    count = prompt.count("<chunk index=")
+    response = MagicMock()
+    response.choices = [
+        MagicMock(
+            message=MagicMock(
+                content=json.dumps({str(i + 1): f"context {i + 1}" for i in range(count)})
+            )
+        )
+    ]
+    return response
+
+
+def patch_contextual_service(
+    mock_client, mock_threading_service, max_tokens: str, **settings: str
+) -> ExitStack:
+    """Patch the contextual service's client, limiter, model and a 10-tokens-per-text counter."""
+    mock_cred = MagicMock()
+    mock_cred.get_credentials_by_category = AsyncMock(
+        return_value={"CONTEXTUAL_EMBEDDING_MAX_TOKENS": max_tokens, **settings}
+    )
+    module = "src.server.services.embeddings.contextual_embedding_service"
+    stack = ExitStack()
+    stack.enter_context(
+        patch(f"{module}.get_llm_client", return_value=AsyncContextManager(mock_client))
+    )
+    stack.enter_context(
+        patch(f"{module}.get_threading_service", return_value=mock_threading_service)
+    )
+    stack.enter_context(
+        patch(f"{module}._get_model_choice", AsyncMock(return_value="gpt-4.1-nano"))
+    )
+    stack.enter_context(
+        patch(
+            f"{module}.count_tokens_batch",
+            side_effect=lambda texts, model: [10] * len(texts),
+        )
+    )
+    stack.enter_context(
+        patch("src.server.services.credential_service.credential_service", mock_cred)
+    )
+    return stack
+
+
+def make_client(side_effect=json_contexts_response):
+    mock_client = MagicMock()
+    mock_client.chat.completions.create = AsyncMock(side_effect=side_effect)
+    return mock_client
+
+
+def make_threading_service():
+    mock_threading_service = MagicMock()
+    mock_threading_service.rate_limited_operation.return_value = AsyncContextManager(None)
+    return mock_threading_service
+
+
+class TestContextualEmbeddingPacking:
+    @pytest.mark.asyncio
+    async def test_splits_requests_by_token_budget(self):
+        mock_client = MagicMock()
+        mock_client.chat.completions.create = AsyncMock(side_effect=json_contexts_response)
+
+        mock_threading_service = MagicMock()
+        mock_threading_service.rate_limited_operation.return_value = AsyncContextManager(None)
+
+        with patch_contextual_service(mock_client, mock_threading_service, "30"):
+            results = await generate_contextual_embeddings_batch(
+                ["doc"] * 5, ["c1", "c2", "c3", "c4", "c5"]
+            )
+
+        # 10 tokens for the preview leaves 20 for chunks -> requests of 2, 2 and 1 chunks
+        assert mock_client.chat.completions.create.call_count == 3
+        assert [success for _, success in results] == [True] * 5
+        assert results[0][0] == "context 1\n\nc1"
+        assert results[2][0] == "context 1\n\nc3"
+        assert results[4][0] == "context 1\n\nc5"
+
+        charged = [c.args[0] for c in mock_threading_service.rate_limited_operation.call_args_list]
+        assert charged[0] > 30  # prompt tokens plus response budget
+
+
+class TestDocumentGrouping:
+    @pytest.mark.asyncio
+    async def test_chunks_are_grouped_by_document(self):
+        mock_client = make_client()
+
+        with patch_contextual_service(mock_client, make_threading_service(), "16000"):
+            results = await generate_contextual_embeddings_batch(
+                ["doc A", "doc B", "doc A", "doc B"], ["a1", "b1", "a2", "b2"]
+            )
+
+        # One request per document, each carrying its preview exactly once
+        prompts = [
+            c.kwargs["messages"][1]["content"]
+            for c in mock_client.chat.completions.create.call_args_list
+        ]
+        assert len(prompts) == 2
+        assert prompts[0].count("doc A") == 1 and "doc B" not in prompts[0]
+        assert prompts[1].count("doc B") == 1 and "doc A" not in prompts[1]
+        assert [text for text, _ in results] == [
+            "context 1\n\na1",
+            "context 1\n\nb1",
+            "context 2\n\na2",
+            "context 2\n\nb2",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_missing_contexts_fall_back_to_plain_chunks(self):
+        def partial(**kwargs):
+            response = MagicMock()
+            response.choices = [MagicMock(message=MagicMock(content='{"2": "only second"}'))]
+            return response
+
+        with patch_contextual_service(make_client(partial), make_threading_service(), "16000"):
+            results = await generate_contextual_embeddings_batch(["doc"] * 2, ["c1", "c2"])
+
+        assert results == [("c1", False), ("only second\n\nc2", True)]
+
+    @pytest.mark.asyncio
+    async def test_failed_request_only_affects_its_own_chunks(self):
+        def fail_doc_b(**kwargs):
+            if "doc B" in kwargs["messages"][1]["content"]:
+                raise RuntimeError("upstream error")
+            return json_contexts_response(**kwargs)
+
+        with patch_contextual_service(make_client(fail_doc_b), make_threading_service(), "16000"):
+            results = await generate_contextual_embeddings_batch(
+                ["doc A", "doc B", "doc A"], ["a1", "b1", "a2"]
+            )
+
+        assert results == [("context 1\n\na1", True), ("b1", False), ("context 2\n\na2", True)]
+
+    @pytest.mark.asyncio
+    async def test_rate_limited_request_is_retried(self):
+        responses = [
+            openai.RateLimitError("slow down", response=MagicMock(status_code=429), body=None),
+            json_contexts_response,
+        ]
+
+        def throttle_once(**kwargs):
+            response = responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response(**kwargs)
+
+        mock_client = make_client(throttle_once)
+        with patch_contextual_service(mock_client, make_threading_service(), "16000"):
+            results = await generate_contextual_embeddings_batch(["doc"], ["c1"])
+
+        assert mock_client.chat.completions.create.call_count == 2
+        assert results == [("context 1\n\nc1", True)]
+
+    @pytest.mark.asyncio
+    async def test_document_requests_run_concurrently(self):
+        in_flight = 0
+        peak = 0
+
+        async def slow(**kwargs):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return json_contexts_response(**kwargs)
+
+        with patch_contextual_service(make_client(slow), make_threading_service(), "16000"):
+            results = await generate_contextual_embeddings_batch(
+                ["doc A", "doc B", "doc C"], ["a1", "b1", "c1"]
+            )
+
+        assert peak == 3
+        assert all(success for _, success in results)
+
+    @pytest.mark.asyncio
+    async def test_batch_requests_json_mode(self):
+        mock_client = make_client()
+
+        with patch_contextual_service(mock_client, make_threading_service(), "16000"):
+            await generate_contextual_embeddings_batch(["doc"], ["c1"])
+
+        kwargs = mock_client.chat.completions.create.call_args.kwargs
+        assert kwargs["response_format"] == {"type": "json_object"}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ContextualCache(tmp_path / "contextual.sqlite3")
+    with patch.object(cache_module, "_contextual_cache", cache):
+        yield cache
+    cache.close()
+
+
+class TestContextualCacheIntegration:
+    @pytest.mark.asyncio
+    async def test_batch_serves_unchanged_chunks_from_cache(self, cache):
+        cache.put_many("gpt-4.1-nano", [("doc", "c1", "cached context")])
+        mock_client = make_client()
+
+        with patch_contextual_service(
+            mock_client, make_threading_service(), "16000", CONTEXTUAL_CACHE_ENABLED="true"
+        ):
+            results = await generate_contextual_embeddings_batch(["doc", "doc"], ["c1", "c2"])
+
+            assert results == [("cached context\n\nc1", True), ("context 1\n\nc2", True)]
+            prompt = mock_client.chat.completions.create.call_args.kwargs["messages"][1]["content"]
+            assert "c1" not in prompt and "c2" in prompt
+
+            # The fresh context is cached too, so a re-run makes no requests
+            mock_client.chat.completions.create.reset_mock()
+            results = await generate_contextual_embeddings_batch(["doc", "doc"], ["c1", "c2"])
+            assert results[1] == ("context 1\n\nc2", True)
+            mock_client.chat.completions.create.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_changed_document_is_a_miss(self, cache):
+        cache.put_many("gpt-4.1-nano", [("old doc", "c1", "stale context")])
+        mock_client = make_client()
+
+        with patch_contextual_service(
+            mock_client, make_threading_service(), "16000", CONTEXTUAL_CACHE_ENABLED="true"
+        ):
+            results = await generate_contextual_embeddings_batch(["new doc"], ["c1"])
+
+        assert results == [("context 1\n\nc1", True)]
+        mock_client.chat.completions.create.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_cache_is_off_unless_enabled(self, cache):
+        cache.put_many("gpt-4.1-nano", [("doc", "c1", "cached context")])
+        mock_client = make_client()
+
+        with patch_contextual_service(mock_client, make_threading_service(), "16000"):
+            results = await generate_contextual_embeddings_batch(["doc"], ["c1"])
+
+        assert results == [("context 1\n\nc1", True)]
+        mock_client.chat.completions.create.assert_called_once()
+
+    @pytest.mark.asyncio
+    async def test_single_chunk_path_uses_cache(self, cache):
+        cache.put_many("gpt-4.1-nano", [("doc", "c1", "cached context")])
+        mock_client = make_client()
+
+        with patch_contextual_service(
+            mock_client, make_threading_service(), "16000", CONTEXTUAL_CACHE_ENABLED="true"
+        ):
+            result = await generate_contextual_embedding("doc", "c1")
+
+        assert result == ("cached context\n---\nc1", True)
+        mock_client.chat.completions.create.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_single_and_batch_paths_share_entries_for_long_documents(self, cache):
+        long_doc = "x" * 10000
+        mock_client = make_client()
+
+        with patch_contextual_service(
+            mock_client, make_threading_service(), "16000", CONTEXTUAL_CACHE_ENABLED="true"
+        ):
+            await generate_contextual_embeddings_batch([long_doc], ["c1"])
+            mock_client.chat.completions.create.reset_mock()
+            result = await generate_contextual_embedding(long_doc, "c1")
+
+        assert result == ("context 1\n---\nc1", True)
+        mock_client.chat.completions.create.assert_not_called()
+
+
+class TestParseContexts:
+    def test_parses_fenced_json(self):
+        text = '```json\n{"1": "first", "2": " second "}\n```'
+        assert _parse_contexts(text, 2) == {0: "first", 1: "second"}
+
+    def test_ignores_out_of_range_and_empty_entries(self):
+        assert _parse_contexts('{"0": "x", "2": "", "3": "y", "1": "ok"}', 2) == {0: "ok"}
+
+    def test_invalid_json_yields_no_contexts(self):
+        assert _parse_contexts("CHUNK 1: not json", 1) == {}
+        assert _parse_contexts('{"1": "unterminated', 1) == {}
@@ -0,0 +1,60 @@
+"""Tests for the ingestion process pool."""
+
+import os
+from unittest.mock import patch
+
+import pytest
+
+from src.server.services.cpu_process_pool import CpuProcessPool
+from src.server.services.storage.base_storage_service import (
+    chunk_text_by_characters,
+    chunk_text_with_metadata,
+)
+from src.server.services.storage.code_storage_service import extract_code_blocks
+
+
+@pytest.mark.asyncio
+async def test_small_inputs_run_inline_without_starting_workers():
+    pool = CpuProcessPool(max_workers=2, min_bytes=1000)
+
+    assert await pool.run(str.upper, "small") == "SMALL"
+    assert pool._executor is None
+
+
+@pytest.mark.asyncio
+async def test_disabled_pool_runs_in_threads():
+    pool = CpuProcessPool(max_workers=0, min_bytes=0)
+
+    assert await pool.run(chunk_text_by_characters, "One. Two.", 5000) == ["One. Two."]
+    assert pool._executor is None
+
+
+@pytest.mark.asyncio
+async def test_text_travels_through_shared_memory():
+    pool = CpuProcessPool(max_workers=1, min_bytes=0)
+    text = "naïve café – ünïcode " * 1000
+    try:
+        assert await pool.run(str.upper, text) == text.upper()
+    finally:
+        pool.shutdown()
+
+
+def test_chunks_and_metadata_come_back_together():
+    text = "# Title\n\nSome text with a link to https://example.com.\n\n" * 200
+
+    chunked = chunk_text_with_metadata(text, chunk_size=1000)
+
+    assert [chunk for chunk, _ in chunked] == chunk_text_by_characters(text, 1000)
+    chunk, metadata = chunked[0]
+    assert metadata["headers"].startswith("# Title")
+    assert metadata["has_links"] is True
+    assert metadata["char_count"] == len(chunk)
+
+
+def test_code_block_settings_snapshot_is_used_over_the_cache():
+    code = "\n".join(f"result_{i} = compute(value_{i}) + offset" for i in range(20))
+    markdown = f"Intro text.\n\n```python\n{code}\n```\n\nOutro text."
+
+    with patch.dict(os.environ, {"MAX_CODE_BLOCK_LENGTH": "5000"}):
+        assert extract_code_blocks(markdown, min_length=100)
+        assert extract_code_blocks(markdown, 100, {"MAX_CODE_BLOCK_LENGTH": "200"}) == []
@@ -0,0 +1,103 @@
+"""
+Tests for the bounded executor that keeps Supabase calls off the event loop.
+"""
+
+import asyncio
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.server.services.client_manager import get_supabase_client
+from src.server.services.database_executor import DatabaseExecutor
+
+
+@pytest.fixture
+def executor():
+    executor = DatabaseExecutor(max_workers=2, slow_query_seconds=10)
+    yield executor
+    executor.shutdown()
+
+
+class TestDatabaseExecutor:
+    @pytest.mark.asyncio
+    async def test_execute_runs_off_the_event_loop(self, executor):
+        seen = {}
+
+        def execute():
+            seen["thread"] = threading.current_thread().name
+            return MagicMock(data=[{"id": 1}])
+
+        query = MagicMock(execute=execute)
+        response = await executor.execute(query, operation="select")
+
+        assert response.data == [{"id": 1}]
+        assert seen["thread"].startswith("supabase")
+
+    @pytest.mark.asyncio
+    async def test_event_loop_stays_responsive_during_a_slow_query(self, executor):
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        ticking = asyncio.create_task(ticker())
+        await executor.run(time.sleep, 0.1)
+        ticking.cancel()
+
+        assert ticks >= 5
+
+    @pytest.mark.asyncio
+    async def test_in_flight_queries_are_bounded(self, executor):
+        active = 0
+        peak = 0
+        lock = threading.Lock()
+
+        def query():
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.02)
+            with lock:
+                active -= 1
+
+        await asyncio.gather(*(executor.run(query) for _ in range(8)))
+
+        assert peak == 2
+
+    @pytest.mark.asyncio
+    async def test_stats_record_timings_and_errors(self, executor):
+        failing = MagicMock()
+        failing.execute.side_effect = RuntimeError("boom")
+
+        await executor.execute(MagicMock(), operation="ok")
+        with pytest.raises(RuntimeError):
+            await executor.execute(failing, operation="broken")
+
+        stats = executor.get_stats()
+        assert stats["ok"]["count"] == 1
+        assert stats["ok"]["errors"] == 0
+        assert stats["broken"]["errors"] == 1
+
+    @pytest.mark.asyncio
+    async def test_slow_queries_are_logged(self):
+        executor = DatabaseExecutor(max_workers=1, slow_query_seconds=0)
+        with patch("src.server.services.database_executor.search_logger") as logger:
+            await executor.execute(MagicMock(), operation="rpc")
+        executor.shutdown()
+
+        assert "rpc" in logger.warning.call_args.args[0]
+
+
+def test_supabase_client_is_reused():
+    client = MagicMock()
+    with patch("src.server.services.client_manager.create_client", return_value=client) as create:
+        assert get_supabase_client() is client
+        assert get_supabase_client() is client
+
+    create.assert_called_once()
@@ -0,0 +1,496 @@
+"""
+Tests for incremental re-crawl and the embed/insert pipeline in the document storage service.
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from src.server.services.embeddings.embedding_service import EmbeddingBatchResult
+from src.server.services.storage.document_storage_service import (
+    _plan_incremental_update,
+    add_documents_to_supabase,
+    compute_chunk_hash,
+)
+
+MODULE = "src.server.services.storage.document_storage_service"
+
+
+class FakeTable:
+    """Records the operations issued against one Supabase table."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.deleted = []
+        self.inserted = []
+        self._op = None
+        self._filter = None
+        self._filters = []
+        self._range = (0, None)
+
+    def select(self, _columns):
+        self._op = "select"
+        return self
+
+    def delete(self):
+        self._op = "delete"
+        return self
+
+    def upsert(self, data, on_conflict=""):
+        assert on_conflict == "url,chunk_number"
+        self._op = "insert"
+        self._data = data
+        return self
+
+    def in_(self, column, values):
+        self._filter = (column, list(values))
+        self._filters.append((column, "in", list(values)))
+        return self
+
+    def eq(self, column, value):
+        self._filters = [(column, "eq", value)]
+        return self
+
+    def gte(self, column, value):
+        self._filters.append((column, "gte", value))
+        return self
+
+    def order(self, _column):
+        return self
+
+    def range(self, start, end):
+        self._range = (start, end)
+        return self
+
+    def execute(self):
+        response = MagicMock(data=[])
+        if self._op == "select":
+            column, values = self._filter
+            matching = [row for row in self.rows if row[column] in values]
+            start, end = self._range
+            response.data = matching[start : end + 1]
+        elif self._op == "delete":
+            self.deleted.append(tuple(self._filters))
+        elif self._op == "insert":
+            self.inserted.extend(self._data if isinstance(self._data, list) else [self._data])
+        return response
+
+
+class FakePageTable:
+    """Upserts archon_pages rows on url and hands out page ids."""
+
+    def __init__(self, error: Exception | None = None):
+        self.pages = {}
+        self.error = error
+        self._urls = None
+
+    def upsert(self, data, on_conflict="", returning=None):
+        assert on_conflict == "url"
+        if self.error is not None:
+            raise self.error
+        for row in data:
+            page_id = self.pages.get(row["url"], {}).get("id", len(self.pages) + 1)
+            self.pages[row["url"]] = {**row, "id": page_id}
+        self._urls = None
+        return self
+
+    def select(self, _columns):
+        return self
+
+    def in_(self, _column, values):
+        self._urls = list(values)
+        return self
+
+    def execute(self):
+        urls = self._urls or []
+        return MagicMock(data=[{"id": self.pages[url]["id"], "url": url} for url in urls if url in self.pages])
+
+
+EMBEDDING_SIGNATURE = "openai:text-embedding-3-small:1536"
+STORED_SIGNATURE = f"{EMBEDDING_SIGNATURE}:contextual=False"
+
+
+def stored_row(row_id, url, chunk_number, content, signature=STORED_SIGNATURE):
+    return {
+        "id": row_id,
+        "url": url,
+        "chunk_number": chunk_number,
+        "content_hash": compute_chunk_hash(content, signature),
+    }
+
+
+def make_client(
+    table: FakeTable, trim_error: Exception | None = None, pages: FakePageTable | None = None
+) -> MagicMock:
+    client = MagicMock()
+    pages = pages or FakePageTable()
+    client.table.side_effect = lambda name: pages if name == "archon_pages" else table
+    if trim_error is not None:
+        client.rpc.return_value.execute.side_effect = trim_error
+    return client
+
+
+def trim_calls(client: MagicMock) -> list:
+    return [c.args for c in client.rpc.call_args_list if c.args[0] == "trim_archon_crawled_pages"]
+
+
+def fake_embeddings(texts, provider=None):
+    result = EmbeddingBatchResult()
+    for text in texts:
+        result.add_success([0.1, 0.2], text)
+    return result
+
+
+def patch_storage(incremental: bool, signature: str = EMBEDDING_SIGNATURE, **settings):
+    credential_service = MagicMock()
+    credential_service.get_credentials_by_category = AsyncMock(
+        return_value={"INCREMENTAL_CRAWL_ENABLED": "true" if incremental else "false", **settings}
+    )
+    credential_service.get_credential = AsyncMock(return_value="false")
+    return (
+        patch(f"{MODULE}.credential_service", credential_service),
+        patch(f"{MODULE}.create_embeddings_batch", AsyncMock(side_effect=fake_embeddings)),
+        patch(f"{MODULE}.get_embedding_signature", AsyncMock(return_value=signature)),
+        patch(f"{MODULE}.asyncio.sleep", new_callable=AsyncMock),
+    )
+
+
+async def store(
+    client,
+    urls,
+    chunk_numbers,
+    contents,
+    incremental=True,
+    metadatas=None,
+    signature=EMBEDDING_SIGNATURE,
+    **kwargs,
+):
+    credentials, embeddings, embedding_signature, sleep = patch_storage(incremental, signature)
+    with credentials, embeddings as embed, embedding_signature, sleep:
+        await add_documents_to_supabase(
+            client,
+            urls,
+            chunk_numbers,
+            contents,
+            metadatas or [{"source_id": "example.com"} for _ in contents],
+            {},
+            **kwargs,
+        )
+    return embed
+
+
+class TestPlanIncrementalUpdate:
+    @pytest.mark.asyncio
+    async def test_diff_returns_only_changed_chunks(self):
+        table = FakeTable(
+            [
+                stored_row(1, "u", 0, "intro"),
+                stored_row(2, "u", 1, "old body"),
+                stored_row(3, "u", 2, "removed tail"),
+                stored_row(4, "other", 0, "untouched"),
+            ]
+        )
+
+        urls = ["u", "u", "u"]
+        hashes = [compute_chunk_hash(c, STORED_SIGNATURE) for c in ("intro", "new body", "brand new")]
+        write = await _plan_incremental_update(make_client(table), urls, [0, 1, 3], hashes, 50)
+
+        assert write == [1, 2]
+
+    @pytest.mark.asyncio
+    async def test_rows_without_hash_are_rewritten(self):
+        table = FakeTable([{"id": 1, "url": "u", "chunk_number": 0, "content_hash": None}])
+
+        write = await _plan_incremental_update(
+            make_client(table), ["u"], [0], [compute_chunk_hash("intro")], 50
+        )
+
+        assert write == [0]
+
+    @pytest.mark.asyncio
+    async def test_large_results_are_paged(self):
+        rows = [stored_row(i, "u", i, f"chunk {i}") for i in range(2500)]
+
+        contents = [f"chunk {i}" for i in range(2500)]
+        write = await _plan_incremental_update(
+            make_client(FakeTable(rows)),
+            ["u"] * 2500,
+            list(range(2500)),
+            [compute_chunk_hash(c, STORED_SIGNATURE) for c in contents],
+            50,
+        )
+
+        assert write == []
+
+
+class TestIncrementalStorage:
+    @pytest.mark.asyncio
+    async def test_only_changed_chunks_are_embedded_and_upserted(self):
+        table = FakeTable([stored_row(1, "u", 0, "intro"), stored_row(2, "u", 1, "old body")])
+        client = make_client(table)
+
+        embed = await store(client, ["u", "u"], [0, 1], ["intro", "new body"])
+
+        embed.assert_awaited_once()
+        assert embed.call_args.args[0] == ["new body"]
+        assert [row["chunk_number"] for row in table.inserted] == [1]
+        assert table.inserted[0]["content_hash"] == compute_chunk_hash("new body", STORED_SIGNATURE)
+        assert table.deleted == []
+
+    @pytest.mark.asyncio
+    async def test_unchanged_page_writes_nothing(self):
+        table = FakeTable([stored_row(1, "u", 0, "intro")])
+        client = make_client(table)
+
+        embed = await store(client, ["u"], [0], ["intro"])
+
+        embed.assert_not_awaited()
+        assert table.inserted == []
+        assert table.deleted == []
+
+    @pytest.mark.asyncio
+    async def test_duplicate_texts_keep_their_own_chunk_numbers(self):
+        table = FakeTable([])
+        client = make_client(table)
+
+        await store(client, ["u", "u", "u"], [0, 1, 2], ["same", "other", "same"])
+
+        assert sorted(row["chunk_number"] for row in table.inserted) == [0, 1, 2]
+
+    @pytest.mark.asyncio
+    async def test_chunks_that_fail_to_embed_are_deleted(self):
+        table = FakeTable([stored_row(1, "u", 0, "old intro"), stored_row(2, "u", 1, "old body")])
+        client = make_client(table)
+
+        def fail_body(texts, provider=None):
+            result = EmbeddingBatchResult()
+            for text in texts:
+                if text == "new body":
+                    result.add_failure(text, RuntimeError("embedding failed"))
+                else:
+                    result.add_success([0.1, 0.2], text)
+            return result
+
+        credentials, _, signature, sleep = patch_storage(incremental=True)
+        with (
+            credentials,
+            signature,
+            sleep,
+            patch(f"{MODULE}.create_embeddings_batch", AsyncMock(side_effect=fail_body)),
+        ):
+            await add_documents_to_supabase(
+                client, ["u", "u"], [0, 1], ["new intro", "new body"], [{"source_id": "s"}] * 2, {}
+            )
+
+        assert [row["chunk_number"] for row in table.inserted] == [0]
+        assert (("url", "eq", "u"), ("chunk_number", "in", [1])) in table.deleted
+
+    @pytest.mark.asyncio
+    async def test_embedding_model_change_rewrites_unchanged_chunks(self):
+        table = FakeTable([stored_row(1, "u", 0, "intro")])
+        client = make_client(table)
+
+        embed = await store(
+            client, ["u"], [0], ["intro"], signature="openai:text-embedding-3-large:3072"
+        )
+
+        embed.assert_awaited_once()
+        assert [row["chunk_number"] for row in table.inserted] == [0]
+
+    @pytest.mark.asyncio
+    async def test_disabled_mode_upserts_every_chunk(self):
+        table = FakeTable([stored_row(1, "u", 0, "intro")])
+        client = make_client(table)
+
+        await store(client, ["u"], [0], ["intro"], incremental=False)
+
+        assert len(table.inserted) == 1
+        assert table.deleted == []
+
+
+class TestUpsertAndTrim:
+    @pytest.mark.asyncio
+    async def test_rows_past_the_new_chunk_count_are_trimmed_in_one_call(self):
+        client = make_client(FakeTable([]))
+
+        await store(client, ["a", "a", "a", "b"], [0, 1, 2, 0], ["1", "2", "3", "4"])
+
+        assert trim_calls(client) == [
+            ("trim_archon_crawled_pages", {"urls": ["a", "b"], "chunk_counts": [3, 1]})
+        ]
+
+    @pytest.mark.asyncio
+    async def test_trim_runs_after_all_chunks_are_written(self):
+        table = FakeTable([])
+        client = make_client(table)
+        order = []
+        client.rpc.side_effect = lambda *args: order.append(len(table.inserted)) or MagicMock()
+
+        await store(client, ["a", "a"], [0, 1], ["1", "2"])
+
+        assert order == [2]
+
+    @pytest.mark.asyncio
+    async def test_trim_falls_back_to_per_url_deletes(self):
+        table = FakeTable([])
+        client = make_client(table, trim_error=RuntimeError("function does not exist"))
+
+        await store(client, ["a", "b", "b"], [0, 0, 1], ["1", "2", "3"])
+
+        assert table.deleted == [
+            (("url", "eq", "a"), ("chunk_number", "gte", 1)),
+            (("url", "eq", "b"), ("chunk_number", "gte", 2)),
+        ]
+
+
+class TestPageRows:
+    @pytest.mark.asyncio
+    async def test_chunks_reference_their_page_and_keep_chunk_metadata(self):
+        table = FakeTable([])
+        pages = FakePageTable()
+        metadatas = [
+            {"source_id": "example.com", "url": url, "title": "Guide", "tags": ["t"], "chunk_index": i}
+            for i, url in enumerate(["a", "a", "b"])
+        ]
+
+        await store(
+            make_client(table, pages=pages),
+            ["a", "a", "b"],
+            [0, 1, 0],
+            ["1", "2", "3"],
+            metadatas=metadatas,
+            url_to_etag={"a": '"v1"'},
+        )
+
+        assert pages.pages["a"]["metadata"] == {
+            "source_id": "example.com",
+            "url": "a",
+            "title": "Guide",
+            "tags": ["t"],
+        }
+        assert (pages.pages["a"]["chunk_count"], pages.pages["a"]["etag"]) == (2, '"v1"')
+        assert [row["page_id"] for row in table.inserted] == [1, 1, 2]
+        assert table.inserted[1]["metadata"] == {"chunk_size": 1, "chunk_index": 1}
+        assert table.inserted[2]["source_id"] == "example.com"
+
+    @pytest.mark.asyncio
+    async def test_without_pages_table_chunks_keep_full_metadata(self):
+        table = FakeTable([])
+        pages = FakePageTable(error=RuntimeError('relation "archon_pages" does not exist'))
+        metadatas = [{"source_id": "example.com", "title": "Guide"}]
+
+        await store(make_client(table, pages=pages), ["a"], [0], ["1"], metadatas=metadatas)
+
+        assert "page_id" not in table.inserted[0]
+        assert table.inserted[0]["metadata"] == {"chunk_size": 1, **metadatas[0]}
+
+
+class TestStoragePipeline:
+    @pytest.mark.asyncio
+    async def test_next_batch_is_embedded_while_previous_is_written(self):
+        events = []
+        insert_started = asyncio.Event()
+
+        async def slow_embeddings(texts, provider=None):
+            events.append(f"embed {texts[0]}")
+            if texts[0] == "chunk 1":
+                # The second batch can only be embedded while the first is being written
+                await asyncio.wait_for(insert_started.wait(), timeout=1)
+            return fake_embeddings(texts)
+
+        async def fake_insert(client, batch_data, cancellation_check=None, bulk_loader=None):
+            events.append(f"insert {batch_data[0]['content']}")
+            insert_started.set()
+            await asyncio.sleep(0)
+
+        credentials, _, signature, _ = patch_storage(incremental=False)
+        with (
+            credentials,
+            signature,
+            patch(f"{MODULE}.create_embeddings_batch", AsyncMock(side_effect=slow_embeddings)),
+            patch(f"{MODULE}._insert_batch", side_effect=fake_insert),
+            patch(f"{MODULE}.upsert_pages", AsyncMock(return_value={})),
+        ):
+            await add_documents_to_supabase(
+                MagicMock(),
+                ["u", "u"],
+                [0, 1],
+                ["chunk 0", "chunk 1"],
+                [{"source_id": "s"}, {"source_id": "s"}],
+                {},
+                batch_size=1,
+            )
+
+        assert events.index("insert chunk 0") < events.index("insert chunk 1")
+        assert len(events) == 4
+
+    @pytest.mark.asyncio
+    async def test_embedding_is_throttled_by_the_writer(self):
+        release_writer = asyncio.Event()
+        embedded = []
+
+        async def counting_embeddings(texts, provider=None):
+            embedded.append(texts[0])
+            return fake_embeddings(texts)
+
+        async def blocked_insert(client, batch_data, cancellation_check=None, bulk_loader=None):
+            await release_writer.wait()
+
+        credentials, _, signature, _ = patch_storage(
+            incremental=False, DOCUMENT_STORAGE_PIPELINE_DEPTH="1"
+        )
+        with (
+            credentials,
+            signature,
+            patch(f"{MODULE}.create_embeddings_batch", AsyncMock(side_effect=counting_embeddings)),
+            patch(f"{MODULE}._insert_batch", side_effect=blocked_insert),
+            patch(f"{MODULE}.upsert_pages", AsyncMock(return_value={})),
+        ):
+            contents = [f"chunk {i}" for i in range(6)]
+            task = asyncio.create_task(
+                add_documents_to_supabase(
+                    MagicMock(),
+                    ["u"] * 6,
+                    list(range(6)),
+                    contents,
+                    [{"source_id": "s"} for _ in contents],
+                    {},
+                    batch_size=1,
+                )
+            )
+            for _ in range(20):
+                await asyncio.sleep(0)
+
+            # One batch in the writer, one queued, one embedded and waiting to be queued
+            assert len(embedded) == 3
+
+            release_writer.set()
+            await asyncio.wait_for(task, timeout=1)
+        assert len(embedded) == 6
+
+    @pytest.mark.asyncio
+    async def test_writer_failure_stops_embedding(self):
+        async def failing_insert(client, batch_data, cancellation_check=None, bulk_loader=None):
+            raise RuntimeError("database unavailable")
+
+        credentials, embeddings, signature, _ = patch_storage(incremental=False)
+        with (
+            credentials,
+            embeddings as embed,
+            signature,
+            patch(f"{MODULE}._insert_batch", side_effect=failing_insert),
+            patch(f"{MODULE}.upsert_pages", AsyncMock(return_value={})),
+        ):
+            contents = [f"chunk {i}" for i in range(10)]
+            with pytest.raises(RuntimeError, match="database unavailable"):
+                await add_documents_to_supabase(
+                    MagicMock(),
+                    ["u"] * 10,
+                    list(range(10)),
+                    contents,
+                    [{"source_id": "s"} for _ in contents],
+                    {},
+                    batch_size=1,
+                )
+        assert embed.await_count < 10
@@ -0,0 +1,118 @@
+"""
+Tests for the embedding micro-batcher used by create_embedding.
+"""
+
+import asyncio
+
+import pytest
+
+from src.server.services.embeddings.embedding_batcher import EmbeddingMicroBatcher
+from src.server.services.embeddings.embedding_exceptions import EmbeddingAPIError
+from src.server.services.embeddings.embedding_service import EmbeddingBatchResult
+
+
+def make_batch_fn(calls: list, fail_texts: set[str] | None = None):
+    fail_texts = fail_texts or set()
+
+    async def batch_fn(texts, provider=None):
+        calls.append((list(texts), provider))
+        await asyncio.sleep(0.01)
+        result = EmbeddingBatchResult()
+        for text in texts:
+            if text in fail_texts:
+                result.add_failure(text, EmbeddingAPIError(f"bad text {text}"))
+            else:
+                result.add_success([float(len(text))], text)
+        return result
+
+    return batch_fn
+
+
+class TestEmbeddingMicroBatcher:
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_share_one_batch(self):
+        calls = []
+        batcher = EmbeddingMicroBatcher(make_batch_fn(calls), max_wait_ms=20)
+
+        results = await asyncio.gather(*(batcher.submit("x" * n) for n in range(1, 6)))
+
+        assert len(calls) == 1
+        assert calls[0][0] == ["x", "xx", "xxx", "xxxx", "xxxxx"]
+        assert [r.embeddings[0][0] for r in results] == [1.0, 2.0, 3.0, 4.0, 5.0]
+        assert all(r.success_count == 1 for r in results)
+
+    @pytest.mark.asyncio
+    async def test_identical_texts_are_coalesced(self):
+        calls = []
+        batcher = EmbeddingMicroBatcher(make_batch_fn(calls), max_wait_ms=20)
+
+        results = await asyncio.gather(*(batcher.submit("same") for _ in range(4)))
+
+        assert calls == [(["same"], None)]
+        assert all([e.tolist() for e in r.embeddings] == [[4.0]] for r in results)
+
+    @pytest.mark.asyncio
+    async def test_in_flight_text_is_coalesced(self):
+        calls = []
+        batcher = EmbeddingMicroBatcher(make_batch_fn(calls), max_wait_ms=1)
+
+        first = asyncio.create_task(batcher.submit("query"))
+        await asyncio.sleep(0.005)  # first batch has been flushed and is in flight
+        second = await batcher.submit("query")
+
+        assert (await first).embeddings[0].tolist() == second.embeddings[0].tolist()
+        assert len(calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_flushes_when_batch_is_full(self):
+        calls = []
+        batcher = EmbeddingMicroBatcher(make_batch_fn(calls), max_wait_ms=10_000, max_batch_size=3)
+
+        results = await asyncio.wait_for(
+            asyncio.gather(*(batcher.submit(f"t{i}") for i in range(3))), timeout=1
+        )
+
+        assert len(calls) == 1
+        assert len(results) == 3
+
+    @pytest.mark.asyncio
+    async def test_batches_are_per_provider(self):
+        calls = []
+        batcher = EmbeddingMicroBatcher(make_batch_fn(calls), max_wait_ms=20)
+
+        await asyncio.gather(
+            batcher.submit("a", provider="openai"),
+            batcher.submit("b", provider="ollama"),
+            batcher.submit("c", provider="openai"),
+        )
+
+        assert sorted(calls, key=lambda c: c[1]) == [(["b"], "ollama"), (["a", "c"], "openai")]
+
+    @pytest.mark.asyncio
+    async def test_failures_fan_out_to_the_right_caller(self):
+        calls = []
+        batcher = EmbeddingMicroBatcher(make_batch_fn(calls, fail_texts={"bad"}), max_wait_ms=20)
+
+        good, bad, other = await asyncio.gather(
+            batcher.submit("good"), batcher.submit("bad"), batcher.submit("other")
+        )
+
+        assert good.success_count == 1 and good.embeddings[0].tolist() == [4.0]
+        assert other.success_count == 1 and other.embeddings[0].tolist() == [5.0]
+        assert bad.success_count == 0
+        assert bad.failure_count == 1
+        assert "bad text bad" in bad.failed_items[0]["error"]
+
+    @pytest.mark.asyncio
+    async def test_batch_exception_propagates_to_all_callers(self):
+        async def broken(texts, provider=None):
+            raise RuntimeError("boom")
+
+        batcher = EmbeddingMicroBatcher(broken, max_wait_ms=1)
+
+        results = await asyncio.gather(
+            batcher.submit("a"), batcher.submit("b"), return_exceptions=True
+        )
+
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert batcher.stats()["pending_futures"] == 0
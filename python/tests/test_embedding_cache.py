@@ -0,0 +1,164 @@
+"""
+Tests for the persistent embedding cache and its use in create_embeddings_batch.
+"""
+
+import sqlite3
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import numpy as np
+import pytest
+
+from src.server.services.embeddings import embedding_cache as cache_module
+from src.server.services.embeddings.embedding_cache import EmbeddingCache, make_cache_key
+from src.server.services.embeddings.embedding_service import create_embeddings_batch
+
+
+class AsyncContextManager:
+    """Helper class for properly mocking async context managers"""
+
+    def __init__(self, return_value):
+        self.return_value = return_value
+
+    async def __aenter__(self):
+        return self.return_value
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = EmbeddingCache(tmp_path / "embeddings.sqlite3")
+    yield cache
+    cache.close()
+
+
+class TestEmbeddingCache:
+    def test_key_depends_on_provider_model_dimensions_and_text(self):
+        base = make_cache_key("openai", "model-a", 1536, "hello")
+        assert base == make_cache_key("openai", "model-a", 1536, "hello")
+        assert base != make_cache_key("ollama", "model-a", 1536, "hello")
+        assert base != make_cache_key("openai", "model-b", 1536, "hello")
+        assert base != make_cache_key("openai", "model-a", 768, "hello")
+        assert base != make_cache_key("openai", "model-a", 1536, "hello!")
+
+    def test_round_trip(self, cache):
+        cache.put_many("p", "m", 3, [("a", [0.5, 0.25, 1.0]), ("b", [1.0, 2.0, 3.0])])
+
+        hits = cache.get_many("p", "m", 3, ["b", "missing", "a"])
+
+        assert {i: v.tolist() for i, v in hits.items()} == {0: [1.0, 2.0, 3.0], 2: [0.5, 0.25, 1.0]}
+        assert hits[0].dtype == np.float32
+        assert cache.hits == 2
+        assert cache.misses == 1
+
+    def test_model_mismatch_is_a_miss(self, cache):
+        cache.put_many("p", "m", 3, [("a", [0.5, 0.25, 1.0])])
+        assert cache.get_many("p", "other-model", 3, ["a"]) == {}
+
+    def test_persists_across_instances(self, tmp_path):
+        path = tmp_path / "embeddings.sqlite3"
+        first = EmbeddingCache(path)
+        first.put_many("p", "m", 2, [("a", [1.0, 2.0])])
+        first.close()
+
+        second = EmbeddingCache(path)
+        assert second.get_many("p", "m", 2, ["a"])[0].tolist() == [1.0, 2.0]
+        assert second.size_bytes == 8
+        second.close()
+
+    def test_lru_eviction(self, tmp_path):
+        # Each 4-dim float32 vector is 16 bytes; room for 3 entries
+        cache = EmbeddingCache(tmp_path / "embeddings.sqlite3", max_size_bytes=48)
+        cache.put_many("p", "m", 4, [("a", [1.0] * 4)])
+        cache.put_many("p", "m", 4, [("b", [2.0] * 4)])
+        cache.put_many("p", "m", 4, [("c", [3.0] * 4)])
+
+        # Touch "a" so "b" becomes least recently used
+        cache.get_many("p", "m", 4, ["a"])
+        cache.put_many("p", "m", 4, [("d", [4.0] * 4)])
+
+        hits = cache.get_many("p", "m", 4, ["a", "b", "c", "d"])
+        assert 1 not in hits
+        assert 0 in hits and 3 in hits
+        assert cache.size_bytes <= 48
+        cache.close()
+
+    def test_replacing_entry_does_not_double_count(self, cache):
+        cache.put_many("p", "m", 2, [("a", [1.0, 2.0])])
+        cache.put_many("p", "m", 2, [("a", [3.0, 4.0])])
+        assert cache.size_bytes == 8
+        assert cache.get_many("p", "m", 2, ["a"])[0].tolist() == [3.0, 4.0]
+
+    def test_cache_without_creation_times_is_upgraded(self, tmp_path):
+        path = tmp_path / "embeddings.sqlite3"
+        conn = sqlite3.connect(path)
+        conn.execute(
+            "CREATE TABLE embedding_cache (key TEXT PRIMARY KEY, embedding BLOB NOT NULL, "
+            "size_bytes INTEGER NOT NULL, last_accessed REAL NOT NULL)"
+        )
+        blob = np.asarray([1.0, 2.0], dtype=np.float32).tobytes()
+        conn.execute(
+            "INSERT INTO embedding_cache VALUES (?, ?, ?, ?)",
+            (make_cache_key("p", "m", 2, "a"), blob, len(blob), 1.0),
+        )
+        conn.commit()
+        conn.close()
+
+        cache = EmbeddingCache(path)
+        # Embeddings have no TTL, so old entries stay hits
+        assert cache.get_many("p", "m", 2, ["a"])[0].tolist() == [1.0, 2.0]
+        cache.put_many("p", "m", 2, [("b", [3.0, 4.0])])
+        assert cache.size_bytes == 16
+        cache.close()
+
+
+class TestCreateEmbeddingsBatchWithCache:
+    # The cache is on unless EMBEDDING_CACHE_ENABLED turns it off
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("settings", [{"EMBEDDING_CACHE_ENABLED": "true"}, {}])
+    async def test_cached_texts_skip_provider(self, cache, settings):
+        cache.put_many("openai", "text-embedding-3-small", 1536, [("cached", [0.5] * 1536)])
+
+        mock_client = MagicMock()
+        mock_response = MagicMock()
+        mock_response.data = [MagicMock(embedding=[0.1] * 1536)]
+        mock_client.embeddings.create = AsyncMock(return_value=mock_response)
+
+        mock_threading_service = MagicMock()
+        mock_threading_service.rate_limited_operation.return_value = AsyncContextManager(None)
+
+        with (
+            patch(
+                "src.server.services.embeddings.embedding_service.get_threading_service",
+                return_value=mock_threading_service,
+            ),
+            patch(
+                "src.server.services.embeddings.embedding_service.get_llm_client",
+                return_value=AsyncContextManager(mock_client),
+            ),
+            patch(
+                "src.server.services.embeddings.embedding_service.get_embedding_model",
+                return_value="text-embedding-3-small",
+            ),
+            patch(
+                "src.server.services.embeddings.embedding_service.credential_service"
+            ) as mock_cred,
+            patch.object(cache_module, "_embedding_cache", cache),
+        ):
+            mock_cred.get_credentials_by_category = AsyncMock(
+                return_value={"EMBEDDING_BATCH_SIZE": "10", **settings}
+            )
+
+            result = await create_embeddings_batch(["cached", "fresh"])
+
+            assert result.success_count == 2
+            assert set(result.texts_processed) == {"cached", "fresh"}
+            mock_client.embeddings.create.assert_called_once()
+            assert mock_client.embeddings.create.call_args.kwargs["input"] == ["fresh"]
+
+            # The fresh embedding is now cached too
+            mock_client.embeddings.create.reset_mock()
+            result = await create_embeddings_batch(["fresh"])
+            assert result.success_count == 1
+            mock_client.embeddings.create.assert_not_called()
@@ -7,6 +7,7 @@ instead of returning zero embeddings, following the "fail fast and loud" princip
 
 from unittest.mock import AsyncMock, Mock, patch
 
+import numpy as np
 import openai
 import pytest
 
@@ -290,7 +291,8 @@ class TestEmbeddingBatchResult:
         assert result.success_count == 1
         assert result.failure_count == 0
         assert len(result.embeddings) == 1
-        assert result.embeddings[0] == embedding
+        assert result.embeddings[0].dtype == np.float32
+        assert result.embeddings[0].tolist() == pytest.approx(embedding)
         assert result.texts_processed[0] == text
         assert not result.has_failures
 
@@ -0,0 +1,196 @@
+"""
+Tests for the streaming HTML code block parser.
+"""
+
+import time
+from collections import Counter
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from src.server.services.crawling.code_extraction_service import (
+    CodeExtractionService,
+    CodeExtractionSettings,
+)
+from src.server.services.crawling.html_code_parser import (
+    CodeBlockParser,
+    iter_html_code_blocks,
+    parse_html_code_blocks,
+)
+
+CORPUS_DIR = Path(__file__).parent.parent / "benchmarks" / "html_corpus"
+
+PYTHON_BLOCK = '''import asyncio
+from archon import Client
+
+async def fetch(client: Client, query: str) -> list[dict]:
+    results = await client.search(query=query, limit=5)
+    return [r for r in results if r["score"] > 0.5]
+'''
+
+
+class TestCorpus:
+    @pytest.mark.parametrize(
+        "page, source_type, has_languages",
+        [
+            ("codemirror.html", "codemirror", False),
+            ("docusaurus.html", "docusaurus", True),
+            ("github_readme.html", "github-highlight", True),
+            ("hljs.html", "hljs", True),
+            ("plain_pre_code.html", "standard", False),
+            ("vitepress_shiki.html", "shiki", True),
+        ],
+    )
+    def test_doc_site_flavours(self, page, source_type, has_languages):
+        blocks = parse_html_code_blocks((CORPUS_DIR / page).read_text())
+
+        assert len(blocks) == 40
+        assert Counter(block["source_type"] for block in blocks) == {source_type: 40}
+        languages = {block["language"] for block in blocks}
+        if has_languages:
+            assert {"python", "typescript", "go", "bash"} <= languages
+        else:
+            assert languages == {""}
+        for block in blocks:
+            assert block["context_before"] and block["context_after"]
+            assert "</" not in block["context_before"] + block["context_after"]
+
+    def test_prose_page_only_has_inline_code(self):
+        blocks = parse_html_code_blocks((CORPUS_DIR / "prose_only.html").read_text())
+        assert blocks
+        assert {block["source_type"] for block in blocks} == {"code"}
+
+    def test_codemirror_keeps_blank_lines(self):
+        blocks = parse_html_code_blocks((CORPUS_DIR / "codemirror.html").read_text())
+        assert blocks[0]["code"].startswith('package main\n\nimport "fmt"\n\n')
+
+    def test_chunked_feed_matches_whole_page(self):
+        html = (CORPUS_DIR / "docusaurus.html").read_text()
+        whole = parse_html_code_blocks(html)
+        chunks = (html[i : i + 97] for i in range(0, len(html), 97))
+
+        assert list(iter_html_code_blocks(chunks)) == whole
+
+
+class TestParser:
+    def test_entities_and_markup(self):
+        html = (
+            '<p>Render a list:</p><div class="highlight highlight-source-html"><pre>'
+            "&lt;ul class=&quot;items&quot;&gt;<span>&lt;li&gt;</span>one&lt;/li&gt;&lt;/ul&gt;"
+            "</pre></div><p>Done.</p>"
+        )
+        [block] = parse_html_code_blocks(html)
+
+        assert block["code"] == '<ul class="items"><li>one</li></ul>'
+        assert block["language"] == "html"
+        assert block["source_type"] == "github-highlight"
+        assert block["context_before"] == "Render a list:"
+        assert block["context_after"] == "Done."
+
+    def test_language_from_nested_code_element(self):
+        html = '<pre class="hljs"><code class="language-rust">fn main() {}</code></pre>'
+        [block] = parse_html_code_blocks(html)
+        assert (block["language"], block["source_type"]) == ("rust", "hljs")
+
+    def test_monaco_lines(self):
+        html = (
+            '<div class="monaco-editor"><div class="view-lines">'
+            '<div class="view-line"><span>let x = 1;</span></div>'
+            '<div class="view-line"><span>let y = x;</span></div></div></div>'
+        )
+        [block] = parse_html_code_blocks(html)
+        assert block["code"] == "let x = 1;\nlet y = x;"
+        assert block["source_type"] == "monaco"
+
+    def test_scripts_and_styles_are_not_context(self):
+        html = (
+            "<p>Before</p><script>var secret = 1;</script><style>p {}</style>"
+            "<pre>x = 1</pre>"
+        )
+        [block] = parse_html_code_blocks(html)
+        assert block["context_before"] == "Before"
+
+    def test_standalone_code_only_without_code_blocks(self):
+        inline = "<p>Call <code>client.search(query)</code> first.</p>"
+        assert [b["code"] for b in parse_html_code_blocks(inline)] == ["client.search(query)"]
+        assert [b["code"] for b in parse_html_code_blocks(inline + "<pre>x = 1</pre>")] == [
+            "x = 1"
+        ]
+
+    def test_blocks_are_released_once_context_is_complete(self):
+        parser = CodeBlockParser(context_chars=10)
+        parser.feed("<pre>x = 1</pre><p>short")
+        assert parser.pop_blocks() == []
+
+        parser.feed(" text after the block</p>")
+        [block] = parser.pop_blocks()
+        assert block["context_after"] == "short text"
+
+    def test_oversized_blocks_are_skipped(self):
+        parser = CodeBlockParser(max_block_chars=100)
+        parser.feed("<pre>" + "x" * 500 + "</pre><pre>y = 2</pre>")
+        parser.close()
+
+        assert [block["code"] for block in parser.pop_blocks()] == ["y = 2"]
+        assert parser.skipped_oversized == 1
+
+    @pytest.mark.parametrize(
+        "html",
+        [
+            "<a " * 100_000,
+            '<a href="x' + "<p>text</p>" * 30_000,
+            "<!--" + "x" * 300_000 + "<pre>y = 1</pre>",
+            '<div class="highlight"><pre>x' * 20_000,
+            "<div>" * 50_000 + "<pre>x</pre>",
+        ],
+        ids=["unterminated-tags", "unterminated-quote", "unterminated-comment", "unclosed-pre", "deep"],
+    )
+    def test_pathological_pages_stay_fast(self, html):
+        start = time.perf_counter()
+        parse_html_code_blocks(html)
+        assert time.perf_counter() - start < 5
+
+
+class TestServiceIntegration:
+    @pytest.fixture
+    def service(self):
+        service = CodeExtractionService(MagicMock())
+        service._settings = CodeExtractionSettings()
+        return service
+
+    async def test_streaming_extraction(self, service):
+        html = (
+            "<h2>Example</h2><p>This example searches the knowledge base.</p>"
+            f'<pre class="language-python"><code>{PYTHON_BLOCK}</code></pre><p>That is all.</p>'
+        )
+        [block] = await service._extract_html_code_blocks(html)
+
+        assert block["language"] == "python"
+        assert block["source_type"] == "prism"
+        assert block["code"].startswith("import asyncio\nfrom archon import Client")
+        assert block["context_before"].endswith("This example searches the knowledge base.")
+        assert block["full_context"] == (
+            f"{block['context_before']}\n\n{block['code']}\n\n{block['context_after']}"
+        )
+
+    async def test_tags_in_code_survive_cleaning(self, service):
+        html_code = "\n".join(
+            f'&lt;div class="card"&gt;&lt;h3&gt;{{{{ item.title_{i} }}}}&lt;/h3&gt;&lt;/div&gt;'
+            for i in range(12)
+        )
+        html = f'<pre><code class="language-html">{html_code}</code></pre>'
+        service._settings = CodeExtractionSettings(prose_filtering=False)
+
+        [block] = await service._extract_html_code_blocks(html)
+
+        assert block["code"].count("div") == 24
+        assert block["code"].count("h3") == 24
+
+    async def test_setting_selects_regex_extractor(self, service):
+        service._settings = CodeExtractionSettings(streaming_html_parser=False)
+        service._extract_html_code_blocks_regex = AsyncMock(return_value=[])
+
+        await service._extract_html_code_blocks("<pre>x</pre>")
+
+        service._extract_html_code_blocks_regex.assert_awaited_once()
@@ -0,0 +1,140 @@
+"""
+Tests for the local CPU embedding provider and its use in create_embeddings_batch.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import numpy as np
+import pytest
+
+from src.server.services.embeddings import local_embedding_provider as local_module
+from src.server.services.embeddings.embedding_service import create_embeddings_batch
+from src.server.services.embeddings.local_embedding_provider import LocalEmbeddingProvider
+
+
+def fake_encode(texts, batch_size):
+    return np.array([[len(text), 1.0] for text in texts], dtype=np.float32)
+
+
+@pytest.fixture
+def provider():
+    provider = LocalEmbeddingProvider("test-model", workers=2)
+    executor = ThreadPoolExecutor(max_workers=2)
+    with (
+        patch.object(provider, "_get_executor", return_value=executor),
+        patch.object(local_module, "_encode_batch", fake_encode),
+    ):
+        yield provider
+    executor.shutdown()
+
+
+class TestLocalEmbeddingProvider:
+    @pytest.mark.asyncio
+    async def test_openai_style_create(self, provider):
+        response = await provider.embeddings.create(model="test-model", input=["a", "bbb"])
+        assert [item.embedding.tolist() for item in response.data] == [[1.0, 1.0], [3.0, 1.0]]
+
+    @pytest.mark.asyncio
+    async def test_pads_to_requested_dimensions(self, provider):
+        vectors = await provider.embed(["ab"], dimensions=4)
+        assert vectors.dtype == np.float32
+        assert vectors.tolist() == [[2.0, 1.0, 0.0, 0.0]]
+
+    @pytest.mark.asyncio
+    async def test_rejects_larger_native_dimensions(self, provider):
+        with pytest.raises(ValueError):
+            await provider.embed(["ab"], dimensions=1)
+
+    def test_reconfiguring_does_not_wait_for_the_old_pool(self):
+        old = LocalEmbeddingProvider("old-model", workers=1)
+        executor = MagicMock()
+        old._executor = executor
+        with (
+            patch.object(local_module, "_local_provider", old),
+            patch.object(local_module, "SENTENCE_TRANSFORMERS_AVAILABLE", True),
+        ):
+            new = local_module.get_local_embedding_provider("new-model", workers=1)
+
+        assert new is not old and new.model_name == "new-model"
+        executor.shutdown.assert_called_once_with(wait=False, cancel_futures=False)
+
+    def test_missing_dependency_is_reported(self):
+        provider = LocalEmbeddingProvider("test-model", workers=1)
+        with patch.object(local_module, "SENTENCE_TRANSFORMERS_AVAILABLE", False):
+            with pytest.raises(RuntimeError, match="sentence-transformers"):
+                provider._get_executor()
+
+    def test_missing_dependency_fails_before_creating_the_provider(self):
+        with (
+            patch.object(local_module, "_local_provider", None),
+            patch.object(local_module, "SENTENCE_TRANSFORMERS_AVAILABLE", False),
+        ):
+            with pytest.raises(RuntimeError, match="INSTALL_LOCAL_EMBEDDINGS"):
+                local_module.get_local_embedding_provider()
+            assert local_module._local_provider is None
+
+
+class TestCreateEmbeddingsBatchLocal:
+    @pytest.mark.asyncio
+    async def test_local_provider_skips_remote_client_and_rate_limiter(self, provider):
+        mock_threading_service = MagicMock()
+
+        with (
+            patch(
+                "src.server.services.embeddings.embedding_service.get_threading_service",
+                return_value=mock_threading_service,
+            ),
+            patch(
+                "src.server.services.embeddings.embedding_service.get_llm_client"
+            ) as mock_get_client,
+            patch(
+                "src.server.services.embeddings.embedding_service.get_local_embedding_provider",
+                return_value=provider,
+            ),
+            patch(
+                "src.server.services.embeddings.embedding_service.credential_service"
+            ) as mock_cred,
+        ):
+            mock_cred.get_credentials_by_category = AsyncMock(
+                return_value={
+                    "EMBEDDING_PROVIDER": "local",
+                    "EMBEDDING_BATCH_SIZE": "2",
+                    "EMBEDDING_DIMENSIONS": "3",
+                }
+            )
+
+            result = await create_embeddings_batch(["a", "bb", "ccc"])
+
+            assert result.success_count == 3
+            assert result.embeddings_array().tolist() == [
+                [1.0, 1.0, 0.0],
+                [2.0, 1.0, 0.0],
+                [3.0, 1.0, 0.0],
+            ]
+            mock_get_client.assert_not_called()
+            mock_threading_service.rate_limited_operation.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_local_failures_are_tracked(self):
+        provider = LocalEmbeddingProvider("test-model", workers=1)
+
+        with (
+            patch(
+                "src.server.services.embeddings.embedding_service.get_local_embedding_provider",
+                return_value=provider,
+            ),
+            patch(
+                "src.server.services.embeddings.embedding_service.credential_service"
+            ) as mock_cred,
+            patch.object(local_module, "SENTENCE_TRANSFORMERS_AVAILABLE", False),
+        ):
+            mock_cred.get_credentials_by_category = AsyncMock(
+                return_value={"EMBEDDING_PROVIDER": "local"}
+            )
+
+            result = await create_embeddings_batch(["a", "b"])
+
+            assert result.success_count == 0
+            assert result.failure_count == 2
+            assert "sentence-transformers" in result.failed_items[0]["error"]
@@ -0,0 +1,148 @@
+"""
+Tests for page rows and the page metadata join in search.
+"""
+
+import hashlib
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from postgrest.exceptions import APIError
+
+from src.server.services.search import hybrid_search_strategy
+from src.server.services.search.base_search_strategy import BaseSearchStrategy
+from src.server.services.search.hybrid_search_strategy import HybridSearchStrategy
+from src.server.services.storage.page_storage_service import (
+    build_page_rows,
+    merge_page_metadata,
+    split_page_metadata,
+)
+
+
+class TestPageMetadata:
+    def test_split_and_merge_round_trip(self):
+        metadata = {
+            "url": "https://example.com/guide",
+            "title": "Guide",
+            "source_id": "example.com",
+            "tags": ["docs"],
+            "chunk_index": 3,
+            "word_count": 120,
+            "headers": "## Install",
+        }
+
+        page, chunk = split_page_metadata(metadata)
+
+        assert chunk == {"chunk_index": 3, "word_count": 120, "headers": "## Install"}
+        assert merge_page_metadata(page, chunk) == metadata
+        assert merge_page_metadata(None, chunk) == chunk
+
+    def test_one_row_per_url_from_its_first_chunk(self):
+        metadatas = [
+            {"source_id": "s", "title": "A", "chunk_index": 0},
+            {"source_id": "s", "title": "A", "chunk_index": 1},
+            {"source_id": "s", "title": "B", "chunk_index": 0},
+        ]
+
+        rows = build_page_rows(
+            ["a", "a", "b"], metadatas, {"a": "# A"}, {"a": 2, "b": 1}, {"b": "W/\"1\""}
+        )
+
+        assert [(row["url"], row["chunk_count"], row["etag"]) for row in rows] == [
+            ("a", 2, None),
+            ("b", 1, 'W/"1"'),
+        ]
+        assert rows[0]["metadata"] == {"source_id": "s", "title": "A"}
+        assert rows[0]["content_hash"] == hashlib.sha256(b"# A").hexdigest()
+        assert (rows[1]["content"], rows[1]["content_hash"]) == (None, None)
+
+    def test_missing_source_id_falls_back_to_the_host(self):
+        rows = build_page_rows(
+            ["https://docs.example.com/guide", "file.md"], [{}, {"source_id": ""}], {}, {}
+        )
+
+        assert [row["source_id"] for row in rows] == ["docs.example.com", "file.md"]
+
+
+class TestSearchJoin:
+    async def test_metadata_join_is_requested_by_default(self):
+        client = MagicMock()
+        client.rpc.return_value.execute.return_value = MagicMock(data=[])
+
+        await BaseSearchStrategy(client).vector_search([0.1], 5)
+
+        assert "include_metadata" not in client.rpc.call_args.args[1]
+
+    async def test_skipping_the_join(self):
+        client = MagicMock()
+        client.rpc.return_value.execute.return_value = MagicMock(data=[])
+        strategy = BaseSearchStrategy(client)
+
+        await strategy.vector_search([0.1], 5, include_metadata=False)
+        assert client.rpc.call_args.args[1]["include_metadata"] is False
+
+        await strategy.vector_search([0.1], 5, table_rpc="match_archon_code_examples", include_metadata=False)
+        assert "include_metadata" not in client.rpc.call_args.args[1]
+
+    async def test_keyword_results_get_page_metadata(self):
+        base = MagicMock()
+        base.vector_search = AsyncMock(return_value=[])
+        strategy = HybridSearchStrategy(MagicMock(), base)
+        strategy.keyword_search = AsyncMock(
+            return_value=[{
+                "id": 1,
+                "url": "u",
+                "chunk_number": 0,
+                "content": "install archon",
+                "metadata": {"chunk_index": 0},
+                "source_id": "s",
+                "page": {"metadata": {"title": "Guide"}},
+            }]
+        )
+
+        [result] = await strategy.search_documents_hybrid("install", [0.1], 5)
+
+        assert "archon_pages(metadata)" in strategy.keyword_search.call_args.kwargs["select_fields"]
+        assert result["metadata"] == {"title": "Guide", "chunk_index": 0}
+        assert "page" not in result
+
+    async def test_missing_pages_table_falls_back_to_plain_chunks(self):
+        class Query:
+            """Records the select list; every filter returns the same query."""
+
+            def __init__(self, fields):
+                self.fields = fields
+
+            def ilike(self, *args):
+                return self
+
+            limit = eq = ilike
+
+        selected = []
+
+        async def execute(query, operation=None):
+            selected.append(query.fields)
+            if "archon_pages" in query.fields:
+                raise APIError({
+                    "code": "PGRST200",
+                    "message": "Could not find a relationship between 'archon_crawled_pages' and 'archon_pages'",
+                })
+            row = {"id": 1, "url": "u", "chunk_number": 0, "content": "install archon", "source_id": "s"}
+            return MagicMock(data=[{**row, "metadata": {"chunk_index": 0}}])
+
+        client = MagicMock()
+        client.from_.return_value.select.side_effect = Query
+        base = MagicMock()
+        base.vector_search = AsyncMock(return_value=[])
+        strategy = HybridSearchStrategy(client, base)
+
+        with (
+            patch.object(hybrid_search_strategy, "execute_query", side_effect=execute),
+            patch.object(hybrid_search_strategy, "_pages_relation_available", True),
+        ):
+            [result] = await strategy.search_documents_hybrid("install", [0.1], 5)
+            assert result["metadata"] == {"chunk_index": 0}
+            assert "archon_pages" in selected[0] and "archon_pages" not in selected[-1]
+
+            # Later searches don't ask for the missing relation again
+            selected.clear()
+            await strategy.search_documents_hybrid("install", [0.1], 5)
+            assert selected and not any("archon_pages" in fields for fields in selected)
@@ -0,0 +1,134 @@
+"""
+Tests for the GCRA request/token rate limiter in the threading service.
+"""
+
+import asyncio
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from src.server.services.threading_service import (
+    InMemoryRateLimitState,
+    RateLimitConfig,
+    RateLimiter,
+    RateLimitStateBackend,
+    SQLiteRateLimitState,
+    create_rate_limit_state,
+)
+
+MODULE = "src.server.services.threading_service"
+
+
+def make_limiter(state=None, **overrides) -> RateLimiter:
+    settings = {"requests_per_minute": 60, "tokens_per_minute": 6000, **overrides}
+    return RateLimiter(RateLimitConfig(**settings), state=state or InMemoryRateLimitState())
+
+
+class TestGCRA:
+    @pytest.mark.asyncio
+    async def test_calls_within_budget_do_not_wait(self):
+        limiter = make_limiter()
+        with patch(f"{MODULE}.asyncio.sleep", new_callable=AsyncMock) as sleep:
+            for _ in range(10):
+                assert await limiter.acquire(100)
+        sleep.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_token_budget_exhaustion_waits_for_refill(self):
+        limiter = make_limiter()
+        with (
+            patch(f"{MODULE}.time.time", return_value=1000.0),
+            patch(f"{MODULE}.asyncio.sleep", new_callable=AsyncMock) as sleep,
+        ):
+            await limiter.acquire(6000)  # the whole minute's tokens
+            sleep.assert_not_called()
+
+            await limiter.acquire(600)  # refills at 100 tokens/s
+        assert sleep.call_args.args[0] == pytest.approx(6.0)
+
+    @pytest.mark.asyncio
+    async def test_request_budget_exhaustion_waits_for_refill(self):
+        limiter = make_limiter(requests_per_minute=2)
+        with (
+            patch(f"{MODULE}.time.time", return_value=1000.0),
+            patch(f"{MODULE}.asyncio.sleep", new_callable=AsyncMock) as sleep,
+        ):
+            await limiter.acquire(1)
+            await limiter.acquire(1)
+            sleep.assert_not_called()
+            await limiter.acquire(1)
+        assert sleep.call_args.args[0] == pytest.approx(30.0)
+
+    @pytest.mark.asyncio
+    async def test_reservations_are_served_in_order(self):
+        limiter = make_limiter()
+        with (
+            patch(f"{MODULE}.time.time", return_value=1000.0),
+            patch(f"{MODULE}.asyncio.sleep", new_callable=AsyncMock) as sleep,
+        ):
+            await limiter.acquire(6000)
+            for _ in range(3):
+                await limiter.acquire(100)
+        waits = [c.args[0] for c in sleep.call_args_list]
+        assert waits == pytest.approx([1.0, 2.0, 3.0])
+
+    @pytest.mark.asyncio
+    async def test_waiters_do_not_block_each_other(self):
+        # 10 requests/sec: the third and fourth calls each wait ~0.1s and ~0.2s,
+        # but they sleep concurrently rather than one after the other
+        limiter = make_limiter(requests_per_minute=600)
+        for _ in range(600):
+            await limiter.acquire(1)
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await asyncio.gather(*(limiter.acquire(1) for _ in range(2)))
+        assert loop.time() - start < 0.35
+
+    @pytest.mark.asyncio
+    async def test_oversized_request_is_capped_to_the_budget(self):
+        limiter = make_limiter()
+        with patch(f"{MODULE}.asyncio.sleep", new_callable=AsyncMock) as sleep:
+            await limiter.acquire(1_000_000)
+        sleep.assert_not_called()
+
+    def test_usage_reports_committed_budget(self):
+        limiter = make_limiter()
+        with patch(f"{MODULE}.time.time", return_value=1000.0):
+            limiter.state.reserve(limiter._buckets(3000), 1000.0)
+            usage = limiter._get_current_usage()
+        assert usage["tokens"] == 3000
+        assert usage["requests"] == 1
+
+
+class TestSharedState:
+    @pytest.mark.asyncio
+    async def test_sqlite_state_is_shared_between_limiters(self, tmp_path):
+        path = str(tmp_path / "ratelimit.db")
+        first = make_limiter(state=SQLiteRateLimitState(path))
+        second = make_limiter(state=SQLiteRateLimitState(path))
+
+        with (
+            patch(f"{MODULE}.time.time", return_value=1000.0),
+            patch(f"{MODULE}.asyncio.sleep", new_callable=AsyncMock) as sleep,
+        ):
+            await first.acquire(6000)
+            sleep.assert_not_called()
+            await second.acquire(600)
+        assert sleep.call_args.args[0] == pytest.approx(6.0)
+
+    def test_backend_selection_from_url(self, tmp_path):
+        assert isinstance(create_rate_limit_state(None), InMemoryRateLimitState)
+        assert isinstance(create_rate_limit_state("memory"), InMemoryRateLimitState)
+        state = create_rate_limit_state(f"sqlite:///{tmp_path / 'state.db'}")
+        assert isinstance(state, SQLiteRateLimitState)
+        with pytest.raises(ValueError):
+            create_rate_limit_state("ftp://nope")
+
+    def test_backends_must_implement_reserve_and_peek(self):
+        class ReserveOnly(RateLimitStateBackend):
+            def reserve(self, buckets, now):
+                return 0.0
+
+        with pytest.raises(TypeError):
+            ReserveOnly()
@@ -0,0 +1,49 @@
+"""
+Tests for token counting and token-budget batch packing.
+"""
+
+from unittest.mock import MagicMock, patch
+
+from src.server.services.embeddings import token_batching
+from src.server.services.embeddings.token_batching import (
+    count_tokens_batch,
+    pack_token_batches,
+)
+
+
+class TestPackTokenBatches:
+    def test_fills_up_to_budget(self):
+        assert pack_token_batches([4, 4, 4, 4], max_tokens=8) == [[0, 1], [2, 3]]
+
+    def test_respects_max_items(self):
+        assert pack_token_batches([1, 1, 1, 1, 1], max_tokens=100, max_items=2) == [
+            [0, 1],
+            [2, 3],
+            [4],
+        ]
+
+    def test_oversized_item_gets_own_batch(self):
+        assert pack_token_batches([2, 50, 2, 2], max_tokens=10) == [[0], [1], [2, 3]]
+
+    def test_preserves_order_and_covers_all_items(self):
+        counts = [3, 7, 1, 9, 2, 2, 8, 1]
+        batches = pack_token_batches(counts, max_tokens=10, max_items=3)
+        assert [i for batch in batches for i in batch] == list(range(len(counts)))
+        for batch in batches:
+            assert len(batch) <= 3
+            assert len(batch) == 1 or sum(counts[i] for i in batch) <= 10
+
+    def test_empty(self):
+        assert pack_token_batches([], max_tokens=10) == []
+
+
+class TestCountTokens:
+    def test_uses_encoder_when_available(self):
+        encoder = MagicMock()
+        encoder.encode_ordinary_batch.return_value = [[1, 2, 3], [4]]
+        with patch.object(token_batching, "get_encoder", return_value=encoder):
+            assert count_tokens_batch(["abc", "d"], "text-embedding-3-small") == [3, 1]
+
+    def test_falls_back_to_character_estimate(self):
+        with patch.object(token_batching, "get_encoder", return_value=None):
+            assert count_tokens_batch(["a" * 40, "", "ab"]) == [10, 0, 1]
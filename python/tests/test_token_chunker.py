@@ -0,0 +1,127 @@
+"""
+Tests for the token-budgeted chunker.
+
+Token counts use the character estimate (4 characters per token) so the expected
+chunk boundaries do not depend on which tokenizer files are cached locally.
+"""
+
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from src.server.services.embeddings import token_batching
+from src.server.services.embeddings.token_batching import count_tokens_batch
+from src.server.services.storage import token_chunker
+from src.server.services.storage.storage_services import DocumentStorageService
+from src.server.services.storage.token_chunker import chunk_text_by_tokens, split_at_boundaries
+
+
+@pytest.fixture(autouse=True)
+def estimated_tokens():
+    with (
+        patch.object(token_batching, "get_encoder", return_value=None),
+        patch.object(token_chunker, "get_encoder", return_value=None),
+    ):
+        yield
+
+
+def tokens(text: str) -> int:
+    # Budgets are enforced on the sum of per-piece counts, count the same way here
+    return sum(count_tokens_batch(split_at_boundaries(text)[0]))
+
+
+def sentence(n: int) -> str:
+    return f"Sentence number {n} talks about vector search in some detail."
+
+
+class TestSplitAtBoundaries:
+    def test_pieces_rebuild_the_text(self):
+        text = "Intro. More text.\n\n```python\nx = 1\n\ny = 2\n```\nAfter. End"
+        pieces, priorities = split_at_boundaries(text)
+        assert "".join(pieces) == text
+        assert len(pieces) == len(priorities)
+
+    def test_code_blocks_are_not_split_at_paragraphs(self):
+        text = "Intro\n\n```python\nx = 1\n\ny = 2\n```\nAfter"
+        pieces, priorities = split_at_boundaries(text)
+        block = next(i for i, piece in enumerate(pieces) if piece.startswith("```python"))
+        # The blank line inside the block only rates as a weak boundary
+        assert priorities[block] < priorities[block - 1]
+        assert pieces[block + 1].endswith("```")
+
+
+class TestChunkTextByTokens:
+    def test_chunks_stay_within_budget_and_keep_all_text(self):
+        text = "\n\n".join(" ".join(sentence(p * 10 + s) for s in range(6)) for p in range(40))
+        chunks = chunk_text_by_tokens(text, max_tokens=200)
+
+        assert len(chunks) > 1
+        assert all(tokens(chunk) <= 200 for chunk in chunks)
+        assert "".join("".join(chunks).split()) == "".join(text.split())
+
+    def test_prefers_paragraph_over_sentence_breaks(self):
+        text = "\n\n".join(" ".join(sentence(p * 10 + s) for s in range(3)) for p in range(20))
+        chunks = chunk_text_by_tokens(text, max_tokens=150)
+
+        # Every chunk ends at the end of a paragraph, never mid-paragraph
+        paragraphs = text.split("\n\n")
+        for chunk in chunks:
+            assert chunk.split("\n\n")[-1] in paragraphs
+
+    def test_keeps_code_block_whole_when_it_fits(self):
+        code = "```python\n" + "\n".join(f"value_{i} = compute({i})" for i in range(20)) + "\n```"
+        text = " ".join(sentence(i) for i in range(12)) + "\n\n" + code + "\n\nTrailing text."
+        chunks = chunk_text_by_tokens(text, max_tokens=200)
+
+        assert any(code in chunk for chunk in chunks)
+
+    def test_oversized_span_is_split_mid_content(self):
+        chunks = chunk_text_by_tokens("a" * 4000, max_tokens=100)
+        assert len(chunks) == 10
+        assert all(len(chunk) == 400 for chunk in chunks)
+
+    def test_overlap_repeats_the_trailing_sentence(self):
+        text = " ".join(sentence(i) for i in range(60))
+        chunks = chunk_text_by_tokens(text, max_tokens=100, overlap_tokens=20)
+
+        for previous, current in zip(chunks, chunks[1:], strict=False):
+            last_sentence = previous.rsplit(". ", 1)[-1]
+            assert current.startswith(last_sentence)
+
+    def test_empty_input(self):
+        assert chunk_text_by_tokens("", max_tokens=100) == []
+        assert chunk_text_by_tokens("   \n\n  ", max_tokens=100) == []
+
+    def test_rejects_non_positive_budget(self):
+        with pytest.raises(ValueError):
+            chunk_text_by_tokens("text", max_tokens=0)
+
+
+@pytest.fixture
+def service():
+    return DocumentStorageService(supabase_client=MagicMock())
+
+
+def test_smart_chunk_text_switches_to_tokens(service):
+    text = " ".join(sentence(i) for i in range(200))
+
+    by_characters = service.smart_chunk_text(text, chunk_size=5000)
+    by_tokens = service.smart_chunk_text(text, max_tokens=300)
+
+    assert all(len(chunk) <= 5000 for chunk in by_characters)
+    assert all(tokens(chunk) <= 300 for chunk in by_tokens)
+    assert len(by_tokens) > len(by_characters)
+
+
+@pytest.mark.asyncio
+async def test_chunking_options_follow_settings(service):
+    settings = {"CHUNKING_STRATEGY": "tokens", "CHUNK_MAX_TOKENS": "512", "CHUNK_OVERLAP_TOKENS": "64"}
+    credentials = AsyncMock(return_value=settings)
+    with patch(
+        "src.server.services.credential_service.credential_service.get_credentials_by_category",
+        credentials,
+    ):
+        assert await service.get_chunking_options() == {"max_tokens": 512, "overlap_tokens": 64}
+
+        settings["CHUNKING_STRATEGY"] = "characters"
+        assert await service.get_chunking_options() == {}